@@ -13,7 +13,7 @@ V10.41: 新增 ML 增量學習相關資料表
 
 import os
 from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, text, Date, JSON
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Text, text, Date, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
@@ -29,6 +29,16 @@ engine = create_engine(
     echo=False  # 設為 True 可看 SQL 語句
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL 讓批次寫入訓練樣本時不阻塞讀取；WAL 下 synchronous=NORMAL 仍不會損毀資料"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
 # Session 工廠
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -178,6 +188,10 @@ class TrainingSample(Base):
     - 數據來源追蹤：區分歷史數據 vs 績效追蹤數據
     """
     __tablename__ = "training_samples"
+    __table_args__ = (
+        # 同一股票、日期、來源只保留一筆（批次寫入以 ON CONFLICT DO NOTHING 去重）
+        Index("uq_training_samples_key", "stock_id", "sample_date", "source", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     stock_id = Column(String(10), nullable=False, index=True)
@@ -290,9 +304,33 @@ class TrainingHistory(Base):
 def init_db():
     """初始化資料庫（建立所有表格）"""
     Base.metadata.create_all(bind=engine)
+    ensure_training_sample_index(engine)
     # 使用 logging 而非 print，避免編碼問題
 
 
+def ensure_training_sample_index(bind=None):
+    """
+    為既有的 training_samples 表補上唯一索引（建表時已包含則不動作）
+
+    舊資料庫若有重複樣本，保留最早的一筆後再建立索引。
+    """
+    bind = bind or engine
+    with bind.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_training_samples_key'"
+        )).first()
+        if exists:
+            return
+        conn.execute(text(
+            "DELETE FROM training_samples WHERE id NOT IN ("
+            "SELECT MIN(id) FROM training_samples GROUP BY stock_id, sample_date, source)"
+        ))
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_training_samples_key "
+            "ON training_samples (stock_id, sample_date, source)"
+        ))
+
+
 def get_db():
     """取得資料庫 Session（用於依賴注入）"""
     db = SessionLocal()
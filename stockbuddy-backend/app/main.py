@@ -6,6 +6,7 @@ V10.38 - 新增 SQLite 資料庫支援、JWT 認證、錯誤監控
 """
 
 import os
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 
@@ -65,6 +66,9 @@ from .routers import optimization_routes
 # V10.38: API 版本控制
 from .routers import api_v1
 from .services.twse_api import get_twse_service
+from .services.http_client import get_http_client
+from .services.cache_service import run_cache_sweeper
+from .services.training_jobs import get_training_runner
 
 # V10.38: 資料庫支援
 try:
@@ -109,10 +113,16 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("⚠️ Sentry 未設定 (設定 SENTRY_DSN 環境變數以啟用)")
 
+    # 背景清除過期快取
+    cache_sweeper = asyncio.create_task(run_cache_sweeper())
+
     yield
     # 關閉時
+    cache_sweeper.cancel()
+    get_training_runner().shutdown()
     twse = await get_twse_service()
     await twse.close()
+    await get_http_client().aclose()
     logger.info("👋 StockBuddy API 已關閉")
 
 
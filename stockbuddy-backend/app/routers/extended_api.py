@@ -745,6 +745,10 @@ async def screen_stocks(
     dividend_yield_max: Optional[float] = Query(default=None, description="殖利率上限 (%)"),
     roe_min: Optional[float] = Query(default=None, description="ROE 下限 (%)"),
     roe_max: Optional[float] = Query(default=None, description="ROE 上限 (%)"),
+    rsi_min: Optional[float] = Query(default=None, ge=0, le=100, description="RSI 下限"),
+    rsi_max: Optional[float] = Query(default=None, ge=0, le=100, description="RSI 上限"),
+    technical_score_min: Optional[int] = Query(default=None, ge=0, le=100, description="技術評分下限"),
+    ma_trend: Optional[str] = Query(default=None, description="均線趨勢: bullish/bearish/neutral"),
     market_cap_size: Optional[str] = Query(default=None, description="市值規模: large/mid/small"),
     limit: int = Query(default=20, ge=1, le=50, description="最大返回數量")
 ):
@@ -753,11 +757,13 @@ async def screen_stocks(
 
     支援多條件組合篩選：
     - 基本面篩選（本益比、股價淨值比、殖利率、ROE）
+    - 技術面篩選（RSI、均線趨勢、技術評分；來自盤後技術指標快照）
     - 市值規模篩選（大型股/中型股/小型股）
 
     Example:
         - 價值型：/screener/screen?pe_max=15&dividend_yield_min=3
         - 成長型：/screener/screen?roe_min=15&pe_max=30
+        - 超賣反彈：/screener/screen?rsi_max=30&ma_trend=bullish
     """
     try:
         from app.services.stock_screener import StockScreener, MarketCapSize
@@ -776,6 +782,10 @@ async def screen_stocks(
             dividend_yield_max=dividend_yield_max,
             roe_min=roe_min,
             roe_max=roe_max,
+            rsi_min=rsi_min,
+            rsi_max=rsi_max,
+            technical_score_min=technical_score_min,
+            ma_trend=ma_trend if ma_trend in ["bullish", "bearish", "neutral"] else None,
             market_cap_size=cap_size,
             limit=limit,
         )
@@ -1018,6 +1028,108 @@ async def check_price_alerts(
         raise HTTPException(status_code=500, detail=f"檢查警示失敗: {str(e)}")
 
 
+@router.post("/alerts/register")
+async def register_price_alerts(
+    alerts: List[Dict] = []
+):
+    """
+    登錄伺服器端價格警示
+
+    Body 格式同 /alerts/check；登錄後由排程器以盤中即時報價自動檢查，
+    觸發時寫入警示歷史並推送至 /alerts/stream（觸發後自動移除）。
+    base_price 未提供時，漲跌幅警示以第一筆報價的昨收為基準。
+    """
+    try:
+        from app.services.alert_registry import get_alert_registry
+
+        registry = get_alert_registry()
+        registered, errors = [], []
+        for alert in alerts:
+            try:
+                registered.append(registry.register(alert))
+            except ValueError as e:
+                errors.append({"alert": alert, "error": str(e)})
+
+        return {
+            "success": not errors,
+            "registered": registered,
+            "errors": errors,
+            "total_alerts": len(registry),
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"登錄警示失敗: {str(e)}")
+
+
+@router.get("/alerts/registry")
+async def list_registered_alerts(
+    stock_id: Optional[str] = Query(default=None, description="股票代號")
+):
+    """列出登錄中的價格警示與統計"""
+    from app.services.alert_registry import get_alert_registry
+
+    registry = get_alert_registry()
+    alerts = registry.list_alerts(stock_id)
+    return {
+        "success": True,
+        "alerts": alerts,
+        "count": len(alerts),
+        "stats": registry.get_stats(),
+    }
+
+
+@router.delete("/alerts/registry/{alert_id}")
+async def cancel_registered_alert(alert_id: str):
+    """取消登錄中的價格警示"""
+    from app.services.alert_registry import get_alert_registry
+
+    if not get_alert_registry().cancel(alert_id):
+        raise HTTPException(status_code=404, detail=f"找不到警示: {alert_id}")
+    return {"success": True, "alert_id": alert_id}
+
+
+@router.get("/alerts/stream")
+async def stream_triggered_alerts():
+    """
+    訂閱警示觸發通知（Server-Sent Events）
+
+    每個觸發事件為一筆 `data: {...}`，每 15 秒送出一次心跳註解
+    """
+    import asyncio
+    import json
+    from app.services.alert_registry import get_alert_registry
+
+    registry = get_alert_registry()
+    queue = registry.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                    yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            registry.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.get("/alerts/history")
+async def get_triggered_history(
+    stock_id: Optional[str] = Query(default=None, description="股票代號"),
+    limit: int = Query(default=50, ge=1, le=200, description="最大返回數量")
+):
+    """取得警示觸發歷史（AlertHistory）"""
+    try:
+        from app.services.alert_registry import get_alert_history
+
+        history = get_alert_history(limit=limit, stock_id=stock_id)
+        return {"success": True, "history": history, "count": len(history)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"取得警示歷史失敗: {str(e)}")
+
+
 @router.get("/alerts/price/{stock_id}")
 async def get_stock_price(stock_id: str):
     """
@@ -72,6 +72,59 @@ async def get_preset_stock_list(preset_key: str):
         return {"success": False, "error": str(e)}
 
 
+async def _prediction_inputs(stock_ids: List[str]) -> dict:
+    """
+    以一次批量歷史下載建立預測用的股票數據（收盤價、均線、成交量、RSI）與歷史K線
+
+    歷史K線附上每日 ma5 / ma20，與訓練時相同地計算多日漲跌、均線斜率等特徵
+
+    Returns:
+        {股票代號: (stock_data, history)}，資料不足 20 筆的股票不會出現在結果中
+    """
+    import numpy as np
+    from app.services import indicator_engine
+    from app.services.twse_bulk import get_bulk_service
+
+    histories = await get_bulk_service().get_stocks_history_yf_batch(stock_ids, months=3)
+
+    result = {}
+    for stock_id, history in histories.items():
+        if len(history) < 20:
+            continue
+
+        closes = indicator_engine.as_array([h["close"] for h in history])
+        volumes = indicator_engine.as_array([h["volume"] for h in history])
+        rsi = indicator_engine.rsi(closes)[-1]
+        ma5 = indicator_engine.sma(closes, 5)
+        ma20 = indicator_engine.sma(closes, 20)
+        stock_data = {
+            "close": float(closes[-1]),
+            "prev_close": float(closes[-2]),
+            "open": float(history[-1]["open"]),
+            "high": float(history[-1]["high"]),
+            "low": float(history[-1]["low"]),
+            "ma5": float(ma5[-1]),
+            "ma20": float(ma20[-1]),
+            "volume": float(volumes[-1]),
+            "volume_ma5": float(volumes[-5:].mean()),
+            "avg_volume": float(volumes[-20:].mean()),
+            "rsi": None if np.isnan(rsi) else float(rsi),
+            "rsi_14": None if np.isnan(rsi) else float(rsi),
+        }
+        if len(closes) >= 60:
+            stock_data["ma60"] = float(closes[-60:].mean())
+        bars = [
+            {
+                **bar,
+                "ma5": None if np.isnan(ma5[i]) else float(ma5[i]),
+                "ma20": None if np.isnan(ma20[i]) else float(ma20[i]),
+            }
+            for i, bar in enumerate(history)
+        ]
+        result[stock_id] = (stock_data, bars)
+    return result
+
+
 @router.get("/predict/{stock_id}")
 async def ml_predict_stock(stock_id: str):
     """
@@ -86,39 +139,19 @@ async def ml_predict_stock(stock_id: str):
         - model_version: 使用的模型版本
     """
     try:
-        from app.services.ml_predictor import predict_stock
+        from dataclasses import asdict
+        from app.services.inference_batcher import predict_async
 
         # 嘗試取得股票數據作為預測依據
-        stock_data = {}
         try:
-            import yfinance as yf
-            ticker = yf.Ticker(f"{stock_id}.TW")
-            hist = ticker.history(period="60d")
-
-            if not hist.empty and len(hist) >= 20:
-                close = hist['Close']
-                stock_data = {
-                    "close": float(close.iloc[-1]),
-                    "ma5": float(close.rolling(5).mean().iloc[-1]),
-                    "ma20": float(close.rolling(20).mean().iloc[-1]),
-                    "volume": float(hist['Volume'].iloc[-1]),
-                    "avg_volume": float(hist['Volume'].rolling(20).mean().iloc[-1]),
-                }
-
-                # 計算 RSI
-                delta = close.diff()
-                gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-                loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-                rs = gain / loss
-                rsi = 100 - (100 / (1 + rs))
-                stock_data["rsi"] = float(rsi.iloc[-1]) if not rsi.empty else None
-
+            stock_data, history = (await _prediction_inputs([stock_id])).get(stock_id, ({}, None))
         except Exception:
             # 即使取得數據失敗，仍可使用規則引擎預測
-            pass
+            stock_data, history = {}, None
 
-        result = predict_stock(stock_id, stock_data)
-        return {"success": True, **result}
+        # 並行請求在微批次器中合併為一次特徵萃取與一次模型呼叫
+        result = await predict_async(stock_id, stock_data=stock_data, history=history)
+        return {"success": True, **asdict(result)}
 
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -130,18 +163,34 @@ async def ml_predict_batch(stock_ids: List[str]):
     V10.36: 批次 ML 預測多檔股票
     """
     try:
-        from app.services.ml_predictor import predict_stock
+        import asyncio
+        from dataclasses import asdict
+        from app.services.inference_batcher import predict_async
+
+        stock_ids = stock_ids[:20]  # 限制最多 20 檔
+        try:
+            inputs = await _prediction_inputs(stock_ids)
+        except Exception:
+            inputs = {}
+
+        requests = [inputs.get(stock_id, ({}, None)) for stock_id in stock_ids]
+        outcomes = await asyncio.gather(
+            *[
+                predict_async(stock_id, stock_data=stock_data, history=history)
+                for stock_id, (stock_data, history) in zip(stock_ids, requests)
+            ],
+            return_exceptions=True,
+        )
 
         results = []
-        for stock_id in stock_ids[:20]:  # 限制最多 20 檔
-            try:
-                result = predict_stock(stock_id, {})
-                results.append(result)
-            except Exception as e:
+        for stock_id, outcome in zip(stock_ids, outcomes):
+            if isinstance(outcome, Exception):
                 results.append({
                     "stock_id": stock_id,
-                    "error": str(e)
+                    "error": str(outcome)
                 })
+            else:
+                results.append(asdict(outcome))
 
         return {
             "success": True,
@@ -190,7 +239,8 @@ async def train_ml_model_from_historical(
     predict_days: int = Query(5, ge=1, le=30, description="預測天數 (標籤: N天後是否上漲)"),
     min_samples: int = Query(100, ge=10, description="最少訓練樣本數"),
     preset: Optional[str] = Query(None, description="預設股票清單 (top50, top100, electronics50, electronics100, financials30, traditional50, dividend30)"),
-    stock_ids: Optional[str] = Query(None, description="自訂股票代碼 (逗號分隔，如: 2330,2317,2454)")
+    stock_ids: Optional[str] = Query(None, description="自訂股票代碼 (逗號分隔，如: 2330,2317,2454)"),
+    wait: bool = Query(True, description="等待訓練完成再回應 (False 則立即回傳 job_id)")
 ):
     """
     V10.40: 從歷史股價數據訓練 ML 模型
@@ -214,13 +264,12 @@ async def train_ml_model_from_historical(
             - "traditional50": 傳產 TOP 50
             - "dividend30": 高股息 TOP 30
         stock_ids: 自訂股票代碼 (當 preset 為空時使用)
+        wait: 等待訓練完成 (訓練在背景子行程執行，等待期間 API 仍可正常回應)
 
     Returns:
-        訓練結果，包含準確率、F1 分數、樣本數等資訊
+        訓練結果，包含準確率、F1 分數、樣本數等資訊 (wait=False 時為工作狀態)
     """
     try:
-        from app.services.ml_predictor import ModelTrainer
-
         # 解析股票代碼：優先使用 preset
         parsed_stock_ids = None
 
@@ -232,13 +281,12 @@ async def train_ml_model_from_historical(
             # 使用自訂清單
             parsed_stock_ids = [s.strip() for s in stock_ids.split(",") if s.strip()]
 
-        result = ModelTrainer.train_from_historical(
-            stock_ids=parsed_stock_ids,
-            period=period,
-            predict_days=predict_days,
-            min_samples=min_samples
-        )
-        return result
+        return await _run_training_job("historical", {
+            "stock_ids": parsed_stock_ids,
+            "period": period,
+            "predict_days": predict_days,
+            "min_samples": min_samples,
+        }, wait)
 
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -343,24 +391,28 @@ async def get_ml_model_info():
     """
     try:
         from app.services.ml_predictor import get_predictor
+        from app.services.inference_batcher import get_prediction_batcher
 
         predictor = get_predictor()
 
         # 嘗試載入模型資訊
         predictor._load_model()
+        batching = get_prediction_batcher().get_stats()
 
         if predictor._meta:
             return {
                 "success": True,
                 "has_model": True,
-                "model_info": predictor._meta
+                "model_info": predictor._meta,
+                "batching": batching
             }
         else:
             return {
                 "success": True,
                 "has_model": False,
                 "message": "尚未訓練模型，使用規則引擎預測",
-                "model_version": "rule_based_v1"
+                "model_version": "rule_based_v1",
+                "batching": batching
             }
 
     except Exception as e:
@@ -375,6 +427,7 @@ async def train_incremental(
     replay_ratio: float = Query(0.3, ge=0, le=1, description="經驗回放比例"),
     base_version: Optional[str] = Query(None, description="基礎版本 (預設使用當前版本)"),
     min_new_samples: int = Query(50, ge=10, description="最少新樣本數"),
+    wait: bool = Query(True, description="等待訓練完成再回應 (False 則立即回傳 job_id)"),
 ):
     """
     V10.41: 增量訓練
@@ -391,15 +444,12 @@ async def train_incremental(
         訓練結果，包含新版本 ID、改進幅度等
     """
     try:
-        from app.services.ml_predictor import ModelTrainer
-
-        result = ModelTrainer.incremental_train(
-            new_data_source=data_source,
-            replay_ratio=replay_ratio,
-            base_version=base_version,
-            min_new_samples=min_new_samples,
-        )
-        return result
+        return await _run_training_job("incremental", {
+            "new_data_source": data_source,
+            "replay_ratio": replay_ratio,
+            "base_version": base_version,
+            "min_new_samples": min_new_samples,
+        }, wait)
 
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -408,6 +458,7 @@ async def train_incremental(
 @router.post("/train-hybrid")
 async def train_hybrid(
     min_samples: int = Query(100, ge=10, description="最少樣本數"),
+    wait: bool = Query(True, description="等待訓練完成再回應 (False 則立即回傳 job_id)"),
 ):
     """
     V10.41: 混合訓練
@@ -421,15 +472,81 @@ async def train_hybrid(
         訓練結果
     """
     try:
-        from app.services.ml_predictor import ModelTrainer
-
-        result = ModelTrainer.hybrid_train(min_samples=min_samples)
-        return result
+        return await _run_training_job("hybrid", {"min_samples": min_samples}, wait)
 
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
+async def _run_training_job(kind: str, params: dict, wait: bool) -> dict:
+    """
+    在背景子行程執行訓練（同時只執行一個，其餘排隊）
+
+    wait=True 時等待完成並回傳訓練結果（與原本同步 API 相同格式），
+    否則立即回傳工作狀態，之後以 /train/jobs/{job_id} 查詢進度。
+    """
+    from app.services.training_jobs import get_training_runner
+
+    runner = get_training_runner()
+    job = runner.submit(kind, params)
+    if not wait:
+        return {"success": True, **job.to_dict()}
+
+    await runner.wait(job.id)
+    if job.result is not None:
+        return {**job.result, "job_id": job.id}
+    return {"success": False, "error": job.error or "訓練已取消", "job_id": job.id, "status": job.status}
+
+
+@router.get("/train/jobs")
+async def list_training_jobs():
+    """
+    列出訓練工作 (最新的在前)
+    """
+    from app.services.training_jobs import get_training_runner
+
+    runner = get_training_runner()
+    return {
+        "success": True,
+        **runner.get_stats(),
+        "items": [job.to_dict() for job in runner.list()],
+    }
+
+
+@router.get("/train/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    """
+    查詢訓練工作狀態與進度
+
+    Returns:
+        - status: queued / running / done / failed / cancelled
+        - progress: 進度百分比 (0-100)
+        - stage: 目前階段
+        - result: 訓練結果 (完成後)
+    """
+    from app.services.training_jobs import get_training_runner
+
+    job = get_training_runner().get(job_id)
+    if job is None:
+        return {"success": False, "error": f"找不到訓練工作: {job_id}"}
+    return {"success": True, **job.to_dict()}
+
+
+@router.post("/train/jobs/{job_id}/cancel")
+async def cancel_training_job(job_id: str):
+    """
+    取消訓練工作 (排隊中直接移除，執行中終止訓練行程)
+    """
+    from app.services.training_jobs import get_training_runner
+
+    runner = get_training_runner()
+    if not runner.cancel(job_id):
+        job = runner.get(job_id)
+        error = f"找不到訓練工作: {job_id}" if job is None else f"工作已結束 ({job.status})"
+        return {"success": False, "error": error}
+    return {"success": True, **runner.get(job_id).to_dict()}
+
+
 @router.get("/versions")
 async def list_model_versions(
     limit: int = Query(10, ge=1, le=50, description="最大返回數量"),
@@ -605,7 +722,7 @@ async def get_stock_sentiment(stock_id: str):
     try:
         # 嘗試載入 FinBERT 分析器
         try:
-            from app.services.finbert_sentiment import analyze_sentiment, get_sentiment_score
+            from app.services.finbert_sentiment import analyze_sentiment, analyze_sentiment_batch
         except ImportError:
             return {
                 "success": False,
@@ -634,22 +751,20 @@ async def get_stock_sentiment(stock_id: str):
             combined_text = " ".join([n["title"] for n in news_texts])
             result = analyze_sentiment(combined_text, language="zh")
 
-            # 分析每則新聞的情緒
-            recent_news = []
-            for news in news_texts[:5]:
-                try:
-                    news_result = analyze_sentiment(news["title"], language="zh")
-                    recent_news.append({
-                        "title": news["title"],
-                        "sentiment": news_result["label"],
-                        "score": news_result["score"]
-                    })
-                except Exception:
-                    recent_news.append({
-                        "title": news["title"],
-                        "sentiment": "neutral",
-                        "score": 0.5
-                    })
+            # 分析每則新聞的情緒（整批一次推論）
+            recent = news_texts[:5]
+            try:
+                news_results = analyze_sentiment_batch([n["title"] for n in recent], language="zh")
+            except Exception:
+                news_results = [{"label": "neutral", "score": 0.5}] * len(recent)
+            recent_news = [
+                {
+                    "title": news["title"],
+                    "sentiment": news_result["label"],
+                    "score": news_result["score"]
+                }
+                for news, news_result in zip(recent, news_results)
+            ]
 
             return {
                 "success": True,
@@ -3,14 +3,17 @@
 """
 
 from fastapi import APIRouter, HTTPException, Query
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
 from datetime import datetime
 
 from ..services.github_data import SmartStockService as StockDataService  # 智能選擇資料源
 from ..services.technical_analysis import TechnicalAnalysis
 from ..services.themes import get_stock_info as get_stock_tags  # 產業標籤（只顯示，不影響評分）
 from ..services.news_service import get_news_service  # 新聞服務
-from ..services.cache_service import StockCache  # 快取服務
+from ..services.cache_service import SmartTTL, StockCache  # 快取服務
+from ..services.precompute import get_precompute, register_precompute  # 🆕 背景預先計算快照
+from ..services.cache_backend import SharedCache  # 🆕 共用快取後端（多 worker）
 from ..services.fundamental_service import FundamentalService  # 基本面分析
 from ..services.institutional_service import InstitutionalService, MarginService  # 籌碼面分析（備用）
 from ..services.finmind_service import FinMindService  # FinMind API（主要資料源）
@@ -23,73 +26,54 @@ router = APIRouter(prefix="/api/stocks", tags=["stocks"])
 # ============================================================
 # 🆕 V10.13.3: 全局籌碼快取（供股票分析 Tab 共用）
 # ============================================================
-import time
 
 class ChipDataCache:
-    """籌碼數據全局快取，讓股票分析 Tab 共用 TWSE 預取數據"""
-    _institutional_data: dict = {}  # 三大法人
-    _margin_data: dict = {}  # 融資融券
-    _last_update: float = 0
+    """籌碼數據全局快取，讓股票分析 Tab 共用 TWSE 預取數據（經由 cache_backend，多個 worker 共用）"""
     _cache_ttl: int = 600  # 10 分鐘
+    _shared = SharedCache("chip", retention=_cache_ttl)
     
     @classmethod
     def set_institutional(cls, data: dict):
         """設定三大法人快取"""
-        cls._institutional_data = data or {}
-        cls._last_update = time.time()
-        print(f"📦 [ChipCache] 三大法人快取已更新: {len(cls._institutional_data)} 檔")
+        cls._shared.set("institutional", data or {})
+        print(f"📦 [ChipCache] 三大法人快取已更新: {len(data or {})} 檔")
     
     @classmethod
     def set_margin(cls, data: dict):
         """設定融資融券快取"""
-        cls._margin_data = data or {}
-        print(f"📦 [ChipCache] 融資融券快取已更新: {len(cls._margin_data)} 檔")
+        cls._shared.set("margin", data or {})
+        print(f"📦 [ChipCache] 融資融券快取已更新: {len(data or {})} 檔")
     
     @classmethod
     def get_institutional(cls, stock_id: str) -> dict:
         """取得單檔三大法人數據"""
-        if cls._is_expired():
-            return None
-        return cls._institutional_data.get(stock_id)
+        return cls.get_all_institutional().get(stock_id)
     
     @classmethod
     def get_margin(cls, stock_id: str) -> dict:
         """取得單檔融資融券數據"""
-        if cls._is_expired():
-            return None
-        return cls._margin_data.get(stock_id)
+        return cls.get_all_margin().get(stock_id)
     
     @classmethod
     def get_all_institutional(cls) -> dict:
         """取得全部三大法人數據"""
-        if cls._is_expired():
-            return {}
-        return cls._institutional_data
+        return cls._shared.get("institutional", max_age=cls._cache_ttl) or {}
     
     @classmethod
     def get_all_margin(cls) -> dict:
         """取得全部融資融券數據"""
-        if cls._is_expired():
-            return {}
-        return cls._margin_data
-    
-    @classmethod
-    def _is_expired(cls) -> bool:
-        """檢查快取是否過期"""
-        return time.time() - cls._last_update > cls._cache_ttl
+        return cls._shared.get("margin", max_age=cls._cache_ttl) or {}
     
     @classmethod
     def clear(cls):
         """🆕 V10.13.4: 強制清除所有快取"""
-        cls._institutional_data = {}
-        cls._margin_data = {}
-        cls._last_update = 0
+        cls._shared.clear()
         print("🗑️ [ChipCache] 所有快取已清除")
     
     @classmethod
     def is_available(cls) -> bool:
         """檢查快取是否可用"""
-        return len(cls._institutional_data) > 0 and not cls._is_expired()
+        return len(cls.get_all_institutional()) > 0
 # ============================================================
 
 
@@ -117,6 +101,13 @@ async def clear_all_cache():
     except:
         pass
     
+    # 2.5 清除推薦快照（下次請求重新計算）
+    try:
+        get_precompute().invalidate("recommend")
+        cleared_items.append("推薦快照")
+    except:
+        pass
+    
     # 3. 清除 TWSE OpenAPI 快取
     try:
         TWSEOpenAPI.clear_cache()
@@ -421,17 +412,22 @@ async def get_stock_analysis(stock_id: str):
     """
     取得個股技術分析
     """
-    # 取得歷史資料
-    history = await StockDataService.get_stock_history(stock_id, months=3)
-    
-    if not history or len(history) < 20:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"股票 {stock_id} 歷史資料不足，無法進行技術分析（需要至少20天）"
-        )
-    
-    # 技術分析
-    analysis = TechnicalAnalysis.full_analysis(history)
+    # 盤中追蹤股票由排程器以增量指標更新，直接使用快取
+    analysis = StockCache.get_analysis(stock_id)
+    history = None
+
+    if analysis is None:
+        # 取得歷史資料
+        history = await StockDataService.get_stock_history(stock_id, months=3)
+
+        if not history or len(history) < 20:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"股票 {stock_id} 歷史資料不足，無法進行技術分析（需要至少20天）"
+            )
+
+        # 技術分析
+        analysis = TechnicalAnalysis.full_analysis(history)
     
     # 取得基本資訊
     info = await StockDataService.get_stock_info(stock_id)
@@ -439,7 +435,7 @@ async def get_stock_analysis(stock_id: str):
     return {
         "stock_id": stock_id,
         "name": info.get("name", stock_id) if info else stock_id,
-        "current_price": info.get("close") if info else history[-1]["close"],
+        "current_price": info.get("close") if info else (history[-1]["close"] if history else analysis.get("current_price")),
         "change_percent": info.get("change_percent", 0) if info else 0,
         "analysis": analysis
     }
@@ -808,18 +804,34 @@ async def get_recommendations():
     選股邏輯：
     1. 從資料源取得全市場當日行情
     2. 初篩：排除低價股、低成交量股、當日跌停股
-    3. 依「當日漲幅 + 成交量」排序，取前 100 名做技術分析
+    3. 依「當日漲幅 + 成交量 + 估值 + 盤後技術快照」排序，取前 200 名做技術分析
     4. 技術分析評分後，產生 AI 精選 + 熱門股兩個清單
+
+    預先計算：DataScheduler 在背景執行完整流程並發布版本化快照，這裡只讀最新快照。
+    尚無快照時（排程器未啟動）才在請求中計算一次（並行請求共用），
+    快照超過 SmartTTL 時回傳舊版並在背景重建。
     """
+    precompute = get_precompute()
+    snapshot = precompute.latest("recommend")
+    if snapshot is None:
+        snapshot = await precompute.run("recommend")
+        if snapshot is None:
+            raise HTTPException(status_code=503, detail="推薦結果計算失敗，請稍後再試")
+    elif precompute.snapshot_age(snapshot) > SmartTTL.get_ttl("recommend"):
+        precompute.run_in_background("recommend")
+
+    return {
+        **snapshot["result"],
+        "snapshot_version": snapshot["version"],
+        "snapshot_built_at": snapshot["built_at"],
+    }
+
+
+async def _build_recommendations():
+    """計算推薦結果（由 precompute 於背景執行並發布快照）"""
     import asyncio
     from app.services.twse_bulk import get_bulk_service
-    
-    # 檢查快取
-    cached_result = StockCache.get_recommendations()
-    if cached_result:
-        print("📦 使用快取資料")
-        return cached_result
-    
+
     all_stocks = {}
     data_source = "unknown"
     data_date = None  # 🆕 V10.13.5: 追蹤資料日期
@@ -930,6 +942,8 @@ async def get_recommendations():
     # Step 4: 初篩條件（V10.8 優化）
     # ============================================================
     candidates = []
+    from app.services.technical_snapshot import get_technical_snapshot
+    snapshot = get_technical_snapshot()
     for stock_id, info in all_stocks.items():
         # 排除條件
         close_price = info.get("close") or 0
@@ -990,8 +1004,14 @@ async def get_recommendations():
             elif pb_ratio > 5:
                 pb_score = -3  # 過高
         
+        # 6. 盤後技術快照分數（查表，不需下載歷史；無快照時為 0）
+        technical = snapshot.get(stock_id)
+        snapshot_score = 0
+        if technical and technical["technical_score"] is not None:
+            snapshot_score = (technical["technical_score"] - 50) * 0.2
+
         # 綜合初篩分數
-        prelim_score = momentum_score + volume_score + pe_score + yield_score + pb_score
+        prelim_score = momentum_score + volume_score + pe_score + yield_score + pb_score + snapshot_score
         
         candidates.append({
             "stock_id": stock_id,
@@ -1038,13 +1058,19 @@ async def get_recommendations():
     except Exception as e:
         print(f"⚠️ TWSE 融資融券預取失敗: {e}")
     
+    # 批量取得候選股歷史資料（多檔一次下載，取代逐檔請求）
+    print("📊 批量下載候選股歷史資料...")
+    history_map = await bulk_service.get_stocks_history_yf_batch(
+        [c["stock_id"] for c in top_candidates], months=2
+    )
+    
     # Step 4: 對候選股進行技術分析
     async def analyze_with_tech(candidate: dict):
         """對候選股進行技術分析"""
         stock_id = candidate["stock_id"]
         try:
-            # 使用 yfinance 取得歷史資料
-            history = await bulk_service.get_stock_history_yf(stock_id, months=2)
+            # 使用批量下載的 yfinance 歷史資料
+            history = history_map.get(stock_id, [])
             
             # 🔧 V10.14.1: 修復漲跌幅計算
             if history and len(history) > 0:
@@ -1393,7 +1419,7 @@ async def get_recommendations():
                 },
             }
     
-    # 批次分析（每批10個，間隔1秒，避免 yfinance 限流）
+    # 批次分析（歷史資料已批量取得，不需再間隔等待 yfinance 限流）
     batch_size = 10
     results = []
     
@@ -1404,10 +1430,6 @@ async def get_recommendations():
         tasks = [analyze_with_tech(c) for c in batch]
         batch_results = await asyncio.gather(*tasks)
         results.extend([r for r in batch_results if r])
-        
-        # 批次間延遲
-        if i + batch_size < len(top_candidates):
-            await asyncio.sleep(1.0)
     
     print(f"✅ 完成分析 {len(results)} 檔股票")
     
@@ -1474,13 +1496,37 @@ async def get_recommendations():
     except Exception as e:
         print(f"⚠️ 績效追蹤記錄失敗: {e}")
 
-    # 設定快取（3分鐘）
-    StockCache.set_recommendations(result)
-    print("📦 已更新快取")
-    
     return result
 
 
+register_precompute("recommend", _build_recommendations, data_type="recommend")
+
+
+def _info_from_history(stock_id: str, history: list) -> Optional[dict]:
+    """由歷史 K 線推算即時資訊（格式同 StockDataService.get_stock_info）"""
+    if not history:
+        return None
+    
+    latest = history[-1]
+    prev = history[-2] if len(history) > 1 else latest
+    
+    change = latest["close"] - prev["close"]
+    change_percent = (change / prev["close"] * 100) if prev["close"] > 0 else 0
+    
+    return {
+        "stock_id": stock_id,
+        "name": StockDataService.POPULAR_STOCKS.get(stock_id, stock_id),
+        "date": latest["date"],
+        "open": round(latest["open"], 2),
+        "high": round(latest["high"], 2),
+        "low": round(latest["low"], 2),
+        "close": round(latest["close"], 2),
+        "volume": int(latest["volume"]),
+        "change": round(change, 2),
+        "change_percent": round(change_percent, 2),
+    }
+
+
 async def _fallback_recommend():
     """備用推薦方案（當 TWSE API 失敗時）- 使用 yfinance"""
     from app.services.github_data import SmartStockService
@@ -1536,10 +1582,18 @@ async def _fallback_recommend():
     
     print(f"⚠️ 使用備用方案，掃描 {len(core_stocks)} 檔核心股票...")
     
+    # 批量取得核心股票歷史資料（多檔一次下載）
+    history_map = await bulk_service.get_stocks_history_yf_batch(core_stocks, months=2)
+    
     async def analyze_stock(stock_id: str):
         try:
-            # 取得即時資訊
-            info = await StockDataService.get_stock_info(stock_id)
+            # 取得歷史資料做技術分析
+            history = history_map.get(stock_id, [])
+            
+            # 取得即時資訊（優先由批量歷史資料推算，避免逐檔請求）
+            info = _info_from_history(stock_id, history)
+            if not info:
+                info = await StockDataService.get_stock_info(stock_id)
             if not info:
                 return None
             
@@ -1547,9 +1601,6 @@ async def _fallback_recommend():
             if name == stock_id:
                 name = SmartStockService.POPULAR_STOCKS.get(stock_id, stock_id)
             
-            # 取得歷史資料做技術分析
-            history = await bulk_service.get_stock_history_yf(stock_id, months=2)
-            
             tech_score = 50
             bonus = 0
             vol_ratio = 1.0
@@ -1683,9 +1734,6 @@ async def _fallback_recommend():
         tasks = [analyze_stock(sid) for sid in batch]
         batch_results = await asyncio.gather(*tasks)
         results.extend([r for r in batch_results if r])
-        
-        if i + batch_size < len(core_stocks):
-            await asyncio.sleep(1.0)
     
     print(f"✅ 備用方案完成分析 {len(results)} 檔股票")
     
@@ -1718,10 +1766,6 @@ async def _fallback_recommend():
         "news_summary": news_summary,
     }
     
-    # 設定快取（3分鐘）
-    StockCache.set_recommendations(result)
-    print("📦 已更新快取")
-    
     return result
 
 
@@ -1811,8 +1855,9 @@ async def get_industry_news(industry: str, limit: int = Query(5, ge=1, le=20)):
 
 @router.get("/cache/stats")
 async def get_cache_stats():
-    """取得快取統計"""
-    return StockCache.get_stats()
+    """取得快取統計（各命名空間的命中 / 未命中 / 淘汰 / 記憶體，以及共用快取後端）"""
+    from ..services.cache_backend import get_cache_backend
+    return {**StockCache.get_stats(), "backend": get_cache_backend().get_stats()}
 
 
 @router.post("/cache/clear")
@@ -1885,6 +1930,138 @@ async def check_watchlist(stock_id: str):
 
 # ===== 回測 API =====
 
+class BatchBacktestRequest(BaseModel):
+    """批次回測請求"""
+    stock_ids: List[str] = []
+    preset: Optional[str] = None  # 預設股票清單（如 top50），與 stock_ids 合併
+    strategies: List[Dict[str, Any]]  # [{"strategy": "ma_crossover", "params": {"short_period": [5, 10]}}]
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    months: int = 12
+    initial_capital: float = 1000000
+    position_size: float = 0.1
+
+
+@router.post("/backtest/batch")
+async def submit_batch_backtest_api(request: BatchBacktestRequest):
+    """
+    提交批次回測（股票 × 策略 × 參數網格）
+
+    於背景行程池平行執行，立即回傳 job_id，
+    以 GET /backtest/batch/{job_id} 查詢進度與排名結果
+    """
+    from ..services.batch_backtest import submit_batch_backtest
+    from datetime import timedelta
+
+    stock_ids = list(request.stock_ids)
+    if request.preset:
+        from ..config.stock_lists import STOCK_PRESETS
+        if request.preset not in STOCK_PRESETS:
+            raise HTTPException(status_code=400, detail=f"找不到預設清單: {request.preset}")
+        stock_ids += STOCK_PRESETS[request.preset]["stocks"]
+
+    end_date = request.end_date or datetime.now().strftime("%Y-%m-%d")
+    start_date = request.start_date or (datetime.now() - timedelta(days=request.months * 30)).strftime("%Y-%m-%d")
+
+    try:
+        job = submit_batch_backtest(
+            stock_ids=stock_ids,
+            strategies=request.strategies,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=request.initial_capital,
+            position_size=request.position_size,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "success": True,
+        "job_id": job.job_id,
+        "status": job.status,
+        "total": job.total,
+    }
+
+
+@router.get("/backtest/batch")
+async def list_batch_backtests_api():
+    """列出批次回測工作"""
+    from ..services.batch_backtest import list_batch_jobs
+    return {"jobs": list_batch_jobs()}
+
+
+@router.get("/backtest/batch/{job_id}")
+async def get_batch_backtest_api(
+    job_id: str,
+    limit: int = Query(50, ge=1, le=1000, description="回傳筆數"),
+    sort_by: str = Query("sharpe_ratio", description="排序指標：sharpe_ratio, total_return_pct, annual_return_pct, win_rate, profit_factor, max_drawdown_pct"),
+):
+    """查詢批次回測進度與排名結果"""
+    from ..services.batch_backtest import get_batch_job, RANK_METRICS
+
+    job = get_batch_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"找不到批次回測工作: {job_id}")
+    if sort_by not in RANK_METRICS:
+        raise HTTPException(status_code=400, detail=f"不支援的排序指標: {sort_by}")
+
+    return job.to_dict(limit=limit, sort_by=sort_by)
+
+
+@router.get("/backtest/portfolio")
+async def run_portfolio_backtest_api(
+    stock_ids: str = Query(None, description="股票代號（逗號分隔），未指定時使用 preset"),
+    preset: str = Query("top50", description="預設股票清單（top50, top100...）"),
+    start_date: str = Query(None, description="開始日期 YYYY-MM-DD"),
+    end_date: str = Query(None, description="結束日期 YYYY-MM-DD"),
+    months: int = Query(12, ge=1, le=120, description="回測月數（未指定 start_date 時使用）"),
+    top_n: int = Query(10, ge=1, le=50, description="持有檔數"),
+    rebalance_days: int = Query(5, ge=1, le=60, description="調倉間隔（交易日）"),
+    scorer: str = Query("technical", description="評分方式：technical, momentum"),
+    min_score: float = Query(None, description="最低評分門檻"),
+    initial_capital: float = Query(1000000, description="初始資金"),
+):
+    """
+    投資組合回測
+
+    每隔 rebalance_days 個交易日依評分等權重持有前 top_n 檔，
+    計入手續費、交易稅與滑點，用於驗證選股結果的長期績效
+    """
+    from ..services.portfolio_backtest import run_portfolio_backtest, SCORERS
+    from datetime import timedelta
+
+    if scorer not in SCORERS:
+        raise HTTPException(status_code=400, detail=f"未知評分方式: {scorer}（可用: {', '.join(SCORERS)}）")
+
+    if stock_ids:
+        universe = [s.strip() for s in stock_ids.split(",") if s.strip()]
+    else:
+        from ..config.stock_lists import STOCK_PRESETS
+        if preset not in STOCK_PRESETS:
+            raise HTTPException(status_code=400, detail=f"找不到預設清單: {preset}")
+        universe = list(STOCK_PRESETS[preset]["stocks"])
+
+    try:
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.now() - timedelta(days=months * 30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="日期格式錯誤，請使用 YYYY-MM-DD")
+    if start.date() > end.date():
+        raise HTTPException(status_code=400, detail="開始日期不可晚於結束日期")
+    start_date, end_date = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+    return await run_portfolio_backtest(
+        stock_ids=universe,
+        start_date=start_date,
+        end_date=end_date,
+        top_n=top_n,
+        rebalance_days=rebalance_days,
+        scorer=scorer,
+        initial_capital=initial_capital,
+        min_score=min_score,
+    )
+
+
 @router.get("/backtest/{stock_id}")
 async def run_backtest_api(
     stock_id: str,
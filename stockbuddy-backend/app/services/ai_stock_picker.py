@@ -14,10 +14,14 @@
 
 V10.7 更新：使用 TWSE OpenAPI 取得全市場資料
 V10.7.1 更新：整合智能快取（盤中/盤後動態 TTL）
+
+深度分析以有上限的並行度同時進行（上游限速由共用 HTTP 連線層處理），
+排序後的完整分析清單只快取一份，任何 top_n 都從同一份結果切片。
 """
 
 import asyncio
 import math
+import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
@@ -25,6 +29,13 @@ from dataclasses import dataclass
 from app.services.finmind_service import FinMindService, FinMindExtended
 from app.services.twse_openapi import TWSEOpenAPI
 from app.services.cache_service import SmartTTL, is_trading_hours  # 🆕 V10.7.1: 智能快取
+from app.services.cache_backend import SharedCache
+
+# 同時進行深度分析的股票數
+AI_PICKER_CONCURRENCY = int(os.getenv("AI_PICKER_CONCURRENCY", "8"))
+
+# 深度分析的候選股數量
+DEEP_ANALYZE_COUNT = 50
 
 
 @dataclass
@@ -64,9 +75,10 @@ class StockAnalysis:
 class AIStockPicker:
     """AI 智能選股引擎（支援智能快取）"""
 
-    # 快取（使用智能 TTL）
-    _cache = {}
-    _cache_time = {}
+    # 快取（使用智能 TTL，經由 cache_backend，多個 worker 共用）
+    _cache = SharedCache("ai_stock_picker", retention=14400)
+    RANKED_CACHE_KEY = "ranked_analysis"
+    _scan_task: Optional[asyncio.Task] = None  # 進行中的掃描（並行呼叫共用）
     # 🆕 V10.7.1: 改用智能 TTL，盤後自動延長快取時間
     
     # ============================================================
@@ -86,11 +98,38 @@ class AIStockPicker:
                 "analysis_count": 100
             }
         """
-        cache_key = f"top_picks_{top_n}"
-        cached = cls._get_cache(cache_key)
+        ranked = await cls.get_ranked_analysis()
+        if "error" in ranked:
+            return {"error": ranked["error"], "top_picks": []}
+
+        return {
+            "updated_at": ranked["updated_at"],
+            "market_summary": ranked["market_summary"],
+            "top_picks": ranked["ranked"][:top_n],
+            "analysis_count": ranked["analysis_count"],
+            "scanned_count": ranked["scanned_count"],
+        }
+
+    @classmethod
+    async def get_ranked_analysis(cls) -> Dict:
+        """
+        取得依 AI 評分排序的完整分析清單（快取一份，所有 top_n 共用）
+
+        並行呼叫只執行一次掃描。
+        """
+        cached = cls._get_cache(cls.RANKED_CACHE_KEY)
         if cached:
             return cached
-        
+
+        loop = asyncio.get_running_loop()
+        task = cls._scan_task
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = cls._scan_task = asyncio.ensure_future(cls._scan())
+        return await asyncio.shield(task)
+
+    @classmethod
+    async def _scan(cls) -> Dict:
+        """全市場掃描與深度分析"""
         print("🤖 AI 選股引擎啟動...")
         
         # Step 1: 取得全市場資料
@@ -99,7 +138,7 @@ class AIStockPicker:
         
         if not all_stocks:
             print("❌ 無法取得市場資料")
-            return {"error": "無法取得市場資料", "top_picks": []}
+            return {"error": "無法取得市場資料"}
         
         print(f"✅ 取得 {len(all_stocks)} 檔股票")
         
@@ -114,39 +153,54 @@ class AIStockPicker:
             key=lambda x: (x.get("change_percent", 0) * 0.4 + 
                           min(x.get("volume_ratio", 1), 5) * 0.6),
             reverse=True
-        )[:50]
+        )[:DEEP_ANALYZE_COUNT]
         
-        print(f"🔍 深度分析前 {len(top_candidates)} 檔...")
+        print(f"🔍 深度分析前 {len(top_candidates)} 檔（並行 {AI_PICKER_CONCURRENCY}）...")
         
-        # Step 4: 多維度分析
-        analyzed = []
-        for i, stock in enumerate(top_candidates):
-            try:
-                analysis = await cls._deep_analyze(stock)
-                if analysis:
-                    analyzed.append(analysis)
-                if (i + 1) % 10 == 0:
-                    print(f"  分析進度: {i+1}/{len(top_candidates)}")
-            except Exception as e:
-                print(f"  ⚠️ {stock.get('stock_id')} 分析失敗: {e}")
+        # Step 4: 多維度分析（並行，結果順序與候選順序相同）
+        analyzed, market_summary = await asyncio.gather(
+            cls._analyze_candidates(top_candidates),
+            cls._get_market_summary(),
+        )
         
-        # Step 5: 排序並選出 Top N
+        # Step 5: 排序（同分維持候選順序）
         analyzed.sort(key=lambda x: x["ai_score"], reverse=True)
-        top_picks = analyzed[:top_n]
         
         # Step 6: 產生報告
         result = {
             "updated_at": datetime.now().isoformat(),
-            "market_summary": await cls._get_market_summary(),
-            "top_picks": top_picks,
+            "market_summary": market_summary,
+            "ranked": analyzed,
             "analysis_count": len(analyzed),
             "scanned_count": len(all_stocks),
         }
         
-        cls._set_cache(cache_key, result)
-        print(f"🎯 AI 精選完成！Top {len(top_picks)} 出爐")
+        cls._set_cache(cls.RANKED_CACHE_KEY, result)
+        print(f"🎯 AI 精選完成！共 {len(analyzed)} 檔排序")
         
         return result
+
+    @classmethod
+    async def _analyze_candidates(cls, candidates: List[Dict], concurrency: Optional[int] = None) -> List[Dict]:
+        """並行深度分析（最多同時 concurrency 檔），回傳成功的結果"""
+        semaphore = asyncio.Semaphore(concurrency or AI_PICKER_CONCURRENCY)
+        completed = 0
+
+        async def analyze(stock: Dict) -> Optional[Dict]:
+            nonlocal completed
+            async with semaphore:
+                try:
+                    return await cls._deep_analyze(stock)
+                except Exception as e:
+                    print(f"  ⚠️ {stock.get('stock_id')} 分析失敗: {e}")
+                    return None
+                finally:
+                    completed += 1
+                    if completed % 10 == 0:
+                        print(f"  分析進度: {completed}/{len(candidates)}")
+
+        results = await asyncio.gather(*[analyze(stock) for stock in candidates])
+        return [r for r in results if r]
     
     # ============================================================
     # 資料取得
@@ -477,19 +531,17 @@ class AIStockPicker:
     
     @classmethod
     async def _analyze_technical(cls, stock_id: str, current: Dict) -> Dict:
-        """技術面分析 - 使用 yfinance 取得歷史資料"""
+        """技術面分析 - 使用本地 OHLCV 資料庫（必要時由 yfinance 增量更新）"""
         try:
-            import yfinance as yf
+            from app.services.twse_bulk import get_bulk_service
             
-            # 使用 yfinance 取得歷史資料
-            ticker = yf.Ticker(f"{stock_id}.TW")
-            hist = ticker.history(period="3mo")
+            hist = await get_bulk_service().get_stock_history_yf(stock_id, months=3)
             
-            if hist.empty or len(hist) < 20:
+            if len(hist) < 20:
                 return {"score": 50, "detail": "資料不足", "signals": []}
             
-            closes = hist['Close'].tolist()
-            volumes = hist['Volume'].tolist()
+            closes = [h["close"] for h in hist]
+            volumes = [h["volume"] for h in hist]
             
             # 計算指標
             ma5 = sum(closes[-5:]) / 5 if len(closes) >= 5 else closes[-1]
@@ -1046,18 +1098,13 @@ class AIStockPicker:
     @classmethod
     def _get_cache(cls, key: str):
         """取得快取（使用智能 TTL）"""
-        if key in cls._cache:
-            # 🆕 V10.7.1: 使用智能 TTL，盤後自動延長快取時間
-            ttl = SmartTTL.get_ttl("recommend")
-            if datetime.now().timestamp() - cls._cache_time.get(key, 0) < ttl:
-                return cls._cache[key]
-        return None
+        # 🆕 V10.7.1: 使用智能 TTL，盤後自動延長快取時間
+        return cls._cache.get(key, max_age=SmartTTL.get_ttl("recommend"))
 
     @classmethod
     def _set_cache(cls, key: str, value):
         """設定快取"""
-        cls._cache[key] = value
-        cls._cache_time[key] = datetime.now().timestamp()
+        cls._cache.set(key, value)
 
 
 # ============================================================
@@ -0,0 +1,392 @@
+"""
+伺服器端價格警示登錄表（事件驅動）
+
+警示依股票分組，存成兩條依觸發價排序的價格階梯：
+- 上方階梯（above / percent_up）：股價 ≥ 觸發價即觸發，觸發的必定是排序後的前綴
+- 下方階梯（below / percent_down）：股價 ≤ 觸發價即觸發，觸發的必定是排序後的後綴
+
+漲跌幅警示以基準價換算為觸發價後放入同一組階梯（未提供基準價時，以第一次收到報價的昨收為基準）。
+排程器每次取得即時報價後呼叫 dispatch()，每檔股票只需一次二分搜尋，
+再以 PriceAlertService.evaluate 確認候選警示（結果與 /alerts/check 相同）。
+觸發的警示寫入 AlertHistory、推送給訂閱者（/alerts/stream），並自登錄表移除（一次性）。
+
+使用方式：
+    registry = get_alert_registry()
+    registry.register({"stock_id": "2330", "alert_type": "above", "target_price": 1100})
+    triggered = await registry.dispatch(quotes)   # {stock_id: 即時報價}
+"""
+
+import asyncio
+import json
+import threading
+import uuid
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.ohlcv_store import DATA_DIR
+from app.services.price_alert import AlertType, PriceAlertService
+
+REGISTRY_FILE = DATA_DIR / "price_alerts.json"
+
+# 上方階梯的警示類型（其餘在下方階梯）
+UPPER_TYPES = {AlertType.ABOVE.value, AlertType.PERCENT_UP.value}
+PERCENT_TYPES = {AlertType.PERCENT_UP.value, AlertType.PERCENT_DOWN.value}
+
+# 二分搜尋時放寬的相對誤差（換算觸發價的浮點誤差），候選警示再以 evaluate 精確判斷
+PRICE_EPS = 1e-9
+
+# 每個訂閱者最多暫存的通知數
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class _Ladders:
+    """單一股票的價格階梯（元素為 (觸發價, 警示 ID)）"""
+
+    __slots__ = ("upper", "lower", "pending")
+
+    def __init__(self):
+        self.upper: List[Tuple[float, str]] = []
+        self.lower: List[Tuple[float, str]] = []
+        self.pending: List[str] = []  # 等待第一筆報價決定基準價的漲跌幅警示
+
+    def __len__(self) -> int:
+        return len(self.upper) + len(self.lower) + len(self.pending)
+
+
+def _positive(alert: Dict[str, Any], field: str, required: bool) -> Optional[float]:
+    """欄位轉為正數（未提供且非必要時為 None）"""
+    value = alert.get(field)
+    if value is None or value == "":
+        if required:
+            raise ValueError(f"缺少 {field}")
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} 必須是數字: {value!r}")
+    if not number > 0 or number == float("inf"):
+        raise ValueError(f"{field} 必須大於 0: {value!r}")
+    return number
+
+
+def _threshold(alert: Dict[str, Any]) -> Optional[float]:
+    """警示的觸發價（漲跌幅警示需已有基準價）"""
+    alert_type = alert["alert_type"]
+    if alert_type in PERCENT_TYPES:
+        base = alert.get("base_price")
+        if not base:
+            return None
+        sign = 1 if alert_type == AlertType.PERCENT_UP.value else -1
+        return base * (1 + sign * alert["target_percent"] / 100)
+    return alert["target_price"]
+
+
+class AlertRegistry:
+    """價格警示登錄表"""
+
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self._alerts: Dict[str, Dict[str, Any]] = {}
+        self._ladders: Dict[str, _Ladders] = {}
+        self._lock = threading.Lock()
+        self._subscribers: List[asyncio.Queue] = []
+        self._stats = {"quotes": 0, "candidates": 0, "triggered": 0}
+        self._dirty = False  # 有尚未寫入磁碟的變更（例如新決定的基準價）
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    # ============================================================
+    # 登錄
+    # ============================================================
+
+    def register(self, alert: Dict[str, Any], persist: bool = True) -> Dict[str, Any]:
+        """
+        新增警示（相同 ID 會取代舊警示）
+
+        target_price / target_percent / base_price 一律轉為大於 0 的 float，
+        避免字串等值進入價格階梯
+
+        Raises:
+            ValueError: 警示類型或目標值不正確
+        """
+        alert_type = alert.get("alert_type")
+        if alert_type not in {t.value for t in AlertType}:
+            raise ValueError(f"不支援的警示類型: {alert_type}")
+        if not alert.get("stock_id"):
+            raise ValueError("缺少股票代號")
+        is_percent = alert_type in PERCENT_TYPES
+
+        record = {
+            "id": str(alert.get("id") or uuid.uuid4().hex[:12]),
+            "stock_id": str(alert["stock_id"]),
+            "alert_type": alert_type,
+            "target_price": _positive(alert, "target_price", required=not is_percent),
+            "target_percent": _positive(alert, "target_percent", required=is_percent),
+            "base_price": _positive(alert, "base_price", required=False),
+            "created_at": alert.get("created_at") or datetime.now().isoformat(),
+        }
+
+        with self._lock:
+            self._remove(record["id"])
+            self._alerts[record["id"]] = record
+            self._index(record)
+        if persist:
+            self.save()
+        return dict(record, threshold=_threshold(record))
+
+    def cancel(self, alert_id: str) -> bool:
+        """取消警示"""
+        with self._lock:
+            removed = self._remove(alert_id)
+        if removed:
+            self.save()
+        return removed
+
+    def list_alerts(self, stock_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """目前登錄中的警示"""
+        return [
+            dict(a, threshold=_threshold(a))
+            for a in self._alerts.values()
+            if stock_id is None or a["stock_id"] == stock_id
+        ]
+
+    def symbols(self) -> List[str]:
+        """有警示的股票"""
+        return [s for s, ladders in self._ladders.items() if len(ladders)]
+
+    def _index(self, alert: Dict[str, Any]) -> None:
+        ladders = self._ladders.setdefault(alert["stock_id"], _Ladders())
+        threshold = _threshold(alert)
+        if threshold is None:
+            ladders.pending.append(alert["id"])
+        elif alert["alert_type"] in UPPER_TYPES:
+            insort(ladders.upper, (threshold, alert["id"]))
+        else:
+            insort(ladders.lower, (threshold, alert["id"]))
+
+    def _remove(self, alert_id: str) -> bool:
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return False
+        ladders = self._ladders[alert["stock_id"]]
+        threshold = _threshold(alert)
+        if threshold is None:
+            ladders.pending.remove(alert_id)
+        else:
+            ladder = ladders.upper if alert["alert_type"] in UPPER_TYPES else ladders.lower
+            del ladder[bisect_left(ladder, (threshold, alert_id))]
+        if not len(ladders):
+            del self._ladders[alert["stock_id"]]
+        return True
+
+    # ============================================================
+    # 報價事件
+    # ============================================================
+
+    def match(self, quotes: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        以最新報價找出觸發的警示並自登錄表移除
+
+        Args:
+            quotes: {stock_id: {"price": 成交價, "yesterday": 昨收, "name": 名稱, ...}}
+
+        Returns:
+            觸發結果列表（格式同 check_alerts 的 triggered）
+        """
+        triggered = []
+        with self._lock:
+            for stock_id, quote in quotes.items():
+                ladders = self._ladders.get(stock_id)
+                price = quote.get("price") if quote else None
+                if ladders is None or not price:
+                    continue
+                self._stats["quotes"] += 1
+
+                if ladders.pending:
+                    self._resolve_base(ladders, quote)
+
+                # 上方階梯：觸發價 ≤ 股價的前綴
+                k = bisect_right(ladders.upper, (price * (1 + PRICE_EPS), "\uffff"))
+                candidates = [alert_id for _, alert_id in ladders.upper[:k]]
+                # 下方階梯：觸發價 ≥ 股價的後綴
+                k = bisect_left(ladders.lower, (price * (1 - PRICE_EPS), ""))
+                candidates += [alert_id for _, alert_id in ladders.lower[k:]]
+                self._stats["candidates"] += len(candidates)
+
+                for alert_id in candidates:
+                    alert = self._alerts[alert_id]
+                    is_triggered, message = PriceAlertService.evaluate(alert, price)
+                    if not is_triggered:
+                        continue
+                    self._remove(alert_id)
+                    triggered.append({
+                        "alert_id": alert_id,
+                        "stock_id": stock_id,
+                        "stock_name": quote.get("name"),
+                        "alert_type": alert["alert_type"],
+                        "current_price": price,
+                        "target_price": alert["target_price"],
+                        "target_percent": alert["target_percent"],
+                        "trigger_value": _threshold(alert),
+                        "is_triggered": True,
+                        "message": message,
+                        "triggered_at": datetime.now().isoformat(),
+                    })
+
+            self._stats["triggered"] += len(triggered)
+        return triggered
+
+    def _resolve_base(self, ladders: _Ladders, quote: Dict[str, Any]) -> None:
+        """未指定基準價的漲跌幅警示，以第一筆報價的昨收（無則成交價）為基準"""
+        base = float(quote.get("yesterday") or quote.get("price"))
+        pending, ladders.pending = ladders.pending, []
+        for alert_id in pending:
+            alert = self._alerts[alert_id]
+            alert["base_price"] = base
+            self._index(alert)
+        self._dirty = True
+
+    async def dispatch(self, quotes: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """處理一批報價：比對、寫入 AlertHistory、推送訂閱者"""
+        triggered = self.match(quotes)
+        loop = asyncio.get_running_loop()
+        if not triggered:
+            # 基準價已決定的漲跌幅警示也要寫入，重啟後才不會以另一天的昨收重新計算
+            if self._dirty:
+                await loop.run_in_executor(None, self.save)
+            return []
+
+        await loop.run_in_executor(None, _record_history, triggered)
+        await loop.run_in_executor(None, self.save)
+        for queue in list(self._subscribers):
+            for event in triggered:
+                if queue.full():
+                    queue.get_nowait()  # 丟棄最舊的通知
+                queue.put_nowait(event)
+        return triggered
+
+    # ============================================================
+    # 訂閱
+    # ============================================================
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    # ============================================================
+    # 持久化
+    # ============================================================
+
+    def save(self) -> None:
+        """寫入 JSON（重啟後仍保留登錄中的警示）"""
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with self._lock:
+                alerts = list(self._alerts.values())
+                self._dirty = False
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(alerts, f, ensure_ascii=False)
+            tmp.replace(self.path)
+        except Exception as e:
+            print(f"儲存價格警示失敗: {e}")
+
+    def load(self) -> int:
+        """從 JSON 載入警示"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                alerts = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            print(f"讀取價格警示失敗: {e}")
+            return 0
+
+        for alert in alerts:
+            try:
+                self.register(alert, persist=False)
+            except ValueError:
+                continue
+        return len(self._alerts)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "alerts": len(self._alerts),
+            "symbols": len(self.symbols()),
+            "subscribers": len(self._subscribers),
+            **self._stats,
+        }
+
+
+def _record_history(triggered: List[Dict[str, Any]]) -> None:
+    """觸發紀錄寫入 AlertHistory"""
+    from app.database import AlertHistory, SessionLocal
+
+    db = SessionLocal()
+    try:
+        db.add_all([
+            AlertHistory(
+                stock_id=event["stock_id"],
+                stock_name=event.get("stock_name"),
+                alert_type=event["alert_type"],
+                alert_message=event["message"],
+                trigger_value=event["trigger_value"],
+                current_price=event["current_price"],
+            )
+            for event in triggered
+        ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"寫入警示歷史失敗: {e}")
+    finally:
+        db.close()
+
+
+def get_alert_history(limit: int = 50, stock_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """最近的警示觸發紀錄"""
+    from app.database import AlertHistory, SessionLocal
+
+    db = SessionLocal()
+    try:
+        query = db.query(AlertHistory)
+        if stock_id:
+            query = query.filter(AlertHistory.stock_id == stock_id)
+        rows = query.order_by(AlertHistory.triggered_at.desc()).limit(limit).all()
+        return [
+            {
+                "id": row.id,
+                "stock_id": row.stock_id,
+                "stock_name": row.stock_name,
+                "alert_type": row.alert_type,
+                "message": row.alert_message,
+                "trigger_value": row.trigger_value,
+                "current_price": row.current_price,
+                "is_read": row.is_read,
+                "triggered_at": row.triggered_at.isoformat() if row.triggered_at else None,
+            }
+            for row in rows
+        ]
+    finally:
+        db.close()
+
+
+_registry: Optional[AlertRegistry] = None
+
+
+def get_alert_registry() -> AlertRegistry:
+    """取得警示登錄表（首次呼叫時從磁碟載入）"""
+    global _registry
+    if _registry is None:
+        _registry = AlertRegistry()
+        count = _registry.load()
+        if count:
+            print(f"🔔 [AlertRegistry] 載入 {count} 個價格警示")
+    return _registry
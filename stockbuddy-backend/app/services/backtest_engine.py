@@ -6,7 +6,7 @@
 """
 
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import math
 
 
@@ -302,9 +302,114 @@ class BacktestEngine:
         }
 
 
+# ============================================================
+# 訊號序列輔助函數
+# ============================================================
+
+_INSUFFICIENT = {"signal": "hold", "reason": "資料不足"}
+
+
+def _window_sums(values: List[float], period: int) -> List[Optional[float]]:
+    """
+    每個位置往前 period 筆的和，不足為 None
+
+    逐窗以 sum() 依序加總，與 sum(values[i-period+1:i+1]) 逐位元相同；
+    每窗重新加總，整段序列為 O(n·period)（不用滑動累加，避免浮點誤差累積）
+    """
+    if period <= 0:
+        return [0] * len(values)
+    return [None] * min(period - 1, len(values)) + [
+        sum(values[i - period + 1:i + 1]) for i in range(period - 1, len(values))
+    ]
+
+
+def _gains_losses(closes: List[float]):
+    """逐日漲跌幅拆成上漲 / 下跌兩個序列（長度 len(closes) - 1）"""
+    gains = []
+    losses = []
+    for i in range(1, len(closes)):
+        change = closes[i] - closes[i-1]
+        if change > 0:
+            gains.append(change)
+            losses.append(0)
+        else:
+            gains.append(0)
+            losses.append(abs(change))
+    return gains, losses
+
+
+def _ema_prefix(data: List[float], period: int) -> List[float]:
+    """
+    每個前綴 data[:i+1] 的 EMA（以前 period 筆平均為起始值）
+
+    前綴長度不足 period 時為前綴平均，與 macd_strategy 的 ema() 相同
+    """
+    result = []
+    multiplier = 2 / (period + 1)
+    ema_val = None
+    for i, price in enumerate(data):
+        if i < period - 1:
+            result.append(sum(data[:i+1]) / (i + 1))
+        elif i == period - 1:
+            ema_val = sum(data[:period]) / period
+            result.append(ema_val)
+        else:
+            ema_val = (price - ema_val) * multiplier + ema_val
+            result.append(ema_val)
+    return result
+
+
 class SimpleStrategy:
-    """簡單策略"""
-    
+    """
+    簡單策略
+
+    每個策略有兩種用法：
+    - ma_crossover(history) 等：以截至當日的歷史資料產生當日訊號
+    - signal_series(strategy, history)：一次計算整段序列的指標，回傳每日訊號，
+      第 i 筆與 ma_crossover(history[:i+1]) 等完全相同（回測使用）
+    """
+
+    STRATEGIES = ("ma_crossover", "rsi", "macd", "bollinger", "volume_breakout", "combined")
+
+    @classmethod
+    def signal_at(cls, strategy: str, history: List[Dict], **params) -> Dict:
+        """以截至當日的歷史資料產生單日訊號"""
+        func = {
+            "ma_crossover": cls.ma_crossover,
+            "rsi": cls.rsi_strategy,
+            "macd": cls.macd_strategy,
+            "bollinger": cls.bollinger_strategy,
+            "volume_breakout": cls.volume_breakout_strategy,
+            "combined": cls.combined_strategy,
+        }.get(strategy)
+        if func is None:
+            return {"signal": "hold", "reason": "未知策略"}
+        return func(history, **params)
+
+    @classmethod
+    def signal_series(cls, strategy: str, history: List[Dict], **params) -> List[Dict]:
+        """
+        一次產生整段序列的每日訊號（O(n)）
+
+        Returns:
+            與 history 等長的訊號列表，第 i 筆等於 signal_at(strategy, history[:i+1])
+        """
+        func = {
+            "ma_crossover": cls.ma_crossover_series,
+            "rsi": cls.rsi_series,
+            "macd": cls.macd_series,
+            "bollinger": cls.bollinger_series,
+            "volume_breakout": cls.volume_breakout_series,
+            "combined": cls.combined_series,
+        }.get(strategy)
+        if func is None:
+            return [{"signal": "hold", "reason": "未知策略"}] * len(history)
+        return func(history, **params)
+
+    # ============================================================
+    # 均線交叉
+    # ============================================================
+
     @staticmethod
     def ma_crossover(history: List[Dict], short_period: int = 5, long_period: int = 20) -> Dict:
         """
@@ -327,8 +432,6 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": "資料不足"}
         
         closes = [h["close"] for h in history]
-        current_price = closes[-1]
-        prev_price = closes[-2]
         
         # 計算均線
         short_ma = sum(closes[-short_period:]) / short_period
@@ -353,6 +456,56 @@ class SimpleStrategy:
             long_ma_10d = sum(closes_10d_ago[-long_period:]) / long_period
             was_bearish_10d = short_ma_10d < long_ma_10d
         
+        return SimpleStrategy._ma_crossover_signal(
+            closes[-11:], short_ma, long_ma, prev_short_ma, prev_long_ma,
+            was_bearish_5d, was_bearish_10d, short_period, long_period,
+        )
+
+    @staticmethod
+    def ma_crossover_series(history: List[Dict], short_period: int = 5, long_period: int = 20) -> List[Dict]:
+        """均線交叉策略（整段序列）"""
+        closes = [h["close"] for h in history]
+        short_sums = _window_sums(closes, short_period)
+        long_sums = _window_sums(closes, long_period)
+
+        signals = []
+        for i in range(len(closes)):
+            size = i + 1
+            if size < long_period + 10:
+                signals.append(_INSUFFICIENT)
+                continue
+
+            was_bearish_5d = False
+            was_bearish_10d = False
+            if size - 5 >= long_period:
+                was_bearish_5d = short_sums[i-5] / short_period < long_sums[i-5] / long_period
+            if size - 10 >= long_period:
+                was_bearish_10d = short_sums[i-10] / short_period < long_sums[i-10] / long_period
+
+            signals.append(SimpleStrategy._ma_crossover_signal(
+                closes[max(0, i-10):i+1],
+                short_sums[i] / short_period, long_sums[i] / long_period,
+                short_sums[i-1] / short_period, long_sums[i-1] / long_period,
+                was_bearish_5d, was_bearish_10d, short_period, long_period,
+            ))
+        return signals
+
+    @staticmethod
+    def _ma_crossover_signal(
+        recent: List[float],
+        short_ma: float,
+        long_ma: float,
+        prev_short_ma: float,
+        prev_long_ma: float,
+        was_bearish_5d: bool,
+        was_bearish_10d: bool,
+        short_period: int,
+        long_period: int,
+    ) -> Dict:
+        """均線交叉判斷（recent 為最近 11 日收盤價）"""
+        current_price = recent[-1]
+        prev_price = recent[-2]
+
         # 判斷狀態
         is_bullish = short_ma > long_ma
         was_bullish = prev_short_ma > prev_long_ma
@@ -360,8 +513,8 @@ class SimpleStrategy:
         price_above_long = current_price > long_ma
         
         # 計算動能
-        price_5d_ago = closes[-6] if len(closes) >= 6 else closes[0]
-        price_10d_ago = closes[-11] if len(closes) >= 11 else closes[0]
+        price_5d_ago = recent[-6] if len(recent) >= 6 else recent[0]
+        price_10d_ago = recent[-11] if len(recent) >= 11 else recent[0]
         momentum_5d = (current_price - price_5d_ago) / price_5d_ago * 100
         momentum_10d = (current_price - price_10d_ago) / price_10d_ago * 100
         daily_change = (current_price - prev_price) / prev_price * 100
@@ -378,14 +531,12 @@ class SimpleStrategy:
         
         # 3. 多頭排列中，價格回測短均線後反彈
         if is_bullish and price_above_short:
-            prev_short_ma_val = sum(closes[-short_period-1:-1]) / short_period
-            if prev_price < prev_short_ma_val and current_price > short_ma:
+            if prev_price < prev_short_ma and current_price > short_ma:
                 return {"signal": "buy", "reason": f"多頭回測 MA{short_period} 後反彈"}
         
         # 4. 多頭排列中，價格回測長均線後反彈（較強支撐）
         if is_bullish and price_above_long:
-            prev_long_ma_val = sum(closes[-long_period-1:-1]) / long_period
-            if prev_price < prev_long_ma_val * 1.01 and current_price > long_ma:
+            if prev_price < prev_long_ma * 1.01 and current_price > long_ma:
                 return {"signal": "buy", "reason": f"多頭回測 MA{long_period} 後反彈（強支撐）"}
         
         # 5. 【優化】多頭排列 + 動能正向（降低門檻到 1.5%）
@@ -397,7 +548,7 @@ class SimpleStrategy:
             return {"signal": "buy", "reason": f"多頭強勢上攻，今日 +{daily_change:.1f}%"}
         
         # 7. 【新增】多頭排列 + 價格創近 10 日新高
-        high_10d = max(closes[-10:])
+        high_10d = max(recent[-10:])
         if is_bullish and current_price >= high_10d * 0.995:
             return {"signal": "buy", "reason": f"多頭排列，接近10日高點"}
         
@@ -425,7 +576,7 @@ class SimpleStrategy:
             return {"signal": "sell", "reason": f"跌破 MA{long_period}，注意趨勢"}
         
         # 13.【新增】價格創近 10 日新低
-        low_10d = min(closes[-10:])
+        low_10d = min(recent[-10:])
         if not is_bullish and current_price <= low_10d * 1.005:
             return {"signal": "sell", "reason": f"空頭排列，接近10日低點"}
         
@@ -434,6 +585,10 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": f"多頭排列，持有觀察"}
         else:
             return {"signal": "hold", "reason": f"空頭排列，觀望"}
+
+    # ============================================================
+    # RSI
+    # ============================================================
     
     @staticmethod
     def rsi_strategy(history: List[Dict], period: int = 14, oversold: int = 30, overbought: int = 70) -> Dict:
@@ -452,20 +607,35 @@ class SimpleStrategy:
         closes = [h["close"] for h in history]
         
         # 計算 RSI
-        gains = []
-        losses = []
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
+        gains, losses = _gains_losses(closes)
         
         avg_gain = sum(gains[-period:]) / period
         avg_loss = sum(losses[-period:]) / period
         
+        return SimpleStrategy._rsi_signal(avg_gain, avg_loss, oversold, overbought)
+
+    @staticmethod
+    def rsi_series(history: List[Dict], period: int = 14, oversold: int = 30, overbought: int = 70) -> List[Dict]:
+        """RSI 策略（整段序列）"""
+        closes = [h["close"] for h in history]
+        gains, losses = _gains_losses(closes)
+        gain_sums = _window_sums(gains, period)
+        loss_sums = _window_sums(losses, period)
+
+        signals = []
+        for i in range(len(closes)):
+            if i + 1 < period + 1:
+                signals.append(_INSUFFICIENT)
+                continue
+            # 前綴 closes[:i+1] 的漲跌序列結束於 gains[i-1]
+            signals.append(SimpleStrategy._rsi_signal(
+                gain_sums[i-1] / period, loss_sums[i-1] / period, oversold, overbought
+            ))
+        return signals
+
+    @staticmethod
+    def _rsi_signal(avg_gain: float, avg_loss: float, oversold: int, overbought: int) -> Dict:
+        """RSI 判斷"""
         if avg_loss == 0:
             rsi = 100
         else:
@@ -478,6 +648,10 @@ class SimpleStrategy:
             return {"signal": "sell", "reason": f"RSI {rsi:.1f} 進入超買區"}
         else:
             return {"signal": "hold", "reason": f"RSI {rsi:.1f} 正常區間"}
+
+    # ============================================================
+    # MACD
+    # ============================================================
     
     @staticmethod
     def macd_strategy(history: List[Dict], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict:
@@ -516,6 +690,28 @@ class SimpleStrategy:
         prev_ema_slow = ema(prev_closes, slow)
         prev_macd = prev_ema_fast - prev_ema_slow
         
+        return SimpleStrategy._macd_signal(macd_line, prev_macd)
+
+    @staticmethod
+    def macd_series(history: List[Dict], fast: int = 12, slow: int = 26, signal: int = 9) -> List[Dict]:
+        """MACD 策略（整段序列，EMA 遞迴只計算一次）"""
+        closes = [h["close"] for h in history]
+        ema_fast = _ema_prefix(closes, fast)
+        ema_slow = _ema_prefix(closes, slow)
+
+        signals = []
+        for i in range(len(closes)):
+            if i + 1 < slow + signal:
+                signals.append(_INSUFFICIENT)
+                continue
+            signals.append(SimpleStrategy._macd_signal(
+                ema_fast[i] - ema_slow[i], ema_fast[i-1] - ema_slow[i-1]
+            ))
+        return signals
+
+    @staticmethod
+    def _macd_signal(macd_line: float, prev_macd: float) -> Dict:
+        """MACD 判斷"""
         # 簡化：用 MACD 線穿越零軸判斷
         if prev_macd <= 0 and macd_line > 0:
             return {"signal": "buy", "reason": f"MACD 向上穿越零軸"}
@@ -525,6 +721,10 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": f"MACD 多方，持有"}
         else:
             return {"signal": "hold", "reason": f"MACD 空方，觀望"}
+
+    # ============================================================
+    # 布林通道
+    # ============================================================
     
     @staticmethod
     def bollinger_strategy(history: List[Dict], period: int = 20, std_dev: float = 2.0) -> Dict:
@@ -540,8 +740,21 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": "資料不足"}
         
         closes = [h["close"] for h in history]
-        recent_closes = closes[-period:]
-        
+        return SimpleStrategy._bollinger_signal(closes[-period:], period, std_dev)
+
+    @staticmethod
+    def bollinger_series(history: List[Dict], period: int = 20, std_dev: float = 2.0) -> List[Dict]:
+        """布林通道策略（整段序列）"""
+        closes = [h["close"] for h in history]
+        return [
+            _INSUFFICIENT if i + 1 < period
+            else SimpleStrategy._bollinger_signal(closes[i-period+1:i+1], period, std_dev)
+            for i in range(len(closes))
+        ]
+
+    @staticmethod
+    def _bollinger_signal(recent_closes: List[float], period: int, std_dev: float) -> Dict:
+        """布林通道判斷（recent_closes 為最近 period 日收盤價）"""
         # 計算布林通道
         ma = sum(recent_closes) / period
         variance = sum((x - ma) ** 2 for x in recent_closes) / period
@@ -550,7 +763,7 @@ class SimpleStrategy:
         upper_band = ma + std_dev * std
         lower_band = ma - std_dev * std
         
-        current_price = closes[-1]
+        current_price = recent_closes[-1]
         
         # 價格觸及下軌買入，觸及上軌賣出
         if current_price <= lower_band:
@@ -560,6 +773,10 @@ class SimpleStrategy:
         else:
             band_width = (upper_band - lower_band) / ma * 100
             return {"signal": "hold", "reason": f"價格在通道內，帶寬 {band_width:.1f}%"}
+
+    # ============================================================
+    # 量價突破
+    # ============================================================
     
     @staticmethod
     def volume_breakout_strategy(history: List[Dict], ma_period: int = 20, volume_ratio: float = 1.3) -> Dict:
@@ -583,19 +800,53 @@ class SimpleStrategy:
         ma = sum(closes[-ma_period:]) / ma_period
         avg_volume = sum(volumes[-ma_period:-1]) / (ma_period - 1) if ma_period > 1 else volumes[-1]
         
-        current_price = closes[-1]
-        current_volume = volumes[-1]
-        prev_price = closes[-2]
+        return SimpleStrategy._volume_breakout_signal(
+            closes[-6:], volumes[-3:], ma, avg_volume, ma_period, volume_ratio
+        )
+
+    @staticmethod
+    def volume_breakout_series(history: List[Dict], ma_period: int = 20, volume_ratio: float = 1.3) -> List[Dict]:
+        """量價突破策略（整段序列）"""
+        closes = [h["close"] for h in history]
+        volumes = [h.get("volume", 0) for h in history]
+        close_sums = _window_sums(closes, ma_period)
+        volume_sums = _window_sums(volumes, ma_period - 1)
+
+        signals = []
+        for i in range(len(closes)):
+            if i + 1 < ma_period + 5:
+                signals.append(_INSUFFICIENT)
+                continue
+            avg_volume = volume_sums[i-1] / (ma_period - 1) if ma_period > 1 else volumes[i]
+            signals.append(SimpleStrategy._volume_breakout_signal(
+                closes[max(0, i-5):i+1], volumes[max(0, i-2):i+1],
+                close_sums[i] / ma_period, avg_volume, ma_period, volume_ratio,
+            ))
+        return signals
+
+    @staticmethod
+    def _volume_breakout_signal(
+        recent: List[float],
+        recent_volumes: List[float],
+        ma: float,
+        avg_volume: float,
+        ma_period: int,
+        volume_ratio: float,
+    ) -> Dict:
+        """量價突破判斷（recent 為最近 6 日收盤價，recent_volumes 為最近 3 日成交量）"""
+        current_price = recent[-1]
+        current_volume = recent_volumes[-1]
+        prev_price = recent[-2]
         
         # 量能比
         vol_ratio = current_volume / avg_volume if avg_volume > 0 else 1
         
         # 計算近 5 天的價格變化
-        price_5d_ago = closes[-6] if len(closes) >= 6 else closes[0]
+        price_5d_ago = recent[-6] if len(recent) >= 6 else recent[0]
         momentum_5d = (current_price - price_5d_ago) / price_5d_ago * 100
         
         # 計算近 3 天平均量能
-        avg_vol_3d = sum(volumes[-3:]) / 3 if len(volumes) >= 3 else current_volume
+        avg_vol_3d = sum(recent_volumes[-3:]) / 3 if len(recent_volumes) >= 3 else current_volume
         vol_ratio_3d = avg_vol_3d / avg_volume if avg_volume > 0 else 1
         
         # 1. 經典突破：帶量突破均線
@@ -618,7 +869,7 @@ class SimpleStrategy:
         # 5. 新增：均線下方 + 縮量（可能見底）
         if current_price < ma * 0.98 and vol_ratio < 0.7:
             # 檢查是否連續縮量
-            if len(volumes) >= 3 and volumes[-1] < volumes[-2] < volumes[-3]:
+            if len(recent_volumes) >= 3 and recent_volumes[-1] < recent_volumes[-2] < recent_volumes[-3]:
                 return {"signal": "buy", "reason": f"跌深縮量，可能見底"}
         
         # 6. 新增：均線上方 + 量縮價跌（獲利了結訊號）
@@ -630,6 +881,10 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": f"站穩均線上方，量能 {vol_ratio:.1f}x"}
         else:
             return {"signal": "hold", "reason": f"位於均線下方"}
+
+    # ============================================================
+    # 綜合策略
+    # ============================================================
     
     @staticmethod
     def combined_strategy(history: List[Dict]) -> Dict:
@@ -643,8 +898,6 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": "資料不足"}
         
         closes = [h["close"] for h in history]
-        current_price = closes[-1]
-        prev_price = closes[-2]
         
         # 計算均線
         ma5 = sum(closes[-5:]) / 5
@@ -657,14 +910,53 @@ class SimpleStrategy:
         prev_ma20 = sum(prev_closes[-20:]) / 20 if len(prev_closes) >= 20 else ma20
         
         # RSI
-        gains = []
-        losses = []
-        for i in range(1, len(closes)):
-            change = closes[i] - closes[i-1]
-            gains.append(max(change, 0))
-            losses.append(abs(min(change, 0)))
+        gains, losses = _gains_losses(closes)
         avg_gain = sum(gains[-14:]) / 14
         avg_loss = sum(losses[-14:]) / 14
+        
+        return SimpleStrategy._combined_signal(
+            closes[-20:], ma5, ma10, ma20, prev_ma5, prev_ma10, prev_ma20, avg_gain, avg_loss
+        )
+
+    @staticmethod
+    def combined_series(history: List[Dict]) -> List[Dict]:
+        """綜合策略（整段序列）"""
+        closes = [h["close"] for h in history]
+        sums5 = _window_sums(closes, 5)
+        sums10 = _window_sums(closes, 10)
+        sums20 = _window_sums(closes, 20)
+        gains, losses = _gains_losses(closes)
+        gain_sums = _window_sums(gains, 14)
+        loss_sums = _window_sums(losses, 14)
+
+        signals = []
+        for i in range(len(closes)):
+            if i + 1 < 30:
+                signals.append(_INSUFFICIENT)
+                continue
+            signals.append(SimpleStrategy._combined_signal(
+                closes[i-19:i+1],
+                sums5[i] / 5, sums10[i] / 10, sums20[i] / 20,
+                sums5[i-1] / 5, sums10[i-1] / 10, sums20[i-1] / 20,
+                gain_sums[i-1] / 14, loss_sums[i-1] / 14,
+            ))
+        return signals
+
+    @staticmethod
+    def _combined_signal(
+        recent: List[float],
+        ma5: float,
+        ma10: float,
+        ma20: float,
+        prev_ma5: float,
+        prev_ma10: float,
+        prev_ma20: float,
+        avg_gain: float,
+        avg_loss: float,
+    ) -> Dict:
+        """綜合策略判斷（recent 為最近 20 日收盤價）"""
+        current_price = recent[-1]
+        prev_price = recent[-2]
         rsi = 100 - (100 / (1 + avg_gain / avg_loss)) if avg_loss > 0 else 100
         
         # 計分系統
@@ -725,7 +1017,7 @@ class SimpleStrategy:
             sell_score += 1
         
         # 5. 短期動能（放寬到 0.5%）
-        price_5d_ago = closes[-6] if len(closes) >= 6 else closes[0]
+        price_5d_ago = recent[-6] if len(recent) >= 6 else recent[0]
         momentum = (current_price - price_5d_ago) / price_5d_ago * 100
         if momentum > 0.5:
             buy_score += 1
@@ -751,8 +1043,8 @@ class SimpleStrategy:
         # 🆕 7. 連續上漲/下跌（降低到 2 天）
         consecutive_up = 0
         consecutive_down = 0
-        for i in range(len(closes)-1, max(0, len(closes)-6), -1):
-            if closes[i] > closes[i-1]:
+        for i in range(len(recent)-1, max(0, len(recent)-6), -1):
+            if recent[i] > recent[i-1]:
                 if consecutive_down == 0:
                     consecutive_up += 1
                 else:
@@ -771,8 +1063,8 @@ class SimpleStrategy:
             sell_score += 1
         
         # 🆕 8. 接近區間高點/低點（10日）
-        high_10d = max(closes[-10:])
-        low_10d = min(closes[-10:])
+        high_10d = max(recent[-10:])
+        low_10d = min(recent[-10:])
         range_10d = high_10d - low_10d
         if range_10d > 0:
             position = (current_price - low_10d) / range_10d
@@ -784,8 +1076,8 @@ class SimpleStrategy:
                 buy_score += 0.5
         
         # 🆕 9. 創新高/新低（20日）
-        high_20d = max(closes[-20:])
-        low_20d = min(closes[-20:])
+        high_20d = max(recent[-20:])
+        low_20d = min(recent[-20:])
         if current_price >= high_20d:
             buy_score += 1
             reasons.append("創20日新高")
@@ -801,6 +1093,68 @@ class SimpleStrategy:
             return {"signal": "hold", "reason": f"綜合評分 買{buy_score:.1f}/賣{sell_score:.1f}，觀望"}
 
 
+def simulate_signals(
+    engine: BacktestEngine,
+    stock_id: str,
+    history: List[Dict],
+    signals: List[Dict],
+    position_size: float = 0.1,
+    start: int = 20,
+    verbose: bool = True,
+) -> Dict[str, int]:
+    """
+    依預先計算的訊號序列單次走訪執行交易
+
+    Args:
+        engine: 回測引擎
+        stock_id: 股票代號
+        history: 歷史 K 線資料
+        signals: 與 history 等長的每日訊號（SimpleStrategy.signal_series）
+        position_size: 倉位大小 (0-1)
+        start: 開始交易的位置
+        verbose: 是否輸出交易日誌
+
+    Returns:
+        訊號統計 {"buy": n, "sell": n, "hold": n}
+    """
+    signal_counts = {"buy": 0, "sell": 0, "hold": 0}
+
+    for i in range(start, len(history)):
+        today = history[i]
+        date = today["date"]
+        price = today["close"]
+        signal = signals[i]
+
+        signal_counts[signal["signal"]] = signal_counts.get(signal["signal"], 0) + 1
+
+        # 執行交易
+        if signal["signal"] == "buy":
+            # 計算可買股數（支援零股交易，最小 100 股）
+            available = engine.capital * position_size
+            # 先嘗試整張（1000股），如果買不起則嘗試零股（100股為單位）
+            shares = int(available / price / 1000) * 1000
+            if shares < 1000:
+                # 零股交易：以 100 股為單位
+                shares = int(available / price / 100) * 100
+            if shares >= 100:  # 最少買 100 股
+                result = engine.buy(stock_id, price, shares, date, signal["reason"])
+                if result["success"] and verbose:
+                    print(f"[BUY] {date} {shares} shares @ ${price:.2f}")
+
+        elif signal["signal"] == "sell":
+            # 賣出全部
+            if stock_id in engine.positions:
+                shares = engine.positions[stock_id]["shares"]
+                result = engine.sell(stock_id, price, shares, date, signal["reason"])
+                if result["success"] and verbose:
+                    print(f"[SELL] {date} {shares} shares @ ${price:.2f}")
+
+        # 記錄每日淨值
+        engine.record_daily_value(date, {stock_id: price})
+
+    return signal_counts
+
+
 async def run_backtest(
     stock_id: str,
     start_date: str,
@@ -820,11 +1174,32 @@ async def run_backtest(
         initial_capital: 初始資金
         position_size: 倉位大小 (0-1)
     """
+    print(f"[Backtest] Starting {stock_id}, strategy: {strategy}")
+
+    filtered_history, error = await load_backtest_history(stock_id, start_date, end_date)
+    if error:
+        return error
+
+    return backtest_history(
+        stock_id,
+        filtered_history,
+        strategy=strategy,
+        initial_capital=initial_capital,
+        position_size=position_size,
+        period=f"{start_date} ~ {end_date}",
+    )
+
+
+async def load_backtest_history(stock_id: str, start_date: str, end_date: str) -> Tuple[Optional[List[Dict]], Optional[Dict]]:
+    """
+    取得回測期間的歷史資料（日期已標準化為 YYYY-MM-DD）
+
+    Returns:
+        (歷史資料, None)，資料不足時為 (None, 錯誤訊息)
+    """
     from app.services.github_data import SmartStockService
     from datetime import datetime
 
-    print(f"[Backtest] Starting {stock_id}, strategy: {strategy}")
-
     # 計算需要的月份數
     try:
         start_dt = datetime.strptime(start_date, "%Y-%m-%d")
@@ -880,7 +1255,7 @@ async def run_backtest(
             "部分 ETF 和特殊股票可能無法取得歷史資料"
         ]
         
-        return {
+        return None, {
             "error": f"無法回測股票 {stock_id}",
             "reason": "。".join(reasons),
             "suggestions": suggestions,
@@ -942,7 +1317,7 @@ async def run_backtest(
         filtered_history = history
 
     if len(filtered_history) < 20:
-        return {
+        return None, {
             "error": "指定日期範圍資料不足",
             "details": {
                 "required": 20,
@@ -952,63 +1327,41 @@ async def run_backtest(
             }
         }
 
-    # 初始化回測引擎
-    engine = BacktestEngine(initial_capital)
-
-    # 追蹤訊號統計
-    signal_counts = {"buy": 0, "sell": 0, "hold": 0}
-
-    # 執行回測
-    for i in range(20, len(filtered_history)):
-        current_data = filtered_history[:i+1]
-        today = current_data[-1]
-        date = today["date"]
-        price = today["close"]
-
-        # 取得策略訊號
-        if strategy == "ma_crossover":
-            signal = SimpleStrategy.ma_crossover(current_data)
-        elif strategy == "rsi":
-            signal = SimpleStrategy.rsi_strategy(current_data)
-        elif strategy == "macd":
-            signal = SimpleStrategy.macd_strategy(current_data)
-        elif strategy == "bollinger":
-            signal = SimpleStrategy.bollinger_strategy(current_data)
-        elif strategy == "volume_breakout":
-            signal = SimpleStrategy.volume_breakout_strategy(current_data)
-        elif strategy == "combined":
-            signal = SimpleStrategy.combined_strategy(current_data)
-        else:
-            signal = {"signal": "hold", "reason": "未知策略"}
+    return filtered_history, None
 
-        signal_counts[signal["signal"]] = signal_counts.get(signal["signal"], 0) + 1
 
-        # 執行交易
-        if signal["signal"] == "buy":
-            # 計算可買股數（支援零股交易，最小 100 股）
-            available = engine.capital * position_size
-            # 先嘗試整張（1000股），如果買不起則嘗試零股（100股為單位）
-            shares = int(available / price / 1000) * 1000
-            if shares < 1000:
-                # 零股交易：以 100 股為單位
-                shares = int(available / price / 100) * 100
-            if shares >= 100:  # 最少買 100 股
-                result = engine.buy(stock_id, price, shares, date, signal["reason"])
-                if result["success"]:
-                    print(f"[BUY] {date} {shares} shares @ ${price:.2f}")
+def backtest_history(
+    stock_id: str,
+    history: List[Dict],
+    strategy: str = "ma_crossover",
+    initial_capital: float = 1000000,
+    position_size: float = 0.1,
+    params: Optional[Dict] = None,
+    period: str = "",
+    verbose: bool = True,
+) -> Dict:
+    """
+    以已載入的歷史資料執行單一策略回測（不需 I/O，可在子行程執行）
 
-        elif signal["signal"] == "sell":
-            # 賣出全部
-            if stock_id in engine.positions:
-                shares = engine.positions[stock_id]["shares"]
-                result = engine.sell(stock_id, price, shares, date, signal["reason"])
-                if result["success"]:
-                    print(f"[SELL] {date} {shares} shares @ ${price:.2f}")
+    Args:
+        stock_id: 股票代號
+        history: 歷史 K 線資料（至少需 date、close、volume）
+        strategy: 策略名稱
+        initial_capital: 初始資金
+        position_size: 倉位大小 (0-1)
+        params: 策略參數（例如 {"short_period": 10, "long_period": 60}）
+        period: 回測期間說明
+        verbose: 是否輸出交易日誌
+    """
+    # 初始化回測引擎
+    engine = BacktestEngine(initial_capital)
 
-        # 記錄每日淨值
-        engine.record_daily_value(date, {stock_id: price})
+    # 一次計算整段訊號，再單次走訪執行交易
+    signals = SimpleStrategy.signal_series(strategy, history, **(params or {}))
+    signal_counts = simulate_signals(engine, stock_id, history, signals, position_size, verbose=verbose)
 
-    print(f"[Backtest] Signals: buy={signal_counts['buy']}, sell={signal_counts['sell']}, hold={signal_counts['hold']}")
+    if verbose:
+        print(f"[Backtest] Signals: buy={signal_counts['buy']}, sell={signal_counts['sell']}, hold={signal_counts['hold']}")
     
     # 計算統計
     stats = engine.calculate_stats()
@@ -1016,7 +1369,7 @@ async def run_backtest(
     return {
         "stock_id": stock_id,
         "strategy": strategy,
-        "period": f"{start_date} ~ {end_date}",
+        "period": period,
         "stats": stats,
         "trades": engine.trades[-20:],  # 最近 20 筆交易
         "daily_values": engine.daily_values[-60:],  # 最近 60 天淨值
@@ -0,0 +1,363 @@
+"""
+批次回測服務（參數掃描 / 多股票）
+
+一次提交「股票 × 策略 × 參數組合」的回測網格：
+1. 先以 async 載入所有股票的歷史資料（只載入一次）
+2. 歷史資料於行程池啟動時傳給每個子行程（initializer），各組合只傳遞代號與參數
+3. 各組合以 backtest_history 在子行程平行執行
+4. 結果依 Sharpe / 回撤 / 勝率等指標排序
+
+工作在背景執行，以 job_id 查詢進度與結果，不佔用 HTTP 連線。
+
+使用方式：
+    job = submit_batch_backtest(
+        stock_ids=["2330", "2317"],
+        strategies=[{"strategy": "ma_crossover", "params": {"short_period": [5, 10], "long_period": [20, 60]}}],
+        start_date="2023-01-01",
+        end_date="2025-01-01",
+    )
+    status = get_batch_job(job.job_id).to_dict()
+"""
+
+import asyncio
+import inspect
+import itertools
+import os
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.backtest_engine import SimpleStrategy, backtest_history, load_backtest_history
+
+# 子行程數量
+BATCH_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# 單一工作的組合上限（股票數 × 參數組合數）
+MAX_COMBINATIONS = 5000
+
+# 保留的工作數（超過時移除最舊的已完成工作）
+MAX_JOBS = 20
+
+# 同時載入歷史資料的股票數
+LOAD_CONCURRENCY = 5
+
+# 可排序指標：True 表示越大越好
+RANK_METRICS = {
+    "sharpe_ratio": True,
+    "total_return_pct": True,
+    "annual_return_pct": True,
+    "win_rate": True,
+    "profit_factor": True,
+    "max_drawdown_pct": False,
+}
+
+
+# ============================================================
+# 子行程
+# ============================================================
+
+_worker_histories: Dict[str, List[Dict]] = {}
+
+
+def _init_worker(histories: Dict[str, List[Dict]]) -> None:
+    """子行程初始化：保存預先載入的歷史資料"""
+    global _worker_histories
+    _worker_histories = histories
+
+
+def _run_combination(
+    stock_id: str,
+    strategy: str,
+    params: Dict[str, Any],
+    initial_capital: float,
+    position_size: float,
+) -> Dict[str, Any]:
+    """在子行程執行單一組合回測，只回傳排名所需的統計"""
+    result = backtest_history(
+        stock_id,
+        _worker_histories[stock_id],
+        strategy=strategy,
+        initial_capital=initial_capital,
+        position_size=position_size,
+        params=params,
+        verbose=False,
+    )
+    stats = result["stats"]
+    row = {"stock_id": stock_id, "strategy": strategy, "params": params}
+    if "error" in stats:
+        row["error"] = stats["error"]
+        return row
+
+    row.update({
+        "sharpe_ratio": stats["sharpe_ratio"],
+        "max_drawdown_pct": stats["max_drawdown_pct"],
+        "win_rate": stats["win_rate"],
+        "total_return_pct": stats["total_return_pct"],
+        "annual_return_pct": stats["annual_return_pct"],
+        "profit_factor": stats["profit_factor"],
+        "total_trades": stats["total_trades"],
+        "final_value": stats["final_value"],
+    })
+    return row
+
+
+# ============================================================
+# 參數網格
+# ============================================================
+
+_SERIES_FUNCS = {
+    "ma_crossover": SimpleStrategy.ma_crossover_series,
+    "rsi": SimpleStrategy.rsi_series,
+    "macd": SimpleStrategy.macd_series,
+    "bollinger": SimpleStrategy.bollinger_series,
+    "volume_breakout": SimpleStrategy.volume_breakout_series,
+    "combined": SimpleStrategy.combined_series,
+}
+
+
+def expand_grid(strategies: List[Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    展開策略參數網格
+
+    Args:
+        strategies: [{"strategy": "rsi", "params": {"oversold": [25, 30], "overbought": 70}}, ...]
+                    參數值可為單一值或列表
+
+    Returns:
+        [(策略名稱, 參數), ...]
+
+    Raises:
+        ValueError: 未知策略或參數
+    """
+    combos = []
+    for spec in strategies:
+        name = spec.get("strategy")
+        func = _SERIES_FUNCS.get(name)
+        if func is None:
+            raise ValueError(f"未知策略: {name}（可用: {', '.join(SimpleStrategy.STRATEGIES)}）")
+
+        grid = spec.get("params") or {}
+        allowed = set(inspect.signature(func).parameters) - {"history"}
+        unknown = set(grid) - allowed
+        if unknown:
+            raise ValueError(f"策略 {name} 不支援參數: {', '.join(sorted(unknown))}")
+
+        keys = list(grid)
+        values = [v if isinstance(v, (list, tuple)) else [v] for v in grid.values()]
+        for combo in itertools.product(*values):
+            combos.append((name, dict(zip(keys, combo))))
+
+    return combos
+
+
+def rank_results(rows: List[Dict[str, Any]], sort_by: str = "sharpe_ratio") -> List[Dict[str, Any]]:
+    """依指標排序（失敗的組合排在最後）"""
+    if sort_by not in RANK_METRICS:
+        raise ValueError(f"不支援的排序指標: {sort_by}")
+
+    descending = RANK_METRICS[sort_by]
+    valid = [r for r in rows if "error" not in r]
+    failed = [r for r in rows if "error" in r]
+    valid.sort(key=lambda r: r[sort_by], reverse=descending)
+    return valid + failed
+
+
+# ============================================================
+# 工作
+# ============================================================
+
+class BatchBacktestJob:
+    """批次回測工作"""
+
+    def __init__(
+        self,
+        stock_ids: List[str],
+        combos: List[Tuple[str, Dict[str, Any]]],
+        start_date: str,
+        end_date: str,
+        initial_capital: float,
+        position_size: float,
+    ):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.stock_ids = stock_ids
+        self.combos = combos
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.position_size = position_size
+
+        self.status = "pending"  # pending / loading / running / completed / failed
+        self.total = len(stock_ids) * len(combos)
+        self.completed = 0
+        self.results: List[Dict[str, Any]] = []
+        self.skipped: Dict[str, str] = {}  # 資料不足而略過的股票
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self, limit: int = 50, sort_by: str = "sharpe_ratio") -> Dict[str, Any]:
+        """工作狀態與排名結果"""
+        elapsed = None
+        if self.started_at:
+            elapsed = round(((self.finished_at or datetime.now()) - self.started_at).total_seconds(), 2)
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": {
+                "completed": self.completed,
+                "total": self.total,
+                "percent": round(self.completed / self.total * 100, 1) if self.total else 0,
+            },
+            "period": f"{self.start_date} ~ {self.end_date}",
+            "stocks": len(self.stock_ids),
+            "combinations": len(self.combos),
+            "skipped": self.skipped,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "elapsed_seconds": elapsed,
+            "sort_by": sort_by,
+            "results": rank_results(self.results, sort_by)[:limit],
+        }
+
+
+_jobs: "OrderedDict[str, BatchBacktestJob]" = OrderedDict()
+
+
+def submit_batch_backtest(
+    stock_ids: List[str],
+    strategies: List[Dict[str, Any]],
+    start_date: str,
+    end_date: str,
+    initial_capital: float = 1000000,
+    position_size: float = 0.1,
+) -> BatchBacktestJob:
+    """
+    提交批次回測（需在事件迴圈中呼叫），立即回傳工作
+
+    Raises:
+        ValueError: 參數錯誤或組合數超過上限
+    """
+    stock_ids = list(dict.fromkeys(s.strip() for s in stock_ids if s and s.strip()))
+    if not stock_ids:
+        raise ValueError("未指定股票")
+
+    combos = expand_grid(strategies)
+    if not combos:
+        raise ValueError("未指定策略")
+    if len(stock_ids) * len(combos) > MAX_COMBINATIONS:
+        raise ValueError(f"組合數 {len(stock_ids) * len(combos)} 超過上限 {MAX_COMBINATIONS}")
+
+    job = BatchBacktestJob(stock_ids, combos, start_date, end_date, initial_capital, position_size)
+    _jobs[job.job_id] = job
+    _prune_jobs()
+
+    job._task = asyncio.create_task(_run_job(job))
+    return job
+
+
+def get_batch_job(job_id: str) -> Optional[BatchBacktestJob]:
+    """取得批次回測工作"""
+    return _jobs.get(job_id)
+
+
+def list_batch_jobs() -> List[Dict[str, Any]]:
+    """列出批次回測工作（不含結果）"""
+    return [
+        {
+            "job_id": job.job_id,
+            "status": job.status,
+            "completed": job.completed,
+            "total": job.total,
+            "created_at": job.created_at.isoformat(),
+        }
+        for job in reversed(_jobs.values())
+    ]
+
+
+def _prune_jobs() -> None:
+    """移除最舊的已完成工作"""
+    for job_id in list(_jobs):
+        if len(_jobs) <= MAX_JOBS:
+            break
+        if _jobs[job_id].finished:
+            del _jobs[job_id]
+
+
+async def _load_histories(job: BatchBacktestJob) -> Dict[str, List[Dict]]:
+    """載入所有股票的回測資料（只保留回測需要的欄位，減少傳給子行程的資料量）"""
+    semaphore = asyncio.Semaphore(LOAD_CONCURRENCY)
+    histories: Dict[str, List[Dict]] = {}
+
+    async def load(stock_id: str):
+        async with semaphore:
+            history, error = await load_backtest_history(stock_id, job.start_date, job.end_date)
+        if error:
+            job.skipped[stock_id] = error.get("error", "資料不足")
+            return
+        histories[stock_id] = [
+            {"date": h["date"], "close": h["close"], "volume": h.get("volume", 0)}
+            for h in history
+        ]
+
+    await asyncio.gather(*(load(sid) for sid in job.stock_ids))
+    return histories
+
+
+async def _run_job(job: BatchBacktestJob) -> None:
+    """執行批次回測"""
+    job.started_at = datetime.now()
+    try:
+        job.status = "loading"
+        histories = await _load_histories(job)
+        job.total = len(histories) * len(job.combos)
+
+        job.status = "running"
+        print(f"📊 [BatchBacktest] {job.job_id}: {len(histories)} 檔 × {len(job.combos)} 組參數")
+
+        if histories:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(
+                max_workers=BATCH_MAX_WORKERS,
+                initializer=_init_worker,
+                initargs=(histories,),
+            ) as pool:
+                combos = {
+                    loop.run_in_executor(
+                        pool, _run_combination,
+                        stock_id, strategy, params, job.initial_capital, job.position_size,
+                    ): (stock_id, strategy, params)
+                    for stock_id in histories
+                    for strategy, params in job.combos
+                }
+                pending = set(combos)
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            job.results.append(future.result())
+                        except Exception as e:
+                            stock_id, strategy, params = combos[future]
+                            job.results.append({
+                                "stock_id": stock_id, "strategy": strategy, "params": params, "error": str(e),
+                            })
+                        job.completed += 1
+
+        job.status = "completed"
+        print(f"✅ [BatchBacktest] {job.job_id} 完成 ({job.completed} 組)")
+
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"❌ [BatchBacktest] {job.job_id} 失敗: {e}")
+
+    finally:
+        job.finished_at = datetime.now()
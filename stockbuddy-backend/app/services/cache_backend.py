@@ -0,0 +1,468 @@
+"""
+可抽換的共用快取後端
+
+多個 uvicorn worker 各自的行程內快取會讓上游請求與全市場資料各複製一份。
+各服務的快取改經由同一個後端介面，依環境變數選擇實作：
+
+    CACHE_BACKEND=memory   行程內（預設，與過去行為相同）
+    CACHE_BACKEND=sqlite   本機共用 SQLite 檔（WAL 模式，多個 worker 同時讀寫）
+                           CACHE_SQLITE_PATH 預設 data/shared_cache.db
+    CACHE_BACKEND=redis    Redis 協定（Redis / Valkey / KeyDB 等）
+                           CACHE_REDIS_URL 預設 redis://localhost:6379/0
+
+使用方式：
+    cache = SharedCache("twse_openapi", retention=14400)
+    cache.set("all_stocks", data)
+    data = cache.get("all_stocks", max_age=SmartTTL.get_ttl("daily_trading"))
+
+共用後端時，每個 SharedCache 另有數秒的行程內近端快取，避免同一請求中
+重複反序列化整份全市場資料。
+"""
+
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from cachetools import TTLCache
+
+from app.services.cache_service import CacheService
+from app.services.ohlcv_store import DATA_DIR
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+CACHE_SQLITE_PATH = Path(os.getenv("CACHE_SQLITE_PATH", str(DATA_DIR / "shared_cache.db")))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# 共用後端時行程內近端快取的秒數與容量
+LOCAL_TTL = 2.0
+LOCAL_MAXSIZE = 1024
+
+# SQLite 每寫入幾次清除一次過期資料
+SQLITE_PURGE_EVERY = 500
+
+
+class CacheBackend:
+    """快取後端介面（值為任意可 pickle 的 Python 物件）"""
+
+    name = "base"
+    shared = False  # 是否跨行程共用
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def get(self, key: str) -> Optional[Any]:
+        """取得值，不存在、過期或後端錯誤時回傳 None"""
+        try:
+            value = self._get(key)
+        except Exception as e:
+            self._error("get", e)
+            return None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        """寫入值，ttl 秒後過期（後端錯誤只記錄，不影響呼叫端）"""
+        try:
+            self._set(key, value, ttl)
+            self.writes += 1
+        except Exception as e:
+            self._error("set", e)
+
+    def delete(self, key: str) -> None:
+        try:
+            self._delete(key)
+        except Exception as e:
+            self._error("delete", e)
+
+    def clear(self, prefix: str = "") -> None:
+        """刪除指定前綴的所有鍵（空字串為全部）"""
+        try:
+            self._clear(prefix)
+        except Exception as e:
+            self._error("clear", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "shared": self.shared,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "writes": self.writes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+    def close(self) -> None:
+        return None
+
+    def _error(self, op: str, e: Exception) -> None:
+        self.errors += 1
+        self.last_error = f"{op}: {type(e).__name__}: {e}"
+        if self.errors <= 3 or self.errors % 100 == 0:
+            print(f"⚠️ [CacheBackend] {self.name} {self.last_error}")
+
+    # 子類別實作
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _clear(self, prefix: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """行程內後端（有容量上限的 CacheService，不序列化）"""
+
+    name = "memory"
+    shared = False
+
+    def __init__(self, cache: Optional[CacheService] = None):
+        super().__init__()
+        self._cache = cache or CacheService()
+
+    def _get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        self._cache.set(key, value, ttl=max(1, int(ttl)))
+
+    def _delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def _clear(self, prefix: str) -> None:
+        self._cache.delete_prefix(prefix)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        local = self._cache.get_stats()
+        stats.update({"keys": local["total_keys"], "bytes": local["bytes"]})
+        return stats
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    本機共用 SQLite 後端
+
+    - WAL 模式：讀取不阻擋寫入，同一台主機的多個 worker 共用
+    - 每個執行緒一條連線（API event loop 與執行緒池都會呼叫）
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: Path = CACHE_SQLITE_PATH):
+        super().__init__()
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._writes_since_purge = 0
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, key: str) -> Optional[Any]:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, blob, time.time() + ttl),
+        )
+        self._writes_since_purge += 1
+        if self._writes_since_purge >= SQLITE_PURGE_EVERY:
+            self._writes_since_purge = 0
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def _delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def _clear(self, prefix: str) -> None:
+        if prefix:
+            self._conn().execute("DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+        else:
+            self._conn().execute("DELETE FROM cache")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        try:
+            keys, size = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM cache WHERE expires_at > ?",
+                (time.time(),),
+            ).fetchone()
+            stats.update({"path": str(self.path), "keys": keys, "bytes": size})
+        except Exception as e:
+            self._error("stats", e)
+        return stats
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RedisProtocolError(Exception):
+    """Redis 回傳錯誤（-ERR ...）"""
+
+
+class RedisBackend(CacheBackend):
+    """
+    Redis 協定後端（RESP2，不依賴 redis 套件）
+
+    只使用 GET / SET PX / DEL / SCAN，相容 Redis、Valkey、KeyDB 等
+    每個執行緒一條連線；連線錯誤時關閉，下次呼叫重新連線
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = CACHE_REDIS_URL, key_prefix: str = "stockbuddy:", timeout: float = 1.0):
+        super().__init__()
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = parts.password
+        self.db = int(parts.path.strip("/") or 0)
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # ---------- RESP ----------
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            if self.password:
+                self._command("AUTH", self.password)
+            if self.db:
+                self._command("SELECT", str(self.db))
+        return conn
+
+    def _command(self, *args) -> Any:
+        sock, reader = self._connection()
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            sock.sendall(b"".join(parts))
+            return self._read(reader)
+        except RedisProtocolError:
+            raise
+        except Exception:
+            self.close()
+            raise
+
+    def _read(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis 連線已關閉")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisProtocolError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read(reader) for _ in range(length)]
+        raise RedisProtocolError(f"無法解析的回應: {line!r}")
+
+    def _scan(self, pattern: str) -> List[bytes]:
+        keys, cursor = [], "0"
+        while True:
+            cursor, batch = self._command("SCAN", cursor, "MATCH", pattern, "COUNT", "500")
+            keys.extend(batch)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if cursor == "0":
+                return keys
+
+    @staticmethod
+    def _escape_pattern(text: str) -> str:
+        for ch in "\\*?[]":
+            text = text.replace(ch, "\\" + ch)
+        return text
+
+    # ---------- 後端介面 ----------
+
+    def _get(self, key: str) -> Optional[Any]:
+        blob = self._command("GET", self.key_prefix + key)
+        return pickle.loads(blob) if blob is not None else None
+
+    def _set(self, key: str, value: Any, ttl: float) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self._command("SET", self.key_prefix + key, blob, "PX", str(max(1, int(ttl * 1000))))
+
+    def _delete(self, key: str) -> None:
+        self._command("DEL", self.key_prefix + key)
+
+    def _clear(self, prefix: str) -> None:
+        keys = self._scan(self._escape_pattern(self.key_prefix + prefix) + "*")
+        for i in range(0, len(keys), 500):
+            self._command("DEL", *keys[i:i + 500])
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats["url"] = f"redis://{self.host}:{self.port}/{self.db}"
+        return stats
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            sock, reader = conn
+            try:
+                reader.close()
+                sock.close()
+            except OSError:
+                pass
+            self._local.conn = None
+
+
+def create_backend(kind: str = CACHE_BACKEND) -> CacheBackend:
+    """依名稱建立後端，未知名稱或初始化失敗時退回行程內後端"""
+    try:
+        if kind == "sqlite":
+            return SQLiteBackend()
+        if kind == "redis":
+            return RedisBackend()
+    except Exception as e:
+        print(f"⚠️ [CacheBackend] {kind} 初始化失敗，改用行程內快取: {e}")
+        return MemoryBackend()
+    if kind != "memory":
+        print(f"⚠️ [CacheBackend] 未知的 CACHE_BACKEND={kind}，改用行程內快取")
+    return MemoryBackend()
+
+
+_backend: Optional[CacheBackend] = None
+
+
+def get_cache_backend() -> CacheBackend:
+    """取得全域快取後端"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend()
+        print(f"📦 [CacheBackend] 使用 {_backend.name} 快取後端")
+    return _backend
+
+
+def set_cache_backend(backend: CacheBackend) -> None:
+    """替換全域快取後端（測試或啟動時設定）"""
+    global _backend
+    _backend = backend
+
+
+class SharedCache:
+    """
+    命名空間快取（經由全域後端）
+
+    值與寫入時間一起儲存，讀取時可用 max_age 依呼叫端的 TTL（例如 SmartTTL）判斷新鮮度
+    """
+
+    def __init__(self, namespace: str, retention: float = 3600, backend: Optional[CacheBackend] = None):
+        """
+        Args:
+            namespace: 鍵前綴
+            retention: 後端保留秒數（應不小於呼叫端最長的 max_age）
+            backend: 指定後端（預設為全域後端）
+        """
+        self.namespace = namespace
+        self.retention = retention
+        self._backend = backend
+        self._local: TTLCache = TTLCache(maxsize=LOCAL_MAXSIZE, ttl=LOCAL_TTL)
+
+    @property
+    def backend(self) -> CacheBackend:
+        return self._backend or get_cache_backend()
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get_entry(self, key: str) -> Optional[Tuple[float, Any]]:
+        """取得 (寫入時間, 值)"""
+        full_key = self._key(key)
+        backend = self.backend
+        if backend.shared:
+            entry = self._local.get(full_key)
+            if entry is not None:
+                return entry
+        entry = backend.get(full_key)
+        if entry is not None and backend.shared:
+            self._local[full_key] = entry
+        return entry
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[Any]:
+        """取得值；指定 max_age 時，超過秒數的值視為不存在"""
+        entry = self.get_entry(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if max_age is not None and time.time() - stored_at >= max_age:
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        entry = (time.time(), value)
+        full_key = self._key(key)
+        backend = self.backend
+        backend.set(full_key, entry, ttl or self.retention)
+        if backend.shared:
+            self._local[full_key] = entry
+
+    def delete(self, key: str) -> None:
+        full_key = self._key(key)
+        self._local.pop(full_key, None)
+        self.backend.delete(full_key)
+
+    def clear(self) -> None:
+        self._local.clear()
+        self.backend.clear(self.namespace + ":")
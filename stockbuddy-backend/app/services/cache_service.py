@@ -3,13 +3,24 @@
 - 智能快取：根據盤中/盤後自動調整 TTL
 - 減少 API 請求次數
 - 加快回應速度
+- 單一載入（single-flight）：同一個鍵同時只有一個載入在執行，其餘呼叫者等待結果
+- 過期仍回傳舊值（stale-while-revalidate）：寬限時間內立即回傳舊值，背景更新一次
+- 容量上限：項目數 / 估計記憶體上限（CACHE_MAX_ENTRIES、CACHE_MAX_MB），LRU 淘汰
+- 過期清除：依到期時間的 heap 主動清除，每個命名空間各自統計
 
 台股交易時間：週一至週五 09:00-13:30
 """
 
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Optional, Dict, Tuple
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple
+import asyncio
+import functools
+import heapq
 import json
+import os
+import sys
+import time
 
 
 def is_trading_hours() -> bool:
@@ -90,6 +101,9 @@ class SmartTTL:
         "market_index": 3600,     # 大盤指數：1 小時
     }
 
+    # 過期後仍可回傳舊值（同時背景更新）的寬限時間 = TTL × 比例
+    STALE_GRACE_RATIO = 1.0
+
     @classmethod
     def get_ttl(cls, data_type: str) -> int:
         """
@@ -106,6 +120,15 @@ class SmartTTL:
         else:
             return cls.AFTER_HOURS.get(data_type, 3600)
 
+    @classmethod
+    def get_grace(cls, data_type: str) -> int:
+        """
+        取得舊值寬限時間（秒）
+
+        盤中 TTL 短、寬限也短；盤後 TTL 長、寬限也長
+        """
+        return int(cls.get_ttl(data_type) * cls.STALE_GRACE_RATIO)
+
     @classmethod
     def get_ttl_info(cls, data_type: str) -> Dict:
         """取得 TTL 詳細資訊"""
@@ -116,33 +139,200 @@ class SmartTTL:
             "data_type": data_type,
             "ttl_seconds": ttl,
             "ttl_display": f"{ttl // 60} 分鐘" if ttl < 3600 else f"{ttl // 3600} 小時",
+            "stale_grace_seconds": cls.get_grace(data_type),
             "is_trading_hours": trading,
             "market_status": "盤中" if trading else "盤後",
         }
 
 
-class CacheService:
-    """通用快取服務"""
+# 快取容量（512 MB 主機上保持記憶體穩定）
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "20000"))
+CACHE_MAX_BYTES = int(float(os.getenv("CACHE_MAX_MB", "128")) * 1024 * 1024)
+
+# 背景清除過期項目的間隔（秒）
+SWEEP_INTERVAL = 60
+
+# 估計大小時，超過此數量的容器以抽樣推估
+_SIZE_SAMPLE = 100
+_SIZE_MAX_DEPTH = 6
+
+
+def estimate_size(value: Any, _depth: int = 0) -> int:
+    """
+    估計物件佔用的記憶體（位元組，近似值）
+
+    - dict / list / tuple / set 遞迴累加，大型容器以前 100 個元素推估
+    - numpy / pandas 的 __sizeof__ 已包含資料本身
+    """
+    size = sys.getsizeof(value)
+    if _depth >= _SIZE_MAX_DEPTH or isinstance(value, (str, bytes, int, float, bool)) or value is None:
+        return size
+
+    if isinstance(value, dict):
+        items = value.items()
+        n = len(value)
+        total = 0
+        for i, (k, v) in enumerate(items):
+            if i >= _SIZE_SAMPLE:
+                total = total * n // _SIZE_SAMPLE
+                break
+            total += estimate_size(k, _depth + 1) + estimate_size(v, _depth + 1)
+        return size + total
+
+    if isinstance(value, (list, tuple, set, frozenset)):
+        n = len(value)
+        total = 0
+        for i, v in enumerate(value):
+            if i >= _SIZE_SAMPLE:
+                total = total * n // _SIZE_SAMPLE
+                break
+            total += estimate_size(v, _depth + 1)
+        return size + total
+
+    return size
+
+
+def namespace_of(key: str) -> str:
+    """快取鍵的命名空間（第一段非空前綴，如 history:2330:6 → history）"""
+    for part in key.split(":"):
+        if part:
+            return part
+    return key
+
+
+class _Entry:
+    """單一快取項目"""
+
+    __slots__ = ("value", "created", "ttl", "data_type", "grace", "size", "namespace")
+
+    def __init__(self, value, created, ttl, data_type, grace, size, namespace):
+        self.value = value
+        self.created = created
+        self.ttl = ttl
+        self.data_type = data_type
+        self.grace = grace
+        self.size = size
+        self.namespace = namespace
+
+    def current_ttl(self) -> int:
+        # 如果有資料類型，重新計算智能 TTL（因為可能從盤中變盤後）
+        if self.data_type:
+            return SmartTTL.get_ttl(self.data_type)
+        return self.ttl
+
+    def current_grace(self) -> int:
+        if self.grace is not None:
+            return self.grace
+        if self.data_type:
+            return SmartTTL.get_grace(self.data_type)
+        return 0
+
+    def expires_at(self) -> float:
+        return self.created + self.current_ttl()
+
+    def dead_at(self) -> float:
+        """超過此時間連舊值都不回傳，可清除"""
+        return self.expires_at() + self.current_grace()
+
+
+class NamespaceStats:
+    """單一命名空間的統計"""
+
+    __slots__ = ("hits", "stale_hits", "misses", "evictions", "expirations", "entries", "bytes")
 
     def __init__(self):
-        self._cache: Dict[str, Any] = {}
-        self._timestamps: Dict[str, datetime] = {}
-        self._ttl: Dict[str, int] = {}  # 秒
-        self._data_types: Dict[str, str] = {}  # 記錄資料類型供智能 TTL 使用
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.entries = 0
+        self.bytes = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": self.entries,
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
 
-    def get(self, key: str) -> Optional[Any]:
-        """取得快取值"""
-        if key not in self._cache:
-            return None
 
-        # 檢查是否過期（支援智能 TTL）
-        if self._is_expired(key):
-            self.delete(key)
-            return None
+class CacheService:
+    """
+    通用快取服務
+
+    - 容量上限：項目數與估計位元組數，超過時淘汰最久未使用（LRU）的項目
+    - 過期清除：依到期時間排序的 heap，寫入時與背景定期清除，不必等到再次讀取
+    - 統計：每個命名空間（鍵的第一段前綴）的命中 / 未命中 / 淘汰 / 記憶體
+    - 共用後端（可選）：寫入同時寫到 cache_backend，本地沒有或已過期時先查共用後端，
+      多個 worker 共用同一份結果
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None, backend=None, backend_prefix: str = "stock:"):
+        self.max_entries = CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._backend = backend
+        self._backend_prefix = backend_prefix
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()  # 由舊到新（LRU 順序）
+        self._bytes = 0
+
+        # 到期 heap：(清除時間, 序號, 鍵, 項目)；項目被取代後留下的舊紀錄於彈出時略過
+        self._expiry_heap: List[Tuple[float, int, str, _Entry]] = []
+        self._heap_seq = 0
+
+        # 進行中的載入（每個鍵一個 task）
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # 統計
+        self._namespaces: Dict[str, NamespaceStats] = {}
+        self._loads = 0
+        self._coalesced = 0
+        self._load_errors = 0
+        self._rejected = 0
+        self._sweeps = 0
 
-        return self._cache[key]
+    def __len__(self) -> int:
+        return len(self._entries)
 
-    def set(self, key: str, value: Any, ttl: int = 300, data_type: str = None) -> None:
+    # ============================================================
+    # 讀寫
+    # ============================================================
+
+    def get(self, key: str) -> Optional[Any]:
+        """取得快取值（只回傳未過期的值）"""
+        entry, state = self._lookup(key)
+        ns = self._ns(namespace_of(key))
+        if state == "fresh":
+            ns.hits += 1
+            return entry.value
+        ns.misses += 1
+        return None
+
+    def peek(self, key: str) -> Tuple[Optional[Any], str]:
+        """
+        取得快取值與狀態
+
+        Returns:
+            (值, 狀態)，狀態為 fresh（未過期）/ stale（過期但在寬限內）/ miss
+        """
+        entry, state = self._lookup(key)
+        ns = self._ns(namespace_of(key))
+        if state == "fresh":
+            ns.hits += 1
+        elif state == "stale":
+            ns.stale_hits += 1
+        else:
+            ns.misses += 1
+        return (entry.value if entry is not None else None), state
+
+    def set(self, key: str, value: Any, ttl: int = 300, data_type: str = None, grace: int = None) -> None:
         """設定快取值
 
         Args:
@@ -150,16 +340,46 @@ class CacheService:
             value: 快取值
             ttl: 存活時間（秒），預設 5 分鐘
             data_type: 資料類型（用於智能 TTL）
+            grace: 過期後仍可回傳舊值的秒數；None 時智能 TTL 依 SmartTTL.get_grace，其餘為 0
         """
-        self._cache[key] = value
-        self._timestamps[key] = datetime.now()
+        now = time.time()
+        if grace is None and not data_type:
+            grace = 0
+
+        entry = self._store(key, value, now, ttl, data_type or None, grace)
+        if self._backend is not None and entry is not None:
+            self._backend.set(
+                self._backend_prefix + key,
+                (now, ttl, data_type or None, grace, value),
+                max(1.0, entry.dead_at() - now),
+            )
+
+    def _store(
+        self, key: str, value: Any, created: float, ttl: int, data_type: Optional[str], grace: Optional[int]
+    ) -> Optional[_Entry]:
+        """寫入本地項目（不寫共用後端）"""
+        namespace = namespace_of(key)
+        size = estimate_size(value) + sys.getsizeof(key)
+        self._remove(key)
+
+        if size > self.max_bytes:
+            # 單一項目超過總容量，不快取
+            self._rejected += 1
+            return None
 
-        # 如果指定了資料類型，使用智能 TTL
-        if data_type:
-            self._data_types[key] = data_type
-            self._ttl[key] = SmartTTL.get_ttl(data_type)
-        else:
-            self._ttl[key] = ttl
+        now = time.time()
+        entry = _Entry(value, created, ttl, data_type, grace, size, namespace)
+        self._entries[key] = entry
+        self._bytes += size
+        ns = self._ns(namespace)
+        ns.entries += 1
+        ns.bytes += size
+
+        self._push_expiry(key, entry)
+        self._evict()
+        if self._expiry_heap and self._expiry_heap[0][0] <= now:
+            self.sweep(now)
+        return entry
 
     def set_smart(self, key: str, value: Any, data_type: str) -> None:
         """使用智能 TTL 設定快取
@@ -173,39 +393,215 @@ class CacheService:
 
     def delete(self, key: str) -> None:
         """刪除快取"""
-        self._cache.pop(key, None)
-        self._timestamps.pop(key, None)
-        self._ttl.pop(key, None)
-        self._data_types.pop(key, None)
+        self._remove(key)
+        if self._backend is not None:
+            self._backend.delete(self._backend_prefix + key)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """刪除指定前綴的所有鍵，回傳本地刪除數量"""
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            self._remove(key)
+        if self._backend is not None:
+            self._backend.clear(self._backend_prefix + prefix)
+        return len(keys)
 
     def clear(self) -> None:
         """清除所有快取"""
-        self._cache.clear()
-        self._timestamps.clear()
-        self._ttl.clear()
-        self._data_types.clear()
+        self._entries.clear()
+        self._expiry_heap.clear()
+        self._bytes = 0
+        for ns in self._namespaces.values():
+            ns.entries = 0
+            ns.bytes = 0
+        if self._backend is not None:
+            self._backend.clear(self._backend_prefix)
+
+    # ============================================================
+    # 淘汰與過期清除
+    # ============================================================
+
+    def sweep(self, now: float = None) -> int:
+        """清除所有已超過寬限時間的項目，回傳清除數量"""
+        now = time.time() if now is None else now
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] <= now:
+            _, _, key, entry = heapq.heappop(heap)
+            if self._entries.get(key) is not entry:
+                continue  # 已被取代或刪除
+            if entry.dead_at() > now:
+                # 智能 TTL 由盤中轉盤後而變長，依新的時間重新排入
+                self._push_expiry(key, entry)
+                continue
+            self._remove(key, reason="expired")
+            removed += 1
+
+        # 舊紀錄過多時重建 heap
+        if len(heap) > 2 * len(self._entries) + 1024:
+            self._expiry_heap = []
+            for key, entry in self._entries.items():
+                self._push_expiry(key, entry)
+
+        self._sweeps += 1
+        return removed
+
+    def _push_expiry(self, key: str, entry: _Entry) -> None:
+        self._heap_seq += 1
+        heapq.heappush(self._expiry_heap, (entry.dead_at(), self._heap_seq, key, entry))
+
+    def _evict(self) -> None:
+        """超過項目數或位元組上限時，淘汰最久未使用的項目"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key, reason="evicted")
+
+    def _remove(self, key: str, reason: str = None) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        ns = self._ns(entry.namespace)
+        ns.entries -= 1
+        ns.bytes -= entry.size
+        if reason == "evicted":
+            ns.evictions += 1
+        elif reason == "expired":
+            ns.expirations += 1
+
+    def _lookup(self, key: str) -> Tuple[Optional[_Entry], str]:
+        entry = self._entries.get(key)
+        now = time.time()
+
+        if self._backend is not None and (entry is None or now > entry.expires_at()):
+            # 本地沒有或已過期：其他 worker 可能已寫入較新的值
+            shared = self._load_shared(key, entry)
+            if shared is not None:
+                entry = shared
+
+        if entry is None:
+            return None, "miss"
+
+        if now <= entry.expires_at():
+            self._entries.move_to_end(key)
+            return entry, "fresh"
+        if now <= entry.dead_at():
+            self._entries.move_to_end(key)
+            return entry, "stale"
+
+        self._remove(key, reason="expired")
+        return None, "miss"
+
+    def _load_shared(self, key: str, local: Optional[_Entry] = None) -> Optional[_Entry]:
+        """從共用後端讀取，比本地項目新時才寫入本地"""
+        raw = self._backend.get(self._backend_prefix + key)
+        if raw is None:
+            return None
+        try:
+            created, ttl, data_type, grace, value = raw
+        except (TypeError, ValueError):
+            return None
+        if local is not None and created <= local.created:
+            return None
+        return self._store(key, value, created, ttl, data_type, grace)
+
+    def _ns(self, namespace: str) -> NamespaceStats:
+        stats = self._namespaces.get(namespace)
+        if stats is None:
+            stats = self._namespaces[namespace] = NamespaceStats()
+        return stats
+
+    # ============================================================
+    # Single-flight 載入
+    # ============================================================
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int = 300,
+        data_type: str = None,
+        grace: int = None,
+    ) -> Any:
+        """
+        取得快取值，沒有時載入並寫入快取
 
-    def _is_expired(self, key: str) -> bool:
-        """檢查是否過期"""
-        if key not in self._timestamps:
-            return True
+        - 未過期：直接回傳
+        - 過期但在寬限內：立即回傳舊值，背景更新（同一個鍵只更新一次）
+        - 沒有值：同一個鍵同時只執行一次 loader，其餘呼叫者等待同一個結果
 
-        # 如果有資料類型，重新計算智能 TTL（因為可能從盤中變盤後）
-        if key in self._data_types:
-            current_ttl = SmartTTL.get_ttl(self._data_types[key])
-        else:
-            current_ttl = self._ttl.get(key, 300)
+        loader 回傳 None 時不寫入快取
 
-        elapsed = (datetime.now() - self._timestamps[key]).total_seconds()
-        return elapsed > current_ttl
+        Args:
+            key: 快取鍵
+            loader: 無參數的 async 函數
+            ttl / data_type / grace: 同 set()
+        """
+        value, state = self.peek(key)
+        if state == "fresh":
+            return value
+
+        if state == "stale":
+            self._start_load(key, loader, ttl, data_type, grace)
+            return value
+
+        # shield：呼叫者被取消（例如連線中斷）時不影響其他等待者
+        return await asyncio.shield(self._start_load(key, loader, ttl, data_type, grace))
+
+    def _start_load(self, key, loader, ttl, data_type, grace) -> asyncio.Task:
+        """啟動載入 task，已有進行中的載入時直接共用"""
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(key)
+        if task is not None and not task.done() and task.get_loop() is loop:
+            self._coalesced += 1
+            return task
+
+        async def run():
+            self._loads += 1
+            result = await loader()
+            if result is not None:
+                self.set(key, result, ttl=ttl, data_type=data_type, grace=grace)
+            return result
+
+        task = loop.create_task(run())
+        self._inflight[key] = task
+
+        def done(t: asyncio.Task):
+            if self._inflight.get(key) is t:
+                del self._inflight[key]
+            if not t.cancelled() and t.exception() is not None:
+                self._load_errors += 1
+                print(f"⚠️ [Cache] 載入 {key} 失敗: {t.exception()}")
+
+        task.add_done_callback(done)
+        return task
 
     def get_stats(self) -> Dict:
-        """取得快取統計"""
-        valid_count = sum(1 for k in self._cache if not self._is_expired(k))
+        """取得快取統計（依命名空間）"""
+        namespaces = {name: ns.to_dict() for name, ns in sorted(self._namespaces.items())}
+        hits = sum(ns.hits for ns in self._namespaces.values())
+        stale_hits = sum(ns.stale_hits for ns in self._namespaces.values())
+        misses = sum(ns.misses for ns in self._namespaces.values())
+        lookups = hits + stale_hits + misses
         return {
-            "total_keys": len(self._cache),
-            "valid_keys": valid_count,
-            "expired_keys": len(self._cache) - valid_count,
+            "total_keys": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "stale_hits": stale_hits,
+            "misses": misses,
+            "hit_rate": round((hits + stale_hits) / lookups, 3) if lookups else None,
+            "evictions": sum(ns.evictions for ns in self._namespaces.values()),
+            "expirations": sum(ns.expirations for ns in self._namespaces.values()),
+            "rejected": self._rejected,
+            "loads": self._loads,
+            "coalesced": self._coalesced,
+            "load_errors": self._load_errors,
+            "inflight": len(self._inflight),
+            "pending_expiry": len(self._expiry_heap),
+            "backend": self._backend.get_stats() if self._backend is not None else None,
+            "namespaces": namespaces,
             "is_trading_hours": is_trading_hours(),
             "market_status": "盤中" if is_trading_hours() else "盤後",
         }
@@ -220,9 +616,11 @@ class StockCache:
 
     @classmethod
     def get_instance(cls) -> CacheService:
-        """取得快取實例（單例）"""
+        """取得快取實例（單例；CACHE_BACKEND 為共用後端時多個 worker 共用）"""
         if cls._cache is None:
-            cls._cache = CacheService()
+            from app.services.cache_backend import get_cache_backend
+            backend = get_cache_backend()
+            cls._cache = CacheService(backend=backend if backend.shared else None)
         return cls._cache
 
     @classmethod
@@ -306,43 +704,48 @@ class StockCache:
         return cls.get_instance().get_stats()
 
 
+async def run_cache_sweeper(interval: int = SWEEP_INTERVAL) -> None:
+    """背景定期清除過期快取（應用程式啟動時建立 task）"""
+    cache = StockCache.get_instance()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            cache.sweep()
+        except Exception as e:
+            print(f"⚠️ [Cache] 清除過期快取失敗: {e}")
+
+
 # 快取裝飾器（支援智能 TTL）
-def cached(ttl: int = 300, key_prefix: str = "", data_type: str = None):
+def cached(ttl: int = 300, key_prefix: str = "", data_type: str = None, grace: int = None):
     """快取裝飾器
 
+    同一個鍵同時只執行一次函數；過期但在寬限內時立即回傳舊值並背景更新
+
     Args:
         ttl: 存活時間（秒），若指定 data_type 則忽略
         key_prefix: 快取鍵前綴
         data_type: 資料類型（用於智能 TTL）
+        grace: 舊值寬限秒數（預設：智能 TTL 依 SmartTTL.get_grace，固定 TTL 不回傳舊值）
     """
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # 生成快取鍵
             cache_key = f"{key_prefix}:{func.__name__}:{str(args)}:{str(kwargs)}"
 
-            # 嘗試從快取取得
             cache = StockCache.get_instance()
-            cached_value = cache.get(cache_key)
-
-            if cached_value is not None:
-                return cached_value
-
-            # 執行函數
-            result = await func(*args, **kwargs)
-
-            # 存入快取
-            if result is not None:
-                if data_type:
-                    cache.set_smart(cache_key, result, data_type)
-                else:
-                    cache.set(cache_key, result, ttl)
-
-            return result
+            return await cache.get_or_load(
+                cache_key,
+                lambda: func(*args, **kwargs),
+                ttl=ttl,
+                data_type=data_type,
+                grace=grace,
+            )
         return wrapper
     return decorator
 
 
-def smart_cached(data_type: str, key_prefix: str = ""):
+def smart_cached(data_type: str, key_prefix: str = "", grace: int = None):
     """智能快取裝飾器
 
     自動根據盤中/盤後調整 TTL
@@ -350,5 +753,6 @@ def smart_cached(data_type: str, key_prefix: str = ""):
     Args:
         data_type: 資料類型
         key_prefix: 快取鍵前綴
+        grace: 舊值寬限秒數（預設依 SmartTTL.get_grace）
     """
-    return cached(data_type=data_type, key_prefix=key_prefix)
+    return cached(data_type=data_type, key_prefix=key_prefix, grace=grace)
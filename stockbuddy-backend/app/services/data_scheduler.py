@@ -5,6 +5,9 @@
 功能：
 - 盤中自動更新（每分鐘更新熱門股票）
 - 盤後批次更新（每日收盤後批次更新所有追蹤股票）
+- 盤後技術指標快照（每日收盤後對全市場計算一次，供篩選 / 推薦 / 比較查表）
+- 價格警示（以盤中即時報價驅動 alert_registry，只比對被穿越的警示）
+- 預先計算（盤中每個 TTL 週期、盤後資料齊全後，於背景重建 /recommend 等快照並原子發布）
 - 手動觸發更新（API 端點）
 """
 
@@ -89,6 +92,7 @@ class DataScheduler:
                 if is_trading_hours():
                     await self._update_during_trading()
                 else:
+                    await self._run_after_close_jobs()
                     # 盤後每 30 分鐘檢查一次
                     await asyncio.sleep(1800)
 
@@ -117,12 +121,113 @@ class DataScheduler:
             # 避免請求過於頻繁
             await asyncio.sleep(2)
 
+        quotes = await self._update_streaming_analysis()
+        await self._check_price_alerts(quotes)
+        self._run_precompute()
+
         self._update_count += 1
         logger.info(f"✅ 盤中更新完成 (第 {self._update_count} 次)")
 
         # 等待下一次更新
         await asyncio.sleep(self._update_interval)
 
+    async def _run_after_close_jobs(self):
+        """盤後批次：收盤資料齊全後，每日重建一次全市場技術指標快照，再重建預先計算快照"""
+        from .technical_snapshot import run_snapshot_job, snapshot_due
+
+        if snapshot_due():
+            logger.info("🌙 盤後技術指標快照開始")
+            snapshot = await run_snapshot_job()
+            self._last_update["technical_snapshot"] = datetime.now()
+            logger.info(f"✅ 盤後技術指標快照完成 ({len(snapshot)} 檔, {snapshot.as_of})")
+
+        # 推薦等預先計算使用最新的技術指標快照，放在快照之後
+        self._run_precompute()
+
+    def _run_precompute(self):
+        """啟動到期的預先計算工作（背景執行，不阻塞排程迴圈）"""
+        from .precompute import get_precompute
+
+        precompute = get_precompute()
+        for name in precompute.jobs():
+            if precompute.due(name) and precompute.run_in_background(name):
+                self._last_update[f"precompute:{name}"] = datetime.now()
+                logger.info(f"🧮 預先計算 {name} 已於背景啟動")
+
+    async def _update_streaming_analysis(self):
+        """
+        以即時報價增量更新技術指標，並寫入 analysis: 快取
+
+        每檔股票保留增量指標狀態，每分鐘只需以最新報價更新，不必重算整段歷史；
+        換日時以已定案的 K 線重新初始化，不再追蹤的股票移除狀態
+
+        Returns:
+            本次取得的即時報價 {stock_id: quote}（供價格警示共用）
+        """
+        from .twse_openapi import TWSEOpenAPI
+        from .streaming_indicators import ensure_stream, quote_to_bar, retain_streams
+
+        today = datetime.now().strftime("%Y-%m-%d")
+        retain_streams(self._tracked_stocks)
+        batch_size = 10  # 即時報價快取 key 以前 10 檔為準
+        updated = 0
+        all_quotes: Dict[str, Dict] = {}
+
+        for i in range(0, len(self._tracked_stocks), batch_size):
+            batch = self._tracked_stocks[i:i + batch_size]
+            try:
+                quotes = await TWSEOpenAPI.get_realtime_quotes(batch)
+            except Exception as e:
+                logger.warning(f"即時報價取得失敗: {e}")
+                continue
+
+            all_quotes.update(quotes)
+            for stock_id, quote in quotes.items():
+                bar = quote_to_bar(quote, today)
+                if bar is None:
+                    continue
+                try:
+                    stream = await ensure_stream(stock_id, session_date=today)
+                    if stream is None:
+                        continue
+                    StockCache.set_analysis(stock_id, stream.update(bar))
+                    self._last_update[f"analysis:{stock_id}"] = datetime.now()
+                    updated += 1
+                except Exception as e:
+                    logger.warning(f"增量指標更新 {stock_id} 失敗: {e}")
+
+        if updated:
+            logger.info(f"📈 增量技術指標已更新 {updated} 檔")
+        return all_quotes
+
+    async def _check_price_alerts(self, quotes: Optional[Dict[str, Dict]] = None):
+        """
+        以即時報價驅動價格警示登錄表
+
+        追蹤股票的報價直接沿用，其餘有警示的股票再批次查詢
+        """
+        from .alert_registry import get_alert_registry
+        from .twse_openapi import TWSEOpenAPI
+
+        registry = get_alert_registry()
+        symbols = registry.symbols()
+        if not symbols:
+            return
+
+        quotes = {s: quotes[s] for s in symbols if quotes and s in quotes}
+        missing = [s for s in symbols if s not in quotes]
+        batch_size = 10
+        for i in range(0, len(missing), batch_size):
+            try:
+                quotes.update(await TWSEOpenAPI.get_realtime_quotes(missing[i:i + batch_size]))
+            except Exception as e:
+                logger.warning(f"警示報價取得失敗: {e}")
+
+        triggered = await registry.dispatch(quotes)
+        if triggered:
+            self._last_update["price_alerts"] = datetime.now()
+            logger.info(f"🔔 價格警示觸發 {len(triggered)} 個")
+
     async def _safe_update(self, data_type: str, stock_id: str):
         """安全執行更新（捕捉異常）"""
         try:
@@ -164,6 +269,11 @@ class DataScheduler:
 
     def get_status(self) -> Dict:
         """取得排程器狀態"""
+        from .alert_registry import get_alert_registry
+        from .http_client import get_http_client
+        from .precompute import get_precompute
+        from .technical_snapshot import get_snapshot_stats
+
         return {
             "running": self._running,
             "is_trading_hours": is_trading_hours(),
@@ -175,6 +285,10 @@ class DataScheduler:
             "last_updates": {
                 k: v.isoformat() for k, v in list(self._last_update.items())[-10:]
             },
+            "technical_snapshot": get_snapshot_stats(),
+            "price_alerts": get_alert_registry().get_stats(),
+            "upstream": get_http_client().get_stats(),
+            "precompute": get_precompute().get_stats(),
         }
 
 
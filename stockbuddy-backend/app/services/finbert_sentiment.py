@@ -7,14 +7,30 @@ FinBERT 情緒分析模組 V10.41
 
 依賴:
     pip install transformers>=4.36.0 torch>=2.1.0 sentencepiece>=0.1.99
+
+效能:
+    - analyze_batch 以 padding 一次 tokenize 整批，每批只做一次 forward
+    - 結果以「模型 + 文字內容」雜湊快取，重複的新聞標題不會重新推論
+    - CPU 主機可設定 FINBERT_QUANTIZE=1 使用動態量化 (int8 Linear) 模型
 """
 
+import hashlib
 import logging
+import os
+import threading
+import time
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 
+from cachetools import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# 結果快取筆數上限
+FINBERT_CACHE_SIZE = int(os.getenv("FINBERT_CACHE_SIZE", "20000"))
+# CPU 推論使用動態量化模型
+FINBERT_QUANTIZE = os.getenv("FINBERT_QUANTIZE", "0").lower() in ("1", "true", "yes")
+
 # 延遲導入
 torch = None
 transformers = None
@@ -80,13 +96,21 @@ class FinBERTSentiment:
         "LABEL_2": "positive",
     }
 
-    def __init__(self, language: str = "zh", device: str = "auto"):
+    def __init__(
+        self,
+        language: str = "zh",
+        device: str = "auto",
+        quantize: Optional[bool] = None,
+        cache_size: int = FINBERT_CACHE_SIZE,
+    ):
         """
         初始化 FinBERT 分析器
 
         Args:
             language: 語言 ("en" 英文, "zh" 中文)
             device: 裝置 ("auto", "cpu", "cuda")
+            quantize: CPU 上使用動態量化模型 (None 時依 FINBERT_QUANTIZE)
+            cache_size: 結果快取筆數上限
         """
         _ensure_dependencies()
 
@@ -99,65 +123,110 @@ class FinBERTSentiment:
         else:
             self.device = device
 
+        # 動態量化只支援 CPU
+        if quantize is None:
+            quantize = FINBERT_QUANTIZE
+        self.quantize = bool(quantize) and self.device == "cpu"
+
         self._model = None
         self._tokenizer = None
         self._loaded = False
+        # 並行請求（asyncio.to_thread）只載入一次模型
+        self._load_lock = threading.Lock()
+
+        # 內容雜湊 → SentimentResult
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
 
     def _load_model(self):
-        """載入模型 (延遲載入)"""
+        """載入模型 (延遲載入，並行呼叫只載入一次)"""
         if self._loaded:
             return
 
-        logger.info(f"[FinBERT] 載入模型: {self.model_name}")
+        with self._load_lock:
+            if self._loaded:
+                return
+
+            logger.info(f"[FinBERT] 載入模型: {self.model_name}")
+
+            try:
+                self._load_weights()
+                logger.info(f"[FinBERT] 模型載入完成 (device: {self.device}, quantized: {self.quantize})")
+
+            except Exception as e:
+                # 嘗試備用模型
+                if self.language == "zh":
+                    logger.warning(f"[FinBERT] 主模型載入失敗，嘗試備用模型")
+                    self.model_name = self.MODELS["zh_backup"]
+                    self._load_weights()
+                else:
+                    raise e
+
+    def _load_weights(self):
+        """載入 tokenizer 與模型權重"""
+        self._tokenizer = transformers.AutoTokenizer.from_pretrained(
+            self.model_name
+        )
+        model = transformers.AutoModelForSequenceClassification.from_pretrained(
+            self.model_name
+        )
+        model.to(self.device)
+        model.eval()
 
-        try:
-            self._tokenizer = transformers.AutoTokenizer.from_pretrained(
-                self.model_name
+        if self.quantize:
+            # Linear 層權重改為 int8，CPU 推論約快 2 倍，準確度差異很小
+            model = torch.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
             )
-            self._model = transformers.AutoModelForSequenceClassification.from_pretrained(
-                self.model_name
-            )
-            self._model.to(self.device)
-            self._model.eval()
 
-            self._loaded = True
-            logger.info(f"[FinBERT] 模型載入完成 (device: {self.device})")
+        self._model = model
+        self._loaded = True
 
-        except Exception as e:
-            # 嘗試備用模型
-            if self.language == "zh":
-                logger.warning(f"[FinBERT] 主模型載入失敗，嘗試備用模型")
-                self.model_name = self.MODELS["zh_backup"]
-                self._tokenizer = transformers.AutoTokenizer.from_pretrained(
-                    self.model_name
-                )
-                self._model = transformers.AutoModelForSequenceClassification.from_pretrained(
-                    self.model_name
-                )
-                self._model.to(self.device)
-                self._model.eval()
-                self._loaded = True
-            else:
-                raise e
+    # ============================================================
+    # 結果快取
+    # ============================================================
 
-    def analyze(self, text: str) -> SentimentResult:
-        """
-        分析單條文本情緒
+    def _cache_key(self, text: str) -> str:
+        """模型 + 正規化文字的雜湊"""
+        normalized = " ".join(text.split())
+        return hashlib.sha1(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
 
-        Args:
-            text: 待分析文本
+    def _cache_get(self, key: str) -> Optional[SentimentResult]:
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is None:
+                self.cache_misses += 1
+            else:
+                self.cache_hits += 1
+            return result
+
+    def _cache_set(self, key: str, result: SentimentResult) -> None:
+        with self._cache_lock:
+            self._cache[key] = result
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        total = self.cache_hits + self.cache_misses
+        return {
+            "entries": len(self._cache),
+            "max_entries": self._cache.maxsize,
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / total * 100, 1) if total else 0,
+            "quantized": self.quantize,
+        }
 
-        Returns:
-            SentimentResult 情緒分析結果
-        """
-        import time
-        start_time = time.time()
+    # ============================================================
+    # 推論
+    # ============================================================
 
-        self._load_model()
+    def _infer(self, texts: List[str]) -> List[SentimentResult]:
+        """整批 tokenize（padding 到批內最長）並只做一次 forward"""
+        start_time = time.time()
 
-        # Tokenize
         inputs = self._tokenizer(
-            text,
+            texts,
             return_tensors="pt",
             truncation=True,
             max_length=512,
@@ -165,15 +234,18 @@ class FinBERTSentiment:
         )
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
-        # 推論
-        with torch.no_grad():
-            outputs = self._model(**inputs)
-            logits = outputs.logits
+        with torch.inference_mode():
+            logits = self._model(**inputs).logits
             probs = torch.nn.functional.softmax(logits, dim=-1)
 
-        # 取得結果
-        probs_np = probs.cpu().numpy()[0]
-        predicted_idx = int(torch.argmax(probs).item())
+        probs_np = probs.cpu().numpy()
+        # 批次耗時平均分攤到每一筆
+        per_item_ms = round((time.time() - start_time) * 1000 / len(texts), 2)
+        return [self._to_result(row, per_item_ms) for row in probs_np]
+
+    def _to_result(self, probs_np, processing_time_ms: float) -> SentimentResult:
+        """單筆機率向量轉為 SentimentResult"""
+        predicted_idx = int(probs_np.argmax())
 
         # 取得標籤
         if hasattr(self._model.config, 'id2label'):
@@ -197,49 +269,101 @@ class FinBERTSentiment:
                 "positive": float(probs_np[2]) if len(probs_np) > 2 else 0,
             }
 
-        processing_time = (time.time() - start_time) * 1000
-
         return SentimentResult(
             label=label,
             score=float(probs_np[predicted_idx]),
             probabilities=probabilities,
             model=self.model_name,
-            processing_time_ms=round(processing_time, 2)
+            processing_time_ms=processing_time_ms
         )
 
+    def analyze(self, text: str) -> SentimentResult:
+        """
+        分析單條文本情緒
+
+        Args:
+            text: 待分析文本
+
+        Returns:
+            SentimentResult 情緒分析結果
+        """
+        self._load_model()
+
+        key = self._cache_key(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        result = self._infer([text])[0]
+        self._cache_set(key, result)
+        return result
+
     def analyze_batch(
         self,
         texts: List[str],
-        batch_size: int = 8
+        batch_size: int = 16
     ) -> List[SentimentResult]:
         """
         批次分析多條文本
 
+        已快取與批內重複的文本只推論一次，其餘每 batch_size 筆一次 forward。
+
         Args:
             texts: 文本列表
             batch_size: 批次大小
 
         Returns:
-            SentimentResult 列表
+            SentimentResult 列表（順序與 texts 相同）
         """
-        results = []
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            for text in batch:
-                try:
-                    result = self.analyze(text)
-                    results.append(result)
-                except Exception as e:
-                    logger.warning(f"[FinBERT] 分析失敗: {e}")
-                    # 返回中性結果
-                    results.append(SentimentResult(
+        if not texts:
+            return []
+
+        self._load_model()
+
+        keys = [self._cache_key(text) for text in texts]
+        resolved: Dict[str, SentimentResult] = {}
+        pending: Dict[str, str] = {}  # key → text（保留第一次出現的順序）
+        for key, text in zip(keys, texts):
+            if key in resolved or key in pending:
+                continue
+            cached = self._cache_get(key)
+            if cached is not None:
+                resolved[key] = cached
+            else:
+                pending[key] = text
+
+        pending_items = list(pending.items())
+        for i in range(0, len(pending_items), batch_size):
+            batch = pending_items[i:i + batch_size]
+            try:
+                batch_results = self._infer([text for _, text in batch])
+            except Exception as e:
+                logger.warning(f"[FinBERT] 批次推論失敗，改為逐筆分析: {e}")
+                batch_results = [self._infer_one_or_none(text) for _, text in batch]
+
+            for (key, _), result in zip(batch, batch_results):
+                if result is None:
+                    # 返回中性結果（不寫入快取，下次重試）
+                    result = SentimentResult(
                         label="neutral",
                         score=0.5,
                         probabilities={"positive": 0.33, "neutral": 0.34, "negative": 0.33},
                         model=self.model_name,
                         processing_time_ms=0
-                    ))
-        return results
+                    )
+                else:
+                    self._cache_set(key, result)
+                resolved[key] = result
+
+        return [resolved[key] for key in keys]
+
+    def _infer_one_or_none(self, text: str) -> Optional[SentimentResult]:
+        """單筆推論，失敗時回傳 None"""
+        try:
+            return self._infer([text])[0]
+        except Exception as e:
+            logger.warning(f"[FinBERT] 分析失敗: {e}")
+            return None
 
     def get_sentiment_score(self, text: str) -> float:
         """
@@ -302,6 +426,14 @@ def analyze_sentiment(text: str, language: str = "zh") -> Dict[str, Any]:
     return asdict(result)
 
 
+def analyze_sentiment_batch(texts: List[str], language: str = "zh") -> List[Dict[str, Any]]:
+    """
+    便捷函數：批次分析情緒（重複文本只推論一次）
+    """
+    analyzer = get_analyzer(language)
+    return [asdict(result) for result in analyzer.analyze_batch(texts)]
+
+
 def get_sentiment_score(text: str, language: str = "zh") -> float:
     """
     便捷函數：取得情緒分數 (0-100)
@@ -12,13 +12,15 @@ V10.37 安全性修復: API Token 改從環境變數讀取
 """
 
 import os
-import httpx
 import asyncio
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any, List
 import math
 
+from app.services.http_client import get_http_client
+from app.services.cache_backend import SharedCache
+
 logger = logging.getLogger(__name__)
 
 
@@ -30,24 +32,19 @@ class FinMindService:
     # V10.37: API Token 從環境變數讀取，不再硬編碼
     API_TOKEN = os.getenv("FINMIND_TOKEN", "")
     
-    # 快取
-    _cache = {}
-    _cache_time = {}
+    # 快取（經由 cache_backend，多個 worker 共用）
     CACHE_DURATION = 600  # 10 分鐘
+    _cache = SharedCache("finmind", retention=CACHE_DURATION)
     
     @classmethod
     def _get_cache(cls, key: str) -> Optional[Any]:
         """取得快取"""
-        if key in cls._cache:
-            if datetime.now().timestamp() - cls._cache_time.get(key, 0) < cls.CACHE_DURATION:
-                return cls._cache[key]
-        return None
+        return cls._cache.get(key, max_age=cls.CACHE_DURATION)
     
     @classmethod
     def _set_cache(cls, key: str, value: Any):
         """設定快取"""
-        cls._cache[key] = value
-        cls._cache_time[key] = datetime.now().timestamp()
+        cls._cache.set(key, value)
     
     @classmethod
     async def _request(cls, dataset: str, params: Dict) -> Optional[List[Dict]]:
@@ -56,7 +53,7 @@ class FinMindService:
             params["token"] = cls.API_TOKEN
             params["dataset"] = dataset
             
-            async with httpx.AsyncClient(timeout=30) as client:
+            async with get_http_client().session(timeout=30) as client:
                 response = await client.get(cls.BASE_URL, params=params)
                 
                 if response.status_code != 200:
@@ -470,7 +467,7 @@ class FinMindService:
                     "end_date": check_date,
                 }
                 
-                async with httpx.AsyncClient(timeout=60) as client:
+                async with get_http_client().session(timeout=60) as client:
                     response = await client.get(cls.BASE_URL, params=params)
                     
                     if response.status_code != 200:
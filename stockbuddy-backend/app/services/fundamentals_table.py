@@ -0,0 +1,285 @@
+"""
+全市場基本面欄位表
+
+以 TWSE / TPEx 全市場 API 一次建立「每檔一列、每個指標一欄」的 NumPy 欄位表：
+- 上市：TWSEOpenAPI.get_all_stocks_summary（每日成交 + 本益比/殖利率/淨值比）
+- 上櫃：TPExOpenAPI.get_otc_stock_summary + get_otc_pe_ratio
+- ROE / 市值：優先使用已快取的個股基本面，否則 ROE 以 PB / PE 推算，
+  市值以收盤價 × 已發行股數（TWSEOpenAPI.get_issued_shares / TPExOpenAPI.get_otc_issued_shares）計算
+- RSI / 均線趨勢 / 技術評分：盤後技術指標快照（technical_snapshot），盤中以快取的即時技術分析覆蓋
+
+任意篩選條件組合都是整欄的布林遮罩運算，不需逐檔查詢。
+
+使用方式：
+    table = await get_fundamentals_table()
+    mask = table.range_mask("pe_ratio", high=15, require=True)
+    rows = table.stock_ids[mask]
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.cache_service import SmartTTL, StockCache
+from app.services.technical_snapshot import get_technical_snapshot, ma_trend_code
+
+# 數值欄位
+COLUMNS = (
+    "price",
+    "change_percent",
+    "volume",           # 張
+    "pe_ratio",
+    "pb_ratio",
+    "dividend_yield",   # %
+    "roe",              # %
+    "market_cap",       # 元
+    "rsi",
+    "ma_trend",         # 1 多頭排列 / -1 空頭排列 / 0 盤整
+    "technical_score",
+)
+
+
+def _value(val: Any) -> float:
+    """None / 非數值轉為 NaN"""
+    try:
+        return float(val) if val is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class FundamentalsTable:
+    """全市場基本面欄位表（每檔一列）"""
+
+    def __init__(
+        self,
+        stock_ids: List[str],
+        names: List[str],
+        markets: List[str],
+        columns: Dict[str, np.ndarray],
+        data_date: Optional[str] = None,
+    ):
+        self.stock_ids = np.array(stock_ids, dtype=object)
+        self.names = names
+        self.markets = markets
+        self.columns = columns
+        self.data_date = data_date
+        self.built_at = datetime.now()
+        self.index = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+
+    def __len__(self) -> int:
+        return len(self.stock_ids)
+
+    @classmethod
+    def from_records(cls, records: Dict[str, Dict[str, Any]], data_date: Optional[str] = None) -> "FundamentalsTable":
+        """由 {stock_id: {欄位: 值}} 建立欄位表（依股票代碼排序）"""
+        stock_ids = sorted(records)
+        columns = {
+            name: np.array([_value(records[s].get(name)) for s in stock_ids], dtype=float)
+            for name in COLUMNS
+        }
+        return cls(
+            stock_ids=stock_ids,
+            names=[records[s].get("name") or s for s in stock_ids],
+            markets=[records[s].get("market", "TWSE") for s in stock_ids],
+            columns=columns,
+            data_date=data_date,
+        )
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def range_mask(
+        self,
+        name: str,
+        low: Optional[float] = None,
+        high: Optional[float] = None,
+        require: bool = False,
+    ) -> np.ndarray:
+        """
+        區間遮罩
+
+        無資料 (NaN) 的列不受上下限限制，require=True 時則一律排除
+        """
+        values = self.columns[name]
+        has = ~np.isnan(values)
+        mask = has.copy() if require else np.ones(len(values), dtype=bool)
+        if low is not None:
+            mask &= ~has | (values >= low)
+        if high is not None:
+            mask &= ~has | (values <= high)
+        return mask
+
+    def pool_mask(self, stock_ids: List[str]) -> np.ndarray:
+        """只保留指定股票"""
+        mask = np.zeros(len(self), dtype=bool)
+        rows = [self.index[s] for s in stock_ids if s in self.index]
+        mask[rows] = True
+        return mask
+
+    def merge_technical(self, snapshot) -> int:
+        """以技術指標快照覆蓋 RSI / 均線趨勢 / 技術評分欄位，回傳更新列數"""
+        pairs = [(i, snapshot.index[s]) for i, s in enumerate(self.stock_ids) if s in snapshot.index]
+        if not pairs:
+            return 0
+        rows, snapshot_rows = np.array(pairs, dtype=int).T
+        for name in ("rsi", "ma_trend", "technical_score"):
+            self.columns[name][rows] = np.round(snapshot.column(name)[snapshot_rows].astype(float), 4)
+        return len(pairs)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """單列轉為 dict（NaN 轉為 None）"""
+        record = {"stock_id": self.stock_ids[i], "name": self.names[i], "market": self.markets[i]}
+        for name, values in self.columns.items():
+            value = values[i]
+            record[name] = None if np.isnan(value) else float(value)
+        return record
+
+
+# ============================================================
+# 建立
+# ============================================================
+
+def _merge_cached(record: Dict[str, Any]) -> None:
+    """補上快取中的個股基本面、盤後技術快照與即時技術分析"""
+    stock_id = record["stock_id"]
+
+    fundamental = StockCache.get_fundamental(stock_id)
+    if fundamental:
+        if fundamental.get("roe") is not None:
+            record["roe"] = fundamental["roe"]
+        record["market_cap"] = fundamental.get("market_cap")
+
+    if record.get("market_cap") is None:
+        # 市值 = 收盤價 × 已發行股數
+        price, shares = record.get("price"), record.get("issued_shares")
+        if price and shares:
+            record["market_cap"] = float(price) * shares
+
+    if record.get("roe") is None:
+        # ROE = EPS / 每股淨值 = PB / PE
+        pe, pb = record.get("pe_ratio"), record.get("pb_ratio")
+        if pe and pb and pe > 0 and pb > 0:
+            record["roe"] = round(pb / pe * 100, 2)
+
+    technical = get_technical_snapshot().get(stock_id)
+    if technical:
+        record["rsi"] = technical["rsi"]
+        record["ma_trend"] = technical["ma_trend"]
+        record["technical_score"] = technical["technical_score"]
+
+    # 盤中的即時技術分析比盤後快照新
+    analysis = StockCache.get_analysis(stock_id)
+    if analysis:
+        record["rsi"] = (analysis.get("rsi") or {}).get("value")
+        record["ma_trend"] = ma_trend_code((analysis.get("trend") or {}).get("trend"))
+        record["technical_score"] = analysis.get("overall_score")
+
+
+async def build_fundamentals_table() -> FundamentalsTable:
+    """以全市場 API 建立欄位表（上市 + 上櫃）"""
+    from app.services.tpex_openapi import TPExOpenAPI
+    from app.services.twse_openapi import TWSEOpenAPI
+
+    twse, otc_summary, otc_pe, twse_shares, otc_shares = await asyncio.gather(
+        TWSEOpenAPI.get_all_stocks_summary(),
+        TPExOpenAPI.get_otc_stock_summary(),
+        TPExOpenAPI.get_otc_pe_ratio(),
+        TWSEOpenAPI.get_issued_shares(),
+        TPExOpenAPI.get_otc_issued_shares(),
+        return_exceptions=True,
+    )
+    twse = twse if isinstance(twse, dict) else {}
+    otc_summary = otc_summary if isinstance(otc_summary, dict) else {}
+    otc_pe = otc_pe if isinstance(otc_pe, dict) else {}
+    twse_shares = twse_shares if isinstance(twse_shares, dict) else {}
+    otc_shares = otc_shares if isinstance(otc_shares, dict) else {}
+
+    records: Dict[str, Dict[str, Any]] = {}
+    data_date = None
+
+    for stock_id, item in twse.items():
+        volume = item.get("volume")
+        records[stock_id] = {
+            "stock_id": stock_id,
+            "name": item.get("name"),
+            "market": "TWSE",
+            "price": item.get("price"),
+            "change_percent": item.get("change_percent"),
+            "volume": volume / 1000 if volume is not None else None,  # 股 → 張
+            "pe_ratio": item.get("pe_ratio"),
+            "pb_ratio": item.get("pb_ratio"),
+            "dividend_yield": item.get("dividend_yield"),
+            "issued_shares": twse_shares.get(stock_id),
+        }
+        data_date = data_date or item.get("date")
+
+    for stock_id, item in otc_summary.items():
+        if stock_id in records:
+            continue
+        pe = otc_pe.get(stock_id, {})
+        records[stock_id] = {
+            "stock_id": stock_id,
+            "name": item.get("name"),
+            "market": "OTC",
+            "price": item.get("price") or None,
+            "change_percent": item.get("change_percent"),
+            "volume": item.get("volume"),
+            "pe_ratio": pe.get("pe_ratio"),
+            "pb_ratio": pe.get("pb_ratio"),
+            "dividend_yield": pe.get("dividend_yield"),
+            "issued_shares": otc_shares.get(stock_id),
+        }
+
+    for record in records.values():
+        _merge_cached(record)
+
+    table = FundamentalsTable.from_records(records, data_date=data_date)
+    print(f"✅ [FundamentalsTable] 全市場欄位表: {len(table)} 檔 (上市 {len(twse)} / 上櫃 {len(otc_summary)})")
+    return table
+
+
+_table: Optional[FundamentalsTable] = None
+_table_lock: Optional[asyncio.Lock] = None
+
+
+async def get_fundamentals_table(force: bool = False) -> FundamentalsTable:
+    """取得欄位表（依本益比資料的智能 TTL 重建，並行請求只建立一次）"""
+    global _table, _table_lock
+
+    def fresh() -> bool:
+        if _table is None or len(_table) == 0:
+            return False
+        age = (datetime.now() - _table.built_at).total_seconds()
+        return age < SmartTTL.get_ttl("per_dividend")
+
+    if not force and fresh():
+        return _table
+
+    if _table_lock is None:
+        _table_lock = asyncio.Lock()
+    async with _table_lock:
+        if force or not fresh():
+            _table = await build_fundamentals_table()
+    return _table
+
+
+def refresh_technical_columns() -> int:
+    """盤後快照重建後，更新現有欄位表的技術指標欄位（不重新呼叫全市場 API）"""
+    if _table is None:
+        return 0
+    return _table.merge_technical(get_technical_snapshot())
+
+
+def get_table_stats() -> Dict[str, Any]:
+    """欄位表狀態"""
+    if _table is None:
+        return {"built": False, "stocks": 0}
+    return {
+        "built": True,
+        "stocks": len(_table),
+        "data_date": _table.data_date,
+        "built_at": _table.built_at.isoformat(),
+        "columns": list(_table.columns),
+    }
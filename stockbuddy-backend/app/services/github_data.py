@@ -4,12 +4,13 @@
 """
 
 import pandas as pd
-import httpx
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
 from cachetools import TTLCache
 import asyncio
 
+from app.services.http_client import get_http_client
+
 # 快取設定
 _cache = TTLCache(maxsize=200, ttl=300)  # 5分鐘快取
 
@@ -440,7 +441,7 @@ class GitHubStockService:
     }
 
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = get_http_client().session(timeout=30.0)
 
     async def close(self):
         await self.client.aclose()
@@ -9,16 +9,51 @@ V10.40: 歷史數據補齊服務
 - 評分: 訓練時使用中性值
 
 目標: 將特徵完整度從 49% 提升到 90%+
+
+訓練時以 build_feature_matrix 一次計算整段歷史的 55 特徵矩陣，
+結果與逐列 enrich_stock_data + prepare_history_for_features + extract_features 相同。
 """
 
 import logging
+from dataclasses import dataclass
 from typing import Dict, Optional, List, Any
 from datetime import datetime, timedelta
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class FeatureMatrix:
+    """整段歷史的特徵矩陣 (每列對應 hist_df 的一列)"""
+    stock_id: str
+    values: np.ndarray         # (n_rows, 55)，欄位順序同 MLFeatureEngine.FEATURE_COLUMNS
+    missing_count: np.ndarray  # (n_rows,)，每列缺失特徵數
+    feature_names: List[str]
+
+
+def _lag(values: np.ndarray, k: int) -> np.ndarray:
+    """out[i] = values[i - k]，前 k 筆為 NaN"""
+    out = np.full(len(values), np.nan)
+    if k < len(values):
+        out[k:] = values[:len(values) - k]
+    return out
+
+
+def _rolling(values: np.ndarray, window: int, func) -> np.ndarray:
+    """逐窗套用 func (np.max / np.min / np.sum)，資料不足的位置為 NaN"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        out[window - 1:] = func(sliding_window_view(values, window), axis=1)
+    return out
+
+
+def _pct(value: np.ndarray, base: np.ndarray, ok: np.ndarray, default: float = 0) -> np.ndarray:
+    """(value - base) / base * 100，ok 為 False 的位置填 default"""
+    return np.where(ok, (value - base) / base * 100, default)
+
+
 class HistoricalDataEnricher:
     """
     歷史數據補齊器
@@ -37,15 +72,14 @@ class HistoricalDataEnricher:
         Returns:
             DataFrame with market index data
         """
-        import yfinance as yf
+        from .ohlcv_store import get_ohlcv_store
 
         cache_key = f"market_{period}"
         if cache_key in self._market_cache:
             return self._market_cache[cache_key]
 
         try:
-            twii = yf.Ticker("^TWII")
-            market_hist = twii.history(period=period)
+            market_hist = get_ohlcv_store().get_frame_sync("^TWII", period)
 
             if not market_hist.empty:
                 # 計算大盤技術指標
@@ -377,6 +411,254 @@ class HistoricalDataEnricher:
 
         return history
 
+    def build_feature_matrix(
+        self,
+        stock_id: str,
+        hist_df,
+        market_hist=None,
+        fundamental: Dict = None,
+    ) -> FeatureMatrix:
+        """
+        一次計算整段歷史的 55 維特徵 (向量化)
+
+        等同對每一列 i 呼叫 enrich_stock_data、prepare_history_for_features(hist_df, i)
+        再以 ml_feature_engine.extract_features 萃取，但全部以欄位運算完成。
+        均線 / RSI / 波動率以與 ModelTrainer 相同的 rolling 公式計算，不需預先加欄位。
+
+        假設 OHLCV 無缺值 (本地 OHLCV 資料庫的格式)。
+        第 9 列 (剛好 10 筆歷史) 逐列版本計算 OBV 時會索引越界而被略過，此處視為資料不足。
+
+        Args:
+            stock_id: 股票代碼
+            hist_df: 完整歷史 DataFrame (Open/High/Low/Close/Volume)
+            market_hist: 大盤數據 (get_market_data 的結果，可選)
+            fundamental: 基本面數據 (get_fundamental_data 的結果，可選)
+
+        Returns:
+            FeatureMatrix
+        """
+        from .ml_feature_engine import MLFeatureEngine
+
+        close_s = hist_df['Close']
+        c = close_s.to_numpy(dtype=float)
+        o = hist_df['Open'].to_numpy(dtype=float)
+        h = hist_df['High'].to_numpy(dtype=float)
+        l = hist_df['Low'].to_numpy(dtype=float)
+        v = hist_df['Volume'].to_numpy(dtype=float)
+        n = len(c)
+        idx = np.arange(n)
+
+        # 與 ModelTrainer.train_from_historical 相同的技術指標
+        ma5 = close_s.rolling(5).mean().to_numpy(dtype=float)
+        ma20 = close_s.rolling(20).mean().to_numpy(dtype=float)
+        ma60 = close_s.rolling(60).mean().to_numpy(dtype=float)
+        volume_ma20 = hist_df['Volume'].rolling(20).mean().to_numpy(dtype=float)
+        delta = close_s.diff()
+        gain = delta.where(delta > 0, 0).rolling(14).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
+        rsi = (100 - (100 / (1 + gain / loss))).to_numpy(dtype=float)
+        volatility = (close_s.rolling(20).std() / close_s.rolling(20).mean() * 100).to_numpy(dtype=float)
+
+        f: Dict[str, Any] = {}
+        missing = np.zeros(n, dtype=int)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # ========== 價格特徵 ==========
+            prev_close = _lag(c, 1)
+            ok = (c != 0) & (prev_close > 0)
+            f["price_change_1d"] = _pct(c, prev_close, ok)
+            missing += ~ok
+
+            close_5 = _lag(c, 4)
+            f["price_change_5d"] = _pct(c, close_5, (idx >= 4) & (close_5 > 0))
+            missing += idx < 4
+
+            close_20 = _lag(c, 19)
+            f["price_change_20d"] = _pct(c, close_20, (idx >= 19) & (close_20 > 0))
+            missing += idx < 19
+
+            for name, ma in (("price_vs_ma5", ma5), ("price_vs_ma20", ma20), ("price_vs_ma60", ma60)):
+                ok = (c != 0) & (ma > 0)
+                f[name] = np.where(ok, (c / ma - 1) * 100, 0)
+                missing += ~ok
+
+            # 逐列版本只在非 NaN 時寫入 stock_data，且以真值判斷 (0 視為缺少)
+            has_ma5, has_ma20, has_ma60 = (
+                ~np.isnan(ma) & (ma != 0) for ma in (ma5, ma20, ma60)
+            )
+
+            ok = has_ma5 & (ma20 > 0)
+            f["ma5_vs_ma20"] = np.where(ok, (ma5 / ma20 - 1) * 100, 0)
+            missing += ~ok
+            ok = has_ma20 & (ma60 > 0)
+            f["ma20_vs_ma60"] = np.where(ok, (ma20 / ma60 - 1) * 100, 0)
+            missing += ~ok
+
+            ma5_prev = _lag(ma5, 4)
+            f["ma5_slope"] = _pct(ma5, ma5_prev, (idx >= 4) & has_ma5 & (ma5_prev > 0))
+            missing += idx < 4
+            ma20_prev = _lag(ma20, 19)
+            f["ma20_slope"] = _pct(ma20, ma20_prev, (idx >= 19) & has_ma20 & (ma20_prev > 0))
+            missing += idx < 19
+
+            has_all = has_ma5 & has_ma20 & has_ma60
+            f["ma_alignment"] = np.where(
+                has_all & (ma5 > ma20) & (ma20 > ma60), 1,
+                np.where(has_all & (ma5 < ma20) & (ma20 < ma60), -1, 0)
+            )
+            missing += ~has_all
+
+            # 低點計算排除 0 (逐列版本以真值過濾)
+            low_nonzero = np.where(l != 0, l, np.inf)
+            high_60 = _rolling(h, 60, np.max)
+            low_60 = _rolling(low_nonzero, 60, np.min)
+            has_60 = idx >= 59
+            f["distance_from_high"] = _pct(c, high_60, has_60 & (c != 0) & (high_60 > 0))
+            f["distance_from_low"] = _pct(c, low_60, has_60 & (c != 0) & (low_60 != 0) & (low_60 < np.inf))
+            missing += 2 * ~has_60
+
+            # ========== 動能指標 ==========
+            has_rsi = ~np.isnan(rsi)
+            f["rsi_14"] = np.where(has_rsi, rsi, 50)
+            f["rsi_normalized"] = np.where(has_rsi, rsi / 100, 0.5)
+            missing += 2 * ~has_rsi
+
+            # 歷史 K 線無 MACD
+            f["macd_signal"] = 0
+            f["macd_histogram"] = 0
+            missing += 2
+
+            f["momentum_5d"] = f["price_change_5d"]
+            f["momentum_20d"] = f["price_change_20d"]
+
+            close_12 = _lag(c, 11)
+            f["rate_of_change"] = _pct(c, close_12, (idx >= 11) & (c != 0) & (close_12 > 0))
+            missing += idx < 11
+
+            high_14 = _rolling(h, 14, np.max)
+            low_14 = _rolling(low_nonzero, 14, np.min)
+            ok = (idx >= 13) & (high_14 > low_14) & (c != 0)
+            f["williams_r"] = np.where(ok, (high_14 - c) / (high_14 - low_14) * -100, -50)
+            missing += idx < 13
+
+            # ========== 成交量指標 ==========
+            f["volume_ratio_5d"] = 1
+            missing += 1
+
+            ok = (v != 0) & (volume_ma20 > 0)
+            volume_ratio_20d = np.where(ok, v / volume_ma20, 1)
+            f["volume_ratio_20d"] = volume_ratio_20d
+            missing += ~ok
+
+            volume_trend = np.where(volume_ratio_20d > 1.2, 1, np.where(volume_ratio_20d < 0.8, -1, 0))
+            f["volume_trend"] = volume_trend
+            f["volume_price_trend"] = np.where(f["price_change_5d"] > 0, 1, -1) * volume_trend
+
+            signed_volume = np.where(c > prev_close, v, -v)
+            obv = _rolling(signed_volume, 10, np.sum)
+            has_obv = idx >= 10
+            f["obv_slope"] = np.where(has_obv, np.sign(obv), 0)
+            missing += ~has_obv
+
+            f["volume_breakout"] = np.where(volume_ratio_20d > 2.0, 1, 0)
+
+            # ========== 波動率指標 ==========
+            has_volatility = ~np.isnan(volatility)
+            f["volatility_20d"] = np.where(has_volatility, volatility, 0)
+            missing += ~has_volatility
+
+            # 歷史 K 線無 ATR / 布林通道
+            f["atr_ratio"] = 0
+            f["bb_position"] = 0.5
+            f["bb_width"] = 0
+            missing += 3
+
+            ok = (h != 0) & (l > 0)
+            f["intraday_range"] = np.where(ok, (h - l) / l * 100, 0)
+            missing += ~ok
+
+            ok = (prev_close > 0) & (o != 0)
+            f["gap_ratio"] = _pct(o, prev_close, ok)
+            missing += ~ok
+
+            # ========== 籌碼面指標 (量價估算，同 _estimate_chip_data) ==========
+            volume_avg = (_lag(v, 4) + _lag(v, 3) + _lag(v, 2) + _lag(v, 1) + v) / 5
+            volume_ratio = np.where(volume_avg > 0, v / volume_avg, 1)
+            flow = np.clip((c - close_5) / close_5 * 10 * (volume_ratio - 1), -1, 1)
+            has_flow = idx >= 5
+            f["foreign_net_5d"] = np.where(has_flow, flow * 5, 0.0)
+            f["trust_net_5d"] = np.where(has_flow, flow * 3, 0.0)
+
+            # 估算值以 *_ratio 鍵寫入，特徵引擎讀取的原始買賣超欄位不存在
+            f["foreign_net_ratio"] = 0
+            f["foreign_trend"] = 0
+            f["trust_net_ratio"] = 0
+            f["dealer_net_ratio"] = 0
+            f["institutional_score"] = 50
+            f["institutional_consensus"] = 0
+            missing += 4
+
+            # ========== 基本面指標 (每檔固定) ==========
+            f["pe_normalized"] = 0
+            f["pb_normalized"] = 0
+            missing += 2
+            fundamental_keys = ("dividend_yield", "revenue_growth", "profit_margin", "roe", "debt_ratio", "eps_growth")
+            if fundamental:
+                formatted = self._format_fundamental_data(fundamental)
+                for key in fundamental_keys:
+                    f[key] = formatted[key]
+            else:
+                for key in fundamental_keys:
+                    f[key] = 0
+                missing += len(fundamental_keys)
+
+            # ========== 市場環境指標 ==========
+            if market_hist is not None:
+                f.update(self._market_context_columns(market_hist, hist_df.index))
+            else:
+                for key in ("market_trend", "sector_momentum", "market_volatility", "industry_heat"):
+                    f[key] = 0
+                missing += 4
+
+            # ========== 評分 (訓練時使用中性值) ==========
+            f["ai_score"] = 50.0
+            f["confidence"] = 0.5
+
+        feature_names = MLFeatureEngine.FEATURE_COLUMNS
+        values = np.empty((n, len(feature_names)))
+        for j, name in enumerate(feature_names):
+            values[:, j] = f[name]
+
+        return FeatureMatrix(
+            stock_id=stock_id,
+            values=values,
+            missing_count=missing,
+            feature_names=feature_names,
+        )
+
+    def _market_context_columns(self, market_hist, index) -> Dict[str, np.ndarray]:
+        """_get_market_context 的欄位版本 (依日期對齊大盤數據)"""
+        found = np.asarray(index.isin(market_hist.index))
+        aligned = market_hist.reindex(index)
+
+        trend = aligned['Market_Trend'].to_numpy(dtype=float)
+        market_volatility = aligned['Market_Volatility'].to_numpy(dtype=float)
+        market_change = aligned['Market_Change'].to_numpy(dtype=float)
+
+        industry_heat = np.full(len(index), 0.5)
+        if 'Volume' in market_hist.columns:
+            volume = aligned['Volume'].to_numpy(dtype=float)
+            avg_volume = market_hist['Volume'].rolling(20).mean().reindex(index).to_numpy(dtype=float)
+            ok = found & ~np.isnan(volume) & (avg_volume > 0)
+            industry_heat = np.where(ok, np.clip(volume / avg_volume, 0.5, 2.0) / 2, 0.5)
+
+        return {
+            "market_trend": np.where(found, trend, 0),
+            "sector_momentum": np.where(found & ~np.isnan(market_change), np.clip(market_change, -5, 5), 0),
+            "market_volatility": np.where(found & ~np.isnan(market_volatility), market_volatility, 0),
+            "industry_heat": industry_heat,
+        }
+
 
 # 單例
 _enricher = None
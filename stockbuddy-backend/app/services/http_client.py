@@ -0,0 +1,343 @@
+"""
+共用上游 HTTP 連線層
+
+所有對外部資料源（TWSE / TPEx / FinMind / GitHub / 新聞）的請求都經過同一個連線層：
+- 連線池：共用 keep-alive 連線（安裝 h2 套件時啟用 HTTP/2），不再每次請求建立新 client
+- 限速：每個主機一個 token bucket，並行請求下也不會超過上游限制
+- 合併：相同的進行中 GET 請求只送出一次，其餘呼叫者等待同一個回應
+  （50 個同時進來的 /recommend 只會下載一次 STOCK_DAY_ALL）
+- 統計：每個主機的請求數、合併數、錯誤數與延遲
+
+使用方式：
+    client = get_http_client()
+    resp = await client.get(url, params=..., headers=..., timeout=15, verify=False)
+
+    # 取代 httpx.AsyncClient(...) 的寫法（同樣支援 async with / client.get）
+    async with client.session(timeout=30, verify=False, headers=HEADERS) as session:
+        resp = await session.get(url)
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 需要 h2 套件
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+# 各主機限速（每秒請求數, 突發上限）
+HOST_LIMITS: Dict[str, Tuple[float, int]] = {
+    "openapi.twse.com.tw": (0.6, 3),    # 約每 5 秒 3 次
+    "www.twse.com.tw": (0.6, 3),
+    "mis.twse.com.tw": (0.6, 3),
+    "www.tpex.org.tw": (0.67, 2),       # 約每 1.5 秒 1 次
+    "api.finmindtrade.com": (2.0, 5),
+}
+DEFAULT_LIMIT: Tuple[float, int] = (10.0, 20)
+
+DEFAULT_TIMEOUT = 30.0
+
+# 連線池大小
+MAX_CONNECTIONS = 50
+MAX_KEEPALIVE = 20
+
+
+class TokenBucket:
+    """
+    Token bucket 限速器
+
+    acquire() 在鎖內計算等待時間，並行呼叫依序取得 token，不會同時超額
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self.waited = 0.0
+
+    async def acquire(self) -> float:
+        """取得一個 token，回傳等待秒數"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+                self.tokens = 1.0
+                self.updated = time.monotonic()
+            self.tokens -= 1
+            self.waited += wait
+            return wait
+
+
+class HostStats:
+    """單一主機的請求統計"""
+
+    __slots__ = ("requests", "coalesced", "errors", "total_latency", "max_latency", "last_error", "last_status")
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error: Optional[str] = None
+        self.last_status: Optional[int] = None
+
+    def record(self, latency: float, status: Optional[int] = None, error: Optional[str] = None) -> None:
+        self.requests += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.last_status = status
+        if error is not None or (status is not None and status >= 400):
+            self.errors += 1
+            self.last_error = error or f"HTTP {status}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else None,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+        }
+
+
+class UpstreamClient:
+    """共用的上游 HTTP client（連線池 + 限速 + 請求合併）"""
+
+    def __init__(self, host_limits: Optional[Dict[str, Tuple[float, int]]] = None, transport=None):
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self._transport = transport
+        self._clients: Dict[bool, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+        self._stats: Dict[str, HostStats] = {}
+
+    # ============================================================
+    # 內部
+    # ============================================================
+
+    def _bind_loop(self) -> None:
+        """連線池與鎖綁定 event loop；換 loop（例如測試中的 asyncio.run）時重建"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._clients = {}
+            self._inflight = {}
+            for bucket in self._buckets.values():
+                bucket._lock = None
+
+    def _client(self, verify: bool) -> httpx.AsyncClient:
+        client = self._clients.get(verify)
+        if client is None or client.is_closed:
+            kwargs: Dict[str, Any] = {
+                "verify": verify,
+                "timeout": DEFAULT_TIMEOUT,
+                "limits": httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE),
+                "http2": HTTP2_AVAILABLE,
+            }
+            if self._transport is not None:
+                kwargs["transport"] = self._transport
+            client = httpx.AsyncClient(**kwargs)
+            self._clients[verify] = client
+        return client
+
+    def bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, capacity = self.host_limits.get(host, DEFAULT_LIMIT)
+            bucket = self._buckets[host] = TokenBucket(rate, capacity)
+        return bucket
+
+    def stats(self, host: str) -> HostStats:
+        stats = self._stats.get(host)
+        if stats is None:
+            stats = self._stats[host] = HostStats()
+        return stats
+
+    @staticmethod
+    def _key(method: str, url: str, params: Optional[Dict], headers: Optional[Dict], verify: bool) -> Tuple:
+        return (
+            method,
+            url,
+            tuple(sorted((str(k), str(v)) for k, v in (params or {}).items())),
+            tuple(sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items())),
+            verify,
+        )
+
+    async def _send(
+        self,
+        method: str,
+        url: str,
+        host: str,
+        params: Optional[Dict],
+        headers: Optional[Dict],
+        timeout: Optional[float],
+        verify: bool,
+        **kwargs,
+    ) -> httpx.Response:
+        await self.bucket(host).acquire()
+        stats = self.stats(host)
+        started = time.perf_counter()
+        try:
+            response = await self._client(verify).request(
+                method, url, params=params, headers=headers,
+                timeout=timeout if timeout is not None else DEFAULT_TIMEOUT, **kwargs,
+            )
+        except Exception as e:
+            stats.record(time.perf_counter() - started, error=f"{type(e).__name__}: {e}")
+            raise
+        stats.record(time.perf_counter() - started, status=response.status_code)
+        return response
+
+    # ============================================================
+    # 公開介面
+    # ============================================================
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        verify: bool = True,
+        coalesce: bool = True,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        送出請求（GET 且 coalesce=True 時，相同的進行中請求共用同一個回應）
+
+        合併的請求在獨立的 task 中送出，每個呼叫者以 shield 等待：
+        任一呼叫者（包括第一個）被取消，不影響其他等待者。
+        回應內容已完整讀取，多個呼叫者可各自呼叫 .json() / .text
+        """
+        self._bind_loop()
+        host = urlsplit(url).hostname or ""
+        method = method.upper()
+
+        if method != "GET" or not coalesce or kwargs:
+            return await self._send(method, url, host, params, headers, timeout, verify, **kwargs)
+
+        key = self._key(method, url, params, headers, verify)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats(host).coalesced += 1
+            return await asyncio.shield(task)
+
+        task = asyncio.get_running_loop().create_task(
+            self._send(method, url, host, params, headers, timeout, verify)
+        )
+        self._inflight[key] = task
+
+        def done(finished: asyncio.Task) -> None:
+            if self._inflight.get(key) is finished:
+                del self._inflight[key]
+            if not finished.cancelled():
+                finished.exception()  # 所有等待者都已取消時避免 "exception was never retrieved"
+
+        task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def session(
+        self,
+        timeout: Optional[float] = None,
+        verify: bool = True,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> "UpstreamSession":
+        """預設參數的輕量 session（介面與 httpx.AsyncClient 相容，共用連線池）"""
+        return UpstreamSession(self, timeout=timeout, verify=verify, headers=headers)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各主機統計"""
+        hosts = {}
+        for host, stats in sorted(self._stats.items()):
+            entry = stats.to_dict()
+            bucket = self._buckets.get(host)
+            if bucket is not None:
+                entry["rate_limit"] = {"per_second": bucket.rate, "burst": bucket.capacity}
+                entry["rate_limited_seconds"] = round(bucket.waited, 2)
+            hosts[host] = entry
+        return {
+            "http2": HTTP2_AVAILABLE,
+            "inflight": len(self._inflight),
+            "hosts": hosts,
+        }
+
+    async def aclose(self) -> None:
+        """關閉連線池（應用程式結束時）"""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+class UpstreamSession:
+    """
+    帶預設參數的 session
+
+    取代各服務原本的 httpx.AsyncClient(...)：支援 async with 與 get / post，
+    實際請求經由共用 UpstreamClient 送出（關閉 session 不會關閉連線池）
+    """
+
+    def __init__(self, client: UpstreamClient, timeout=None, verify=True, headers=None):
+        self._client = client
+        self.timeout = timeout
+        self.verify = verify
+        self.headers = dict(headers or {})
+
+    async def __aenter__(self) -> "UpstreamSession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        return None
+
+    async def request(self, method: str, url: str, params=None, headers=None, timeout=None, **kwargs) -> httpx.Response:
+        merged = {**self.headers, **(headers or {})} or None
+        return await self._client.request(
+            method, url, params=params, headers=merged,
+            timeout=timeout if timeout is not None else self.timeout,
+            verify=self.verify, **kwargs,
+        )
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        return None
+
+
+_client: Optional[UpstreamClient] = None
+
+
+def get_http_client() -> UpstreamClient:
+    """取得共用上游 client"""
+    global _client
+    if _client is None:
+        _client = UpstreamClient()
+    return _client
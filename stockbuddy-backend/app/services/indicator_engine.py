@@ -0,0 +1,228 @@
+"""
+向量化技術指標引擎
+
+以 NumPy 陣列一次計算整段序列的技術指標，全部為 O(n)：
+- 移動平均：累積和相減
+- 布林通道：平移後的累積和 / 平方累積和
+- EMA / MACD：遞迴濾波（scipy.signal.lfilter，未安裝時退回逐筆遞迴）
+- RSI：Wilder 平滑遞迴
+
+輸入為 float 陣列，輸出為同長度 float 陣列，資料不足的位置為 NaN。
+TechnicalAnalysis 的 calculate_* 方法透過此模組計算，再轉回 List[Optional[float]]，
+輸出與原本逐窗計算的版本完全一致（含四捨五入）。
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # scipy 為 scikit-learn 的相依套件，一般都會存在
+    lfilter = None
+
+
+# 四捨五入前判斷「接近 .5 進位邊界」的容忍值（以放大 10^decimals 後的單位計）；
+# 落在邊界附近的位置改用逐窗精確重算，確保累積和的浮點誤差不會讓 round() 結果與原本實作不同
+_TIE_EPS = 1e-6
+
+
+def as_array(values: Sequence[float]) -> np.ndarray:
+    """轉為 float64 陣列（None 轉為 NaN）"""
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64) \
+        if isinstance(values, list) else np.asarray(values, dtype=np.float64)
+
+
+def to_list(values: np.ndarray, decimals: Optional[int] = None) -> list:
+    """NaN 轉為 None 的 Python list（可選四捨五入，與 round() 結果相同）"""
+    if decimals is None:
+        return [None if v != v else v for v in values.tolist()]
+    return [None if v != v else round(v, decimals) for v in values.tolist()]
+
+
+def _near_tie(values: np.ndarray, decimals: int) -> np.ndarray:
+    """找出四捨五入到 decimals 位時接近進位邊界的位置"""
+    scaled = np.abs(values) * (10 ** decimals)
+    frac = scaled - np.floor(scaled)
+    return np.abs(frac - 0.5) < _TIE_EPS
+
+
+# ============================================================
+# 移動平均 / 布林通道
+# ============================================================
+
+def sma(prices: np.ndarray, period: int, decimals: Optional[int] = None) -> np.ndarray:
+    """
+    簡單移動平均（累積和，O(n)）
+
+    指定 decimals 時，接近四捨五入邊界的位置會以原本的逐窗加總重算，
+    結果與 round(sum(window) / period, decimals) 相同
+    """
+    n = len(prices)
+    result = np.full(n, np.nan)
+    if n < period:
+        return result
+
+    # 平移後再累積，降低大數相減的誤差
+    offset = prices[0]
+    csum = np.concatenate(([0.0], np.cumsum(prices - offset)))
+    result[period - 1:] = (csum[period:] - csum[:-period]) / period + offset
+
+    if decimals is not None:
+        ties = np.flatnonzero(_near_tie(result[period - 1:], decimals)) + period - 1
+        result[period - 1:] = np.round(result[period - 1:], decimals)
+        plist = prices.tolist()
+        for i in ties:
+            result[i] = round(sum(plist[i - period + 1:i + 1]) / period, decimals)
+
+    return result
+
+
+def rolling_std(prices: np.ndarray, period: int) -> np.ndarray:
+    """母體標準差（與 np.std 相同，ddof=0），O(n)"""
+    n = len(prices)
+    result = np.full(n, np.nan)
+    if n < period:
+        return result
+
+    shifted = prices - prices[0]
+    csum = np.concatenate(([0.0], np.cumsum(shifted)))
+    csq = np.concatenate(([0.0], np.cumsum(shifted * shifted)))
+    window_sum = csum[period:] - csum[:-period]
+    window_sq = csq[period:] - csq[:-period]
+    var = window_sq / period - (window_sum / period) ** 2
+    result[period - 1:] = np.sqrt(np.maximum(var, 0.0))
+    return result
+
+
+def bollinger(prices: np.ndarray, period: int = 20, std_dev: float = 2,
+              decimals: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """布林通道（中軌為移動平均，上下軌為 ± std_dev 倍標準差）"""
+    middle = sma(prices, period, decimals)
+    std = rolling_std(prices, period)
+    upper = middle + std_dev * std
+    lower = middle - std_dev * std
+
+    if decimals is not None and len(prices) >= period:
+        # 標準差的累積誤差可能影響進位：接近邊界者以 np.std 精確重算
+        ties = np.flatnonzero(
+            _near_tie(upper[period - 1:], decimals) | _near_tie(lower[period - 1:], decimals)
+        ) + period - 1
+        upper = np.round(upper, decimals)
+        lower = np.round(lower, decimals)
+        for i in ties:
+            exact = np.std(prices[i - period + 1:i + 1].tolist())
+            upper[i] = round(middle[i] + std_dev * exact, decimals)
+            lower[i] = round(middle[i] - std_dev * exact, decimals)
+
+    return {"upper": upper, "middle": middle, "lower": lower}
+
+
+# ============================================================
+# EMA / MACD
+# ============================================================
+
+def ema(data: np.ndarray, period: int) -> np.ndarray:
+    """
+    指數移動平均（以第一筆為起始值）
+
+    y[i] = x[i] * k + y[i-1] * (1 - k)，k = 2 / (period + 1)
+    """
+    return _recursive_filter(data, 2 / (period + 1), data[0])
+
+
+def _recursive_filter(data: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """一階遞迴濾波 y[i] = alpha * x[i] + (1 - alpha) * y[i-1]，y[0] = initial（x[0] 不使用）"""
+    n = len(data)
+    if n == 0:
+        return np.array([], dtype=np.float64)
+
+    decay = 1 - alpha
+    if lfilter is not None:
+        out = np.empty(n)
+        out[0] = initial
+        if n > 1:
+            out[1:], _ = lfilter([alpha], [1.0, -decay], data[1:], zi=[decay * initial])
+        return out
+
+    out = np.empty(n)
+    prev = out[0] = initial
+    for i, x in enumerate(data[1:].tolist(), start=1):
+        prev = (x * alpha) + (prev * decay)
+        out[i] = prev
+    return out
+
+
+def macd(prices: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, np.ndarray]:
+    """MACD（DIF、訊號線、柱狀圖），前 slow - 1 筆為 NaN"""
+    n = len(prices)
+    if n < slow:
+        empty = np.full(n, np.nan)
+        return {"macd": empty, "signal": empty.copy(), "histogram": empty.copy()}
+
+    macd_line = ema(prices, fast) - ema(prices, slow)
+    signal_line = ema(macd_line, signal)
+    histogram = macd_line - signal_line
+
+    macd_line[:slow - 1] = np.nan
+    signal_line[:slow - 1] = np.nan
+    histogram[:slow - 1] = np.nan
+
+    return {"macd": macd_line, "signal": signal_line, "histogram": histogram}
+
+
+# ============================================================
+# RSI
+# ============================================================
+
+def rsi(prices: np.ndarray, period: int = 14) -> np.ndarray:
+    """
+    RSI（Wilder 平滑）
+
+    與 TechnicalAnalysis 原本實作相同：第一筆為 NaN，
+    第 period 筆以前 period 個變動的簡單平均計算
+    """
+    n = len(prices)
+    result = np.full(n, np.nan)
+    if n < period + 1:
+        return result
+
+    deltas = np.diff(prices)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+
+    seed_gain = sum(gains[:period].tolist()) / period
+    seed_loss = sum(losses[:period].tolist()) / period
+
+    avg_gain = _wilder(gains, period, seed_gain)
+    avg_loss = _wilder(losses, period, seed_loss)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        values = np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + rs)))
+    result[period + 1:] = values
+
+    # 第一個 RSI（沿用原實作：以最後的 avg_loss 判斷是否為 100）
+    final_loss = avg_loss[-1] if len(avg_loss) else seed_loss
+    if final_loss == 0:
+        first_rsi = 100
+    else:
+        rs0 = seed_gain / seed_loss if sum(losses[:period].tolist()) > 0 else 100
+        first_rsi = 100 - (100 / (1 + rs0)) if rs0 != 100 else 100
+    result[period] = first_rsi
+
+    return result
+
+
+def _wilder(values: np.ndarray, period: int, seed: float) -> np.ndarray:
+    """
+    Wilder 平滑：avg = (avg * (period - 1) + x) / period，自 values[period] 起
+
+    以純量遞迴計算，運算順序與原實作相同，確保結果逐位元一致
+    """
+    out = np.empty(len(values) - period)
+    avg = seed
+    for j, x in enumerate(values[period:].tolist()):
+        avg = (avg * (period - 1) + x) / period
+        out[j] = avg
+    return out
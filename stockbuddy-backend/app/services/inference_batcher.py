@@ -0,0 +1,146 @@
+"""
+推論微批次器 (micro-batcher)
+
+並行進來的預測請求先在短時間窗（預設 5ms）內累積，再一次送進模型：
+一個特徵矩陣、一次 scaler.transform、一次 predict_proba，結果再分送回各請求。
+尖峰時每檔股票分攤到的模型呼叫成本下降一到兩個數量級。
+
+- 時間窗到期或累積到 max_batch 筆時立即送出
+- 模型在執行緒中執行，不阻塞事件迴圈
+- 整批失敗時錯誤傳給該批所有等待者
+
+使用方式：
+    result = await get_prediction_batcher().submit((stock_id, features, stock_data, history))
+
+    # 或
+    result = await predict_async(stock_id, stock_data=stock_data, history=history)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 收集時間窗（毫秒）與單批上限
+ML_BATCH_WINDOW_MS = float(os.getenv("ML_BATCH_WINDOW_MS", "5"))
+ML_BATCH_MAX = int(os.getenv("ML_BATCH_MAX", "256"))
+
+
+class MicroBatcher:
+    """
+    通用微批次器
+
+    handler 是同步函數：輸入 N 筆請求，回傳順序相同的 N 筆結果
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], List[Any]],
+        window_ms: float = ML_BATCH_WINDOW_MS,
+        max_batch: int = ML_BATCH_MAX,
+    ):
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # 統計
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.largest_batch = 0
+        self.total_seconds = 0.0
+
+    async def submit(self, item: Any) -> Any:
+        """送出一筆請求，等待所屬批次的結果"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # 新的事件迴圈（例如測試重新 asyncio.run），舊迴圈的排程已失效
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((item, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """送出目前累積的請求"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        started = time.perf_counter()
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            results = await asyncio.to_thread(self.handler, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"批次結果數量不符: {len(results)} != {len(batch)}")
+        except Exception as e:
+            self.errors += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.total_seconds += time.perf_counter() - started
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "errors": self.errors,
+            "avg_batch_ms": round(self.total_seconds / self.batches * 1000, 2) if self.batches else 0,
+            "pending": len(self._pending),
+        }
+
+
+def _predict_many(requests: List[Tuple[str, Optional[Dict], Optional[Dict], Optional[List[Dict]]]]) -> List[Any]:
+    from app.services.ml_predictor import get_predictor
+    return get_predictor().predict_many(requests)
+
+
+_prediction_batcher: Optional[MicroBatcher] = None
+
+
+def get_prediction_batcher() -> MicroBatcher:
+    """取得 ML 預測微批次器"""
+    global _prediction_batcher
+    if _prediction_batcher is None:
+        _prediction_batcher = MicroBatcher(_predict_many)
+    return _prediction_batcher
+
+
+async def predict_async(
+    stock_id: str,
+    features: Optional[Dict[str, float]] = None,
+    stock_data: Optional[Dict] = None,
+    history: Optional[List[Dict]] = None,
+):
+    """經由微批次器預測單檔股票，回傳 PredictionResult"""
+    return await get_prediction_batcher().submit((stock_id, features, stock_data, history))
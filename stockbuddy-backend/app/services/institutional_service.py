@@ -5,12 +5,13 @@
 - 大戶持股比例
 """
 
-import httpx
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any, List
 import math
 
+from app.services.http_client import get_http_client
+
 
 def safe_float(val) -> Optional[float]:
     """安全轉換為 float"""
@@ -95,7 +96,7 @@ class InstitutionalService:
                 # TWSE 三大法人買賣超 API
                 url = f"{cls.BASE_URL}/fund/T86?response=json&date={date_str}&selectType=ALLBUT0999"
                 
-                async with httpx.AsyncClient(timeout=10, verify=False) as client:
+                async with get_http_client().session(timeout=10, verify=False) as client:
                     response = await client.get(url, headers={
                         "User-Agent": "Mozilla/5.0",
                         "Accept-Language": "zh-TW"
@@ -35,7 +35,7 @@ import json
 import pickle
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Callable, Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from pathlib import Path
 
@@ -136,7 +136,8 @@ class MLPredictor:
         self,
         stock_id: str,
         features: Optional[Dict[str, float]] = None,
-        stock_data: Optional[Dict] = None
+        stock_data: Optional[Dict] = None,
+        history: Optional[List[Dict]] = None
     ) -> PredictionResult:
         """
         預測股票走勢
@@ -145,98 +146,115 @@ class MLPredictor:
             stock_id: 股票代碼
             features: 特徵字典 (若已計算)
             stock_data: 原始股票數據 (若無特徵則從此計算)
+            history: 歷史K線 (含 ma5 / ma20，計算多日漲跌等特徵)
 
         Returns:
             PredictionResult 預測結果
         """
-        timestamp = datetime.now().isoformat()
+        return self.predict_many([(stock_id, features, stock_data, history)])[0]
 
-        # 嘗試載入模型
-        has_model = self._load_model()
+    def _feature_matrix(self, features_list: List[Dict[str, float]]) -> Tuple[Any, List[int]]:
+        """
+        特徵字典列表轉為特徵矩陣（依模型特徵順序）
 
-        # 決定使用 ML 模型還是規則引擎
-        if has_model and features is not None:
-            return self._ml_prediction(stock_id, features, timestamp)
-        else:
-            return self._rule_based_prediction(stock_id, stock_data, timestamp)
+        Returns:
+            (矩陣 n × 特徵數, 每列缺失特徵數)
+        """
+        import numpy as np
 
-    def _ml_prediction(
+        feature_names = self._meta.get("feature_names", [])
+        matrix = np.zeros((len(features_list), len(feature_names)), dtype=np.float64)
+        missing_counts = []
+        for row, features in enumerate(features_list):
+            missing_features = []
+            for col, name in enumerate(feature_names):
+                value = features.get(name, 0)
+                if value is None:
+                    missing_features.append(name)
+                    continue
+                matrix[row, col] = float(value)
+            if missing_features and len(missing_features) <= 5:
+                logger.debug(f"[MLPredictor] 缺少特徵: {missing_features}")
+            missing_counts.append(len(missing_features))
+        return matrix, missing_counts
+
+    def _ml_predictions(
         self,
-        stock_id: str,
-        features: Dict[str, float],
+        items: List[Tuple[str, Dict[str, float]]],
         timestamp: str
-    ) -> PredictionResult:
+    ) -> List[PredictionResult]:
         """
-        V10.38: 使用 ML 模型預測
+        多檔股票一次 ML 預測（一次標準化、一次 predict_proba）
 
         Args:
-            stock_id: 股票代碼
-            features: 特徵字典
+            items: [(股票代碼, 特徵字典), ...]
             timestamp: 預測時間
 
         Returns:
-            PredictionResult
+            PredictionResult 列表（順序與 items 相同）
         """
-        try:
-            # 準備特徵向量
-            feature_names = self._meta.get("feature_names", [])
+        if not items:
+            return []
 
-            # V10.38: 確保特徵順序正確
-            feature_vector = []
-            missing_features = []
-            for name in feature_names:
-                value = features.get(name, 0)
-                if value is None:
-                    value = 0
-                    missing_features.append(name)
-                feature_vector.append(float(value))
-
-            if missing_features and len(missing_features) <= 5:
-                logger.debug(f"[MLPredictor] 缺少特徵: {missing_features}")
+        try:
+            feature_count = len(self._meta.get("feature_names", []))
+            matrix, missing_counts = self._feature_matrix([features for _, features in items])
 
             # 標準化
             if self._scaler:
-                feature_vector = self._scaler.transform([feature_vector])[0]
+                matrix = self._scaler.transform(matrix)
 
             # 預測
-            prob = self._model.predict_proba([feature_vector])[0]
+            probs = self._model.predict_proba(matrix)
 
-            # 取得上漲機率 (假設 class 1 是上漲)
-            up_prob = float(prob[1]) if len(prob) > 1 else float(prob[0])
-
-            # 邊界處理
-            up_prob = max(0.0, min(1.0, up_prob))
-
-            # 決定預測結果
-            if up_prob > 0.6:
-                prediction = "up"
-            elif up_prob < 0.4:
-                prediction = "down"
-            else:
-                prediction = "neutral"
-
-            # 決定信心等級
-            confidence = self._get_confidence(up_prob)
-
-            # V10.38: 改進預期報酬率估算
-            # 根據歷史數據調整 (假設平均報酬率約 5-10%)
-            expected_return = round((up_prob - 0.5) * 15, 2)
-
-            return PredictionResult(
-                stock_id=stock_id,
-                prediction=prediction,
-                probability=round(up_prob, 4),
-                confidence=confidence,
-                expected_return=expected_return,
-                model_version=self._get_model_version(),
-                features_used=len(feature_names) - len(missing_features),
-                timestamp=timestamp,
-            )
+            results = []
+            for (stock_id, _), prob, missing in zip(items, probs, missing_counts):
+                # 取得上漲機率 (假設 class 1 是上漲)
+                up_prob = float(prob[1]) if len(prob) > 1 else float(prob[0])
+                results.append(self._ml_result(stock_id, up_prob, feature_count - missing, timestamp))
+            return results
 
         except Exception as e:
             logger.error(f"[MLPredictor] ML 預測失敗: {e}")
             # 降級到規則引擎
-            return self._rule_based_prediction(stock_id, None, timestamp)
+            return [self._rule_based_prediction(stock_id, None, timestamp) for stock_id, _ in items]
+
+    def _ml_result(
+        self,
+        stock_id: str,
+        up_prob: float,
+        features_used: int,
+        timestamp: str
+    ) -> PredictionResult:
+        """上漲機率轉為 PredictionResult"""
+        # 邊界處理
+        up_prob = max(0.0, min(1.0, up_prob))
+
+        # 決定預測結果
+        if up_prob > 0.6:
+            prediction = "up"
+        elif up_prob < 0.4:
+            prediction = "down"
+        else:
+            prediction = "neutral"
+
+        # 決定信心等級
+        confidence = self._get_confidence(up_prob)
+
+        # V10.38: 改進預期報酬率估算
+        # 根據歷史數據調整 (假設平均報酬率約 5-10%)
+        expected_return = round((up_prob - 0.5) * 15, 2)
+
+        return PredictionResult(
+            stock_id=stock_id,
+            prediction=prediction,
+            probability=round(up_prob, 4),
+            confidence=confidence,
+            expected_return=expected_return,
+            model_version=self._get_model_version(),
+            features_used=features_used,
+            timestamp=timestamp,
+        )
 
     def _rule_based_prediction(
         self,
@@ -402,6 +420,49 @@ class MLPredictor:
         else:
             return "low"
 
+    def predict_many(
+        self,
+        requests: List[Tuple[str, Optional[Dict[str, float]], Optional[Dict], Optional[List[Dict]]]]
+    ) -> List[PredictionResult]:
+        """
+        多檔股票一次預測
+
+        有模型時，未提供特徵的請求以 ml_feature_engine 從股票數據與歷史K線萃取特徵
+        （與訓練相同，多日漲跌、均線斜率等需要歷史K線），
+        所有請求組成一個特徵矩陣，只做一次標準化與一次 predict_proba；
+        無模型或無任何數據的請求使用規則引擎。
+
+        Args:
+            requests: [(股票代碼, 特徵字典或 None, 股票數據或 None, 歷史K線或 None), ...]
+
+        Returns:
+            PredictionResult 列表（順序與 requests 相同）
+        """
+        timestamp = datetime.now().isoformat()
+        has_model = self._load_model()
+
+        results: List[Optional[PredictionResult]] = [None] * len(requests)
+        ml_items = []
+        ml_indices = []
+        engine = None
+        for i, (stock_id, features, stock_data, history) in enumerate(requests):
+            if has_model and features is None and stock_data:
+                if engine is None:
+                    from .ml_feature_engine import get_feature_engine
+                    engine = get_feature_engine()
+                features = engine.extract_features({"stock_id": stock_id, **stock_data}, history).features
+
+            if has_model and features is not None:
+                ml_items.append((stock_id, features))
+                ml_indices.append(i)
+            else:
+                results[i] = self._rule_based_prediction(stock_id, stock_data, timestamp)
+
+        ml_results = self._ml_predictions(ml_items, timestamp)
+        for i, result in zip(ml_indices, ml_results):
+            results[i] = result
+        return results
+
     def predict_batch(
         self,
         stocks: List[Dict]
@@ -410,17 +471,15 @@ class MLPredictor:
         批次預測多檔股票
 
         Args:
-            stocks: 股票數據列表
+            stocks: 股票數據列表（可含 "features" 特徵字典、"history" 歷史K線）
 
         Returns:
             預測結果列表
         """
-        results = []
-        for stock in stocks:
-            stock_id = stock.get("stock_id", stock.get("id", "unknown"))
-            result = self.predict(stock_id, stock_data=stock)
-            results.append(result)
-        return results
+        return self.predict_many([
+            (stock.get("stock_id", stock.get("id", "unknown")), stock.get("features"), stock, stock.get("history"))
+            for stock in stocks
+        ])
 
 
 class ModelTrainer:
@@ -878,6 +937,7 @@ class ModelTrainer:
         period: str = "1y",
         predict_days: int = 5,
         min_samples: int = 100,
+        progress: Optional[Callable[[float, str], None]] = None,
     ) -> Dict[str, Any]:
         """
         V10.40: 從歷史股價數據訓練模型
@@ -890,13 +950,18 @@ class ModelTrainer:
             period: 歷史數據期間 ("6mo", "1y", "2y", "5y")
             predict_days: 預測天數 (標籤: N天後是否上漲)
             min_samples: 最少樣本數
+            progress: 進度回報 progress(0-1, 階段說明)
 
         Returns:
             訓練結果
         """
+        report = progress or (lambda fraction, stage: None)
         try:
+            import time
             import numpy as np
 
+            started = time.perf_counter()
+
             try:
                 import yfinance as yf
                 from xgboost import XGBClassifier
@@ -920,141 +985,52 @@ class ModelTrainer:
 
             logger.info(f"[ModelTrainer] 從歷史數據訓練，股票數: {len(stock_ids)}, 期間: {period}")
 
-            # 使用完整 55 特徵引擎 + 數據補齊器
+            # 使用完整 55 特徵引擎 + 數據補齊器（下載與特徵計算並行）
             try:
                 from .ml_feature_engine import get_feature_engine
-                from .historical_data_enricher import get_enricher
+                from .training_pipeline import prepare_training_data
 
                 feature_engine = get_feature_engine()
-                enricher = get_enricher()
             except ImportError as ie:
                 return {"success": False, "error": f"無法載入模組: {ie}"}
 
             feature_names = feature_engine.FEATURE_COLUMNS
             logger.info(f"[ModelTrainer] 使用完整 {len(feature_names)} 特徵架構")
 
-            # 預先載入大盤數據 (所有股票共用)
-            market_hist = enricher.get_market_data(period)
-            if market_hist is not None:
-                logger.info(f"[ModelTrainer] 大盤數據載入: {len(market_hist)} 筆")
-
-            X = []
-            y = []
-            processed_stocks = 0
-            skipped_stocks = 0
-            total_samples = 0
-            quality_stats = {"high": 0, "medium": 0, "low": 0, "rejected": 0}
-
-            for stock_id in stock_ids:
-                try:
-                    # 取得歷史數據
-                    ticker = yf.Ticker(f"{stock_id}.TW")
-                    hist = ticker.history(period=period)
-
-                    if hist.empty or len(hist) < 60 + predict_days:
-                        logger.debug(f"[ModelTrainer] {stock_id} 數據不足，跳過")
-                        skipped_stocks += 1
-                        continue
-
-                    # 計算技術指標
-                    hist['MA5'] = hist['Close'].rolling(5).mean()
-                    hist['MA20'] = hist['Close'].rolling(20).mean()
-                    hist['MA60'] = hist['Close'].rolling(60).mean()
-                    hist['Volume_MA20'] = hist['Volume'].rolling(20).mean()
-
-                    # RSI
-                    delta = hist['Close'].diff()
-                    gain = delta.where(delta > 0, 0).rolling(14).mean()
-                    loss = (-delta.where(delta < 0, 0)).rolling(14).mean()
-                    rs = gain / loss
-                    hist['RSI'] = 100 - (100 / (1 + rs))
-
-                    # 波動率
-                    hist['Volatility'] = hist['Close'].rolling(20).std() / hist['Close'].rolling(20).mean() * 100
-
-                    # 獲取基本面數據 (每檔股票查一次)
-                    fundamental = enricher.get_fundamental_data(stock_id)
-
-                    stock_samples = 0
-
-                    # 生成訓練樣本（從第60天開始，到倒數第predict_days天）
-                    for i in range(60, len(hist) - predict_days):
-                        row = hist.iloc[i]
-                        future_price = hist.iloc[i + predict_days]['Close']
-                        current_price = row['Close']
-
-                        # 標籤: N天後是否上漲
-                        label = 1 if future_price > current_price else 0
-
-                        # 使用數據補齊器準備完整數據
-                        stock_data = enricher.enrich_stock_data(
-                            stock_id=stock_id,
-                            hist_row=row,
-                            hist_df=hist,
-                            row_index=i,
-                            market_hist=market_hist,
-                            fundamental=fundamental,
-                        )
-
-                        # 準備歷史數據
-                        history_data = enricher.prepare_history_for_features(hist, i)
-
-                        # 使用完整 55 特徵引擎萃取特徵
-                        try:
-                            feature_set = feature_engine.extract_features(stock_data, history=history_data)
-                            missing_ratio = feature_set.missing_count / len(feature_names)
-
-                            # 品質分級
-                            if missing_ratio <= 0.2:
-                                quality_stats["high"] += 1
-                            elif missing_ratio <= 0.4:
-                                quality_stats["medium"] += 1
-                            elif missing_ratio <= 0.6:
-                                quality_stats["low"] += 1
-                            else:
-                                quality_stats["rejected"] += 1
-                                continue  # 超過 60% 缺失則跳過
-
-                            feature_vector = feature_engine.get_feature_vector(feature_set)
-                            X.append(feature_vector)
-                            y.append(label)
-                            stock_samples += 1
-
-                        except Exception as fe:
-                            logger.debug(f"[ModelTrainer] 特徵萃取失敗: {fe}")
-                            continue
-
-                    processed_stocks += 1
-                    total_samples += stock_samples
-                    if stock_samples > 0:
-                        logger.info(f"[ModelTrainer] {stock_id} 完成: {stock_samples} 樣本，累計: {len(X)}")
-
-                except Exception as e:
-                    logger.warning(f"[ModelTrainer] {stock_id} 處理失敗: {e}")
-                    skipped_stocks += 1
-                    continue
+            # 資料準備佔整體進度的 0-70%
+            report(0.0, "下載歷史數據")
+            data = prepare_training_data(
+                stock_ids, period=period, predict_days=predict_days,
+                progress=lambda done, total: report(0.7 * done / max(total, 1), f"特徵萃取 {done}/{total}"),
+            )
+            quality_stats = data.quality_stats
+            processed_stocks = data.processed_stocks
+            skipped_stocks = data.skipped_stocks
+            timings = dict(data.timings)
 
             # 輸出品質統計
-            logger.info(f"[ModelTrainer] 數據準備完成: {len(X)} 樣本, {processed_stocks} 股票成功, {skipped_stocks} 跳過")
+            logger.info(f"[ModelTrainer] 數據準備完成: {data.sample_count} 樣本, {processed_stocks} 股票成功, {skipped_stocks} 跳過")
             logger.info(f"[ModelTrainer] 品質分佈: 高品質={quality_stats['high']}, 中品質={quality_stats['medium']}, 低品質={quality_stats['low']}, 拒絕={quality_stats['rejected']}")
 
-            if len(X) < min_samples:
+            if data.sample_count < min_samples:
                 return {
                     "success": False,
-                    "error": f"有效樣本不足，需要 {min_samples} 筆，目前只有 {len(X)} 筆",
+                    "error": f"有效樣本不足，需要 {min_samples} 筆，目前只有 {data.sample_count} 筆",
                     "quality_stats": quality_stats,
                     "stocks_processed": processed_stocks,
                     "stocks_skipped": skipped_stocks,
+                    "timings": timings,
                 }
 
-            X = np.array(X)
-            y = np.array(y)
+            X = data.X
+            y = data.y
 
             # 檢查類別分佈
             up_ratio = np.mean(y)
             logger.info(f"[ModelTrainer] 類別分佈: 上漲 {up_ratio:.2%}, 下跌 {1-up_ratio:.2%}")
 
             # 標準化
+            train_started = time.perf_counter()
             scaler = StandardScaler()
             X_scaled = scaler.fit_transform(X)
 
@@ -1077,9 +1053,11 @@ class ModelTrainer:
             )
 
             # 交叉驗證
+            report(0.72, "交叉驗證")
             cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='accuracy')
 
             # 完整訓練
+            report(0.85, "訓練模型")
             model.fit(X_train, y_train)
 
             # 測試集評估
@@ -1088,6 +1066,7 @@ class ModelTrainer:
             test_f1 = float(f1_score(y_test, y_pred, zero_division=0))
 
             logger.info(f"[ModelTrainer] 測試集: accuracy={test_accuracy:.4f}, f1={test_f1:.4f}")
+            timings["train"] = round(time.perf_counter() - train_started, 3)
 
             # 計算品質比例
             total_quality = sum(quality_stats.values())
@@ -1098,21 +1077,18 @@ class ModelTrainer:
             }
 
             # V10.41: 使用 MLTrainingManager 進行版本管理
+            report(0.95, "保存模型")
             try:
                 from .ml_training_manager import get_training_manager
                 manager = get_training_manager()
 
                 # 準備訓練樣本的元數據 (用於保存到資料庫)
                 sample_metadata = {
-                    "stock_ids": stock_ids[:len(X)] if stock_ids else [],
-                    "dates": [],  # 歷史訓練不追蹤具體日期
-                    "returns": [],
+                    "stock_ids": data.sample_stock_ids,
+                    "dates": data.sample_dates,
+                    "returns": data.sample_returns,
                     "source": "historical",
-                    "quality_scores": [
-                        0.9 if i < quality_stats["high"] else
-                        0.7 if i < quality_stats["high"] + quality_stats["medium"] else 0.5
-                        for i in range(len(X))
-                    ],
+                    "quality_scores": data.sample_quality,
                     "predict_days": predict_days,
                 }
 
@@ -1196,7 +1172,8 @@ class ModelTrainer:
                 with open(META_JSON_FILE, 'w', encoding='utf-8') as f:
                     json.dump(meta, f, ensure_ascii=False, indent=2)
 
-            logger.info(f"[ModelTrainer] 歷史數據訓練完成: {model_version}")
+            timings["total"] = round(time.perf_counter() - started, 3)
+            logger.info(f"[ModelTrainer] 歷史數據訓練完成: {model_version}, 耗時: {timings}")
 
             # 重置預測器以載入新模型
             global _predictor
@@ -1221,6 +1198,7 @@ class ModelTrainer:
                 "test_accuracy": round(test_accuracy, 4),
                 "test_f1": round(test_f1, 4),
                 "model_path": str(MODEL_DIR),
+                "timings": timings,
             }
 
         except Exception as e:
@@ -1238,6 +1216,7 @@ class ModelTrainer:
         replay_ratio: float = 0.3,
         base_version: Optional[str] = None,
         min_new_samples: int = 50,
+        progress: Optional[Callable[[float, str], None]] = None,
     ) -> Dict[str, Any]:
         """
         V10.41: 增量訓練
@@ -1249,10 +1228,12 @@ class ModelTrainer:
             replay_ratio: 經驗回放比例 (舊數據 / 新數據)
             base_version: 基礎版本 (None 則使用當前版本)
             min_new_samples: 最少新樣本數
+            progress: 進度回報 progress(0-1, 階段說明)
 
         Returns:
             訓練結果
         """
+        report = progress or (lambda fraction, stage: None)
         try:
             import numpy as np
             from datetime import datetime
@@ -1275,6 +1256,7 @@ class ModelTrainer:
             start_time = time.time()
 
             # 1. 載入新數據
+            report(0.0, "載入訓練樣本")
             X_new, y_new, feature_names = manager.load_training_samples(
                 sources=[new_data_source],
                 min_quality=0.6,
@@ -1343,6 +1325,7 @@ class ModelTrainer:
             )
 
             # 7. 增量訓練 (使用較小的學習率和較少的樹)
+            report(0.4, "增量訓練")
             new_model = XGBClassifier(
                 n_estimators=50,      # 較少的新樹
                 learning_rate=0.02,   # 較小的學習率
@@ -1376,6 +1359,7 @@ class ModelTrainer:
             improvement = (test_accuracy - base_accuracy) * 100
 
             # 10. 保存新版本
+            report(0.9, "保存模型")
             metrics = {
                 "accuracy": test_accuracy,
                 "f1": test_f1,
@@ -1433,6 +1417,7 @@ class ModelTrainer:
         historical_ratio: float = 0.7,
         performance_ratio: float = 0.3,
         min_samples: int = 100,
+        progress: Optional[Callable[[float, str], None]] = None,
     ) -> Dict[str, Any]:
         """
         V10.41: 混合訓練
@@ -1443,10 +1428,12 @@ class ModelTrainer:
             historical_ratio: 歷史數據比例
             performance_ratio: 績效追蹤數據比例
             min_samples: 最少樣本數
+            progress: 進度回報 progress(0-1, 階段說明)
 
         Returns:
             訓練結果
         """
+        report = progress or (lambda fraction, stage: None)
         try:
             import numpy as np
             import time
@@ -1468,6 +1455,7 @@ class ModelTrainer:
             start_time = time.time()
 
             # 載入所有數據
+            report(0.0, "載入訓練樣本")
             X_all, y_all, feature_names = manager.load_training_samples(
                 sources=["historical", "performance"],
                 min_quality=0.6,
@@ -1480,6 +1468,8 @@ class ModelTrainer:
                 }
 
             logger.info(f"[ModelTrainer] 混合訓練: 共 {len(X_all)} 筆數據")
+            timings = {"load": round(time.time() - start_time, 3)}
+            train_started = time.time()
 
             # 標準化
             scaler = StandardScaler()
@@ -1504,9 +1494,11 @@ class ModelTrainer:
             )
 
             # 交叉驗證
+            report(0.3, "交叉驗證")
             cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='accuracy')
 
             # 完整訓練
+            report(0.7, "訓練模型")
             model.fit(X_train, y_train)
 
             # 測試集評估
@@ -1515,10 +1507,12 @@ class ModelTrainer:
             test_f1 = float(f1_score(y_test, y_pred, zero_division=0))
 
             training_duration = time.time() - start_time
+            timings["train"] = round(time.time() - train_started, 3)
 
             logger.info(f"[ModelTrainer] 混合訓練完成: accuracy={test_accuracy:.4f}, f1={test_f1:.4f}")
 
             # 保存版本
+            report(0.9, "保存模型")
             metrics = {
                 "cv_accuracy": float(np.mean(cv_scores)),
                 "accuracy": test_accuracy,
@@ -1554,6 +1548,7 @@ class ModelTrainer:
                 "test_accuracy": round(test_accuracy, 4),
                 "test_f1": round(test_f1, 4),
                 "training_duration": round(training_duration, 2),
+                "timings": timings,
             }
 
         except Exception as e:
@@ -8,6 +8,9 @@ V10.41: ML 訓練管理器
 - 模型版本管理：保存/載入/回滾版本
 - 訓練策略：完整訓練/增量訓練/混合訓練
 - 經驗回放：防止災難性遺忘
+
+訓練樣本預設存於欄式樣本庫（training_sample_store，分片 .npy + SQLite 索引），
+設定 TRAINING_SAMPLE_BACKEND=database 則沿用 training_samples 資料表。
 """
 
 import os
@@ -27,6 +30,15 @@ CURRENT_DIR = os.path.join(MODELS_DIR, "current")
 VERSIONS_DIR = os.path.join(MODELS_DIR, "versions")
 TRAINING_DATA_DIR = os.path.join(MODELS_DIR, "training_data")
 
+# 訓練樣本存放方式: "columnar" (欄式樣本庫) / "database" (training_samples 資料表)
+TRAINING_SAMPLE_BACKEND = os.getenv("TRAINING_SAMPLE_BACKEND", "columnar")
+
+# 從 training_samples 資料表搬移到欄式樣本庫時每批筆數
+MIGRATE_BATCH_SIZE = 5000
+
+# 寫入 training_samples 資料表時每次 executemany 的筆數（同一交易）
+BULK_INSERT_BATCH_SIZE = 5000
+
 
 class MLTrainingManager:
     """
@@ -45,8 +57,25 @@ class MLTrainingManager:
         manager.incremental_train(new_X, new_y)
     """
 
-    def __init__(self):
+    def __init__(self, sample_backend: str = TRAINING_SAMPLE_BACKEND):
         self._ensure_directories()
+        self.sample_backend = sample_backend
+        self._migrated = False
+        self._sample_index_ready = False
+
+    @property
+    def sample_store(self):
+        """欄式樣本庫（首次使用時搬移資料表中既有的樣本）"""
+        from app.services.training_sample_store import get_sample_store
+
+        store = get_sample_store()
+        if not self._migrated:
+            self._migrated = True
+            try:
+                self._migrate_database_samples(store)
+            except Exception as e:
+                logger.warning(f"[MLManager] 搬移舊訓練樣本失敗: {e}")
+        return store
 
     def _ensure_directories(self):
         """確保所有必要目錄存在"""
@@ -74,11 +103,61 @@ class MLTrainingManager:
         Returns:
             保存結果統計
         """
-        from app.database import SessionLocal, TrainingSample
+        if self.sample_backend == "database":
+            return self._save_samples_database(X, y, feature_names, metadata)
+
+        try:
+            stock_ids = metadata.get("stock_ids", [])
+            dates = metadata.get("dates", [])
+            today = date.today()
+            n = len(X)
+
+            result = self.sample_store.append(
+                X, y,
+                stock_ids=[stock_ids[i] if i < len(stock_ids) else f"unknown_{i}" for i in range(n)],
+                dates=[dates[i] if i < len(dates) else today for i in range(n)],
+                source=metadata.get("source", "historical"),
+                feature_names=feature_names,
+                returns=metadata.get("returns", []),
+                quality_scores=metadata.get("quality_scores", []),
+                predict_days=metadata.get("predict_days", 5),
+            )
+
+            logger.info(f"[MLManager] 保存訓練樣本: {result['saved']} 筆, 跳過: {result['skipped']} 筆")
+
+            return {
+                "success": True,
+                "saved": result["saved"],
+                "skipped": result["skipped"],
+                "total": result["total"],
+            }
+
+        except Exception as e:
+            logger.error(f"[MLManager] 保存訓練樣本失敗: {e}")
+            return {"success": False, "error": str(e)}
+
+    def _save_samples_database(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        feature_names: List[str],
+        metadata: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        保存訓練樣本到 training_samples 資料表
+
+        以 executemany INSERT ... ON CONFLICT DO NOTHING 批次寫入，
+        重複的 (stock_id, sample_date, source) 由唯一索引略過，全部在同一交易內完成。
+        """
+        from sqlalchemy.dialects.sqlite import insert
+        from app.database import SessionLocal, TrainingSample, ensure_training_sample_index
+
+        if not self._sample_index_ready:
+            ensure_training_sample_index()
+            self._sample_index_ready = True
 
         db = SessionLocal()
         saved_count = 0
-        skipped_count = 0
 
         try:
             stock_ids = metadata.get("stock_ids", [])
@@ -88,63 +167,54 @@ class MLTrainingManager:
             quality_scores = metadata.get("quality_scores", [])
             predict_days = metadata.get("predict_days", 5)
 
-            for i in range(len(X)):
-                # 檢查是否已存在相同的樣本
-                stock_id = stock_ids[i] if i < len(stock_ids) else f"unknown_{i}"
-                sample_date = dates[i] if i < len(dates) else date.today()
-
-                # 轉換日期格式
-                if isinstance(sample_date, str):
-                    sample_date = datetime.strptime(sample_date, "%Y-%m-%d").date()
-                elif isinstance(sample_date, datetime):
-                    sample_date = sample_date.date()
-
-                # 檢查重複
-                existing = db.query(TrainingSample).filter(
-                    TrainingSample.stock_id == stock_id,
-                    TrainingSample.sample_date == sample_date,
-                    TrainingSample.source == source
-                ).first()
-
-                if existing:
-                    skipped_count += 1
-                    continue
-
-                # 建立特徵字典
-                features_dict = {
-                    name: float(X[i, j]) if not np.isnan(X[i, j]) else None
-                    for j, name in enumerate(feature_names)
+            today = date.today()
+            created_at = datetime.utcnow()
+            values = np.asarray(X, dtype=float)
+            missing = np.isnan(values)
+
+            def to_date(value):
+                if isinstance(value, str):
+                    return datetime.strptime(value[:10], "%Y-%m-%d").date()
+                if isinstance(value, datetime):
+                    return value.date()
+                return value
+
+            def row(i):
+                features = values[i].tolist()
+                return {
+                    "stock_id": stock_ids[i] if i < len(stock_ids) else f"unknown_{i}",
+                    "sample_date": to_date(dates[i]) if i < len(dates) else today,
+                    "features": {
+                        name: None if missing[i, j] else features[j]
+                        for j, name in enumerate(feature_names)
+                    },
+                    "feature_count": len(feature_names),
+                    "label": int(y[i]),
+                    "actual_return": float(returns[i]) if i < len(returns) else None,
+                    "source": source,
+                    "quality_score": float(quality_scores[i]) if i < len(quality_scores) else 0.6,
+                    "feature_version": "v55",
+                    "predict_days": predict_days,
+                    "created_at": created_at,
                 }
 
-                # 建立樣本記錄
-                sample = TrainingSample(
-                    stock_id=stock_id,
-                    sample_date=sample_date,
-                    features=features_dict,
-                    feature_count=len(feature_names),
-                    label=int(y[i]),
-                    actual_return=float(returns[i]) if i < len(returns) else None,
-                    source=source,
-                    quality_score=float(quality_scores[i]) if i < len(quality_scores) else 0.6,
-                    predict_days=predict_days,
-                )
-
-                db.add(sample)
-                saved_count += 1
-
-                # 每 1000 筆 commit 一次
-                if saved_count % 1000 == 0:
-                    db.commit()
-
+            statement = insert(TrainingSample).on_conflict_do_nothing(
+                index_elements=["stock_id", "sample_date", "source"]
+            )
+            connection = db.connection()
+            for start in range(0, len(values), BULK_INSERT_BATCH_SIZE):
+                rows = [row(i) for i in range(start, min(start + BULK_INSERT_BATCH_SIZE, len(values)))]
+                saved_count += connection.execute(statement, rows).rowcount
             db.commit()
 
+            skipped_count = len(values) - saved_count
             logger.info(f"[MLManager] 保存訓練樣本: {saved_count} 筆, 跳過: {skipped_count} 筆")
 
             return {
                 "success": True,
                 "saved": saved_count,
                 "skipped": skipped_count,
-                "total": len(X),
+                "total": len(values),
             }
 
         except Exception as e:
@@ -173,6 +243,26 @@ class MLTrainingManager:
         Returns:
             (X, y, feature_names)
         """
+        if self.sample_backend == "database":
+            return self._load_samples_database(sources, min_quality, limit, random_sample)
+
+        X, y, feature_names = self.sample_store.load(
+            sources=sources,
+            min_quality=min_quality,
+            limit=limit,
+            random_sample=random_sample,
+        )
+        logger.info(f"[MLManager] 載入訓練樣本: {len(y)} 筆")
+        return X, y, feature_names
+
+    def _load_samples_database(
+        self,
+        sources: Optional[List[str]] = None,
+        min_quality: float = 0.6,
+        limit: Optional[int] = None,
+        random_sample: bool = False,
+    ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """從 training_samples 資料表載入訓練樣本"""
         from app.database import SessionLocal, TrainingSample
 
         db = SessionLocal()
@@ -227,6 +317,9 @@ class MLTrainingManager:
 
     def get_training_stats(self) -> Dict[str, Any]:
         """取得訓練數據統計"""
+        if self.sample_backend != "database":
+            return self.sample_store.get_stats()
+
         from app.database import SessionLocal, TrainingSample
 
         db = SessionLocal()
@@ -275,6 +368,57 @@ class MLTrainingManager:
         finally:
             db.close()
 
+    def _migrate_database_samples(self, store) -> int:
+        """樣本庫為空時，把 training_samples 資料表中的樣本搬移過來（只執行一次）"""
+        if store.count() > 0:
+            return 0
+
+        from app.database import SessionLocal, TrainingSample
+
+        db = SessionLocal()
+        migrated = 0
+        try:
+            query = db.query(TrainingSample).order_by(TrainingSample.source, TrainingSample.id)
+            if query.count() == 0:
+                return 0
+
+            def flush(batch):
+                feature_names = list(batch[0].features.keys())
+                X = np.array([
+                    [np.nan if s.features.get(name) is None else s.features[name] for name in feature_names]
+                    for s in batch
+                ], dtype=np.float32)
+                result = store.append(
+                    X, np.array([s.label for s in batch]),
+                    stock_ids=[s.stock_id for s in batch],
+                    dates=[s.sample_date for s in batch],
+                    source=batch[0].source,
+                    feature_names=feature_names,
+                    returns=[s.actual_return for s in batch],
+                    quality_scores=[s.quality_score for s in batch],
+                    predict_days=batch[0].predict_days or 5,
+                )
+                return result["saved"]
+
+            batch = []
+            for sample in query.yield_per(MIGRATE_BATCH_SIZE):
+                # 每批同一來源、同一特徵集
+                if batch and (
+                    len(batch) >= MIGRATE_BATCH_SIZE
+                    or sample.source != batch[0].source
+                    or sample.features.keys() != batch[0].features.keys()
+                ):
+                    migrated += flush(batch)
+                    batch = []
+                batch.append(sample)
+            if batch:
+                migrated += flush(batch)
+
+            logger.info(f"[MLManager] 已搬移 {migrated} 筆訓練樣本到欄式樣本庫")
+            return migrated
+        finally:
+            db.close()
+
     # ===== 模型版本管理 =====
 
     def save_model_version(
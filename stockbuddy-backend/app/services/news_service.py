@@ -8,12 +8,13 @@ V10.41: 整合 FinBERT 深度學習情緒分析
 """
 
 import asyncio
-import httpx
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 import re
 import xml.etree.ElementTree as ET
 
+from app.services.http_client import get_http_client
+
 # 股票名稱對照（用於新聞搜尋）
 STOCK_NAMES = {
     "2330": "台積電",
@@ -111,9 +112,8 @@ class NewsService:
         # 按時間排序
         unique_news.sort(key=lambda x: x.get("time", ""), reverse=True)
         
-        # 加入情緒分析
-        for news in unique_news:
-            news["sentiment"] = self._analyze_sentiment(news["title"])
+        # 加入情緒分析（整批一次推論）
+        await self._attach_sentiments(unique_news)
         
         # 更新快取
         self.cache[cache_key] = unique_news
@@ -146,8 +146,8 @@ class NewsService:
         for news in news_list:
             if news["title"] not in seen_titles:
                 seen_titles.add(news["title"])
-                news["sentiment"] = self._analyze_sentiment(news["title"])
                 unique_news.append(news)
+        await self._attach_sentiments(unique_news)
         
         unique_news.sort(key=lambda x: x.get("time", ""), reverse=True)
         
@@ -180,8 +180,8 @@ class NewsService:
         for news in news_list:
             if news["title"] not in seen_titles:
                 seen_titles.add(news["title"])
-                news["sentiment"] = self._analyze_sentiment(news["title"])
                 unique_news.append(news)
+        await self._attach_sentiments(unique_news)
         
         unique_news.sort(key=lambda x: x.get("time", ""), reverse=True)
         
@@ -195,7 +195,7 @@ class NewsService:
         try:
             url = f"https://news.google.com/rss/search?q={query}+台股&hl=zh-TW&gl=TW&ceid=TW:zh-Hant"
             
-            async with httpx.AsyncClient(timeout=10) as client:
+            async with get_http_client().session(timeout=10) as client:
                 response = await client.get(url)
                 
                 if response.status_code != 200:
@@ -238,6 +238,29 @@ class NewsService:
             print(f"Yahoo News 錯誤: {e}")
             return []
     
+    async def _attach_sentiments(self, news_list: List[Dict]) -> None:
+        """為新聞列表加入情緒分析（FinBERT 整批推論，重複標題使用快取）"""
+        # 模型推論在執行緒中進行，不阻塞事件迴圈
+        sentiments = await asyncio.to_thread(
+            self._analyze_sentiments, [news["title"] for news in news_list]
+        )
+        for news, sentiment in zip(news_list, sentiments):
+            news["sentiment"] = sentiment
+
+    def _analyze_sentiments(self, texts: List[str]) -> List[Dict]:
+        """批次分析文字情緒，FinBERT 不可用時回退到關鍵字匹配"""
+        if not texts:
+            return []
+
+        analyzer = self._get_finbert()
+        if analyzer is not None:
+            try:
+                return [self._format_finbert(r) for r in analyzer.analyze_batch(texts)]
+            except Exception as e:
+                print(f"[NewsService] FinBERT 批次分析失敗: {e}")
+
+        return [self._analyze_with_keywords(text) for text in texts]
+
     def _analyze_sentiment(self, text: str) -> Dict:
         """
         分析文字情緒
@@ -257,44 +280,52 @@ class NewsService:
         """
         V10.41: 使用 FinBERT 進行情緒分析
         """
-        # 檢查 FinBERT 是否可用
-        if self._finbert_available is False:
+        analyzer = self._get_finbert()
+        if analyzer is None:
             return None
 
         try:
-            # 延遲導入 FinBERT
-            if self._finbert_analyzer is None:
-                from app.services.finbert_sentiment import FinBERTSentiment
-                self._finbert_analyzer = FinBERTSentiment(language="zh")
-                self._finbert_available = True
-
-            # 分析情緒
-            result = self._finbert_analyzer.analyze(text)
-
-            # 轉換為內部格式
-            label_map = {
-                "positive": "利多",
-                "negative": "利空",
-                "neutral": "中性"
-            }
-
-            return {
-                "type": result.label,
-                "score": int(result.probabilities.get("positive", 0.5) * 100),
-                "label": label_map.get(result.label, "中性"),
-                "confidence": result.score,
-                "model": "finbert",  # V10.41: 標記使用的模型
-            }
-
-        except ImportError:
-            # FinBERT 未安裝
-            self._finbert_available = False
-            return None
+            # 分析情緒（分析器內以內容雜湊快取）
+            return self._format_finbert(analyzer.analyze(text))
         except Exception as e:
             # FinBERT 分析失敗，回退到關鍵字
             print(f"[NewsService] FinBERT 分析失敗: {e}")
             return None
 
+    def _get_finbert(self):
+        """延遲建立 FinBERT 分析器（共用全域實例與結果快取），未安裝時回傳 None"""
+        # 檢查 FinBERT 是否可用
+        if self._finbert_available is False:
+            return None
+
+        if self._finbert_analyzer is None:
+            try:
+                from app.services.finbert_sentiment import get_analyzer
+                self._finbert_analyzer = get_analyzer("zh")
+                self._finbert_available = True
+            except ImportError:
+                # FinBERT 未安裝
+                self._finbert_available = False
+                return None
+        return self._finbert_analyzer
+
+    @staticmethod
+    def _format_finbert(result) -> Dict:
+        """FinBERT 結果轉換為內部格式"""
+        label_map = {
+            "positive": "利多",
+            "negative": "利空",
+            "neutral": "中性"
+        }
+
+        return {
+            "type": result.label,
+            "score": int(result.probabilities.get("positive", 0.5) * 100),
+            "label": label_map.get(result.label, "中性"),
+            "confidence": result.score,
+            "model": "finbert",  # V10.41: 標記使用的模型
+        }
+
     def _analyze_with_keywords(self, text: str) -> Dict:
         """
         使用關鍵字匹配進行情緒分析 (回退方案)
@@ -0,0 +1,635 @@
+"""
+本地 OHLCV 歷史資料庫
+
+每檔股票一個目錄，每個欄位一個二進位檔（欄式儲存），讀取時以
+np.memmap 映射，不需整檔載入記憶體：
+
+    data/ohlcv/2330/
+        date.bin    int64   (自 1970-01-01 起的日數)
+        open.bin    float64
+        high.bin    float64
+        low.bin     float64
+        close.bin   float64
+        volume.bin  int64
+        meta.json   {"symbol": "2330.TW", "rows": 1234, "last_date": "2025-01-10", ...}
+
+- 只追加寫入：更新時只向 yfinance 下載最後兩筆起的 K 線
+- 當日 K 線在收盤資料齊全前不寫入（盤中的 K 線尚未定案）；
+  最後一筆若與下載資料日期相同則以新值覆寫
+- 盤中的當日 K 線只保留在記憶體，get_history_sync / get_frame_sync 讀取時附加在最後
+- 收盤資料定案前檢查過的股票，定案後立即重新下載（不等盤後 TTL）
+- meta.json 的 rows 為提交點：追加中斷時，多寫的位元組會在下次寫入前截斷
+- 讀取與寫入共用每檔股票的鎖，整檔重建時不會讀到新舊混合的欄位檔
+- 重啟後直接讀取本地資料，不需再打網路請求
+- yfinance 為還原權值股價，除權息後舊資料會被重新調整；
+  增量更新時比對倒數第二筆（已定案的舊 K 線），不一致則整檔重建（多檔一次下載）
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.cache_service import SmartTTL
+
+# 資料存儲路徑
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+OHLCV_DIR = DATA_DIR / "ohlcv"
+
+# 欄位定義（檔名 → dtype）
+COLUMNS = {
+    "date": np.int64,
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+}
+
+# 首次建檔下載的期間（月）；訓練要求更長期間時會自動重建
+BOOTSTRAP_MONTHS = 24
+
+# 增量更新時比對重疊 K 線的容忍誤差（相對）
+ADJUST_TOLERANCE = 1e-4
+
+# 當日 K 線定案的時間（13:30 收盤，盤後資料約 14:30 前完成）
+BAR_FINAL_TIME = dt_time(14, 30)
+
+# 盤中 K 線開始的時間（開盤）
+BAR_OPEN_TIME = dt_time(9, 0)
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _period_to_months(period: str) -> int:
+    """將 yfinance 期間字串（60d / 3mo / 1y / max）轉為月數"""
+    period = period.strip().lower()
+    if period == "max":
+        return 12 * 30
+    if period.endswith("mo"):
+        return int(period[:-2])
+    if period.endswith("d"):
+        return max(1, -(-int(period[:-1]) // 30))
+    if period.endswith("y"):
+        return int(period[:-1]) * 12
+    raise ValueError(f"無法解析期間: {period}")
+
+
+def _to_day(d: date) -> int:
+    return (d - _EPOCH).days
+
+
+def _from_day(day: int) -> date:
+    return _EPOCH + timedelta(days=int(day))
+
+
+def _last_final_day(now: Optional[datetime] = None) -> int:
+    """已定案的最後一個日期（收盤資料齊全前為昨天）"""
+    now = now or datetime.now()
+    day = now.date()
+    if now.time() < BAR_FINAL_TIME:
+        day -= timedelta(days=1)
+    return _to_day(day)
+
+
+def _live_session(now: datetime) -> bool:
+    """當日 K 線是否尚未定案（交易日開盤後、收盤資料齊全前）"""
+    return now.weekday() < 5 and BAR_OPEN_TIME <= now.time() < BAR_FINAL_TIME
+
+
+class OHLCVStore:
+    """
+    本地 OHLCV 歷史資料庫（欄式、memory-mapped、只追加）
+
+    使用方式：
+        store = get_ohlcv_store()
+
+        # 同步（執行緒池 / 訓練腳本）
+        hist = store.get_history_sync("2330", months=2)   # List[Dict]
+        df = store.get_frame_sync("2330", period="5y")    # pandas DataFrame
+
+        # 非同步（API）：透過 TWSEBulkService.get_stock_history_yf
+    """
+
+    def __init__(self, root: Path = OHLCV_DIR):
+        self.root = Path(root)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # 盤中的當日 K 線（不寫入檔案）：{股票代號: {"checked": 檢查日期, "bar": K 線或 None}}
+        self._live: Dict[str, Dict[str, Any]] = {}
+
+    # ============================================================
+    # 讀取
+    # ============================================================
+
+    def read_columns(self, stock_id: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        以 memmap 讀取所有欄位（唯讀、零複製）
+
+        Returns:
+            {欄位: ndarray}，無本地資料時回傳 None
+        """
+        # 與 rewrite 共用鎖：meta 的 rows 與欄位檔必須來自同一版本
+        with self._lock_for(stock_id):
+            meta = self.read_meta(stock_id)
+            if not meta or meta.get("rows", 0) <= 0:
+                return None
+
+            rows = meta["rows"]
+            symbol_dir = self._symbol_dir(stock_id)
+            return {
+                name: np.memmap(symbol_dir / f"{name}.bin", dtype=dtype, mode="r", shape=(rows,))
+                for name, dtype in COLUMNS.items()
+            }
+
+    def read_meta(self, stock_id: str) -> Optional[Dict[str, Any]]:
+        """讀取 meta.json"""
+        meta_file = self._symbol_dir(stock_id) / "meta.json"
+        try:
+            with open(meta_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"讀取 OHLCV meta 失敗 {stock_id}: {e}")
+            return None
+
+    def last_date(self, stock_id: str) -> Optional[date]:
+        """本地最後一筆 K 線日期"""
+        meta = self.read_meta(stock_id)
+        if not meta or not meta.get("last_date"):
+            return None
+        return date.fromisoformat(meta["last_date"])
+
+    def read_history(self, stock_id: str, months: Optional[int] = None,
+                     live: bool = False) -> List[Dict[str, Any]]:
+        """
+        讀取本地歷史資料（與 TWSEBulkService.get_stock_history_yf 相同格式）
+
+        Args:
+            months: 只取最近 N 個月（以最後一筆日期往回推），None 為全部
+            live: 盤中附加尚未定案的當日 K 線
+        """
+        cols = self.read_columns(stock_id)
+        if cols is None:
+            return []
+
+        start = self._start_index(cols["date"], months)
+        days = cols["date"][start:]
+        opens = cols["open"][start:]
+        highs = cols["high"][start:]
+        lows = cols["low"][start:]
+        closes = cols["close"][start:]
+        volumes = cols["volume"][start:]
+
+        history = [
+            {
+                "date": _from_day(days[i]).isoformat(),
+                "open": float(opens[i]),
+                "high": float(highs[i]),
+                "low": float(lows[i]),
+                "close": float(closes[i]),
+                "volume": int(volumes[i]),
+            }
+            for i in range(len(days))
+        ]
+
+        live_bar = self._live_bar(stock_id, cols["date"]) if live else None
+        if live_bar:
+            history.append(live_bar)
+        return history
+
+    def read_frame(self, stock_id: str, months: Optional[int] = None, live: bool = False):
+        """
+        讀取本地歷史資料為 DataFrame（欄位與 yf.Ticker.history 相同）
+
+        索引為 Asia/Taipei 時區的 DatetimeIndex，可直接與 yfinance 資料對齊；
+        live 為 True 時盤中附加尚未定案的當日 K 線
+        """
+        import pandas as pd
+
+        cols = self.read_columns(stock_id)
+        if cols is None:
+            return pd.DataFrame(columns=["Open", "High", "Low", "Close", "Volume"])
+
+        start = self._start_index(cols["date"], months)
+        days = np.asarray(cols["date"][start:])
+        columns = {
+            "Open": np.asarray(cols["open"][start:]),
+            "High": np.asarray(cols["high"][start:]),
+            "Low": np.asarray(cols["low"][start:]),
+            "Close": np.asarray(cols["close"][start:]),
+            "Volume": np.asarray(cols["volume"][start:]),
+        }
+
+        live_bar = self._live_bar(stock_id, cols["date"]) if live else None
+        if live_bar:
+            days = np.append(days, _to_day(date.fromisoformat(live_bar["date"])))
+            for name in columns:
+                columns[name] = np.append(columns[name], live_bar[name.lower()])
+
+        index = pd.DatetimeIndex(days.astype("datetime64[D]")).tz_localize("Asia/Taipei")
+        return pd.DataFrame(columns, index=index)
+
+    # ============================================================
+    # 寫入
+    # ============================================================
+
+    def append(self, stock_id: str, bars: List[Dict[str, Any]], symbol: Optional[str] = None) -> int:
+        """
+        追加 K 線（寫入日期晚於本地最後一筆者；與最後一筆同日者覆寫最後一筆）
+
+        Returns:
+            實際寫入筆數（含覆寫）
+        """
+        with self._lock_for(stock_id):
+            meta = self.read_meta(stock_id) or {}
+            committed = meta.get("rows", 0)
+            rows = committed
+            last_day = _to_day(date.fromisoformat(meta["last_date"])) if meta.get("last_date") else None
+
+            new_bars = self._normalize(bars)
+            if last_day is not None and rows > 0:
+                if any(b[0] == last_day for b in new_bars):
+                    # 覆寫最後一筆：新資料從 rows - 1 開始寫
+                    rows -= 1
+                    new_bars = [b for b in new_bars if b[0] >= last_day]
+                else:
+                    new_bars = [b for b in new_bars if b[0] > last_day]
+            if not new_bars:
+                self._touch(stock_id, meta, symbol)
+                return 0
+
+            symbol_dir = self._symbol_dir(stock_id)
+            symbol_dir.mkdir(parents=True, exist_ok=True)
+
+            arrays = self._to_arrays(new_bars)
+            for name, dtype in COLUMNS.items():
+                path = symbol_dir / f"{name}.bin"
+                itemsize = np.dtype(dtype).itemsize
+                with open(path, "r+b" if path.exists() else "wb") as f:
+                    # 截斷上次中斷時超出 rows 的殘留資料（不截到已提交的資料，避免讀取中的 memmap 失效）
+                    f.truncate(committed * itemsize)
+                    f.seek(rows * itemsize)
+                    f.write(arrays[name].tobytes())
+
+            meta.update({
+                "rows": rows + len(new_bars),
+                "first_date": meta.get("first_date") or _from_day(new_bars[0][0]).isoformat(),
+                "last_date": _from_day(new_bars[-1][0]).isoformat(),
+            })
+            self._touch(stock_id, meta, symbol)
+            return len(new_bars)
+
+    def rewrite(self, stock_id: str, bars: List[Dict[str, Any]], symbol: Optional[str] = None,
+                coverage_months: Optional[int] = None) -> int:
+        """整檔重建（除權息調整或需要更長歷史時使用）"""
+        with self._lock_for(stock_id):
+            symbol_dir = self._symbol_dir(stock_id)
+            symbol_dir.mkdir(parents=True, exist_ok=True)
+
+            new_bars = self._normalize(bars)
+            arrays = self._to_arrays(new_bars)
+            for name in COLUMNS:
+                tmp = symbol_dir / f"{name}.bin.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(arrays[name].tobytes())
+                os.replace(tmp, symbol_dir / f"{name}.bin")
+
+            meta = {
+                "rows": len(new_bars),
+                "first_date": _from_day(new_bars[0][0]).isoformat() if new_bars else None,
+                "last_date": _from_day(new_bars[-1][0]).isoformat() if new_bars else None,
+                "coverage_months": coverage_months,
+            }
+            self._touch(stock_id, meta, symbol)
+            return len(new_bars)
+
+    def delete(self, stock_id: str) -> None:
+        """刪除單一股票的本地資料"""
+        with self._lock_for(stock_id):
+            symbol_dir = self._symbol_dir(stock_id)
+            if symbol_dir.exists():
+                for path in symbol_dir.iterdir():
+                    path.unlink()
+                symbol_dir.rmdir()
+
+    # ============================================================
+    # 增量更新（yfinance）
+    # ============================================================
+
+    def needs_refresh(self, stock_id: str, months: int, now: Optional[datetime] = None) -> bool:
+        """判斷是否需要向上游更新"""
+        meta = self.read_meta(stock_id)
+        if not meta:
+            return True
+
+        # 本地涵蓋的歷史不足（rows 為 0 表示上游查無此股票，同樣在 TTL 內不重查）
+        if (meta.get("coverage_months") or 0) < months:
+            return True
+
+        now = now or datetime.now()
+        checked_at = meta.get("checked_at", 0)
+
+        # 上次檢查時最新 K 線尚未定案：定案後立即補上，不等盤後 TTL
+        final_day = _last_final_day(now)
+        final_at = datetime.combine(_from_day(final_day), BAR_FINAL_TIME).timestamp()
+        last_date = meta.get("last_date")
+        if last_date and _to_day(date.fromisoformat(last_date)) < final_day and checked_at < final_at:
+            return True
+
+        # 盤中尚未取得當日 K 線（例如重啟後）
+        if _live_session(now) and self._live.get(stock_id, {}).get("checked") != now.date().isoformat():
+            return True
+
+        # 在智能 TTL 內已檢查過，不重複請求（假日也不會一直重抓）
+        return now.timestamp() - checked_at > SmartTTL.get_ttl("history")
+
+    def refresh_sync(self, stock_id: str, months: int = BOOTSTRAP_MONTHS) -> int:
+        """
+        同步增量更新單一股票（於執行緒池中呼叫）
+
+        Returns:
+            新增筆數
+        """
+        return self.refresh_many_sync([stock_id], months).get(stock_id, 0)
+
+    def refresh_many_sync(self, stock_ids: List[str], months: int = BOOTSTRAP_MONTHS,
+                          force: bool = False) -> Dict[str, int]:
+        """
+        同步批量增量更新（多檔一次 yf.download）
+
+        - 無本地資料或涵蓋期間不足：下載 max(months, BOOTSTRAP_MONTHS) 個月後重建
+        - 已有資料：從倒數第二筆（含）開始下載，比對該筆後追加（最後一筆以新值覆寫）
+        - 倒數第二筆收盤價改變（除權息還原）的股票，以一次多檔下載整檔重建
+        - 收盤資料齊全前，當日的 K 線一律不寫入，只保留在記憶體供盤中讀取
+
+        Args:
+            force: 忽略 TTL，全部向上游檢查（盤後快照等需要當日定案 K 線時）
+
+        Returns:
+            {股票代號: 新增筆數}
+        """
+        months = max(months, BOOTSTRAP_MONTHS)
+        stale = [sid for sid in dict.fromkeys(stock_ids) if force or self.needs_refresh(sid, months)]
+        if not stale:
+            return {}
+
+        bootstrap: List[str] = []
+        incremental: Dict[str, date] = {}
+        for sid in stale:
+            meta = self.read_meta(sid)
+            if not meta or not meta.get("rows") or (meta.get("coverage_months") or 0) < months:
+                bootstrap.append(sid)
+            else:
+                incremental[sid] = self._overlap_date(sid) or date.fromisoformat(meta["last_date"])
+
+        written: Dict[str, int] = {}
+
+        if bootstrap:
+            fetched = self._download(bootstrap, start=self._months_ago(months))
+            for sid, (symbol, bars) in fetched.items():
+                self._remember_live(sid, bars)
+                written[sid] = self.rewrite(sid, self._final_bars(bars), symbol=symbol, coverage_months=months)
+
+            # 有取得部分資料才標記查無資料的股票（全部失敗多半是網路問題）
+            if fetched:
+                for sid in bootstrap:
+                    if sid not in fetched:
+                        self.rewrite(sid, [], coverage_months=months)
+
+        if incremental:
+            start = min(incremental.values())
+            known = {sid: (self.read_meta(sid) or {}).get("symbol") for sid in incremental}
+            fetched = self._download(list(incremental), start=start, known_symbols=known)
+            rebuild: List[str] = []
+            for sid, (symbol, bars) in fetched.items():
+                self._remember_live(sid, bars)
+                if self._overlap_changed(sid, bars):
+                    rebuild.append(sid)
+                    continue
+                written[sid] = self.append(sid, self._final_bars(bars), symbol=symbol)
+
+            if rebuild:
+                # 除權息後還原股價改變，整檔重建（一次下載）
+                known = {sid: fetched[sid][0] for sid in rebuild}
+                full = self._download(rebuild, start=self._months_ago(months), known_symbols=known)
+                for sid, (symbol, bars) in full.items():
+                    written[sid] = self.rewrite(sid, self._final_bars(bars), symbol=symbol, coverage_months=months)
+
+        # 沒有新資料的股票也記錄檢查時間
+        today = date.today().isoformat()
+        for sid in stale:
+            if self._live.get(sid, {}).get("checked") != today:
+                self._live[sid] = {"checked": today, "bar": None}
+            if sid not in written:
+                meta = self.read_meta(sid)
+                if meta:
+                    with self._lock_for(sid):
+                        self._touch(sid, meta, None)
+
+        return written
+
+    def get_history_sync(self, stock_id: str, months: int = 2) -> List[Dict[str, Any]]:
+        """同步取得歷史資料（必要時先增量更新；盤中含當日 K 線）"""
+        if self.needs_refresh(stock_id, months):
+            self.refresh_sync(stock_id, months)
+        return self.read_history(stock_id, months, live=True)
+
+    def get_frame_sync(self, stock_id: str, period: str = "1y"):
+        """同步取得歷史 DataFrame（必要時先增量更新；盤中含當日 K 線），取代 yf.Ticker(...).history(period)"""
+        months = _period_to_months(period)
+        if self.needs_refresh(stock_id, months):
+            self.refresh_sync(stock_id, months)
+        return self.read_frame(stock_id, months, live=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """本地資料庫統計"""
+        if not self.root.exists():
+            return {"symbols": 0, "rows": 0, "bytes": 0, "path": str(self.root)}
+
+        symbols = 0
+        rows = 0
+        size = 0
+        for symbol_dir in self.root.iterdir():
+            if not symbol_dir.is_dir():
+                continue
+            meta = self.read_meta(symbol_dir.name)
+            if not meta:
+                continue
+            symbols += 1
+            rows += meta.get("rows", 0)
+            size += sum(p.stat().st_size for p in symbol_dir.iterdir())
+
+        return {"symbols": symbols, "rows": rows, "bytes": size, "path": str(self.root)}
+
+    # ============================================================
+    # 內部工具
+    # ============================================================
+
+    def _symbol_dir(self, stock_id: str) -> Path:
+        return self.root / stock_id.replace("^", "_")
+
+    def _lock_for(self, stock_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._locks.get(stock_id)
+            if lock is None:
+                lock = self._locks[stock_id] = threading.Lock()
+            return lock
+
+    def _touch(self, stock_id: str, meta: Dict[str, Any], symbol: Optional[str]) -> None:
+        """寫入 meta.json（原子替換）並更新檢查時間"""
+        if symbol:
+            meta["symbol"] = symbol
+        meta["checked_at"] = time.time()
+        meta["updated_at"] = datetime.now().isoformat()
+
+        symbol_dir = self._symbol_dir(stock_id)
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        tmp = symbol_dir / "meta.json.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, symbol_dir / "meta.json")
+
+    def _overlap_date(self, stock_id: str) -> Optional[date]:
+        """增量更新的比對日期（倒數第二筆；只有一筆時為 None）"""
+        cols = self.read_columns(stock_id)
+        if cols is None or len(cols["date"]) < 2:
+            return None
+        return _from_day(cols["date"][-2])
+
+    def _overlap_changed(self, stock_id: str, bars: List[Dict[str, Any]]) -> bool:
+        """
+        比對下載資料與本地倒數第二筆收盤價是否一致
+
+        最後一筆可能是舊版寫入的盤中 K 線，改變時直接覆寫，不視為除權息調整
+        """
+        cols = self.read_columns(stock_id)
+        if cols is None or len(cols["date"]) < 2:
+            return False
+
+        check_day = int(cols["date"][-2])
+        check_close = float(cols["close"][-2])
+        for b in bars:
+            if _to_day(date.fromisoformat(b["date"][:10])) == check_day:
+                return abs(b["close"] - check_close) > ADJUST_TOLERANCE * max(abs(check_close), 1.0)
+        return False
+
+    def _remember_live(self, stock_id: str, bars: List[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+        """記錄下載資料中尚未定案的當日 K 線（盤中讀取時附加）"""
+        now = now or datetime.now()
+        today = now.date().isoformat()
+        unfinished = [b for b in bars if b["date"][:10] == today and _to_day(now.date()) > _last_final_day(now)]
+        bar = None
+        if unfinished:
+            b = unfinished[-1]
+            bar = {
+                "date": today,
+                "open": float(b["open"]),
+                "high": float(b["high"]),
+                "low": float(b["low"]),
+                "close": float(b["close"]),
+                "volume": int(b["volume"]),
+            }
+        self._live[stock_id] = {"checked": today, "bar": bar}
+
+    def _live_bar(self, stock_id: str, days: np.ndarray) -> Optional[Dict[str, Any]]:
+        """今日尚未定案的 K 線（晚於本地最後一筆時才回傳）"""
+        bar = (self._live.get(stock_id) or {}).get("bar")
+        if not bar or bar["date"] != date.today().isoformat():
+            return None
+        if len(days) and _to_day(date.fromisoformat(bar["date"])) <= int(days[-1]):
+            return None
+        return bar
+
+    @staticmethod
+    def _final_bars(bars: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """移除尚未定案的 K 線（收盤資料齊全前的當日 K 線）"""
+        last_day = _from_day(_last_final_day(now)).isoformat()
+        return [b for b in bars if b["date"][:10] <= last_day]
+
+    @staticmethod
+    def _start_index(days: np.ndarray, months: Optional[int]) -> int:
+        if months is None or len(days) == 0:
+            return 0
+        cutoff = int(days[-1]) - int(months * 30.44)
+        return int(np.searchsorted(days, cutoff, side="right"))
+
+    @staticmethod
+    def _normalize(bars: List[Dict[str, Any]]) -> List[tuple]:
+        """轉為 (day, open, high, low, close, volume) 並依日期排序去重"""
+        by_day = {}
+        for b in bars:
+            day = _to_day(date.fromisoformat(b["date"][:10]))
+            by_day[day] = (day, b["open"], b["high"], b["low"], b["close"], b["volume"])
+        return [by_day[d] for d in sorted(by_day)]
+
+    @staticmethod
+    def _to_arrays(rows: List[tuple]) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for i, (name, dtype) in enumerate(COLUMNS.items()):
+            arrays[name] = np.array([r[i] for r in rows], dtype=dtype)
+        return arrays
+
+    @staticmethod
+    def _months_ago(months: int) -> date:
+        return date.today() - timedelta(days=int(months * 30.44) + 7)
+
+    @staticmethod
+    def _download(stock_ids: List[str], start: date,
+                  known_symbols: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, tuple]:
+        """
+        以 yf.download 批量下載
+
+        已知 yfinance 代號者直接使用其後綴；其餘先上市 (.TW) 後上櫃 (.TWO)；
+        指數（^ 開頭）不加後綴
+
+        Returns:
+            {股票代號: (yfinance 代號, bars)}
+        """
+        from app.services.twse_bulk import TWSEBulkService
+
+        start = start.isoformat()
+        known_symbols = known_symbols or {}
+
+        # 依後綴分組
+        groups: Dict[str, List[str]] = {}
+        unknown: List[str] = []
+        for sid in stock_ids:
+            symbol = known_symbols.get(sid)
+            if sid.startswith("^"):
+                groups.setdefault("", []).append(sid)
+            elif symbol and "." in symbol:
+                groups.setdefault(symbol[symbol.index("."):], []).append(sid)
+            else:
+                unknown.append(sid)
+
+        result: Dict[str, tuple] = {}
+        for suffix, ids in groups.items():
+            fetched = TWSEBulkService._download_symbols_sync(ids, suffix, start)
+            result.update({sid: (f"{sid}{suffix}", bars) for sid, bars in fetched.items()})
+
+        for suffix in (".TW", ".TWO"):
+            if not unknown:
+                break
+            fetched = TWSEBulkService._download_symbols_sync(unknown, suffix, start)
+            result.update({sid: (f"{sid}{suffix}", bars) for sid, bars in fetched.items()})
+            unknown = [sid for sid in unknown if sid not in fetched]
+
+        return result
+
+
+# 全域實例
+_ohlcv_store: Optional[OHLCVStore] = None
+
+
+def get_ohlcv_store() -> OHLCVStore:
+    global _ohlcv_store
+    if _ohlcv_store is None:
+        _ohlcv_store = OHLCVStore()
+    return _ohlcv_store
@@ -0,0 +1,513 @@
+"""
+投資組合回測（多股票）
+
+每隔 rebalance_days 個交易日，依評分把資金等權重配置到前 N 名股票，
+追蹤現金、手續費、交易稅與滑點，用來驗證選股結果在多年期間的績效。
+
+資料以日期對齊的價格矩陣（T 日 × N 檔）表示：
+- 評分一次計算整個矩陣（各指標沿時間軸向量化）
+- 每日淨值、調倉張數、費用都是整列陣列運算，不需逐檔查字典
+
+評分方式：
+- technical：重播 AIStockPicker 的技術面評分（均線 / RSI / MACD / 量能）與初步篩選條件
+  （基本面、籌碼、新聞沒有歷史資料，無法重播）
+- momentum：20 日報酬率
+- 也可傳入自訂函數 scorer(matrix) -> ndarray[T, N]
+
+績效統計沿用 BacktestEngine.calculate_stats，格式與單檔回測相同。
+"""
+
+import asyncio
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.services import indicator_engine
+from app.services.backtest_engine import BacktestEngine
+
+# 交易成本（與 BacktestEngine.buy / sell 相同）
+FEE_RATE = 0.001425   # 手續費 0.1425%
+TAX_RATE = 0.003      # 交易稅 0.3%
+
+# 回測開始前額外載入的暖機期間（月），供 MA60 等指標使用
+WARMUP_MONTHS = 4
+
+# 回傳的最近交易筆數
+MAX_TRADES_RETURNED = 50
+
+
+# ============================================================
+# 價格矩陣
+# ============================================================
+
+class PriceMatrix:
+    """
+    日期對齊的價格矩陣
+
+    close / volume 為 T × N 陣列，該股票當日無交易（未上市、停牌）時為 NaN
+    """
+
+    def __init__(self, stock_ids: List[str], days: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        self.stock_ids = stock_ids
+        self.days = days      # 自 1970-01-01 起的天數（int64）
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Dict[str, np.ndarray]]) -> "PriceMatrix":
+        """
+        由各股票的欄位陣列建立（OHLCVStore.read_columns 的格式）
+
+        Args:
+            columns: {stock_id: {"date": int64 天數, "close": ..., "volume": ...}}
+        """
+        stock_ids = [sid for sid, cols in columns.items() if cols is not None and len(cols["date"])]
+        if not stock_ids:
+            empty = np.empty((0, 0))
+            return cls([], np.empty(0, dtype=np.int64), empty, empty.copy())
+
+        days = np.unique(np.concatenate([np.asarray(columns[sid]["date"]) for sid in stock_ids]))
+        close = np.full((len(days), len(stock_ids)), np.nan)
+        volume = np.full((len(days), len(stock_ids)), np.nan)
+
+        for j, sid in enumerate(stock_ids):
+            cols = columns[sid]
+            rows = np.searchsorted(days, np.asarray(cols["date"]))
+            close[rows, j] = cols["close"]
+            volume[rows, j] = cols["volume"]
+
+        return cls(stock_ids, days, close, volume)
+
+    @classmethod
+    def from_histories(cls, histories: Dict[str, List[Dict[str, Any]]]) -> "PriceMatrix":
+        """由 [{"date": "YYYY-MM-DD", "close", "volume"}] 格式的歷史資料建立"""
+        return cls.from_columns({
+            sid: {
+                "date": np.array([h["date"][:10] for h in history], dtype="datetime64[D]").astype(np.int64),
+                "close": np.array([h["close"] for h in history], dtype=np.float64),
+                "volume": np.array([h.get("volume", 0) for h in history], dtype=np.float64),
+            }
+            for sid, history in histories.items() if history
+        })
+
+    @property
+    def dates(self) -> List[str]:
+        return self.days.astype("datetime64[D]").astype(str).tolist()
+
+    def slice(self, start: int, end: int) -> "PriceMatrix":
+        """依列（日期）切片"""
+        return PriceMatrix(self.stock_ids, self.days[start:end], self.close[start:end], self.volume[start:end])
+
+    def filled_close(self) -> np.ndarray:
+        """向前填補的收盤價（停牌日沿用前一個收盤價，用於估值）"""
+        return _ffill(self.close)
+
+
+def _ffill(values: np.ndarray) -> np.ndarray:
+    """沿時間軸向前填補 NaN"""
+    mask = np.isnan(values)
+    index = np.where(~mask, np.arange(values.shape[0])[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = values[index, np.arange(values.shape[1])]
+    # 第一筆之前仍為 NaN
+    return np.where(np.maximum.accumulate(~mask, axis=0), filled, np.nan)
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """沿時間軸的移動平均，視窗內有 NaN 時為 NaN"""
+    valid = ~np.isnan(values)
+    csum = np.cumsum(np.where(valid, values, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    csum = np.vstack([np.zeros((1, values.shape[1])), csum])
+    ccount = np.vstack([np.zeros((1, values.shape[1]), dtype=ccount.dtype), ccount])
+
+    result = np.full(values.shape, np.nan)
+    if values.shape[0] >= window:
+        sums = csum[window:] - csum[:-window]
+        counts = ccount[window:] - ccount[:-window]
+        result[window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return result
+
+
+# ============================================================
+# 評分
+# ============================================================
+
+def technical_scores(matrix: PriceMatrix) -> np.ndarray:
+    """
+    重播 AIStockPicker._analyze_technical 的評分（T × N，資料不足或未通過篩選為 NaN）
+
+    - 均線：價 > MA5 > MA20 +15、價 > MA5 +8、價 < MA5 < MA20 -10；價 > MA60 +10
+    - RSI（14 日簡單平均）：40~60 +10、30~40 +15、<30 +20、60~70 +5、>80 -10
+    - MACD：DIF > 0 +15、DIF < 0 -10（選股器的訊號線為 0.8 × DIF；
+      EMA 以完整歷史計算，選股器只用近 3 個月起算，DIF 接近 0 時正負可能不同）
+    - 量能：量比 >2 +15、>1.5 +10、<0.5 -5
+    - 初步篩選：股價 10~2000、成交量 ≥ 100,000 股、未跌停
+    """
+    close = matrix.filled_close()
+    volume = matrix.volume
+    price = close
+
+    ma5 = _rolling_mean(close, 5)
+    ma20 = _rolling_mean(close, 20)
+    ma60 = _rolling_mean(close, 60)
+
+    # RSI（14 日漲跌簡單平均）
+    delta = np.vstack([np.full((1, close.shape[1]), np.nan), np.diff(close, axis=0)])
+    avg_gain = _rolling_mean(np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0)), 14)
+    avg_loss = _rolling_mean(np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0)), 14)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+
+    # MACD（DIF 正負）
+    dif = np.full(close.shape, np.nan)
+    for j in range(close.shape[1]):
+        valid = np.flatnonzero(~np.isnan(close[:, j]))
+        if len(valid) >= 26:
+            series = close[valid[0]:, j]
+            dif[valid[0]:, j] = indicator_engine.ema(series, 12) - indicator_engine.ema(series, 26)
+            dif[valid[0]:valid[0] + 25, j] = np.nan
+
+    # 量比
+    avg_volume = _rolling_mean(volume, 20)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volume_ratio = np.where(avg_volume > 0, volume / avg_volume, 1.0)
+
+    score = np.full(close.shape, 50.0)
+    score += np.select(
+        [(price > ma5) & (ma5 > ma20), price > ma5, (price < ma5) & (ma5 < ma20)],
+        [15, 8, -10], 0,
+    )
+    score += np.where(price > ma60, 10, 0)
+    score += np.select(
+        [(rsi >= 40) & (rsi <= 60), (rsi >= 30) & (rsi < 40), rsi < 30, (rsi > 60) & (rsi <= 70), rsi > 80],
+        [10, 15, 20, 5, -10], 0,
+    )
+    score += np.select([dif > 0, dif < 0], [15, -10], 0)
+    score += np.select([volume_ratio > 2, volume_ratio > 1.5, volume_ratio < 0.5], [15, 10, -5], 0)
+    score = np.clip(score, 0, 100)
+
+    # 初步篩選
+    prev_close = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = (close - prev_close) / prev_close * 100
+    passed = (
+        (matrix.close >= 10) & (matrix.close <= 2000)
+        & (volume >= 100000)
+        & ~(change_pct <= -9.5)
+    )
+
+    ready = ~np.isnan(ma60) & ~np.isnan(rsi) & ~np.isnan(dif) & ~np.isnan(avg_volume)
+    return np.where(ready & passed, score, np.nan)
+
+
+def momentum_scores(matrix: PriceMatrix, period: int = 20) -> np.ndarray:
+    """N 日報酬率（%）"""
+    close = matrix.filled_close()
+    past = np.vstack([np.full((period, close.shape[1]), np.nan), close[:-period]])[:len(close)]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (close - past) / past * 100
+
+
+SCORERS: Dict[str, Callable[[PriceMatrix], np.ndarray]] = {
+    "technical": technical_scores,
+    "momentum": momentum_scores,
+}
+
+
+# ============================================================
+# 回測
+# ============================================================
+
+class PortfolioBacktester:
+    """投資組合回測器"""
+
+    def __init__(
+        self,
+        initial_capital: float = 1000000,
+        top_n: int = 10,
+        rebalance_days: int = 5,
+        min_score: Optional[float] = None,
+        lot_size: int = 100,  # 最小交易單位（零股 100 股，整張 1000 股）
+        drift_tolerance: float = 0.25,  # 續抱股票與目標股數差距在此比例內不調整
+        slippage_rate: float = 0.001,
+        enable_slippage: bool = True,
+    ):
+        if top_n <= 0 or rebalance_days <= 0:
+            raise ValueError("top_n 與 rebalance_days 必須大於 0")
+
+        self.initial_capital = initial_capital
+        self.top_n = top_n
+        self.rebalance_days = rebalance_days
+        self.min_score = min_score
+        self.lot_size = lot_size
+        self.drift_tolerance = drift_tolerance
+        self.slippage_rate = slippage_rate
+        self.enable_slippage = enable_slippage
+
+    def run(self, matrix: PriceMatrix, scores: np.ndarray, start_index: int = 0) -> Dict[str, Any]:
+        """
+        執行回測
+
+        Args:
+            matrix: 價格矩陣
+            scores: 與 matrix.close 同形狀的評分（越高越好，NaN 表示不可選）
+            start_index: 開始交易的日期列（之前的資料只作為指標暖機）
+        """
+        T, N = matrix.close.shape
+        if start_index >= T:
+            return {"error": "回測期間無資料"}
+
+        engine = BacktestEngine(self.initial_capital, self.slippage_rate, self.enable_slippage)
+        slip = self.slippage_rate if self.enable_slippage else 0.0
+        lot = self.lot_size
+
+        close = matrix.filled_close()
+        traded = ~np.isnan(matrix.close)
+        dates = matrix.dates
+        stock_ids = np.array(matrix.stock_ids)
+
+        cash = float(self.initial_capital)
+        shares = np.zeros(N, dtype=np.int64)
+        avg_cost = np.zeros(N)
+        total_fees = total_tax = turnover = 0.0
+        rebalances = 0
+
+        for t in range(start_index, T):
+            price = close[t]
+            marked = np.nan_to_num(price)
+
+            if (t - start_index) % self.rebalance_days == 0:
+                rebalances += 1
+                equity = cash + float(shares @ marked)
+
+                # 選出前 N 名
+                score = scores[t]
+                eligible = traded[t] & ~np.isnan(score)
+                if self.min_score is not None:
+                    eligible &= score >= self.min_score
+                ranked = np.argsort(-np.where(eligible, score, -np.inf), kind="stable")[:self.top_n]
+                selected = ranked[eligible[ranked]]
+
+                # 目標股數（等權重，每檔 1/top_n；當日無交易的股票維持原持股）
+                target = np.zeros(N, dtype=np.int64)
+                if selected.size:
+                    per_stock = equity / self.top_n
+                    buy_price = price[selected] * (1 + slip) * (1 + FEE_RATE)
+                    target[selected] = (np.floor(per_stock / buy_price / lot) * lot).astype(np.int64)
+                target = np.where(traded[t], target, shares)
+                delta = target - shares
+
+                # 續抱股票權重偏離不大時不調整，避免每次調倉都產生小額交易
+                drift_ok = (shares > 0) & (target > 0) & (np.abs(delta) <= self.drift_tolerance * target)
+                delta[drift_ok] = 0
+
+                # 先賣後買
+                sells = np.flatnonzero(delta < 0)
+                if sells.size:
+                    qty = -delta[sells]
+                    actual = price[sells] * (1 - slip)
+                    proceeds = actual * qty
+                    fee = proceeds * FEE_RATE
+                    tax = proceeds * TAX_RATE
+                    net = proceeds - fee - tax
+                    cost_basis = avg_cost[sells] * qty
+                    profit = net - cost_basis
+                    slippage = (price[sells] - actual) * qty
+
+                    cash += float(net.sum())
+                    shares[sells] -= qty
+                    avg_cost[shares == 0] = 0.0
+                    total_fees += float(fee.sum())
+                    total_tax += float(tax.sum())
+                    turnover += float(proceeds.sum())
+
+                    for k in range(sells.size):
+                        engine.trades.append({
+                            "date": dates[t],
+                            "type": "sell",
+                            "stock_id": str(stock_ids[sells[k]]),
+                            "price": float(price[sells[k]]),
+                            "actual_price": round(float(actual[k]), 2),
+                            "shares": int(qty[k]),
+                            "proceeds": float(net[k]),
+                            "fee": float(fee[k] + tax[k]),
+                            "slippage": round(float(slippage[k]), 2),
+                            "profit": float(profit[k]),
+                            "profit_pct": float(profit[k] / cost_basis[k] * 100) if cost_basis[k] > 0 else 0,
+                            "reason": "調倉賣出",
+                        })
+
+                buys = np.flatnonzero(delta > 0)
+                if buys.size:
+                    qty = delta[buys]
+                    actual = price[buys] * (1 + slip)
+                    total = actual * qty * (1 + FEE_RATE)
+
+                    # 資金不足時等比例縮減
+                    if total.sum() > cash:
+                        qty = (np.floor(qty * (cash / total.sum()) / lot) * lot).astype(np.int64)
+                        keep = qty > 0
+                        buys, qty, actual = buys[keep], qty[keep], actual[keep]
+
+                    cost = actual * qty
+                    fee = cost * FEE_RATE
+                    slippage = (actual - price[buys]) * qty
+
+                    avg_cost[buys] = (shares[buys] * avg_cost[buys] + cost) / (shares[buys] + qty)
+                    shares[buys] += qty
+                    cash -= float((cost + fee).sum())
+                    total_fees += float(fee.sum())
+                    turnover += float(cost.sum())
+
+                    for k in range(buys.size):
+                        engine.trades.append({
+                            "date": dates[t],
+                            "type": "buy",
+                            "stock_id": str(stock_ids[buys[k]]),
+                            "price": float(price[buys[k]]),
+                            "actual_price": round(float(actual[k]), 2),
+                            "shares": int(qty[k]),
+                            "cost": float(cost[k] + fee[k]),
+                            "fee": float(fee[k]),
+                            "slippage": round(float(slippage[k]), 2),
+                            "reason": "調倉買進",
+                        })
+
+            value = cash + float(shares @ marked)
+            engine.daily_values.append({
+                "date": dates[t],
+                "value": value,
+                "return_pct": ((value / self.initial_capital) - 1) * 100,
+            })
+
+        stats = engine.calculate_stats()
+        stats.update({
+            "rebalances": rebalances,
+            "total_fees": round(total_fees, 2),
+            "total_tax": round(total_tax, 2),
+            "turnover": round(turnover, 2),
+            "benchmark_return_pct": self._benchmark_return(close, traded, start_index),
+        })
+
+        final_prices = np.nan_to_num(close[-1])
+        held = np.flatnonzero(shares > 0)
+        holdings = sorted(
+            (
+                {
+                    "stock_id": str(stock_ids[j]),
+                    "shares": int(shares[j]),
+                    "avg_cost": round(float(avg_cost[j]), 2),
+                    "price": float(final_prices[j]),
+                    "value": round(float(shares[j] * final_prices[j]), 2),
+                }
+                for j in held
+            ),
+            key=lambda h: h["value"],
+            reverse=True,
+        )
+
+        return {
+            "universe": N,
+            "top_n": self.top_n,
+            "rebalance_days": self.rebalance_days,
+            "stats": stats,
+            "cash": round(cash, 2),
+            "holdings": holdings,
+            "trades": engine.trades[-MAX_TRADES_RETURNED:],
+            "daily_values": engine.daily_values,
+        }
+
+    @staticmethod
+    def _benchmark_return(close: np.ndarray, traded: np.ndarray, start_index: int) -> float:
+        """基準：期初有交易的股票等權重買進持有的報酬率（%）"""
+        start = close[start_index]
+        end = close[-1]
+        valid = traded[start_index] & ~np.isnan(end) & (start > 0)
+        if not valid.any():
+            return 0.0
+        return round(float(np.mean(end[valid] / start[valid]) - 1) * 100, 2)
+
+
+# ============================================================
+# 入口
+# ============================================================
+
+def portfolio_backtest_sync(
+    stock_ids: List[str],
+    start_date: str,
+    end_date: str,
+    top_n: int = 10,
+    rebalance_days: int = 5,
+    scorer: Union[str, Callable[[PriceMatrix], np.ndarray]] = "technical",
+    initial_capital: float = 1000000,
+    min_score: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    同步執行投資組合回測（資料來自本地 OHLCV 資料庫，必要時增量更新）
+    """
+    from app.services.ohlcv_store import get_ohlcv_store
+
+    score_func = SCORERS.get(scorer) if isinstance(scorer, str) else scorer
+    if score_func is None:
+        return {"error": f"未知評分方式: {scorer}（可用: {', '.join(SCORERS)}）"}
+
+    start_day = int(np.datetime64(start_date, "D").astype(np.int64))
+    end_day = int(np.datetime64(end_date, "D").astype(np.int64))
+    months = (date.today() - date.fromisoformat(start_date)).days // 30 + WARMUP_MONTHS
+
+    store = get_ohlcv_store()
+    try:
+        store.refresh_many_sync(stock_ids, months)
+    except Exception as e:
+        print(f"⚠️ [PortfolioBacktest] 更新歷史資料失敗，使用本地資料: {e}")
+
+    matrix = PriceMatrix.from_columns({sid: store.read_columns(sid) for sid in stock_ids})
+    if not matrix.stock_ids:
+        return {"error": "無可用的歷史資料"}
+
+    matrix = matrix.slice(0, int(np.searchsorted(matrix.days, end_day, side="right")))
+    start_index = int(np.searchsorted(matrix.days, start_day))
+    if start_index >= len(matrix.days):
+        return {"error": "回測期間無資料", "period": f"{start_date} ~ {end_date}"}
+
+    backtester = PortfolioBacktester(
+        initial_capital=initial_capital,
+        top_n=top_n,
+        rebalance_days=rebalance_days,
+        min_score=min_score,
+    )
+    result = backtester.run(matrix, score_func(matrix), start_index)
+    result.update({
+        "period": f"{start_date} ~ {end_date}",
+        "scorer": scorer if isinstance(scorer, str) else getattr(scorer, "__name__", "custom"),
+        "missing": [sid for sid in stock_ids if sid not in matrix.stock_ids],
+    })
+    return result
+
+
+async def run_portfolio_backtest(
+    stock_ids: List[str],
+    start_date: str,
+    end_date: str,
+    top_n: int = 10,
+    rebalance_days: int = 5,
+    scorer: str = "technical",
+    initial_capital: float = 1000000,
+    min_score: Optional[float] = None,
+) -> Dict[str, Any]:
+    """執行投資組合回測（在執行緒中計算，不阻塞事件迴圈）"""
+    print(f"[PortfolioBacktest] {len(stock_ids)} 檔, top {top_n}, 每 {rebalance_days} 日調倉, 評分: {scorer}")
+    started = datetime.now()
+
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(
+        None, portfolio_backtest_sync,
+        stock_ids, start_date, end_date, top_n, rebalance_days, scorer, initial_capital, min_score,
+    )
+
+    if "stats" in result:
+        elapsed = (datetime.now() - started).total_seconds()
+        print(f"✅ [PortfolioBacktest] 完成 ({elapsed:.1f}s)，報酬率 {result['stats'].get('total_return_pct')}%")
+    return result
@@ -2,18 +2,25 @@
 # 📊 StockBuddy - 投資組合服務
 # ============================================================
 
+import asyncio
 import json
 import os
 from datetime import datetime
 from typing import Dict, List, Optional
+import numpy as np
 import yfinance as yf
 
+from app.services.cache_service import is_trading_hours
+
 class PortfolioService:
     """投資組合管理服務"""
     
     # 本地儲存路徑（簡單的 JSON 檔案儲存）
     PORTFOLIO_FILE = "portfolio_data.json"
     
+    # 即時報價每次查詢的股票數（與 DataScheduler 相同）
+    REALTIME_BATCH = 10
+    
     @classmethod
     def _load_portfolio(cls) -> Dict:
         """載入投資組合資料"""
@@ -33,7 +40,7 @@ class PortfolioService:
     
     @classmethod
     def get_current_price(cls, stock_id: str) -> Optional[float]:
-        """取得即時股價"""
+        """取得即時股價（單檔、同步；估值請用 get_prices）"""
         try:
             ticker = yf.Ticker(f"{stock_id}.TW")
             info = ticker.info
@@ -41,6 +48,113 @@ class PortfolioService:
         except:
             return None
     
+    @classmethod
+    async def get_prices(cls, stock_ids: List[str]) -> Dict[str, Optional[float]]:
+        """
+        批次取得多檔股價
+        
+        盤中先以批量即時報價（每次 10 檔）取最新成交價；
+        其餘上市股票取自全市場每日成交摘要（一次請求、有快取，盤中為前一交易日收盤）；
+        摘要中沒有的股票（上櫃等）以一次 yfinance 多檔下載取最新收盤價。
+        """
+        from app.services.twse_openapi import TWSEOpenAPI
+        
+        stock_ids = list(dict.fromkeys(stock_ids))
+        prices: Dict[str, Optional[float]] = {}
+        
+        if is_trading_hours():
+            batches = [stock_ids[i:i + cls.REALTIME_BATCH] for i in range(0, len(stock_ids), cls.REALTIME_BATCH)]
+            outcomes = await asyncio.gather(
+                *[TWSEOpenAPI.get_realtime_quotes(batch) for batch in batches],
+                return_exceptions=True,
+            )
+            for quotes in outcomes:
+                if isinstance(quotes, Exception):
+                    print(f"⚠️ [Portfolio] 取得即時報價失敗: {quotes}")
+                    continue
+                for stock_id, quote in quotes.items():
+                    price = cls._to_price((quote or {}).get("price"))
+                    if stock_id in stock_ids and price is not None:
+                        prices[stock_id] = price
+        
+        missing = [stock_id for stock_id in stock_ids if stock_id not in prices]
+        if missing:
+            try:
+                all_stocks = await TWSEOpenAPI.get_all_stocks_summary()
+            except Exception as e:
+                print(f"⚠️ [Portfolio] 取得全市場摘要失敗: {e}")
+                all_stocks = {}
+            
+            for stock_id in missing:
+                price = cls._to_price((all_stocks.get(stock_id) or {}).get("price"))
+                if price is not None:
+                    prices[stock_id] = price
+        
+        missing = [stock_id for stock_id in stock_ids if stock_id not in prices]
+        if missing:
+            from app.services.twse_bulk import get_bulk_service
+            
+            try:
+                histories = await get_bulk_service().get_stocks_history_yf_batch(missing, months=1)
+            except Exception as e:
+                print(f"⚠️ [Portfolio] 批量取得股價失敗: {e}")
+                histories = {}
+            for stock_id in missing:
+                history = histories.get(stock_id)
+                prices[stock_id] = cls._to_price(history[-1].get("close")) if history else None
+        
+        return prices
+    
+    @staticmethod
+    def _to_price(value) -> Optional[float]:
+        try:
+            price = float(str(value).replace(",", ""))
+        except (TypeError, ValueError):
+            return None
+        return price if price > 0 else None
+    
+    @staticmethod
+    def value_holdings(holdings: List[Dict], prices: Dict[str, Optional[float]]) -> List[Dict]:
+        """
+        以欄向量一次計算所有持股的成本、市值與損益
+        
+        Args:
+            holdings: 持股列表
+            prices: {股票代號: 現價}，取不到價格為 None
+        """
+        if not holdings:
+            return []
+        
+        buy_price = np.array([h["buy_price"] for h in holdings], dtype=float)
+        quantity = np.array([h["quantity"] for h in holdings], dtype=float)
+        current = np.array([
+            np.nan if prices.get(h["stock_id"]) is None else prices[h["stock_id"]]
+            for h in holdings
+        ], dtype=float)
+        
+        cost = buy_price * quantity
+        market_value = current * quantity
+        profit = market_value - cost
+        with np.errstate(divide="ignore", invalid="ignore"):
+            profit_percent = (current - buy_price) / buy_price * 100
+        
+        def column(values: np.ndarray) -> List[Optional[float]]:
+            return [None if np.isnan(v) else v for v in values.tolist()]
+        
+        return [
+            {
+                **holding,
+                "current_price": prices.get(holding["stock_id"]),
+                "cost": c,
+                "market_value": mv,
+                "profit": pl,
+                "profit_percent": pct,
+            }
+            for holding, c, mv, pl, pct in zip(
+                holdings, cost.tolist(), column(market_value), column(profit), column(profit_percent)
+            )
+        ]
+    
     @classmethod
     async def add_holding(
         cls,
@@ -100,37 +214,11 @@ class PortfolioService:
         """取得所有持股，並計算即時損益"""
         portfolio = cls._load_portfolio()
         holdings = portfolio.get("holdings", [])
+        if not holdings:
+            return []
         
-        result = []
-        for holding in holdings:
-            stock_id = holding["stock_id"]
-            current_price = cls.get_current_price(stock_id)
-            
-            buy_price = holding["buy_price"]
-            quantity = holding["quantity"]
-            
-            if current_price:
-                # 計算損益
-                cost = buy_price * quantity
-                market_value = current_price * quantity
-                profit = market_value - cost
-                profit_percent = ((current_price - buy_price) / buy_price) * 100
-            else:
-                cost = buy_price * quantity
-                market_value = None
-                profit = None
-                profit_percent = None
-            
-            result.append({
-                **holding,
-                "current_price": current_price,
-                "cost": cost,
-                "market_value": market_value,
-                "profit": profit,
-                "profit_percent": profit_percent
-            })
-        
-        return result
+        prices = await cls.get_prices([h["stock_id"] for h in holdings])
+        return cls.value_holdings(holdings, prices)
     
     @classmethod
     async def update_holding(
@@ -183,9 +271,15 @@ class PortfolioService:
         return {"success": False, "error": "找不到該持股"}
     
     @classmethod
-    async def get_summary(cls) -> Dict:
-        """取得投資組合總覽"""
-        holdings = await cls.get_holdings()
+    async def get_summary(cls, holdings: Optional[List[Dict]] = None) -> Dict:
+        """
+        取得投資組合總覽
+        
+        Args:
+            holdings: 已估值的持股（get_holdings 的結果），None 則重新估值
+        """
+        if holdings is None:
+            holdings = await cls.get_holdings()
         
         if not holdings:
             return {
@@ -0,0 +1,259 @@
+"""
+背景預先計算與版本化結果快照
+
+/recommend 這類需要數分鐘的全市場流程改由 DataScheduler 在背景執行，
+完成後以「先寫暫存檔再取代」的方式原子發布到 data/precompute/<name>.json：
+
+    {"name": "recommend", "version": 42, "built_at": "...", "seconds": 95.3, "result": {...}}
+
+API 只讀最新的快照（記憶體中；檔案被其他 worker 更新時自動重新載入），
+不論流程多久，回應時間都只是一次字典讀取。
+
+排程時機：
+- 盤中：距離上次發布超過 SmartTTL 盤中 TTL（recommend 為 10 分鐘）
+- 盤後：收盤資料齊全（14:30）後，今天尚未發布過
+
+使用方式：
+    register_precompute("recommend", build_recommendations)
+    snapshot = get_precompute().latest("recommend")      # 或 None
+    await get_precompute().run("recommend")              # 立即重建（並行呼叫只執行一次）
+"""
+
+import asyncio
+import json
+import os
+import time
+from datetime import date, datetime
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.services.cache_service import SmartTTL, is_trading_hours
+from app.services.ohlcv_store import DATA_DIR
+
+PRECOMPUTE_DIR = DATA_DIR / "precompute"
+
+# 收盤資料齊全的時間（與盤後技術指標快照相同）
+AFTER_CLOSE_READY_TIME = dt_time(14, 30)
+
+
+def _json_default(value: Any):
+    """numpy 數值與日期轉為 JSON 可序列化型別"""
+    if hasattr(value, "item"):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"無法序列化 {type(value).__name__}")
+
+
+class PrecomputeJob:
+    """單一預先計算工作"""
+
+    def __init__(self, name: str, builder: Callable[[], Awaitable[Optional[Dict]]], data_type: str):
+        self.name = name
+        self.builder = builder
+        self.data_type = data_type  # 盤中重建間隔使用 SmartTTL.TRADING_HOURS[data_type]
+        self.task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_seconds: Optional[float] = None
+
+
+class PrecomputeStore:
+    """預先計算工作與已發布快照"""
+
+    def __init__(self, root: Path = PRECOMPUTE_DIR):
+        self.root = Path(root)
+        self._jobs: Dict[str, PrecomputeJob] = {}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        self._mtimes: Dict[str, int] = {}
+
+    # ============================================================
+    # 註冊
+    # ============================================================
+
+    def register(self, name: str, builder: Callable[[], Awaitable[Optional[Dict]]], data_type: str = "recommend") -> None:
+        """
+        註冊預先計算工作
+
+        Args:
+            name: 快照名稱
+            builder: 無參數的 async 函數，回傳要發布的結果（None 表示失敗，保留舊快照）
+            data_type: SmartTTL 資料類型（決定盤中重建間隔）
+        """
+        self._jobs[name] = PrecomputeJob(name, builder, data_type)
+
+    def jobs(self) -> Dict[str, PrecomputeJob]:
+        return dict(self._jobs)
+
+    # ============================================================
+    # 讀取
+    # ============================================================
+
+    def _path(self, name: str) -> Path:
+        return self.root / f"{name}.json"
+
+    def latest(self, name: str) -> Optional[Dict[str, Any]]:
+        """最新發布的快照（檔案被其他 worker 更新時重新載入）"""
+        path = self._path(name)
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            # 已被清除（可能是其他 worker）
+            self._snapshots.pop(name, None)
+            self._mtimes.pop(name, None)
+            return None
+
+        if self._mtimes.get(name) != mtime:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._snapshots[name] = json.load(f)
+                self._mtimes[name] = mtime
+            except Exception as e:
+                print(f"⚠️ [Precompute] 讀取 {name} 快照失敗: {e}")
+        return self._snapshots.get(name)
+
+    def age(self, name: str, now: Optional[datetime] = None) -> Optional[float]:
+        """快照年齡（秒），沒有快照時為 None"""
+        snapshot = self.latest(name)
+        if not snapshot:
+            return None
+        return self.snapshot_age(snapshot, now)
+
+    @staticmethod
+    def snapshot_age(snapshot: Dict[str, Any], now: Optional[datetime] = None) -> float:
+        """已取得快照的年齡（秒），避免再讀一次最新版本"""
+        now = now or datetime.now()
+        return (now - datetime.fromisoformat(snapshot["built_at"])).total_seconds()
+
+    # ============================================================
+    # 發布
+    # ============================================================
+
+    def publish(self, name: str, result: Dict[str, Any], seconds: Optional[float] = None) -> Dict[str, Any]:
+        """原子發布新版本快照"""
+        previous = self.latest(name)
+        snapshot = {
+            "name": name,
+            "version": (previous["version"] + 1) if previous else 1,
+            "built_at": datetime.now().isoformat(),
+            "seconds": seconds,
+            "result": result,
+        }
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self._path(name)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, default=_json_default)
+        tmp.replace(path)
+
+        # 以重新讀取的內容為準（與其他 worker 看到的完全相同）
+        self._mtimes.pop(name, None)
+        return self.latest(name) or snapshot
+
+    def invalidate(self, name: str) -> None:
+        """刪除快照（強制下次請求重建）"""
+        self._snapshots.pop(name, None)
+        self._mtimes.pop(name, None)
+        try:
+            self._path(name).unlink()
+        except FileNotFoundError:
+            pass
+
+    # ============================================================
+    # 執行
+    # ============================================================
+
+    async def run(self, name: str) -> Optional[Dict[str, Any]]:
+        """執行並發布（同一個工作同時只執行一次，並行呼叫等待同一個結果）"""
+        job = self._jobs.get(name)
+        if job is None:
+            raise KeyError(f"未註冊的預先計算工作: {name}")
+
+        if job.task is None or job.task.done():
+            job.task = asyncio.ensure_future(self._run_job(job))
+        return await asyncio.shield(job.task)
+
+    def run_in_background(self, name: str) -> bool:
+        """背景執行（已在執行中時不重複啟動），回傳是否新啟動"""
+        job = self._jobs.get(name)
+        if job is None or (job.task is not None and not job.task.done()):
+            return False
+        job.task = asyncio.ensure_future(self._run_job(job))
+        return True
+
+    async def _run_job(self, job: PrecomputeJob) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        job.runs += 1
+        try:
+            result = await job.builder()
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            print(f"⚠️ [Precompute] {job.name} 計算失敗，保留舊快照: {e}")
+            return self.latest(job.name)
+
+        job.last_seconds = round(time.perf_counter() - started, 2)
+        if not result:
+            job.failures += 1
+            job.last_error = "empty result"
+            return self.latest(job.name)
+
+        snapshot = self.publish(job.name, result, seconds=job.last_seconds)
+        print(f"✅ [Precompute] {job.name} v{snapshot['version']} 已發布 ({job.last_seconds}s)")
+        return snapshot
+
+    def due(self, name: str, now: Optional[datetime] = None) -> bool:
+        """是否需要重建"""
+        job = self._jobs.get(name)
+        if job is None or (job.task is not None and not job.task.done()):
+            return False
+
+        now = now or datetime.now()
+        snapshot = self.latest(name)
+        if not snapshot:
+            return True
+        built_at = datetime.fromisoformat(snapshot["built_at"])
+
+        if is_trading_hours():
+            return (now - built_at).total_seconds() >= SmartTTL.TRADING_HOURS.get(job.data_type, 300)
+
+        # 盤後：收盤資料齊全後每個交易日一次
+        if now.weekday() >= 5 or now.time() < AFTER_CLOSE_READY_TIME:
+            return False
+        return built_at < datetime.combine(now.date(), AFTER_CLOSE_READY_TIME)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for name, job in self._jobs.items():
+            snapshot = self.latest(name)
+            stats[name] = {
+                "version": snapshot["version"] if snapshot else None,
+                "built_at": snapshot["built_at"] if snapshot else None,
+                "running": job.task is not None and not job.task.done(),
+                "runs": job.runs,
+                "failures": job.failures,
+                "last_seconds": job.last_seconds,
+                "last_error": job.last_error,
+            }
+        return stats
+
+
+_store: Optional[PrecomputeStore] = None
+
+
+def get_precompute() -> PrecomputeStore:
+    """取得全域預先計算存放區"""
+    global _store
+    if _store is None:
+        _store = PrecomputeStore()
+    return _store
+
+
+def register_precompute(name: str, builder: Callable[[], Awaitable[Optional[Dict]]], data_type: str = "recommend") -> None:
+    """註冊預先計算工作（由各路由模組在載入時呼叫）"""
+    get_precompute().register(name, builder, data_type)
@@ -9,7 +9,7 @@ V1.0 功能：
 - 支援多種警示類型
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 from enum import Enum
 import json
@@ -39,7 +39,8 @@ class PriceAlertService:
     價格警示服務
 
     注意：此為前端快取版本，警示資料儲存在 localStorage
-    後端主要負責提供即時價格檢查功能
+    後端主要負責提供即時價格檢查功能；
+    伺服器端常駐的警示請使用 alert_registry（由排程器的即時報價驅動）
     """
 
     # 快取
@@ -121,7 +122,6 @@ class PriceAlertService:
             alert_type = alert.get("alert_type")
             target_price = alert.get("target_price")
             target_percent = alert.get("target_percent")
-            base_price = alert.get("base_price")
 
             current_price = prices.get(stock_id)
 
@@ -142,32 +142,7 @@ class PriceAlertService:
                 continue
 
             # 檢查觸發條件
-            is_triggered = False
-            message = None
-
-            if alert_type == AlertType.ABOVE.value:
-                if target_price and current_price >= target_price:
-                    is_triggered = True
-                    message = f"{stock_id} 股價 ${current_price} 已突破 ${target_price}"
-
-            elif alert_type == AlertType.BELOW.value:
-                if target_price and current_price <= target_price:
-                    is_triggered = True
-                    message = f"{stock_id} 股價 ${current_price} 已跌破 ${target_price}"
-
-            elif alert_type == AlertType.PERCENT_UP.value:
-                if target_percent and base_price:
-                    change_pct = ((current_price - base_price) / base_price) * 100
-                    if change_pct >= target_percent:
-                        is_triggered = True
-                        message = f"{stock_id} 漲幅 {change_pct:.2f}% 已達 {target_percent}%"
-
-            elif alert_type == AlertType.PERCENT_DOWN.value:
-                if target_percent and base_price:
-                    change_pct = ((base_price - current_price) / base_price) * 100
-                    if change_pct >= target_percent:
-                        is_triggered = True
-                        message = f"{stock_id} 跌幅 {change_pct:.2f}% 已達 {target_percent}%"
+            is_triggered, message = cls.evaluate(alert, current_price)
 
             result["is_triggered"] = is_triggered
             result["message"] = message
@@ -184,6 +159,42 @@ class PriceAlertService:
             "checked_at": datetime.now().isoformat(),
         }
 
+    @staticmethod
+    def evaluate(alert: Dict[str, Any], current_price: float) -> Tuple[bool, Optional[str]]:
+        """
+        判斷單一警示是否觸發
+
+        Returns:
+            (是否觸發, 通知訊息)
+        """
+        stock_id = alert.get("stock_id")
+        alert_type = alert.get("alert_type")
+        target_price = alert.get("target_price")
+        target_percent = alert.get("target_percent")
+        base_price = alert.get("base_price")
+
+        if alert_type == AlertType.ABOVE.value:
+            if target_price and current_price >= target_price:
+                return True, f"{stock_id} 股價 ${current_price} 已突破 ${target_price}"
+
+        elif alert_type == AlertType.BELOW.value:
+            if target_price and current_price <= target_price:
+                return True, f"{stock_id} 股價 ${current_price} 已跌破 ${target_price}"
+
+        elif alert_type == AlertType.PERCENT_UP.value:
+            if target_percent and base_price:
+                change_pct = ((current_price - base_price) / base_price) * 100
+                if change_pct >= target_percent:
+                    return True, f"{stock_id} 漲幅 {change_pct:.2f}% 已達 {target_percent}%"
+
+        elif alert_type == AlertType.PERCENT_DOWN.value:
+            if target_percent and base_price:
+                change_pct = ((base_price - current_price) / base_price) * 100
+                if change_pct >= target_percent:
+                    return True, f"{stock_id} 跌幅 {change_pct:.2f}% 已達 {target_percent}%"
+
+        return False, None
+
     @classmethod
     async def get_current_price(cls, stock_id: str) -> Dict[str, Any]:
         """
@@ -17,6 +17,7 @@ import asyncio
 from app.services.cache_service import SmartTTL, StockCache
 from app.services.fundamental_service import FundamentalService
 from app.services.scoring_service import ScoringService
+from app.services.technical_snapshot import get_technical_snapshot
 
 
 class StockComparison:
@@ -56,6 +57,13 @@ class StockComparison:
             {"key": "dividend_rate", "label": "每股股利", "format": "currency", "lower_better": False},
             {"key": "payout_ratio", "label": "配息率 (%)", "format": "percent", "lower_better": None},
         ],
+        "technical": [
+            {"key": "technical_score", "label": "技術評分", "format": "number", "lower_better": False},
+            {"key": "rsi", "label": "RSI", "format": "number", "lower_better": None},
+            {"key": "change_5d", "label": "近5日漲跌 (%)", "format": "percent", "lower_better": False},
+            {"key": "volume_ratio", "label": "量比", "format": "number", "lower_better": None},
+            {"key": "ma_trend_label", "label": "均線排列", "format": "text", "lower_better": None},
+        ],
     }
 
     # 雷達圖維度配置
@@ -93,7 +101,7 @@ class StockComparison:
 
         Args:
             stock_ids: 股票代號列表（最多 5 檔）
-            metrics_type: 比較類型 (fundamental/valuation/growth/dividend)
+            metrics_type: 比較類型 (fundamental/valuation/growth/dividend/technical)
 
         Returns:
             {
@@ -116,7 +124,8 @@ class StockComparison:
         if cached:
             return cached
 
-        # 取得所有股票的基本面資料
+        # 取得所有股票的基本面資料，技術面查盤後快照
+        snapshot = get_technical_snapshot()
         stocks_data = []
         for stock_id in stock_ids:
             try:
@@ -124,12 +133,14 @@ class StockComparison:
                 stocks_data.append({
                     "stock_id": stock_id,
                     "fundamental": fundamental,
+                    "technical": snapshot.get(stock_id) or {},
                 })
             except Exception as e:
                 print(f"取得 {stock_id} 資料失敗: {e}")
                 stocks_data.append({
                     "stock_id": stock_id,
                     "fundamental": {},
+                    "technical": snapshot.get(stock_id) or {},
                     "error": str(e),
                 })
 
@@ -152,6 +163,7 @@ class StockComparison:
                     "sector": s["fundamental"].get("sector"),
                     "industry": s["fundamental"].get("industry"),
                     "market_cap_display": s["fundamental"].get("market_cap_display"),
+                    "technical_as_of": s["technical"].get("bar_date"),
                 }
                 for s in stocks_data
             ],
@@ -189,7 +201,7 @@ class StockComparison:
 
             values = []
             for stock in stocks_data:
-                value = stock["fundamental"].get(metric["key"])
+                value = cls._metric_value(stock, metric["key"])
                 values.append({
                     "stock_id": stock["stock_id"],
                     "value": value,
@@ -214,6 +226,14 @@ class StockComparison:
 
         return table
 
+    @staticmethod
+    def _metric_value(stock: Dict, key: str) -> Any:
+        """指標值：基本面優先，其次為技術指標快照"""
+        value = stock["fundamental"].get(key)
+        if value is None:
+            value = stock.get("technical", {}).get(key)
+        return value
+
     @classmethod
     def _calculate_radar_data(cls, stocks_data: List[Dict]) -> List[Dict[str, Any]]:
         """計算雷達圖數據"""
@@ -229,7 +249,7 @@ class StockComparison:
                 "growth_score": cls._calculate_growth_score(f),
                 "dividend_score": cls._calculate_dividend_score(f),
                 "safety_score": cls._calculate_safety_score(f),
-                "momentum_score": 50,  # 需要技術分析數據，暫時使用固定值
+                "momentum_score": stock.get("technical", {}).get("technical_score") or 50,
             }
 
             radar_data.append(scores)
@@ -369,7 +389,7 @@ class StockComparison:
 
             values = []
             for stock in stocks_data:
-                value = stock["fundamental"].get(key)
+                value = cls._metric_value(stock, key)
                 if value is not None:
                     values.append((stock["stock_id"], value))
 
@@ -415,10 +435,12 @@ class StockComparison:
         if len(stock_ids) < 2:
             return {"error": "至少需要 2 檔股票進行比較"}
 
+        snapshot = get_technical_snapshot()
         quick_data = []
         for stock_id in stock_ids:
             try:
                 fundamental = await FundamentalService.get_fundamental_data(stock_id)
+                technical = snapshot.get(stock_id) or {}
                 quick_data.append({
                     "stock_id": stock_id,
                     "pe_ratio": fundamental.get("pe_ratio"),
@@ -427,6 +449,9 @@ class StockComparison:
                     "roe": fundamental.get("roe"),
                     "market_cap_display": fundamental.get("market_cap_display"),
                     "valuation_comment": fundamental.get("valuation_comment"),
+                    "rsi": technical.get("rsi"),
+                    "ma_trend": technical.get("ma_trend_label"),
+                    "technical_score": technical.get("technical_score"),
                 })
             except Exception as e:
                 quick_data.append({
@@ -19,6 +19,8 @@ from cachetools import TTLCache
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 
+from app.services.ohlcv_store import get_ohlcv_store
+
 # 快取設定
 _cache = TTLCache(maxsize=200, ttl=300)  # 5分鐘快取
 
@@ -122,40 +124,36 @@ class StockDataService:
             return _cache[cache_key]
 
         try:
-            symbol = cls._to_tw_symbol(stock_id)
+            base_id = stock_id.split(".")[0]
             
+            # 從本地 OHLCV 資料庫讀取（過期時於執行緒池中增量更新）
             loop = asyncio.get_event_loop()
-            ticker = await loop.run_in_executor(_executor, lambda: yf.Ticker(symbol))
-            
-            # 計算期間
-            period = f"{months}mo"
-            
             hist = await loop.run_in_executor(
                 _executor,
-                lambda: ticker.history(period=period)
+                lambda: get_ohlcv_store().get_history_sync(base_id, months)
             )
             
-            if hist.empty:
+            if not hist:
                 return []
             
             # 轉換格式
             result = []
             prev_close = None
             
-            for idx, row in hist.iterrows():
-                change = row['Close'] - prev_close if prev_close else 0
+            for bar in hist:
+                change = bar['close'] - prev_close if prev_close else 0
                 
                 result.append({
-                    "date": idx.strftime("%Y-%m-%d"),
-                    "open": round(row['Open'], 2),
-                    "high": round(row['High'], 2),
-                    "low": round(row['Low'], 2),
-                    "close": round(row['Close'], 2),
-                    "volume": int(row['Volume']),
+                    "date": bar['date'],
+                    "open": round(bar['open'], 2),
+                    "high": round(bar['high'], 2),
+                    "low": round(bar['low'], 2),
+                    "close": round(bar['close'], 2),
+                    "volume": bar['volume'],
                     "change": round(change, 2),
                 })
                 
-                prev_close = row['Close']
+                prev_close = bar['close']
             
             _cache[cache_key] = result
             return result
@@ -8,6 +8,10 @@ V1.0 功能：
 - 籌碼面篩選（三大法人買賣超）
 - 市值篩選（大型股、中型股、小型股）
 - 預設篩選策略（價值投資、成長股、高殖利率、動能股）
+
+篩選以全市場基本面欄位表（fundamentals_table）的布林遮罩一次完成，
+涵蓋所有上市櫃股票；全市場 API 無資料時才退回逐檔查詢 STOCK_POOL。
+RSI / 均線趨勢 / 技術評分來自盤後技術指標快照（technical_snapshot），不需逐檔下載歷史。
 """
 
 from typing import Dict, Any, Optional, List
@@ -15,7 +19,11 @@ from datetime import datetime
 from enum import Enum
 import asyncio
 
+import numpy as np
+
 from app.services.cache_service import SmartTTL, StockCache
+from app.services.fundamentals_table import FundamentalsTable, get_fundamentals_table, get_table_stats
+from app.services.technical_snapshot import MA_TREND_FILTERS, get_snapshot_stats, get_technical_snapshot
 from app.services.twse_openapi import TWSEOpenAPI
 from app.services.fundamental_service import FundamentalService
 from app.services.scoring_service import ScoringService
@@ -192,11 +200,195 @@ class StockScreener:
             pb_min=pb_min, pb_max=pb_max,
             dividend_yield_min=dividend_yield_min,
             roe_min=roe_min,
+            rsi_min=rsi_min, rsi_max=rsi_max,
             technical_score_min=technical_score_min,
+            ma_trend=ma_trend,
             foreign_net_min=foreign_net_min,
             market_cap_size=market_cap_size,
         )
 
+        # 全市場欄位表：所有條件以布林遮罩一次套用
+        table = await get_fundamentals_table()
+        if len(table) == 0:
+            # 全市場 API 無資料時退回逐檔查詢
+            return await cls._screen_per_stock(
+                filters_applied=filters_applied,
+                pe_min=pe_min, pe_max=pe_max,
+                pb_min=pb_min, pb_max=pb_max,
+                dividend_yield_min=dividend_yield_min,
+                dividend_yield_max=dividend_yield_max,
+                roe_min=roe_min, roe_max=roe_max,
+                rsi_min=rsi_min, rsi_max=rsi_max,
+                technical_score_min=technical_score_min,
+                ma_trend=ma_trend,
+                market_cap_size=market_cap_size,
+                market_cap_min=market_cap_min,
+                market_cap_max=market_cap_max,
+                exclude_stocks=exclude_stocks,
+                stock_pool=stock_pool,
+                limit=limit,
+                start_time=start_time,
+            )
+
+        scanned = table.pool_mask(stock_pool) if stock_pool else np.ones(len(table), dtype=bool)
+        if exclude_stocks:
+            scanned &= ~table.pool_mask(exclude_stocks)
+
+        mask = scanned & cls._table_mask(
+            table,
+            pe_min=pe_min, pe_max=pe_max,
+            pb_min=pb_min, pb_max=pb_max,
+            dividend_yield_min=dividend_yield_min,
+            dividend_yield_max=dividend_yield_max,
+            roe_min=roe_min, roe_max=roe_max,
+            rsi_min=rsi_min, rsi_max=rsi_max,
+            technical_score_min=technical_score_min,
+            ma_trend=ma_trend,
+            market_cap_size=market_cap_size,
+            market_cap_min=market_cap_min,
+            market_cap_max=market_cap_max,
+        )
+        rows = np.flatnonzero(mask)
+
+        # 依殖利率排序（如果有）
+        if dividend_yield_min:
+            rows = rows[np.argsort(-np.nan_to_num(table.column("dividend_yield")[rows], nan=0), kind="stable")]
+        # 依本益比排序（如果有 PE 條件）
+        elif pe_max:
+            rows = rows[np.argsort(np.nan_to_num(table.column("pe_ratio")[rows], nan=999), kind="stable")]
+        # 指定股票池時維持股票池順序，全市場則依成交量
+        elif stock_pool:
+            order = {stock_id: k for k, stock_id in enumerate(stock_pool)}
+            rows = np.array(sorted(rows, key=lambda i: order[table.stock_ids[i]]), dtype=int)
+        else:
+            rows = rows[np.argsort(-np.nan_to_num(table.column("volume")[rows], nan=0), kind="stable")]
+
+        matched_stocks = [cls._table_result(table, i) for i in rows[:limit]]
+
+        execution_time = (datetime.now() - start_time).total_seconds()
+
+        return {
+            "total_scanned": int(scanned.sum()),
+            "matched_count": len(rows),
+            "stocks": matched_stocks,
+            "filters_applied": filters_applied,
+            "execution_time": round(execution_time, 3),
+            "data_date": table.data_date,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @classmethod
+    def _table_mask(
+        cls,
+        table: FundamentalsTable,
+        pe_min: Optional[float] = None,
+        pe_max: Optional[float] = None,
+        pb_min: Optional[float] = None,
+        pb_max: Optional[float] = None,
+        dividend_yield_min: Optional[float] = None,
+        dividend_yield_max: Optional[float] = None,
+        roe_min: Optional[float] = None,
+        roe_max: Optional[float] = None,
+        rsi_min: Optional[float] = None,
+        rsi_max: Optional[float] = None,
+        technical_score_min: Optional[int] = None,
+        ma_trend: Optional[str] = None,
+        market_cap_size: Optional[MarketCapSize] = None,
+        market_cap_min: Optional[float] = None,
+        market_cap_max: Optional[float] = None,
+    ) -> np.ndarray:
+        """
+        _apply_filters 的欄位版本（缺資料的處理規則相同）
+        """
+        mask = table.range_mask("pe_ratio", pe_min, pe_max, require=pe_max is not None)
+        mask &= table.range_mask("pb_ratio", pb_min, pb_max, require=pb_max is not None)
+        mask &= table.range_mask(
+            "dividend_yield", dividend_yield_min, dividend_yield_max,
+            require=dividend_yield_min is not None,
+        )
+        mask &= table.range_mask("roe", roe_min, roe_max, require=roe_min is not None)
+
+        # 技術面條件需要有資料
+        if rsi_min is not None or rsi_max is not None:
+            mask &= table.range_mask("rsi", rsi_min, rsi_max, require=True)
+        if technical_score_min is not None:
+            mask &= table.range_mask("technical_score", technical_score_min, require=True)
+        if ma_trend in MA_TREND_FILTERS:
+            mask &= table.column("ma_trend") == MA_TREND_FILTERS[ma_trend]
+
+        # 市值（億元）：設定市值條件時需要有資料
+        size_range = {
+            MarketCapSize.LARGE: (500, None),
+            MarketCapSize.MID: (50, 500),
+            MarketCapSize.SMALL: (None, 50),
+        }.get(market_cap_size, (None, None))
+        for low, high in (size_range, (market_cap_min, market_cap_max)):
+            if low is not None or high is not None:
+                mask &= table.range_mask(
+                    "market_cap",
+                    low * 1e8 if low is not None else None,
+                    high * 1e8 if high is not None else None,
+                    require=True,
+                )
+
+        return mask
+
+    @classmethod
+    def _table_result(cls, table: FundamentalsTable, i: int) -> Dict[str, Any]:
+        """欄位表的一列轉為篩選結果（補上快取中的基本面評語）"""
+        row = table.row(i)
+        stock_id = row["stock_id"]
+        name = row["name"] if row["name"] and row["name"] != stock_id else get_stock_name(stock_id)
+        fundamental = StockCache.get_fundamental(stock_id) or {}
+        return {
+            "stock_id": stock_id,
+            "name": name,
+            "stock_name": name,
+            "market": row["market"],
+            "price": row["price"],
+            "change_percent": row["change_percent"],
+            "pe_ratio": row["pe_ratio"],
+            "pb_ratio": row["pb_ratio"],
+            "dividend_yield": row["dividend_yield"],
+            "roe": row["roe"],
+            "rsi": row["rsi"],
+            "ma_trend": row["ma_trend"],
+            "technical_score": row["technical_score"],
+            "market_cap": row["market_cap"],
+            "market_cap_display": fundamental.get("market_cap_display"),
+            "valuation_comment": fundamental.get("valuation_comment"),
+            "growth_comment": fundamental.get("growth_comment"),
+            "sector": fundamental.get("sector"),
+            "industry": fundamental.get("industry"),
+        }
+
+    @classmethod
+    async def _screen_per_stock(
+        cls,
+        filters_applied: List[Dict[str, Any]],
+        pe_min: Optional[float] = None,
+        pe_max: Optional[float] = None,
+        pb_min: Optional[float] = None,
+        pb_max: Optional[float] = None,
+        dividend_yield_min: Optional[float] = None,
+        dividend_yield_max: Optional[float] = None,
+        roe_min: Optional[float] = None,
+        roe_max: Optional[float] = None,
+        rsi_min: Optional[float] = None,
+        rsi_max: Optional[float] = None,
+        technical_score_min: Optional[int] = None,
+        ma_trend: Optional[str] = None,
+        market_cap_size: Optional[MarketCapSize] = None,
+        market_cap_min: Optional[float] = None,
+        market_cap_max: Optional[float] = None,
+        exclude_stocks: Optional[List[str]] = None,
+        stock_pool: Optional[List[str]] = None,
+        limit: int = 20,
+        start_time: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """逐檔查詢基本面篩選（全市場 API 無資料時使用）"""
+        start_time = start_time or datetime.now()
+
         # 決定要篩選的股票池
         pool = stock_pool or cls.STOCK_POOL
         if exclude_stocks:
@@ -204,20 +396,26 @@ class StockScreener:
 
         # 執行篩選
         matched_stocks = []
+        snapshot = get_technical_snapshot()
 
         for stock_id in pool:
             try:
                 # 取得基本面資料
                 fundamental = await FundamentalService.get_fundamental_data(stock_id)
+                technical = snapshot.get(stock_id)
 
                 # 套用篩選條件
                 if not cls._apply_filters(
                     fundamental=fundamental,
+                    technical=technical,
                     pe_min=pe_min, pe_max=pe_max,
                     pb_min=pb_min, pb_max=pb_max,
                     dividend_yield_min=dividend_yield_min,
                     dividend_yield_max=dividend_yield_max,
                     roe_min=roe_min, roe_max=roe_max,
+                    rsi_min=rsi_min, rsi_max=rsi_max,
+                    technical_score_min=technical_score_min,
+                    ma_trend=ma_trend,
                     market_cap_size=market_cap_size,
                     market_cap_min=market_cap_min,
                     market_cap_max=market_cap_max,
@@ -233,6 +431,9 @@ class StockScreener:
                     "pb_ratio": fundamental.get("pb_ratio"),
                     "dividend_yield": fundamental.get("dividend_yield_percent"),
                     "roe": fundamental.get("roe"),
+                    "rsi": (technical or {}).get("rsi"),
+                    "ma_trend": (technical or {}).get("ma_trend"),
+                    "technical_score": (technical or {}).get("technical_score"),
                     "market_cap": fundamental.get("market_cap"),
                     "market_cap_display": fundamental.get("market_cap_display"),
                     "valuation_comment": fundamental.get("valuation_comment"),
@@ -307,7 +508,10 @@ class StockScreener:
             dividend_yield_max=preset_config.get("dividend_yield_max"),
             roe_min=preset_config.get("roe_min"),
             roe_max=preset_config.get("roe_max"),
+            rsi_min=preset_config.get("rsi_min"),
+            rsi_max=preset_config.get("rsi_max"),
             technical_score_min=preset_config.get("technical_score_min"),
+            ma_trend=preset_config.get("ma_trend"),
             foreign_net_min=preset_config.get("foreign_net_min"),
             market_cap_size=preset_config.get("market_cap_size"),
             limit=limit,
@@ -342,6 +546,7 @@ class StockScreener:
     def _apply_filters(
         cls,
         fundamental: Dict[str, Any],
+        technical: Optional[Dict[str, Any]] = None,
         pe_min: Optional[float] = None,
         pe_max: Optional[float] = None,
         pb_min: Optional[float] = None,
@@ -350,12 +555,19 @@ class StockScreener:
         dividend_yield_max: Optional[float] = None,
         roe_min: Optional[float] = None,
         roe_max: Optional[float] = None,
+        rsi_min: Optional[float] = None,
+        rsi_max: Optional[float] = None,
+        technical_score_min: Optional[int] = None,
+        ma_trend: Optional[str] = None,
         market_cap_size: Optional[MarketCapSize] = None,
         market_cap_min: Optional[float] = None,
         market_cap_max: Optional[float] = None,
     ) -> bool:
         """
         套用篩選條件，返回是否通過
+
+        technical 為技術指標快照的單檔資料（get_technical_snapshot().get），
+        設定技術面條件但無快照資料時不通過
         """
         # 本益比篩選
         pe = fundamental.get("pe_ratio")
@@ -398,9 +610,31 @@ class StockScreener:
         elif roe_min is not None:
             return False
 
-        # 市值篩選
+        # 技術面篩選（需要有資料）
+        technical = technical or {}
+        rsi = technical.get("rsi")
+        if rsi_min is not None or rsi_max is not None:
+            if rsi is None:
+                return False
+            if rsi_min is not None and rsi < rsi_min:
+                return False
+            if rsi_max is not None and rsi > rsi_max:
+                return False
+
+        if technical_score_min is not None:
+            score = technical.get("technical_score")
+            if score is None or score < technical_score_min:
+                return False
+
+        if ma_trend in MA_TREND_FILTERS and technical.get("ma_trend") != MA_TREND_FILTERS[ma_trend]:
+            return False
+
+        # 市值篩選（設定市值條件但無資料時不通過）
         market_cap = fundamental.get("market_cap")
-        if market_cap is not None:
+        if market_cap is None:
+            if market_cap_size or market_cap_min is not None or market_cap_max is not None:
+                return False
+        else:
             cap_billion = market_cap / 1e8  # 轉換為億元
 
             if market_cap_size:
@@ -453,12 +687,31 @@ class StockScreener:
                 "label": "ROE",
                 "condition": f"≥ {kwargs['roe_min']}%",
             })
+        if kwargs.get("rsi_min") is not None:
+            filters.append({
+                "field": "rsi",
+                "label": "RSI",
+                "condition": f"≥ {kwargs['rsi_min']}",
+            })
+        if kwargs.get("rsi_max") is not None:
+            filters.append({
+                "field": "rsi",
+                "label": "RSI",
+                "condition": f"≤ {kwargs['rsi_max']}",
+            })
         if kwargs.get("technical_score_min"):
             filters.append({
                 "field": "technical_score",
                 "label": "技術評分",
                 "condition": f"≥ {kwargs['technical_score_min']}",
             })
+        if kwargs.get("ma_trend") in MA_TREND_FILTERS:
+            trend_labels = {"bullish": "多頭排列", "bearish": "空頭排列", "neutral": "盤整"}
+            filters.append({
+                "field": "ma_trend",
+                "label": "均線趨勢",
+                "condition": trend_labels[kwargs["ma_trend"]],
+            })
         if kwargs.get("foreign_net_min"):
             filters.append({
                 "field": "foreign_net",
@@ -484,12 +737,14 @@ class StockScreener:
         """取得篩選器統計資訊"""
         return {
             "stock_pool_size": len(cls.STOCK_POOL),
+            "market_table": get_table_stats(),
+            "technical_snapshot": get_snapshot_stats(),
             "available_presets": len(cls.PRESET_FILTERS),
             "preset_list": [p.value for p in ScreenerPreset],
             "supported_filters": [
                 "pe_ratio", "pb_ratio", "dividend_yield", "roe",
                 "market_cap", "market_cap_size",
-                "technical_score", "rsi",
+                "technical_score", "rsi", "ma_trend",
                 "foreign_net", "trust_net",
             ],
             "cache_status": {
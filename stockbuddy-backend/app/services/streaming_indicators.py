@@ -0,0 +1,348 @@
+"""
+增量技術指標（盤中即時更新用）
+
+每檔股票保留一份指標狀態：
+- 遞迴指標（EMA / MACD、Wilder RSI、KD）只保存最新狀態，新 K 線 O(1) 更新
+- 視窗指標（MA、布林、威廉、支撐壓力）只保留最近 64 根 K 線，與歷史長度無關
+
+最後一根 K 線視為「未收盤」：同一天的即時報價會直接取代它，
+換日時才把它併入狀態。分析結果由 TechnicalAnalysis.compose_analysis 組合，
+與對同一段完整歷史呼叫 full_analysis 的結果一致。
+
+註冊表中的狀態每個交易日以本地資料庫已定案的 K 線重新初始化：前一日最後一筆即時報價
+在收盤集合競價之前，也未經還原權值，不併入狀態。不再追蹤的股票以 retain_streams 移除。
+
+使用方式：
+    stream = await ensure_stream("2330", session_date="2025-01-10")
+    analysis = stream.update({"date": "2025-01-10", "open": ..., "high": ..., "low": ...,
+                              "close": ..., "volume": ...})
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import asyncio
+
+import numpy as np
+
+from app.services.technical_analysis import TechnicalAnalysis
+
+# 保留的已收盤 K 線數（MA60 + 前一日比較所需）
+TAIL_SIZE = 64
+
+# K 線數少於此值時，均線期間會隨資料量調整，直接以 full_analysis 計算
+MIN_STREAM_BARS = 62
+
+# 指標參數（與 TechnicalAnalysis.full_analysis 相同）
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+RSI_PERIOD = 14
+KD_PERIOD = 9
+WR_PERIOD = 14
+BB_PERIOD, BB_STD = 20, 2
+
+# 盤中更新時預設載入的歷史月數
+SEED_MONTHS = 6
+
+
+class StreamingIndicators:
+    """單一股票的增量指標狀態"""
+
+    def __init__(self, stock_id: str, history: List[Dict[str, Any]]):
+        if not history:
+            raise ValueError(f"{stock_id} 沒有歷史資料")
+
+        self.stock_id = stock_id
+        self._bars: deque = deque(maxlen=TAIL_SIZE)  # 已收盤 K 線
+        self._count = 0                                # 已收盤 K 線總數
+        self._state: Dict[str, Any] = {}               # 已收盤部分的遞迴狀態
+        self._open_bar: Dict[str, Any] = history[-1]   # 未收盤（最新）K 線
+        self._tails: Optional[Dict[int, float]] = None
+        self._analysis: Optional[Dict[str, Any]] = None
+        self.updated_at = datetime.now()
+        self.session_date: Optional[str] = None         # 初始化時的交易日（註冊表換日判斷）
+
+        for bar in history[:-1]:
+            self._commit(bar)
+
+    @property
+    def bar_count(self) -> int:
+        """含未收盤 K 線的總筆數"""
+        return self._count + 1
+
+    @property
+    def last_bar(self) -> Dict[str, Any]:
+        return self._open_bar
+
+    # ============================================================
+    # 更新
+    # ============================================================
+
+    def update(self, bar: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        推入一根 K 線或即時報價
+
+        - 日期與最新 K 線相同：取代（盤中 tick）
+        - 日期較新：前一根收盤併入狀態後，新 K 線成為最新
+        - 日期較舊：忽略
+
+        Returns:
+            最新分析結果
+        """
+        current_date = self._open_bar["date"]
+        if bar["date"] > current_date:
+            self._commit(self._open_bar)
+            self._open_bar = bar
+        elif bar["date"] == current_date:
+            self._open_bar = bar
+        else:
+            return self.analysis()
+
+        self._analysis = None
+        self.updated_at = datetime.now()
+        return self.analysis()
+
+    def _commit(self, bar: Dict[str, Any]) -> None:
+        """將一根已收盤 K 線併入狀態"""
+        self._state = self._advance(self._state, bar)
+        self._bars.append(bar)
+        self._count += 1
+        self._tails = None
+
+    def _advance(self, state: Dict[str, Any], bar: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        由已收盤狀態推進一根 K 線，回傳新狀態（不修改原狀態）
+
+        運算順序與 TechnicalAnalysis 的 calculate_* 完全相同
+        """
+        i = self._count  # 此 K 線在完整序列中的位置
+        close = bar["close"]
+        new = dict(state)
+
+        # --- MACD（EMA 以第一筆為起始值） ---
+        if i == 0:
+            ema_fast = ema_slow = close
+        else:
+            kf = 2 / (MACD_FAST + 1)
+            ks = 2 / (MACD_SLOW + 1)
+            ema_fast = (close * kf) + (state["ema_fast"] * (1 - kf))
+            ema_slow = (close * ks) + (state["ema_slow"] * (1 - ks))
+        dif = ema_fast - ema_slow
+        if i == 0:
+            ema_signal = dif
+        else:
+            kg = 2 / (MACD_SIGNAL + 1)
+            ema_signal = (dif * kg) + (state["ema_signal"] * (1 - kg))
+
+        new.update(ema_fast=ema_fast, ema_slow=ema_slow, ema_signal=ema_signal)
+        if i >= MACD_SLOW - 1:
+            new.update(
+                macd=round(dif, 4),
+                macd_signal=round(ema_signal, 4),
+                macd_hist=round(dif - ema_signal, 4),
+            )
+        else:
+            new.update(macd=None, macd_signal=None, macd_hist=None)
+
+        # --- RSI（Wilder 平滑） ---
+        new["rsi"] = None
+        if i >= 1:
+            delta = close - self._bars[-1]["close"]
+            gain = delta if delta > 0 else 0
+            loss = -delta if delta < 0 else 0
+            j = i - 1  # 變動序號
+            if j < RSI_PERIOD:
+                new["gain_sum"] = state.get("gain_sum", 0) + gain
+                new["loss_sum"] = state.get("loss_sum", 0) + loss
+                if j == RSI_PERIOD - 1:
+                    new["avg_gain"] = new["gain_sum"] / RSI_PERIOD
+                    new["avg_loss"] = new["loss_sum"] / RSI_PERIOD
+            else:
+                avg_gain = (state["avg_gain"] * (RSI_PERIOD - 1) + gain) / RSI_PERIOD
+                avg_loss = (state["avg_loss"] * (RSI_PERIOD - 1) + loss) / RSI_PERIOD
+                new.update(avg_gain=avg_gain, avg_loss=avg_loss)
+                if avg_loss == 0:
+                    new["rsi"] = 100
+                else:
+                    new["rsi"] = round(100 - (100 / (1 + avg_gain / avg_loss)), 2)
+
+        # --- KD（K、D 以四捨五入後的前值平滑） ---
+        if i >= KD_PERIOD - 1:
+            window = list(self._bars)[-(KD_PERIOD - 1):] + [bar]
+            high_max = max(b["high"] for b in window)
+            low_min = min(b["low"] for b in window)
+            rsv = 50 if high_max == low_min else (close - low_min) / (high_max - low_min) * 100
+
+            if i == KD_PERIOD - 1:
+                k = rsv
+                d = k
+            else:
+                prev_k = state["k"] if state["k"] is not None else 50
+                k = (2/3) * prev_k + (1/3) * rsv
+                prev_d = state["d"] if state["d"] is not None else 50
+                d = (2/3) * prev_d + (1/3) * k
+            new.update(k=round(k, 2), d=round(d, 2))
+        else:
+            new.update(k=None, d=None)
+
+        return new
+
+    # ============================================================
+    # 分析
+    # ============================================================
+
+    def analysis(self) -> Dict[str, Any]:
+        """
+        取得最新技術分析（格式同 TechnicalAnalysis.full_analysis）
+
+        結果會快取到下一次 update
+        """
+        if self._analysis is not None:
+            return self._analysis
+
+        if self.bar_count < MIN_STREAM_BARS:
+            # 資料量少時均線期間會調整，直接完整計算（此時全部 K 線都在視窗內）
+            self._analysis = TechnicalAnalysis.full_analysis(list(self._bars) + [self._open_bar])
+            return self._analysis
+
+        bar = self._open_bar
+        close = bar["close"]
+        prev = self._state
+        cur = self._advance(prev, bar)
+        tails = self._window_tails()
+
+        window = list(self._bars)[-(TAIL_SIZE - 2):] + [bar]
+        closes = [b["close"] for b in window]
+        highs = [b["high"] for b in window]
+        lows = [b["low"] for b in window]
+        volumes = [b["volume"] for b in window]
+
+        ma5 = round((tails[5] + close) / 5, 2)
+        ma20 = round((tails[20] + close) / 20, 2)
+        ma60 = round((tails[60] + close) / 60, 2)
+
+        bb_std = np.std(closes[-BB_PERIOD:])
+        wr_high = max(highs[-WR_PERIOD:])
+        wr_low = min(lows[-WR_PERIOD:])
+        wr = -50 if wr_high == wr_low else (wr_high - close) / (wr_high - wr_low) * -100
+
+        self._analysis = TechnicalAnalysis.compose_analysis(
+            closes, highs, lows, volumes,
+            ma5=[ma5], ma20=[ma20], ma60=[ma60],
+            rsi=[cur["rsi"]],
+            macd={
+                "macd": [prev["macd"], cur["macd"]],
+                "signal": [prev["macd_signal"], cur["macd_signal"]],
+                "histogram": [prev["macd_hist"], cur["macd_hist"]],
+            },
+            bb={
+                "upper": [round(ma20 + BB_STD * bb_std, 2)],
+                "middle": [ma20],
+                "lower": [round(ma20 - BB_STD * bb_std, 2)],
+            },
+            kd={"K": [prev["k"], cur["k"]], "D": [prev["d"], cur["d"]]},
+            williams_r=[round(wr, 2)],
+        )
+        return self._analysis
+
+    def _window_tails(self) -> Dict[int, float]:
+        """
+        已收盤 K 線最近 period - 1 筆收盤價的和（依序加總，與 sum(window) 相同）
+
+        每次收盤後只計算一次，盤中 tick 只需再加上最新價
+        """
+        if self._tails is None:
+            closes = [b["close"] for b in self._bars]
+            self._tails = {p: sum(closes[len(closes) - (p - 1):]) for p in (5, 20, 60)}
+        return self._tails
+
+
+# ============================================================
+# 全域註冊表
+# ============================================================
+
+_streams: Dict[str, StreamingIndicators] = {}
+
+
+def get_stream(stock_id: str) -> Optional[StreamingIndicators]:
+    """取得已建立的增量指標（未建立則回傳 None）"""
+    return _streams.get(stock_id)
+
+
+def _final_history(stock_id: str, months: int) -> List[Dict[str, Any]]:
+    """本地資料庫已定案的 K 線（必要時先增量更新；不含盤中 K 線）"""
+    from app.services.ohlcv_store import get_ohlcv_store
+
+    store = get_ohlcv_store()
+    if store.needs_refresh(stock_id, months):
+        store.refresh_sync(stock_id, months)
+    return store.read_history(stock_id, months)
+
+
+async def ensure_stream(
+    stock_id: str,
+    months: int = SEED_MONTHS,
+    session_date: Optional[str] = None,
+) -> Optional[StreamingIndicators]:
+    """
+    取得增量指標，未建立或換日時以本地資料庫已定案的 K 線初始化
+
+    Args:
+        session_date: 目前交易日（YYYY-MM-DD）；與初始化時不同即重新初始化，None 不檢查
+    """
+    stream = _streams.get(stock_id)
+    if stream is not None and (session_date is None or stream.session_date == session_date):
+        return stream
+
+    loop = asyncio.get_running_loop()
+    history = await loop.run_in_executor(None, _final_history, stock_id, months)
+    if not history:
+        _streams.pop(stock_id, None)
+        return None
+
+    stream = StreamingIndicators(stock_id, history)
+    stream.session_date = session_date
+    _streams[stock_id] = stream
+    return stream
+
+
+def retain_streams(stock_ids: List[str]) -> int:
+    """只保留指定股票的增量指標（移除不再追蹤的股票），回傳移除數"""
+    keep = set(stock_ids)
+    removed = [stock_id for stock_id in _streams if stock_id not in keep]
+    for stock_id in removed:
+        del _streams[stock_id]
+    return len(removed)
+
+
+def quote_to_bar(quote: Dict[str, Any], date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    將 TWSEOpenAPI.get_realtime_quotes 的報價轉為日 K 格式
+
+    即時報價成交量單位為張，轉為股以與 yfinance 一致
+    """
+    price = quote.get("price")
+    if not price:
+        return None
+
+    return {
+        "date": date or datetime.now().strftime("%Y-%m-%d"),
+        "open": quote.get("open") or price,
+        "high": quote.get("high") or price,
+        "low": quote.get("low") or price,
+        "close": price,
+        "volume": (quote.get("volume") or 0) * 1000,
+    }
+
+
+def drop_stream(stock_id: str) -> None:
+    """移除增量指標"""
+    _streams.pop(stock_id, None)
+
+
+def get_stream_stats() -> Dict[str, Any]:
+    """增量指標統計"""
+    return {
+        "streams": len(_streams),
+        "stocks": sorted(_streams),
+    }
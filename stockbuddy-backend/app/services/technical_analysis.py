@@ -7,63 +7,35 @@ import pandas as pd
 import numpy as np
 from typing import List, Dict, Any, Optional
 
+from app.services import indicator_engine
+
 
 class TechnicalAnalysis:
     """技術分析計算"""
 
     @staticmethod
     def calculate_ma(prices: List[float], period: int) -> List[Optional[float]]:
-        """計算移動平均線"""
+        """計算移動平均線（累積和，O(n)）"""
         if len(prices) < period:
             return [None] * len(prices)
-        
-        result = [None] * (period - 1)
-        for i in range(period - 1, len(prices)):
-            avg = sum(prices[i - period + 1:i + 1]) / period
-            result.append(round(avg, 2))
-        return result
+
+        return indicator_engine.to_list(
+            indicator_engine.sma(indicator_engine.as_array(prices), period, decimals=2)
+        )
 
     @staticmethod
     def calculate_rsi(prices: List[float], period: int = 14) -> List[Optional[float]]:
-        """計算 RSI 指標"""
+        """計算 RSI 指標（Wilder 平滑）"""
         if len(prices) < period + 1:
             return [None] * len(prices)
 
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        
-        gains = [d if d > 0 else 0 for d in deltas]
-        losses = [-d if d < 0 else 0 for d in deltas]
-
-        result = [None] * period
-        
-        avg_gain = sum(gains[:period]) / period
-        avg_loss = sum(losses[:period]) / period
-
-        for i in range(period, len(deltas)):
-            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-            
-            if avg_loss == 0:
-                rsi = 100
-            else:
-                rs = avg_gain / avg_loss
-                rsi = 100 - (100 / (1 + rs))
-            
-            result.append(round(rsi, 2))
-
-        # 補上第一個 RSI
-        if avg_loss == 0:
-            first_rsi = 100
-        else:
-            rs = (sum(gains[:period]) / period) / (sum(losses[:period]) / period) if sum(losses[:period]) > 0 else 100
-            first_rsi = 100 - (100 / (1 + rs)) if rs != 100 else 100
-        result[period - 1] = round(first_rsi, 2)
-
-        return [None] + result  # 第一個價格沒有變動
+        return indicator_engine.to_list(
+            indicator_engine.rsi(indicator_engine.as_array(prices), period), decimals=2
+        )
 
     @staticmethod
     def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, List[Optional[float]]]:
-        """計算 MACD 指標"""
+        """計算 MACD 指標（遞迴 EMA）"""
         if len(prices) < slow:
             return {
                 "macd": [None] * len(prices),
@@ -71,36 +43,17 @@ class TechnicalAnalysis:
                 "histogram": [None] * len(prices),
             }
 
-        # 計算 EMA
-        def ema(data: List[float], period: int) -> List[float]:
-            multiplier = 2 / (period + 1)
-            result = [data[0]]
-            for i in range(1, len(data)):
-                result.append((data[i] * multiplier) + (result[-1] * (1 - multiplier)))
-            return result
-
-        ema_fast = ema(prices, fast)
-        ema_slow = ema(prices, slow)
-        
-        macd_line = [ema_fast[i] - ema_slow[i] for i in range(len(prices))]
-        signal_line = ema(macd_line, signal)
-        histogram = [macd_line[i] - signal_line[i] for i in range(len(prices))]
-
-        # 前面數據不足的部分設為 None
-        for i in range(slow - 1):
-            macd_line[i] = None
-            signal_line[i] = None
-            histogram[i] = None
+        result = indicator_engine.macd(indicator_engine.as_array(prices), fast, slow, signal)
 
         return {
-            "macd": [round(v, 4) if v is not None else None for v in macd_line],
-            "signal": [round(v, 4) if v is not None else None for v in signal_line],
-            "histogram": [round(v, 4) if v is not None else None for v in histogram],
+            "macd": indicator_engine.to_list(result["macd"], decimals=4),
+            "signal": indicator_engine.to_list(result["signal"], decimals=4),
+            "histogram": indicator_engine.to_list(result["histogram"], decimals=4),
         }
 
     @staticmethod
     def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: float = 2) -> Dict[str, List[Optional[float]]]:
-        """計算布林通道"""
+        """計算布林通道（累積和 / 平方累積和，O(n)）"""
         if len(prices) < period:
             return {
                 "upper": [None] * len(prices),
@@ -108,25 +61,12 @@ class TechnicalAnalysis:
                 "lower": [None] * len(prices),
             }
 
-        middle = TechnicalAnalysis.calculate_ma(prices, period)
-        
-        upper = []
-        lower = []
-        
-        for i in range(len(prices)):
-            if middle[i] is None:
-                upper.append(None)
-                lower.append(None)
-            else:
-                window = prices[i - period + 1:i + 1]
-                std = np.std(window)
-                upper.append(round(middle[i] + std_dev * std, 2))
-                lower.append(round(middle[i] - std_dev * std, 2))
+        bands = indicator_engine.bollinger(indicator_engine.as_array(prices), period, std_dev, decimals=2)
 
         return {
-            "upper": upper,
-            "middle": middle,
-            "lower": lower,
+            "upper": indicator_engine.to_list(bands["upper"]),
+            "middle": indicator_engine.to_list(bands["middle"]),
+            "lower": indicator_engine.to_list(bands["lower"]),
         }
 
     @staticmethod
@@ -511,6 +451,30 @@ class TechnicalAnalysis:
         kd = cls.calculate_kd(highs, lows, closes)
         williams_r = cls.calculate_williams_r(highs, lows, closes)
 
+        return cls.compose_analysis(closes, highs, lows, volumes, ma5, ma20, ma60, rsi, macd, bb, kd, williams_r)
+
+    @classmethod
+    def compose_analysis(
+        cls,
+        closes: List[float],
+        highs: List[float],
+        lows: List[float],
+        volumes: List[float],
+        ma5: List[Optional[float]],
+        ma20: List[Optional[float]],
+        ma60: List[Optional[float]],
+        rsi: List[Optional[float]],
+        macd: Dict[str, List[Optional[float]]],
+        bb: Dict[str, List[Optional[float]]],
+        kd: Dict[str, List[Optional[float]]],
+        williams_r: List[Optional[float]],
+    ) -> Dict[str, Any]:
+        """
+        由指標序列組合完整分析結果
+
+        只會讀取各序列最近的值（價量至少 61 筆、指標至少 2 筆即可），
+        增量指標（streaming_indicators）以相同方式組合，結果與 full_analysis 一致
+        """
         # 分析
         trend_analysis = cls.analyze_trend(closes, ma5, ma20, ma60)
         rsi_analysis = cls.analyze_rsi(rsi)
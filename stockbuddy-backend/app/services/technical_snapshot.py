@@ -0,0 +1,353 @@
+"""
+盤後技術指標快照
+
+每個交易日收盤後，以本地 OHLCV 資料庫（ohlcv_store）對全市場計算最新一根 K 線的技術指標，
+存成「每檔一列、每個指標一欄」的 float32 表格並寫入 data/technical_snapshot.npz：
+- 選股篩選器：RSI / 均線趨勢 / 技術評分條件直接查表
+- /recommend 初篩：候選股排序加入盤後技術評分
+- 股票比較：技術面欄位與動能分數
+
+查詢皆為 O(1) 的字典索引，不需要在請求中下載歷史資料或重跑 full_analysis。
+
+使用方式：
+    snapshot = get_technical_snapshot()
+    row = snapshot.get("2330")          # {"rsi": 58.2, "ma_trend": 1, ...} 或 None
+    await run_snapshot_job()            # 盤後重建（DataScheduler 自動排程）
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.ohlcv_store import DATA_DIR, get_ohlcv_store
+from app.services.technical_analysis import TechnicalAnalysis
+
+SNAPSHOT_FILE = DATA_DIR / "technical_snapshot.npz"
+
+# 指標欄位（float32）
+FIELDS = (
+    "close",
+    "change_5d",        # 近 5 日漲跌幅 (%)
+    "ma5",
+    "ma20",
+    "ma60",
+    "rsi",
+    "macd_histogram",
+    "kd_k",
+    "kd_d",
+    "volume_ratio",
+    "ma_trend",         # 1 多頭排列 / -1 空頭排列 / 0 盤整
+    "technical_score",
+)
+
+# 均線排列代碼
+MA_TREND_CODES = {"多頭排列": 1, "空頭排列": -1, "盤整": 0}
+MA_TREND_LABELS = {code: label for label, code in MA_TREND_CODES.items()}
+
+# 篩選參數 → 代碼
+MA_TREND_FILTERS = {"bullish": 1, "bearish": -1, "neutral": 0}
+
+# 計算指標使用的歷史長度（MA60 + MACD 暖機）
+HISTORY_MONTHS = 6
+
+# full_analysis 最少需要的 K 線數
+MIN_BARS = 20
+
+# 每批向上游增量更新的股票數
+REFRESH_CHUNK = 100
+
+# 收盤資料齊全的時間（13:30 收盤，盤後資料約 14:30 前完成）
+SNAPSHOT_READY_TIME = dt_time(14, 30)
+
+# 當日 K 線尚未齊全（上游延遲或休市）時，每日最多重試次數與間隔
+SNAPSHOT_MAX_ATTEMPTS = 3
+SNAPSHOT_RETRY_INTERVAL = timedelta(minutes=30)
+
+
+def ma_trend_code(trend: Optional[str]) -> float:
+    """均線排列文字轉為代碼（資料不足為 NaN）"""
+    return float(MA_TREND_CODES.get(trend, np.nan))
+
+
+class TechnicalSnapshot:
+    """全市場最新技術指標快照（每檔一列）"""
+
+    def __init__(
+        self,
+        stock_ids: List[str],
+        bar_dates: List[str],
+        values: np.ndarray,
+        built_at: Optional[datetime] = None,
+    ):
+        self.stock_ids = np.array(stock_ids, dtype=object)
+        self.bar_dates = list(bar_dates)
+        self.values = np.asarray(values, dtype=np.float32).reshape(len(stock_ids), len(FIELDS))
+        self.built_at = built_at
+        self.index = {stock_id: i for i, stock_id in enumerate(stock_ids)}
+
+    def __len__(self) -> int:
+        return len(self.stock_ids)
+
+    @classmethod
+    def empty(cls) -> "TechnicalSnapshot":
+        return cls([], [], np.empty((0, len(FIELDS)), dtype=np.float32))
+
+    @property
+    def as_of(self) -> Optional[str]:
+        """最新 K 線日期"""
+        return max(self.bar_dates) if self.bar_dates else None
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, FIELDS.index(name)]
+
+    def get(self, stock_id: str) -> Optional[Dict[str, Any]]:
+        """單檔指標（NaN 轉為 None），無資料時回傳 None"""
+        i = self.index.get(stock_id)
+        if i is None:
+            return None
+
+        row = {"stock_id": stock_id, "bar_date": self.bar_dates[i]}
+        for name, value in zip(FIELDS, self.values[i].tolist()):
+            row[name] = None if value != value else round(value, 4)
+        if row["ma_trend"] is not None:
+            row["ma_trend"] = int(row["ma_trend"])
+        if row["technical_score"] is not None:
+            row["technical_score"] = int(row["technical_score"])
+        row["ma_trend_label"] = MA_TREND_LABELS.get(row["ma_trend"])
+        return row
+
+    def save(self, path: Path = SNAPSHOT_FILE) -> None:
+        """寫入 .npz（先寫暫存檔再取代，讀取端不會看到寫到一半的檔案）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp,
+            stock_ids=np.array(self.stock_ids, dtype=str),
+            bar_dates=np.array(self.bar_dates, dtype=str),
+            values=self.values,
+            fields=np.array(FIELDS, dtype=str),
+            built_at=np.array((self.built_at or datetime.now()).isoformat()),
+        )
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = SNAPSHOT_FILE) -> Optional["TechnicalSnapshot"]:
+        """讀取 .npz，檔案不存在或欄位不同（舊版）時回傳 None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if tuple(data["fields"].tolist()) != FIELDS:
+                    return None
+                return cls(
+                    stock_ids=data["stock_ids"].tolist(),
+                    bar_dates=data["bar_dates"].tolist(),
+                    values=data["values"],
+                    built_at=datetime.fromisoformat(str(data["built_at"])),
+                )
+        except Exception as e:
+            print(f"讀取技術指標快照失敗: {e}")
+            return None
+
+
+# ============================================================
+# 計算
+# ============================================================
+
+def snapshot_values(analysis: Dict[str, Any], closes: List[float]) -> np.ndarray:
+    """由 full_analysis 結果取出快照欄位"""
+    ma = analysis.get("ma") or {}
+    macd = analysis.get("macd") or {}
+    kd = analysis.get("kd") or {}
+    change_5d = (closes[-1] - closes[-5]) / closes[-5] * 100 if len(closes) >= 5 and closes[-5] else None
+
+    row = {
+        "close": analysis.get("current_price"),
+        "change_5d": change_5d,
+        "ma5": ma.get("ma5"),
+        "ma20": ma.get("ma20"),
+        "ma60": ma.get("ma60"),
+        "rsi": (analysis.get("rsi") or {}).get("value"),
+        "macd_histogram": macd.get("histogram"),
+        "kd_k": kd.get("K"),
+        "kd_d": kd.get("D"),
+        "volume_ratio": (analysis.get("volume") or {}).get("ratio"),
+        "ma_trend": ma_trend_code((analysis.get("trend") or {}).get("trend")),
+        "technical_score": analysis.get("overall_score"),
+    }
+    return np.array([np.nan if row[name] is None else row[name] for name in FIELDS], dtype=np.float32)
+
+
+def build_technical_snapshot(
+    stock_ids: List[str],
+    refresh: bool = True,
+    store=None,
+    session_date: Optional[str] = None,
+) -> TechnicalSnapshot:
+    """
+    計算全市場技術指標快照（同步，於執行緒池中呼叫）
+
+    Args:
+        stock_ids: 股票代號列表
+        refresh: 先向上游批量更新本地 K 線（忽略 TTL，盤中檢查過的股票也重新下載）
+        store: OHLCVStore（預設為全域實例）
+        session_date: 交易日（YYYY-MM-DD）；最後一根 K 線不是該日的股票略過，None 不檢查
+    """
+    store = store or get_ohlcv_store()
+    stock_ids = list(dict.fromkeys(stock_ids))
+
+    if refresh:
+        for i in range(0, len(stock_ids), REFRESH_CHUNK):
+            try:
+                store.refresh_many_sync(stock_ids[i:i + REFRESH_CHUNK], HISTORY_MONTHS, force=True)
+            except Exception as e:
+                print(f"⚠️ [TechnicalSnapshot] K 線更新失敗: {e}")
+
+    ids, dates, rows = [], [], []
+    stale = 0
+    for stock_id in stock_ids:
+        history = store.read_history(stock_id, months=HISTORY_MONTHS)
+        if len(history) < MIN_BARS:
+            continue
+        if session_date and history[-1]["date"] != session_date:
+            # 當日 K 線尚未取得（停牌或上游未更新），不以舊 K 線冒充當日指標
+            stale += 1
+            continue
+        try:
+            analysis = TechnicalAnalysis.full_analysis(history)
+        except Exception as e:
+            print(f"⚠️ [TechnicalSnapshot] {stock_id} 分析失敗: {e}")
+            continue
+        if "error" in analysis:
+            continue
+
+        ids.append(stock_id)
+        dates.append(history[-1]["date"])
+        rows.append(snapshot_values(analysis, [bar["close"] for bar in history]))
+
+    if stale:
+        print(f"⚠️ [TechnicalSnapshot] {stale} 檔沒有 {session_date} 的 K 線，略過")
+
+    values = np.vstack(rows) if rows else np.empty((0, len(FIELDS)), dtype=np.float32)
+    return TechnicalSnapshot(ids, dates, values, built_at=datetime.now())
+
+
+# ============================================================
+# 全域快照
+# ============================================================
+
+_snapshot: Optional[TechnicalSnapshot] = None
+_job_lock: Optional[asyncio.Lock] = None
+_last_job: Dict[str, Any] = {}
+_attempts: Dict[str, Any] = {}
+
+
+def get_technical_snapshot() -> TechnicalSnapshot:
+    """取得目前的快照（首次呼叫時從磁碟載入，沒有檔案則為空表）"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = TechnicalSnapshot.load() or TechnicalSnapshot.empty()
+    return _snapshot
+
+
+def set_technical_snapshot(snapshot: TechnicalSnapshot, persist: bool = True) -> None:
+    """替換全域快照（可選寫入磁碟）"""
+    global _snapshot
+    if persist:
+        snapshot.save()
+    _snapshot = snapshot
+
+
+def snapshot_due(now: Optional[datetime] = None) -> bool:
+    """交易日收盤資料齊全後，今天尚未重建過快照（當日 K 線未齊全時間隔重試，有次數上限）"""
+    now = now or datetime.now()
+    if now.weekday() >= 5 or now.time() < SNAPSHOT_READY_TIME:
+        return False
+    built_at = get_technical_snapshot().built_at
+    if built_at is not None and built_at >= datetime.combine(now.date(), SNAPSHOT_READY_TIME):
+        return False
+    if _attempts.get("date") == now.date().isoformat():
+        if _attempts["count"] >= SNAPSHOT_MAX_ATTEMPTS:
+            return False
+        return now - _attempts["last"] >= SNAPSHOT_RETRY_INTERVAL
+    return True
+
+
+async def _default_universe() -> List[str]:
+    """全市場股票（欄位表），無資料時退回篩選器股票池"""
+    from app.services.fundamentals_table import get_fundamentals_table
+    from app.services.stock_screener import StockScreener
+
+    try:
+        table = await get_fundamentals_table()
+        stock_ids = [s for s in table.stock_ids if len(s) == 4]
+    except Exception as e:
+        print(f"⚠️ [TechnicalSnapshot] 全市場清單取得失敗: {e}")
+        stock_ids = []
+    return stock_ids or list(StockScreener.STOCK_POOL)
+
+
+async def run_snapshot_job(stock_ids: Optional[List[str]] = None) -> TechnicalSnapshot:
+    """
+    重建並發布快照（並行呼叫只執行一次）
+
+    Args:
+        stock_ids: 股票代號列表，None 為全市場
+    """
+    global _job_lock
+    if _job_lock is None:
+        _job_lock = asyncio.Lock()
+
+    async with _job_lock:
+        started = time.perf_counter()
+        now = datetime.now()
+        session_date = now.date().isoformat()
+        count = _attempts["count"] if _attempts.get("date") == session_date else 0
+        _attempts.update({"date": session_date, "count": count + 1, "last": now})
+
+        stock_ids = stock_ids or await _default_universe()
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(
+            None, lambda: build_technical_snapshot(stock_ids, session_date=session_date)
+        )
+
+        if len(snapshot) == 0:
+            # 上游全部失敗或尚無當日 K 線（休市）時保留舊快照
+            print(f"⚠️ [TechnicalSnapshot] 無 {session_date} 的指標資料，保留舊快照")
+            return get_technical_snapshot()
+
+        set_technical_snapshot(snapshot)
+
+        from app.services.fundamentals_table import refresh_technical_columns
+        refresh_technical_columns()
+
+        _last_job.update({
+            "finished_at": datetime.now().isoformat(),
+            "requested": len(stock_ids),
+            "stocks": len(snapshot),
+            "session_date": session_date,
+            "seconds": round(time.perf_counter() - started, 2),
+        })
+        print(f"✅ [TechnicalSnapshot] 技術指標快照: {len(snapshot)}/{len(stock_ids)} 檔 "
+              f"({snapshot.as_of}, {_last_job['seconds']}s)")
+        return snapshot
+
+
+def get_snapshot_stats() -> Dict[str, Any]:
+    """快照狀態"""
+    snapshot = get_technical_snapshot()
+    return {
+        "stocks": len(snapshot),
+        "as_of": snapshot.as_of,
+        "built_at": snapshot.built_at.isoformat() if snapshot.built_at else None,
+        "fields": list(FIELDS),
+        "bytes": int(snapshot.values.nbytes),
+        "last_job": dict(_last_job),
+    }
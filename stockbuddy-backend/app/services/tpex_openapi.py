@@ -9,14 +9,14 @@ V10.15 新增：支援上櫃股票資料
 4. 上櫃融資融券
 """
 
-import httpx
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from cachetools import TTLCache
-import time
 import json
 
+from app.services.http_client import get_http_client
+
 class TPExOpenAPI:
     """櫃買中心 OpenAPI 服務"""
 
@@ -25,22 +25,12 @@ class TPExOpenAPI:
     # 快取設定
     _cache = TTLCache(maxsize=100, ttl=300)  # 5 分鐘
     _daily_cache = TTLCache(maxsize=50, ttl=60)  # 1 分鐘
-    _last_request_time = 0
-    _request_interval = 1.5  # 每次請求間隔 1.5 秒
 
     @classmethod
     async def _rate_limited_request(cls, url: str, params: dict = None) -> Optional[Any]:
-        """限速請求"""
-        # Rate limiting
-        current_time = time.time()
-        time_since_last = current_time - cls._last_request_time
-        if time_since_last < cls._request_interval:
-            await asyncio.sleep(cls._request_interval - time_since_last)
-
-        cls._last_request_time = time.time()
-
+        """限速請求（共用 http_client，每次請求間隔約 1.5 秒）"""
         try:
-            async with httpx.AsyncClient(timeout=15.0, verify=False) as client:
+            async with get_http_client().session(timeout=15.0, verify=False) as client:
                 response = await client.get(url, params=params)
                 response.raise_for_status()
 
@@ -158,6 +148,42 @@ class TPExOpenAPI:
 
         return result
 
+    @classmethod
+    async def get_otc_issued_shares(cls) -> Dict[str, int]:
+        """
+        取得上櫃公司已發行普通股數（公司基本資料）
+
+        Returns:
+            Dict[stock_id, 股數]
+        """
+        cache_key = "otc_issued_shares"
+        if cache_key in cls._cache:
+            return cls._cache[cache_key]
+
+        url = f"{cls.BASE_URL}/mopsfin_t187ap03_O"
+        data = await cls._rate_limited_request(url)
+
+        if not data:
+            return {}
+
+        result = {}
+        for item in data:
+            stock_id = item.get("SecuritiesCompanyCode") or item.get("公司代號", "")
+            if not stock_id or not stock_id.isdigit():
+                continue
+
+            shares = cls._parse_number(
+                item.get("IssueShares") or item.get("已發行普通股數或TDR原股發行股數")
+            )
+            if shares > 0:
+                result[stock_id] = int(shares)
+
+        if result:
+            cls._cache[cache_key] = result
+            print(f"[TPEx] 取得 {len(result)} 檔上櫃公司已發行股數")
+
+        return result
+
     @classmethod
     async def get_otc_institutional(cls) -> Dict[str, Dict]:
         """
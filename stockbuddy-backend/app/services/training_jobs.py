@@ -0,0 +1,322 @@
+"""
+背景訓練工作
+
+/ml/train-historical、/train-incremental、/train-hybrid 會下載數據、萃取特徵、
+以交叉驗證訓練 XGBoost，耗時數分鐘。原本在 async 路由中同步執行，
+整個事件迴圈停住，其他使用者的請求全部卡住。
+
+改為在獨立子行程執行：
+- 每個工作有 job_id 與狀態 queued → running → done / failed / cancelled
+- 子行程透過佇列回報進度百分比與目前階段
+- 同一時間只執行一個訓練，其餘排隊
+- 排隊中的工作可直接取消；執行中的工作終止整個子行程群組
+- 訓練完成後重置本行程的預測器，下一次預測載入新模型
+
+使用方式：
+    runner = get_training_runner()
+    job = runner.submit("historical", {"period": "1y", "predict_days": 5})
+    runner.get(job.id).to_dict()       # 狀態與進度
+    await runner.wait(job.id)          # 等待完成
+    runner.cancel(job.id)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# 子行程啟動方式（spawn 不繼承事件迴圈、連線池與鎖的狀態）
+TRAINING_START_METHOD = os.getenv("TRAINING_START_METHOD", "spawn")
+
+# 保留的已結束工作數
+MAX_FINISHED_JOBS = 50
+
+# 讀取子行程訊息的間隔（秒）
+POLL_INTERVAL = 0.2
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+def _default_tasks() -> Dict[str, Callable[..., Dict[str, Any]]]:
+    from app.services.ml_predictor import ModelTrainer
+    return {
+        "historical": ModelTrainer.train_from_historical,
+        "incremental": ModelTrainer.incremental_train,
+        "hybrid": ModelTrainer.hybrid_train,
+    }
+
+
+def _run_in_child(task: Callable[..., Dict[str, Any]], params: Dict[str, Any], messages) -> None:
+    """子行程進入點：執行訓練並把進度與結果放入佇列"""
+    if hasattr(os, "setpgrp"):
+        # 自成行程群組，取消時連同特徵計算的行程池一起終止
+        os.setpgrp()
+
+    def progress(fraction: float, stage: str) -> None:
+        messages.put(("progress", fraction, stage))
+
+    try:
+        result = task(progress=progress, **params)
+        messages.put(("result", result))
+    except BaseException as e:
+        messages.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class TrainingJob:
+    """單一訓練工作"""
+
+    def __init__(self, kind: str, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = QUEUED
+        self.progress = 0.0       # 0-100
+        self.stage = "排隊中"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.process = None
+        self.finished = asyncio.Event()
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at:
+            elapsed = round(((self.finished_at or datetime.now()) - self.started_at).total_seconds(), 1)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": round(self.progress, 1),
+            "stage": self.stage,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": elapsed,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class TrainingJobRunner:
+    """訓練工作佇列（一次只執行一個子行程）"""
+
+    def __init__(
+        self,
+        tasks: Optional[Dict[str, Callable[..., Dict[str, Any]]]] = None,
+        start_method: str = TRAINING_START_METHOD,
+    ):
+        self._tasks = tasks
+        self._context = multiprocessing.get_context(start_method)
+        self._jobs: "OrderedDict[str, TrainingJob]" = OrderedDict()
+        self._queue: Deque[TrainingJob] = deque()
+        self._worker: Optional[asyncio.Task] = None
+        self._current: Optional[TrainingJob] = None
+
+    @property
+    def tasks(self) -> Dict[str, Callable[..., Dict[str, Any]]]:
+        if self._tasks is None:
+            self._tasks = _default_tasks()
+        return self._tasks
+
+    # ============================================================
+    # 提交 / 查詢 / 取消
+    # ============================================================
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None) -> TrainingJob:
+        """加入訓練工作（必須在事件迴圈中呼叫）"""
+        if kind not in self.tasks:
+            raise ValueError(f"未知的訓練類型: {kind}")
+
+        job = TrainingJob(kind, dict(params or {}))
+        self._jobs[job.id] = job
+        self._queue.append(job)
+        self._prune()
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._work())
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return list(reversed(self._jobs.values()))
+
+    async def wait(self, job_id: str) -> TrainingJob:
+        """等待工作結束"""
+        job = self._jobs[job_id]
+        await job.finished.wait()
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """取消工作，回傳是否成功（已結束的工作無法取消）"""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return False
+
+        if job.status == QUEUED:
+            self._queue.remove(job)
+            self._finish(job, CANCELLED, stage="已取消")
+            return True
+
+        # 執行中：終止子行程群組，_run 偵測到行程結束後收尾
+        job.status = CANCELLED
+        job.stage = "已取消"
+        self._terminate(job.process)
+        return True
+
+    # ============================================================
+    # 執行
+    # ============================================================
+
+    async def _work(self) -> None:
+        while self._queue:
+            job = self._queue.popleft()
+            self._current = job
+            try:
+                await self._run(job)
+            finally:
+                self._current = None
+
+    async def _run(self, job: TrainingJob) -> None:
+        messages = self._context.Queue()
+        process = self._context.Process(
+            target=_run_in_child,
+            args=(self.tasks[job.kind], job.params, messages),
+            name=f"training-{job.id}",
+            daemon=False,  # 子行程內還會建立特徵計算的行程池
+        )
+        job.process = process
+        job.status = RUNNING
+        job.stage = "啟動中"
+        job.started_at = datetime.now()
+        print(f"🏋️ [TrainingJobs] {job.kind} 訓練開始 ({job.id})")
+
+        outcome = None
+        try:
+            process.start()
+            while True:
+                outcome = self._drain(job, messages) or outcome
+                if not process.is_alive():
+                    outcome = self._drain(job, messages) or outcome
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+            process.join(timeout=1)
+        except Exception as e:
+            outcome = ("error", f"{type(e).__name__}: {e}")
+            self._terminate(process)
+        finally:
+            job.process = None
+            messages.close()
+
+        if job.status == CANCELLED:
+            self._finish(job, CANCELLED, stage="已取消")
+        elif outcome is None:
+            self._finish(job, FAILED, error=f"訓練行程異常結束 (exit code {process.exitcode})")
+        elif outcome[0] == "error":
+            self._finish(job, FAILED, error=outcome[1])
+        else:
+            result = outcome[1] or {}
+            job.result = result
+            if result.get("success"):
+                self._finish(job, DONE, stage="完成")
+                self._reload_predictor()
+            else:
+                self._finish(job, FAILED, error=result.get("error", "訓練失敗"))
+
+        print(f"🏁 [TrainingJobs] {job.kind} 訓練結束 ({job.id}): {job.status}, {job.to_dict()['elapsed_seconds']}s")
+
+    def _drain(self, job: TrainingJob, messages) -> Optional[tuple]:
+        """讀取子行程訊息，回傳結果訊息（若有）"""
+        outcome = None
+        while True:
+            try:
+                message = messages.get_nowait()
+            except queue.Empty:
+                return outcome
+            if message[0] == "progress" and job.status == RUNNING:
+                job.progress = max(job.progress, min(100.0, message[1] * 100))
+                job.stage = message[2]
+            elif message[0] in ("result", "error"):
+                outcome = message
+
+    def _finish(self, job: TrainingJob, status: str, stage: Optional[str] = None, error: Optional[str] = None) -> None:
+        job.status = status
+        if status == DONE:
+            job.progress = 100.0
+        if stage:
+            job.stage = stage
+        if error:
+            job.error = error
+            job.stage = "失敗"
+        job.finished_at = datetime.now()
+        job.finished.set()
+
+    @staticmethod
+    def _terminate(process) -> None:
+        if process is None or not process.is_alive():
+            return
+        try:
+            if hasattr(os, "killpg"):
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except (ProcessLookupError, PermissionError):
+            process.terminate()
+
+    @staticmethod
+    def _reload_predictor() -> None:
+        """子行程已寫入新模型，重置本行程的預測器"""
+        from app.services import ml_predictor
+        ml_predictor._predictor = None
+
+    def _prune(self) -> None:
+        """只保留最近 MAX_FINISHED_JOBS 個已結束的工作"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """關閉時終止執行中的訓練"""
+        for job in list(self._queue):
+            self.cancel(job.id)
+        if self._current is not None:
+            self.cancel(self._current.id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "running": self._current.id if self._current else None,
+            "queued": len(self._queue),
+            "jobs": counts,
+        }
+
+
+_runner: Optional[TrainingJobRunner] = None
+
+
+def get_training_runner() -> TrainingJobRunner:
+    """取得全域訓練工作佇列"""
+    global _runner
+    if _runner is None:
+        _runner = TrainingJobRunner()
+    return _runner
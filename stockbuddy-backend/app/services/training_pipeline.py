@@ -0,0 +1,296 @@
+"""
+訓練資料管線（下載與特徵計算重疊執行）
+
+train_from_historical 的資料準備分為三個階段：
+1. 下載：執行緒池同時取得各股票的 OHLCV（本地資料庫增量更新）與基本面
+2. 特徵：每檔下載完成即送入行程池，以 build_feature_matrix 計算特徵矩陣與標籤
+3. 合併：依股票清單順序串接為最終的 X / y（結果與逐檔序列處理相同）
+
+大盤數據在主行程載入一次，於行程池啟動時傳給每個子行程（initializer）。
+回傳各階段耗時，方便評估全市場重新訓練所需時間。
+
+使用方式：
+    data = prepare_training_data(["2330", "2317"], period="5y", predict_days=5)
+    X, y = data.X, data.y
+    print(data.timings)
+"""
+
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 特徵計算子行程數量
+TRAINING_MAX_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# 同時下載的股票數
+DOWNLOAD_CONCURRENCY = 8
+
+# 產生樣本的起始列（MA60 暖機）
+WARMUP_ROWS = 60
+
+# 缺失比例超過此值的樣本捨棄
+MAX_MISSING_RATIO = 0.6
+
+
+@dataclass
+class TrainingData:
+    """訓練資料與管線統計"""
+    X: np.ndarray
+    y: np.ndarray
+    feature_names: List[str]
+    quality_stats: Dict[str, int]
+    processed_stocks: int
+    skipped_stocks: int
+    stock_samples: Dict[str, int] = field(default_factory=dict)
+    # 每筆樣本的股票代碼、日期、N 天報酬率 (%) 與品質分數（與 X 列對齊）
+    sample_stock_ids: List[str] = field(default_factory=list)
+    sample_dates: List[Any] = field(default_factory=list)
+    sample_returns: Optional[np.ndarray] = None
+    sample_quality: Optional[np.ndarray] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.y)
+
+
+# ============================================================
+# 子行程
+# ============================================================
+
+_worker_market_hist = None
+
+
+def _init_worker(market_hist) -> None:
+    """子行程初始化：保存大盤數據（所有股票共用）"""
+    global _worker_market_hist
+    _worker_market_hist = market_hist
+
+
+def build_stock_samples(
+    stock_id: str,
+    hist,
+    fundamental: Optional[Dict],
+    predict_days: int,
+    market_hist=None,
+) -> Dict[str, Any]:
+    """
+    計算單檔股票的訓練樣本
+
+    Returns:
+        {"X": (n, 55), "y": (n,), "dates": 樣本日期, "returns": N 天報酬率 (%),
+         "quality_scores": 品質分數, "quality": {...}, "seconds": 計算耗時}
+    """
+    from .historical_data_enricher import get_enricher
+
+    started = time.perf_counter()
+    matrix = get_enricher().build_feature_matrix(
+        stock_id, hist, market_hist=market_hist, fundamental=fundamental
+    )
+
+    # 樣本從第 60 天開始，到倒數第 predict_days 天；標籤為 N 天後是否上漲
+    rows = slice(WARMUP_ROWS, len(hist) - predict_days)
+    closes = hist['Close'].to_numpy(dtype=float)
+    future_closes = closes[WARMUP_ROWS + predict_days:]
+    labels = (future_closes > closes[rows]).astype(int)
+    returns = (future_closes / closes[rows] - 1) * 100
+
+    # 品質分級
+    missing_ratio = matrix.missing_count[rows] / len(matrix.feature_names)
+    quality = {
+        "high": int(np.sum(missing_ratio <= 0.2)),
+        "medium": int(np.sum((missing_ratio > 0.2) & (missing_ratio <= 0.4))),
+        "low": int(np.sum((missing_ratio > 0.4) & (missing_ratio <= MAX_MISSING_RATIO))),
+        "rejected": int(np.sum(missing_ratio > MAX_MISSING_RATIO)),
+    }
+
+    keep = missing_ratio <= MAX_MISSING_RATIO
+    quality_scores = np.where(missing_ratio <= 0.2, 0.9, np.where(missing_ratio <= 0.4, 0.7, 0.5))
+    return {
+        "X": matrix.values[rows][keep],
+        "y": labels[keep],
+        "dates": [d.date() for d in hist.index[rows][keep]],
+        "returns": returns[keep],
+        "quality_scores": quality_scores[keep],
+        "quality": quality,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _build_in_worker(stock_id: str, hist, fundamental: Optional[Dict], predict_days: int) -> Dict[str, Any]:
+    """在子行程計算樣本（大盤數據來自 initializer）"""
+    return build_stock_samples(stock_id, hist, fundamental, predict_days, market_hist=_worker_market_hist)
+
+
+# ============================================================
+# 管線
+# ============================================================
+
+def _download(stock_id: str, period: str, predict_days: int):
+    """下載單檔歷史與基本面，資料不足時回傳 None"""
+    from .historical_data_enricher import get_enricher
+    from .ohlcv_store import get_ohlcv_store
+
+    started = time.perf_counter()
+    hist = get_ohlcv_store().get_frame_sync(stock_id, period)
+    if hist.empty or len(hist) < WARMUP_ROWS + predict_days:
+        return None, time.perf_counter() - started
+
+    fundamental = get_enricher().get_fundamental_data(stock_id)
+    return (hist, fundamental), time.perf_counter() - started
+
+
+def prepare_training_data(
+    stock_ids: List[str],
+    period: str = "1y",
+    predict_days: int = 5,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> TrainingData:
+    """
+    並行準備歷史訓練資料
+
+    Args:
+        stock_ids: 股票代碼列表
+        period: 歷史數據期間 ("6mo", "1y", "2y", "5y")
+        predict_days: 預測天數 (標籤: N天後是否上漲)
+        max_workers: 特徵計算子行程數（1 表示在主行程計算）
+        progress: 進度回報 progress(已完成股票數, 總股票數)
+
+    Returns:
+        TrainingData
+    """
+    from .historical_data_enricher import get_enricher
+    from .ml_feature_engine import MLFeatureEngine
+
+    max_workers = TRAINING_MAX_WORKERS if max_workers is None else max_workers
+    feature_names = MLFeatureEngine.FEATURE_COLUMNS
+    timings = {"market": 0.0, "download": 0.0, "download_wall": 0.0, "features": 0.0, "concat": 0.0}
+    started = time.perf_counter()
+
+    # 預先載入大盤數據 (所有股票共用)
+    market_hist = get_enricher().get_market_data(period)
+    if market_hist is not None:
+        logger.info(f"[TrainingPipeline] 大盤數據載入: {len(market_hist)} 筆")
+    timings["market"] = time.perf_counter() - started
+
+    results: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+
+    def report():
+        if progress is not None:
+            progress(len(results) + skipped, len(stock_ids))
+
+    pool = ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(market_hist,)
+    ) if max_workers > 1 else None
+
+    try:
+        feature_futures = {}
+        download_started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_CONCURRENCY) as downloader:
+            downloads = {
+                downloader.submit(_download, stock_id, period, predict_days): stock_id
+                for stock_id in stock_ids
+            }
+            # 每檔下載完成即送出特徵計算，與其餘下載重疊
+            for future in as_completed(downloads):
+                stock_id = downloads[future]
+                try:
+                    payload, seconds = future.result()
+                except Exception as e:
+                    logger.warning(f"[TrainingPipeline] {stock_id} 下載失敗: {e}")
+                    skipped += 1
+                    report()
+                    continue
+
+                timings["download"] += seconds
+                if payload is None:
+                    logger.debug(f"[TrainingPipeline] {stock_id} 數據不足，跳過")
+                    skipped += 1
+                    report()
+                    continue
+
+                hist, fundamental = payload
+                if pool is not None:
+                    feature_futures[pool.submit(_build_in_worker, stock_id, hist, fundamental, predict_days)] = stock_id
+                else:
+                    try:
+                        results[stock_id] = build_stock_samples(
+                            stock_id, hist, fundamental, predict_days, market_hist=market_hist
+                        )
+                    except Exception as e:
+                        logger.warning(f"[TrainingPipeline] {stock_id} 處理失敗: {e}")
+                        skipped += 1
+                    report()
+
+        timings["download_wall"] = time.perf_counter() - download_started
+
+        for future in as_completed(feature_futures):
+            stock_id = feature_futures[future]
+            try:
+                results[stock_id] = future.result()
+            except Exception as e:
+                logger.warning(f"[TrainingPipeline] {stock_id} 處理失敗: {e}")
+                skipped += 1
+            report()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    timings["features"] = sum(r["seconds"] for r in results.values())
+
+    # 依股票清單順序合併，結果與序列處理相同
+    concat_started = time.perf_counter()
+    quality_stats = {"high": 0, "medium": 0, "low": 0, "rejected": 0}
+    X_blocks, y_blocks, stock_samples = [], [], {}
+    sample_stock_ids, sample_dates, return_blocks, score_blocks = [], [], [], []
+    for stock_id in stock_ids:
+        result = results.get(stock_id)
+        if result is None:
+            continue
+        for key, count in result["quality"].items():
+            quality_stats[key] += count
+        X_blocks.append(result["X"])
+        y_blocks.append(result["y"])
+        stock_samples[stock_id] = len(result["y"])
+        sample_stock_ids.extend([stock_id] * len(result["y"]))
+        sample_dates.extend(result["dates"])
+        return_blocks.append(result["returns"])
+        score_blocks.append(result["quality_scores"])
+
+    X = np.vstack(X_blocks) if X_blocks else np.empty((0, len(feature_names)))
+    y = np.concatenate(y_blocks) if y_blocks else np.empty(0, dtype=int)
+    sample_returns = np.concatenate(return_blocks) if return_blocks else np.empty(0)
+    sample_quality = np.concatenate(score_blocks) if score_blocks else np.empty(0)
+    timings["concat"] = time.perf_counter() - concat_started
+    timings["prepare"] = time.perf_counter() - started
+    timings = {k: round(v, 3) for k, v in timings.items()}
+
+    logger.info(
+        f"[TrainingPipeline] {len(results)} 檔 / {len(y)} 樣本, 耗時: "
+        + ", ".join(f"{k}={v}s" for k, v in timings.items())
+    )
+
+    return TrainingData(
+        X=X,
+        y=y,
+        feature_names=feature_names,
+        quality_stats=quality_stats,
+        processed_stocks=len(results),
+        skipped_stocks=skipped,
+        stock_samples=stock_samples,
+        sample_stock_ids=sample_stock_ids,
+        sample_dates=sample_dates,
+        sample_returns=sample_returns,
+        sample_quality=sample_quality,
+        timings=timings,
+    )
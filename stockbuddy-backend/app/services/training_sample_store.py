@@ -0,0 +1,371 @@
+"""
+欄式訓練樣本庫
+
+原本每個樣本是 training_samples 表的一列，55 個特徵存成 JSON；儲存時每筆先 SELECT
+檢查重複，載入時逐列重建 Python list，隨機抽樣還要先取出全部 ID。
+樣本數到數十萬時，存取時間遠超過訓練本身。
+
+改為「特徵矩陣分片 + 輕量索引」：
+
+    app/models/training_data/samples/
+        index.db             SQLite (WAL)：每個樣本一列 (stock_id, sample_date, source) → (shard, row)
+        shards/000001.X.npy  float32 (n, 特徵數)，缺失值為 NaN
+        shards/000001.y.npy  int8    (n,)
+
+- 寫入：整批一次比對重複（臨時表 JOIN），只把新樣本寫成一個新分片，索引以
+  executemany + ON CONFLICT DO NOTHING 在同一個交易內寫入
+- 讀取：索引查詢取得 (shard, row)，分片以 np.load(mmap_mode="r") 映射，
+  一次向量化取列；整個分片都被選取且沒有缺失值時直接回傳 memmap（零複製）
+- 抽樣：在索引結果上以 numpy 隨機選列，不需載入任何特徵
+- 每個分片記錄自己的特徵名稱，特徵集變更時依名稱對齊欄位
+
+使用方式：
+    store = get_sample_store()
+    store.append(X, y, stock_ids, dates, source="historical", feature_names=names)
+    X, y, names = store.load(sources=["historical"], min_quality=0.6)
+    X_old, y_old, _ = store.load(limit=5000, random_sample=True)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SAMPLES_DIR = Path(__file__).parent.parent / "models" / "training_data" / "samples"
+
+# 預設品質分數（未提供時）
+DEFAULT_QUALITY = 0.6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    feature_names TEXT NOT NULL,
+    has_nan INTEGER NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    id INTEGER PRIMARY KEY,
+    stock_id TEXT NOT NULL,
+    sample_date TEXT NOT NULL,
+    source TEXT NOT NULL,
+    label INTEGER NOT NULL,
+    actual_return REAL,
+    quality_score REAL NOT NULL,
+    predict_days INTEGER NOT NULL,
+    shard INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    UNIQUE (stock_id, sample_date, source)
+);
+CREATE INDEX IF NOT EXISTS idx_samples_source_quality ON samples (source, quality_score);
+"""
+
+
+def _date_key(value: Any) -> str:
+    """日期統一為 YYYY-MM-DD 字串"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, np.datetime64):
+        return str(value.astype("datetime64[D]"))
+    if hasattr(value, "date") and callable(value.date):  # pandas.Timestamp
+        return value.date().isoformat()
+    return str(value)[:10]
+
+
+class TrainingSampleStore:
+    """欄式訓練樣本庫（分片 .npy + SQLite 索引）"""
+
+    def __init__(self, root: Path = SAMPLES_DIR):
+        self.root = Path(root)
+        self.shard_dir = self.root / "shards"
+        self._local = threading.local()
+
+    # ============================================================
+    # 連線
+    # ============================================================
+
+    def _conn(self) -> sqlite3.Connection:
+        """每個執行緒一個連線（WAL：讀寫互不阻塞）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.shard_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.root / "index.db", timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _shard_paths(self, shard: int) -> Tuple[Path, Path]:
+        return self.shard_dir / f"{shard:06d}.X.npy", self.shard_dir / f"{shard:06d}.y.npy"
+
+    # ============================================================
+    # 寫入
+    # ============================================================
+
+    def append(
+        self,
+        X: np.ndarray,
+        y: np.ndarray,
+        stock_ids: Sequence[str],
+        dates: Sequence[Any],
+        source: str,
+        feature_names: List[str],
+        returns: Optional[Sequence[Optional[float]]] = None,
+        quality_scores: Optional[Sequence[float]] = None,
+        predict_days: int = 5,
+    ) -> Dict[str, Any]:
+        """
+        批次新增樣本（已存在的 (stock_id, sample_date, source) 跳過）
+
+        Returns:
+            {"saved": 新增數, "skipped": 跳過數, "total": 輸入數, "shard": 分片編號或 None}
+        """
+        X = np.asarray(X)
+        y = np.asarray(y)
+        total = len(X)
+        if total == 0:
+            return {"saved": 0, "skipped": 0, "total": 0, "shard": None}
+
+        keys = [(str(stock_ids[i]), _date_key(dates[i])) for i in range(total)]
+
+        # 批次內重複只保留第一筆
+        first: Dict[Tuple[str, str], int] = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 一次比對已存在的樣本
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS incoming (stock_id TEXT, sample_date TEXT, pos INTEGER)")
+            conn.execute("DELETE FROM incoming")
+            conn.executemany(
+                "INSERT INTO incoming VALUES (?, ?, ?)",
+                ((stock_id, day, pos) for (stock_id, day), pos in first.items()),
+            )
+            existing = {
+                pos for (pos,) in conn.execute(
+                    "SELECT i.pos FROM incoming i JOIN samples s "
+                    "ON s.stock_id = i.stock_id AND s.sample_date = i.sample_date AND s.source = ?",
+                    (source,),
+                )
+            }
+            conn.execute("DELETE FROM incoming")
+
+            positions = np.array(sorted(pos for pos in first.values() if pos not in existing), dtype=np.int64)
+            if len(positions) == 0:
+                conn.execute("COMMIT")
+                return {"saved": 0, "skipped": total, "total": total, "shard": None}
+
+            X_new = np.ascontiguousarray(X[positions], dtype=np.float32)
+            y_new = np.ascontiguousarray(y[positions], dtype=np.int8)
+            has_nan = bool(np.isnan(X_new).any())
+
+            cursor = conn.execute(
+                "INSERT INTO shards (source, rows, feature_names, has_nan, created_at) VALUES (?, ?, ?, ?, ?)",
+                (source, len(positions), json.dumps(list(feature_names)), int(has_nan), datetime.now().isoformat()),
+            )
+            shard = cursor.lastrowid
+
+            # 分片先寫暫存檔再改名，交易失敗時不留下半個分片
+            x_path, y_path = self._shard_paths(shard)
+            for path, array in ((x_path, X_new), (y_path, y_new)):
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, array)
+                tmp.replace(path)
+
+            def rows():
+                for row, pos in enumerate(positions.tolist()):
+                    stock_id, day = keys[pos]
+                    ret = returns[pos] if returns is not None and pos < len(returns) else None
+                    quality = quality_scores[pos] if quality_scores is not None and pos < len(quality_scores) else DEFAULT_QUALITY
+                    yield (
+                        stock_id, day, source, int(y_new[row]),
+                        None if ret is None else float(ret), float(quality),
+                        int(predict_days), shard, row,
+                    )
+
+            conn.executemany(
+                "INSERT INTO samples (stock_id, sample_date, source, label, actual_return, quality_score, "
+                "predict_days, shard, row) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (stock_id, sample_date, source) DO NOTHING",
+                rows(),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        saved = len(positions)
+        return {"saved": saved, "skipped": total - saved, "total": total, "shard": shard}
+
+    # ============================================================
+    # 讀取
+    # ============================================================
+
+    def _select(
+        self,
+        sources: Optional[List[str]],
+        min_quality: float,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """符合條件的 (shard, row)，依寫入順序"""
+        sql = "SELECT shard, row FROM samples WHERE quality_score >= ?"
+        params: List[Any] = [min_quality]
+        if sources:
+            sql += f" AND source IN ({','.join('?' * len(sources))})"
+            params.extend(sources)
+        sql += " ORDER BY id"
+
+        pairs = np.array(self._conn().execute(sql, params).fetchall(), dtype=np.int64).reshape(-1, 2)
+        return pairs[:, 0], pairs[:, 1]
+
+    def load(
+        self,
+        sources: Optional[List[str]] = None,
+        min_quality: float = DEFAULT_QUALITY,
+        limit: Optional[int] = None,
+        random_sample: bool = False,
+        seed: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """
+        載入樣本矩陣
+
+        Args:
+            sources: 數據來源，None 表示全部
+            min_quality: 最低品質分數
+            limit: 最大樣本數
+            random_sample: 是否隨機抽樣（否則取最早寫入的 limit 筆）
+            seed: 隨機種子
+
+        Returns:
+            (X, y, feature_names)，缺失值為 0；沒有樣本時為空陣列
+        """
+        shards, rows = self._select(sources, min_quality)
+        if limit is not None and len(shards) > limit:
+            if random_sample:
+                picked = np.sort(np.random.default_rng(seed).choice(len(shards), size=limit, replace=False))
+            else:
+                picked = np.arange(limit)
+            shards, rows = shards[picked], rows[picked]
+
+        if len(shards) == 0:
+            return np.array([]), np.array([]), []
+
+        meta = {
+            shard: (json.loads(names), bool(has_nan), count)
+            for shard, names, has_nan, count in self._conn().execute(
+                f"SELECT id, feature_names, has_nan, rows FROM shards WHERE id IN ({','.join('?' * len(np.unique(shards)))})",
+                [int(s) for s in np.unique(shards)],
+            )
+        }
+        feature_names = meta[int(shards.max())][0]  # 以最新分片的特徵為準
+
+        # 單一分片全部選取且無缺失值：直接回傳 memmap
+        if len(meta) == 1:
+            shard = int(shards[0])
+            names, has_nan, count = meta[shard]
+            if not has_nan and count == len(rows) and np.array_equal(rows, np.arange(count)):
+                x_path, y_path = self._shard_paths(shard)
+                return np.load(x_path, mmap_mode="r"), np.load(y_path, mmap_mode="r"), names
+
+        X = np.zeros((len(shards), len(feature_names)), dtype=np.float32)
+        y = np.empty(len(shards), dtype=np.int8)
+        column_of = {name: j for j, name in enumerate(feature_names)}
+
+        for shard in np.unique(shards):
+            mask = shards == shard
+            names = meta[int(shard)][0]
+            x_path, y_path = self._shard_paths(int(shard))
+            X_shard = np.load(x_path, mmap_mode="r")
+            y[mask] = np.load(y_path, mmap_mode="r")[rows[mask]]
+
+            block = X_shard[rows[mask]]
+            if names == feature_names:
+                X[mask] = block
+            else:
+                # 特徵集不同：依名稱對齊，缺少的欄位為 0
+                src = [j for j, name in enumerate(names) if name in column_of]
+                dst = [column_of[names[j]] for j in src]
+                X[np.ix_(np.flatnonzero(mask), dst)] = block[:, src]
+
+        np.nan_to_num(X, copy=False, nan=0.0)
+        return X, y, feature_names
+
+    def sample(
+        self,
+        size: int,
+        sources: Optional[List[str]] = None,
+        min_quality: float = DEFAULT_QUALITY,
+        seed: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """隨機抽樣 size 筆（經驗回放）"""
+        X, y, _ = self.load(sources=sources, min_quality=min_quality, limit=size, random_sample=True, seed=seed)
+        return X, y
+
+    # ============================================================
+    # 統計
+    # ============================================================
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """樣本數統計（與原本 training_samples 表的統計格式相同）"""
+        conn = self._conn()
+        by_source = dict(conn.execute("SELECT source, COUNT(*) FROM samples GROUP BY source").fetchall())
+        total, high, medium, positive, negative = conn.execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(quality_score >= 0.8), 0), "
+            "COALESCE(SUM(quality_score >= 0.6 AND quality_score < 0.8), 0), "
+            "COALESCE(SUM(label = 1), 0), "
+            "COALESCE(SUM(label = 0), 0) "
+            "FROM samples"
+        ).fetchone()
+        shards = conn.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+
+        return {
+            "total_samples": total,
+            "by_source": {
+                "historical": by_source.get("historical", 0),
+                "performance": by_source.get("performance", 0),
+            },
+            "by_quality": {
+                "high": high,
+                "medium": medium,
+            },
+            "by_label": {
+                "positive": positive,
+                "negative": negative,
+            },
+            "storage": {
+                "backend": "columnar",
+                "shards": shards,
+            },
+        }
+
+
+_store: Optional[TrainingSampleStore] = None
+
+
+def get_sample_store() -> TrainingSampleStore:
+    """取得全域訓練樣本庫"""
+    global _store
+    if _store is None:
+        _store = TrainingSampleStore()
+    return _store
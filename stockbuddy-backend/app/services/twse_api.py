@@ -3,13 +3,14 @@
 提供台股即時/歷史資料
 """
 
-import httpx
 import pandas as pd
 from datetime import datetime, timedelta
 from typing import Optional, Dict, List, Any
 from cachetools import TTLCache
 import asyncio
 
+from app.services.http_client import get_http_client
+
 # 快取設定（避免頻繁請求被擋）
 _cache = TTLCache(maxsize=100, ttl=300)  # 5分鐘快取
 
@@ -39,7 +40,7 @@ class TWSEService:
     }
 
     def __init__(self):
-        self.client = httpx.AsyncClient(
+        self.client = get_http_client().session(
             timeout=30.0,
             headers={
                 "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
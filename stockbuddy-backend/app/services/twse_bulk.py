@@ -3,16 +3,27 @@ TWSE 批量資料服務
 一次取得所有上市股票的當日行情，避免 API 限流
 """
 
-import httpx
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List, Any
-from cachetools import TTLCache
+from typing import Optional, Dict, List, Any, Tuple
 
-# 快取：全市場資料快取 10 分鐘
-_market_cache = TTLCache(maxsize=10, ttl=600)
-# 個股歷史快取 30 分鐘
-_history_cache = TTLCache(maxsize=500, ttl=1800)
+from app.services.ohlcv_store import get_ohlcv_store
+from app.services.http_client import get_http_client
+from app.services.cache_backend import SharedCache
+
+# 快取：全市場資料快取 10 分鐘（經由 cache_backend，多個 worker 共用）
+_market_cache = SharedCache("twse_bulk:market", retention=600)
+# 個股歷史快取 30 分鐘（轉換後的 List[Dict]；實際 K 線持久化於本地 OHLCV 資料庫）
+_history_cache = SharedCache("twse_bulk:history", retention=1800)
+
+# yfinance 專用執行緒池（yfinance 是同步的，避免阻塞 event loop）
+# 上限固定，慢速 ticker 只會佔用池內執行緒，不會拖垮其他 API 請求
+YF_MAX_WORKERS = 8
+_yf_executor = ThreadPoolExecutor(max_workers=YF_MAX_WORKERS, thread_name_prefix="yf-history")
+
+# 進行中的歷史資料請求：相同 (stock_id, months) 共用同一個 Future
+_history_inflight: Dict[Tuple[str, int], "asyncio.Future"] = {}
 
 
 class TWSEBulkService:
@@ -24,7 +35,7 @@ class TWSEBulkService:
     STOCK_NAMES = {}  # 會從 API 動態填充
     
     def __init__(self):
-        self.client = httpx.AsyncClient(
+        self.client = get_http_client().session(
             timeout=60.0,
             verify=False,  # 禁用 SSL 驗證（TWSE 證書有時有問題）
             headers={
@@ -39,8 +50,9 @@ class TWSEBulkService:
         回傳格式: {股票代號: {資料...}, ...}
         """
         cache_key = "all_stocks_daily"
-        if cache_key in _market_cache:
-            return _market_cache[cache_key]
+        cached = _market_cache.get(cache_key)
+        if cached is not None:
+            return cached
         
         # 嘗試取得今天或最近交易日的資料
         for days_back in range(5):
@@ -49,7 +61,7 @@ class TWSEBulkService:
             
             result = await self._fetch_daily_data(date_str)
             if result:
-                _market_cache[cache_key] = result
+                _market_cache.set(cache_key, result)
                 print(f"✅ 成功取得 {len(result)} 檔股票的行情資料 (日期: {date_str})")
                 return result
         
@@ -142,45 +154,165 @@ class TWSEBulkService:
         """
         使用 yfinance 取得個股歷史資料
         （技術分析需要歷史資料，TWSE 批量 API 只有當日）
+
+        下載在專用執行緒池中執行，不會阻塞 event loop；
+        同時間對相同 (stock_id, months) 的請求只會觸發一次下載。
         """
         cache_key = f"history_{stock_id}_{months}"
-        if cache_key in _history_cache:
-            return _history_cache[cache_key]
-        
-        try:
-            import yfinance as yf
-            
-            ticker = yf.Ticker(f"{stock_id}.TW")
-            period = f"{months}mo"
-            
-            df = ticker.history(period=period)
-            
-            if df.empty:
-                # 嘗試上櫃
-                ticker = yf.Ticker(f"{stock_id}.TWO")
-                df = ticker.history(period=period)
-            
-            if df.empty:
+        cached = _history_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        inflight_key = (stock_id, months)
+        pending = _history_inflight.get(inflight_key)
+        if pending is not None:
+            # 已有相同請求在下載中，等待其結果即可
+            try:
+                return await asyncio.shield(pending)
+            except Exception:
                 return []
-            
-            history = []
-            for date, row in df.iterrows():
-                history.append({
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_yf_executor, self._download_history_sync, stock_id, months)
+        _history_inflight[inflight_key] = future
+
+        try:
+            history = await asyncio.shield(future)
+        except Exception as e:
+            print(f"yfinance 歷史資料失敗 {stock_id}: {e}")
+            return []
+        finally:
+            _history_inflight.pop(inflight_key, None)
+
+        if history:
+            _history_cache.set(cache_key, history)
+        return history
+
+    @staticmethod
+    def _download_history_sync(stock_id: str, months: int) -> List[Dict[str, Any]]:
+        """
+        同步取得個股歷史資料（於執行緒池中呼叫）
+
+        從本地 OHLCV 資料庫讀取，只在資料過期時向 yfinance 增量下載
+        （先嘗試上市 .TW，無資料時改用上櫃 .TWO）
+        """
+        return get_ohlcv_store().get_history_sync(stock_id, months)
+    
+    async def get_stocks_history_yf_batch(
+        self,
+        stock_ids: List[str],
+        months: int = 2,
+        chunk_size: int = 50,
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        批量取得多檔個股歷史資料（yfinance 多檔下載）
+
+        每次上游請求下載 chunk_size 檔，結果拆回與 get_stock_history_yf
+        相同的 List[Dict] 格式並一次寫入 _history_cache。
+
+        Returns:
+            {股票代號: 歷史資料}，取不到資料的股票不會出現在結果中
+        """
+        result: Dict[str, List[Dict[str, Any]]] = {}
+        missing: List[str] = []
+
+        for stock_id in dict.fromkeys(stock_ids):
+            cached = _history_cache.get(f"history_{stock_id}_{months}")
+            if cached is not None:
+                result[stock_id] = cached
+            else:
+                missing.append(stock_id)
+
+        if not missing:
+            return result
+
+        loop = asyncio.get_running_loop()
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        tasks = [
+            loop.run_in_executor(_yf_executor, self._download_history_batch_sync, chunk, months)
+            for chunk in chunks
+        ]
+        chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for chunk, fetched in zip(chunks, chunk_results):
+            if isinstance(fetched, Exception):
+                print(f"yfinance 批量歷史資料失敗 ({len(chunk)} 檔): {fetched}")
+                continue
+            for stock_id, history in fetched.items():
+                _history_cache.set(f"history_{stock_id}_{months}", history)
+                result[stock_id] = history
+
+        print(f"✅ 批量歷史資料: {len(result)}/{len(stock_ids)} 檔 (下載 {len(missing)} 檔)")
+        return result
+
+    @staticmethod
+    def _download_history_batch_sync(stock_ids: List[str], months: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        同步批量取得歷史資料（於執行緒池中呼叫）
+
+        過期的股票以多檔 yf.download 增量更新本地 OHLCV 資料庫後，再從本地讀取
+        """
+        store = get_ohlcv_store()
+        store.refresh_many_sync(stock_ids, months)
+
+        result = {}
+        for stock_id in stock_ids:
+            history = store.read_history(stock_id, months, live=True)
+            if history:
+                result[stock_id] = history
+        return result
+
+    @staticmethod
+    def _download_symbols_sync(stock_ids: List[str], suffix: str, start: str) -> Dict[str, List[Dict[str, Any]]]:
+        """以單次 yf.download 下載多檔（start 起至今），並拆成各股票的歷史資料"""
+        import pandas as pd
+        import yfinance as yf
+
+        symbols = [f"{sid}{suffix}" for sid in stock_ids]
+        df = yf.download(
+            symbols,
+            start=start,
+            group_by="ticker",
+            auto_adjust=True,
+            threads=False,
+            progress=False,
+        )
+
+        if df is None or df.empty:
+            return {}
+
+        if isinstance(df.columns, pd.MultiIndex):
+            tickers = set(df.columns.get_level_values(0))
+            frames = {symbol: df[symbol] for symbol in symbols if symbol in tickers}
+        elif len(symbols) == 1:
+            # 較舊的 yfinance 單檔下載即使 group_by="ticker" 也回傳單層欄位
+            frames = {symbols[0]: df}
+        else:
+            return {}
+
+        result = {}
+        for stock_id, symbol in zip(stock_ids, symbols):
+            if symbol not in frames:
+                continue
+
+            frame = frames[symbol].dropna(subset=["Close"])
+            if frame.empty:
+                continue
+
+            result[stock_id] = [
+                {
                     "date": date.strftime("%Y-%m-%d"),
                     "open": float(row["Open"]),
                     "high": float(row["High"]),
                     "low": float(row["Low"]),
                     "close": float(row["Close"]),
-                    "volume": int(row["Volume"]),
-                })
-            
-            _history_cache[cache_key] = history
-            return history
-            
-        except Exception as e:
-            print(f"yfinance 歷史資料失敗 {stock_id}: {e}")
-            return []
-    
+                    "volume": int(row["Volume"]) if pd.notna(row["Volume"]) else 0,
+                }
+                for date, row in frame.iterrows()
+            ]
+
+        return result
+
     async def get_market_index(self) -> Optional[Dict[str, Any]]:
         """取得大盤指數"""
         try:
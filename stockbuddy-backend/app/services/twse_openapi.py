@@ -14,14 +14,12 @@
 - 融資融券 (MI_MARGN)
 - 即時報價 (getStockInfo)
 
-⚠️ Rate Limit: 每 5 秒最多 3 個 request
+⚠️ Rate Limit: 每 5 秒最多 3 個 request（由 http_client 的主機 token bucket 控制）
 
 🆕 V10.7.1: 整合智能快取（盤中/盤後動態 TTL）
 """
 
 import asyncio
-import httpx
-import time
 import gzip
 import zlib
 import json
@@ -31,6 +29,8 @@ import math
 
 # 導入智能快取
 from app.services.cache_service import SmartTTL, is_trading_hours
+from app.services.cache_backend import SharedCache
+from app.services.http_client import get_http_client
 
 
 class TWSEOpenAPI:
@@ -75,20 +75,16 @@ class TWSEOpenAPI:
     }
     
     # ============================================================
-    # Rate Limit 設定
+    # Rate Limit：所有請求經由共用 http_client，依主機 token bucket 限速、
+    # 相同的進行中請求合併為一次（見 http_client.HOST_LIMITS）
     # ============================================================
     
-    _last_request_time = 0
-    _request_count = 0
-    REQUEST_LIMIT = 3
-    RATE_LIMIT_WINDOW = 5  # 秒
-    
     # ============================================================
     # 快取設定
     # ============================================================
     
-    _cache: Dict[str, Any] = {}
-    _cache_time: Dict[str, float] = {}
+    # 經由 cache_backend，多個 worker 共用（保留 4 小時 = 盤後最長 TTL）
+    _cache = SharedCache("twse_openapi", retention=14400)
     
     # 🆕 V10.7.1: 使用智能快取，根據盤中/盤後自動調整 TTL
     # 舊的固定 TTL 已棄用，改用 SmartTTL.get_ttl(cache_type)
@@ -98,44 +94,21 @@ class TWSEOpenAPI:
     # 工具方法
     # ============================================================
     
-    @classmethod
-    async def _rate_limit(cls):
-        """確保不超過 rate limit"""
-        current_time = time.time()
-        
-        if current_time - cls._last_request_time < cls.RATE_LIMIT_WINDOW:
-            cls._request_count += 1
-            if cls._request_count >= cls.REQUEST_LIMIT:
-                wait_time = cls.RATE_LIMIT_WINDOW - (current_time - cls._last_request_time) + 0.5
-                print(f"⏳ TWSE rate limit，等待 {wait_time:.1f} 秒...")
-                await asyncio.sleep(wait_time)
-                cls._last_request_time = time.time()
-                cls._request_count = 1
-        else:
-            cls._last_request_time = current_time
-            cls._request_count = 1
-    
     @classmethod
     def _get_cache(cls, key: str, cache_type: str = "default") -> Optional[Any]:
         """取得快取（使用智能 TTL）"""
-        if key in cls._cache:
-            # 🆕 V10.7.1: 使用智能 TTL，盤後自動延長快取時間
-            ttl = SmartTTL.get_ttl(cache_type)
-            if time.time() - cls._cache_time.get(key, 0) < ttl:
-                return cls._cache[key]
-        return None
+        # 🆕 V10.7.1: 使用智能 TTL，盤後自動延長快取時間
+        return cls._cache.get(key, max_age=SmartTTL.get_ttl(cache_type))
     
     @classmethod
     def _set_cache(cls, key: str, value: Any):
         """設定快取"""
-        cls._cache[key] = value
-        cls._cache_time[key] = time.time()
+        cls._cache.set(key, value)
     
     @classmethod
     def clear_cache(cls):
         """🆕 V10.13.4: 清除所有快取"""
         cls._cache.clear()
-        cls._cache_time.clear()
         print("🗑️ [TWSE OpenAPI] 所有快取已清除")
     
     @staticmethod
@@ -263,11 +236,9 @@ class TWSEOpenAPI:
             print(f"📦 [TWSE OpenAPI] 使用本益比/殖利率快取 (資料日期: {sample_date})")
             return cached
         
-        await cls._rate_limit()
-        
         try:
             print("🔍 [TWSE OpenAPI] 取得本益比/殖利率資料...")
-            async with httpx.AsyncClient(timeout=30, verify=False, headers=cls.HEADERS) as client:
+            async with get_http_client().session(timeout=30, verify=False, headers=cls.HEADERS) as client:
                 resp = await client.get(f"{cls.OPENAPI_BASE}/exchangeReport/BWIBBU_ALL")
                 
                 if resp.status_code != 200:
@@ -340,11 +311,9 @@ class TWSEOpenAPI:
             print("📦 [TWSE OpenAPI] 使用每日成交快取")
             return cached
         
-        await cls._rate_limit()
-        
         try:
             print("🔍 [TWSE OpenAPI] 取得每日成交資料...")
-            async with httpx.AsyncClient(timeout=30, verify=False, headers=cls.HEADERS) as client:
+            async with get_http_client().session(timeout=30, verify=False, headers=cls.HEADERS) as client:
                 resp = await client.get(f"{cls.OPENAPI_BASE}/exchangeReport/STOCK_DAY_ALL")
                 
                 if resp.status_code != 200:
@@ -429,10 +398,8 @@ class TWSEOpenAPI:
         if cached:
             return cached
         
-        await cls._rate_limit()
-        
         try:
-            async with httpx.AsyncClient(timeout=15, verify=False, headers=cls.HEADERS) as client:
+            async with get_http_client().session(timeout=15, verify=False, headers=cls.HEADERS) as client:
                 resp = await client.get(f"{cls.OPENAPI_BASE}/exchangeReport/MI_INDEX")
                 
                 if resp.status_code != 200:
@@ -533,14 +500,9 @@ class TWSEOpenAPI:
                 print(f"📦 [TWSE] 使用三大法人快取 (日期: {date})")
                 return cached
             
-            if retry > 0:
-                await cls._rate_limit()
-            else:
-                await cls._rate_limit()
-            
             try:
                 print(f"🔍 [TWSE] 嘗試取得 {date} 三大法人資料 (第 {retry+1} 次)")
-                async with httpx.AsyncClient(timeout=30, verify=False, headers=cls.HEADERS) as client:
+                async with get_http_client().session(timeout=30, verify=False, headers=cls.HEADERS) as client:
                     resp = await client.get(
                         f"{cls.TWSE_API}/rwd/zh/fund/T86",
                         params={
@@ -651,13 +613,8 @@ class TWSEOpenAPI:
                 print("📦 [TWSE] 使用融資融券快取")
                 return cached
             
-            if retry > 0:
-                await cls._rate_limit()
-            else:
-                await cls._rate_limit()
-            
             try:
-                async with httpx.AsyncClient(timeout=30, verify=False, headers=cls.HEADERS) as client:
+                async with get_http_client().session(timeout=30, verify=False, headers=cls.HEADERS) as client:
                     resp = await client.get(
                         f"{cls.TWSE_API}/rwd/zh/marginTrading/MI_MARGN",
                         params={
@@ -771,8 +728,6 @@ class TWSEOpenAPI:
             # 只回傳請求的股票
             return {k: v for k, v in cached.items() if k in stock_ids}
         
-        await cls._rate_limit()
-        
         # 建立查詢字串
         ex_ch_list = []
         for sid in stock_ids:
@@ -787,7 +742,7 @@ class TWSEOpenAPI:
         ex_ch = "|".join(ex_ch_list)
         
         try:
-            async with httpx.AsyncClient(timeout=10, verify=False, headers=cls.HEADERS) as client:
+            async with get_http_client().session(timeout=10, verify=False, headers=cls.HEADERS) as client:
                 resp = await client.get(
                     cls.REALTIME_API,
                     params={"ex_ch": ex_ch, "json": "1", "delay": "0"}
@@ -999,10 +954,8 @@ class TWSEOpenAPI:
             print("📦 [TWSE] 使用注意股票快取")
             return cached
         
-        await cls._rate_limit()
-        
         try:
-            async with httpx.AsyncClient(verify=False, timeout=15.0) as client:
+            async with get_http_client().session(verify=False, timeout=15.0) as client:
                 response = await client.get(
                     f"{cls.OPENAPI_BASE}/announcement/notice",
                     headers=cls.HEADERS
@@ -1063,10 +1016,8 @@ class TWSEOpenAPI:
             print("📦 [TWSE] 使用營收快取")
             return cached
         
-        await cls._rate_limit()
-        
         try:
-            async with httpx.AsyncClient(verify=False, timeout=15.0) as client:
+            async with get_http_client().session(verify=False, timeout=15.0) as client:
                 response = await client.get(
                     f"{cls.OPENAPI_BASE}/opendata/t187ap05_L",
                     headers=cls.HEADERS
@@ -1132,10 +1083,8 @@ class TWSEOpenAPI:
             print("📦 [TWSE] 使用除權息快取")
             return cached
         
-        await cls._rate_limit()
-        
         try:
-            async with httpx.AsyncClient(verify=False, timeout=15.0) as client:
+            async with get_http_client().session(verify=False, timeout=15.0) as client:
                 response = await client.get(
                     f"{cls.OPENAPI_BASE}/exchangeReport/TWT48U_ALL",
                     headers=cls.HEADERS
@@ -1168,6 +1117,51 @@ class TWSEOpenAPI:
         
         return {}
 
+    # ============================================================
+    # 9. 上市公司基本資料（已發行股數）
+    # ============================================================
+    
+    @classmethod
+    async def get_issued_shares(cls) -> Dict[str, int]:
+        """
+        取得上市公司已發行普通股數（市值 = 收盤價 × 已發行股數）
+        
+        API: https://openapi.twse.com.tw/v1/opendata/t187ap03_L
+        
+        回傳:
+            {"2330": 25932733242, ...}
+        """
+        cache_key = "issued_shares"
+        cached = cls._get_cache(cache_key, "fundamental")
+        if cached:
+            return cached
+        
+        try:
+            async with get_http_client().session(verify=False, timeout=15.0) as client:
+                response = await client.get(
+                    f"{cls.OPENAPI_BASE}/opendata/t187ap03_L",
+                    headers=cls.HEADERS
+                )
+                
+                if response.status_code == 200:
+                    result = {}
+                    for item in response.json():
+                        stock_id = item.get("公司代號", "")
+                        shares = cls._safe_int(item.get("已發行普通股數或TDR原股發行股數"))
+                        if stock_id and shares:
+                            result[stock_id] = shares
+                    
+                    if result:
+                        print(f"✅ [TWSE] 已發行股數: {len(result)} 檔")
+                        cls._set_cache(cache_key, result)
+                    
+                    return result
+                    
+        except Exception as e:
+            print(f"❌ [TWSE] 已發行股數錯誤: {e}")
+        
+        return {}
+
 
 # ============================================================
 # 便捷函數（向後相容）
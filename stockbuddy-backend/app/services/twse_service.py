@@ -9,13 +9,13 @@
 ⚠️ 重要：TWSE 有 rate limit - 每 5 秒最多 3 個 request！
 """
 
-import asyncio
-import httpx
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import time
 
+from app.services.http_client import get_http_client
+
 
 class TWSEService:
     """TWSE 證交所 API 服務"""
@@ -26,37 +26,13 @@ class TWSEService:
     ALL_STOCKS_API = "https://www.twse.com.tw/exchangeReport/STOCK_DAY_ALL"
     OPENAPI_BASE = "https://openapi.twse.com.tw/v1"
     
-    # Rate limit: 每 5 秒最多 3 個 request
-    _last_request_time = 0
-    _request_count = 0
-    REQUEST_LIMIT = 3
-    RATE_LIMIT_WINDOW = 5  # 秒
+    # Rate limit: 每 5 秒最多 3 個 request（由 http_client 的主機 token bucket 控制）
     
     # 快取
     _cache = {}
     _cache_time = {}
     CACHE_TTL = 60  # 1 分鐘快取
     
-    @classmethod
-    async def _rate_limit(cls):
-        """確保不超過 rate limit"""
-        current_time = time.time()
-        
-        # 如果在同一個時間窗口內
-        if current_time - cls._last_request_time < cls.RATE_LIMIT_WINDOW:
-            cls._request_count += 1
-            if cls._request_count >= cls.REQUEST_LIMIT:
-                # 等待到下一個時間窗口
-                wait_time = cls.RATE_LIMIT_WINDOW - (current_time - cls._last_request_time) + 0.5
-                print(f"⏳ TWSE rate limit，等待 {wait_time:.1f} 秒...")
-                await asyncio.sleep(wait_time)
-                cls._last_request_time = time.time()
-                cls._request_count = 1
-        else:
-            # 新的時間窗口
-            cls._last_request_time = current_time
-            cls._request_count = 1
-    
     @classmethod
     def _get_cache(cls, key: str) -> Optional[Any]:
         """取得快取"""
@@ -101,8 +77,6 @@ class TWSEService:
             print("📦 使用 TWSE 即時報價快取")
             return cached
         
-        await cls._rate_limit()
-        
         # 建立查詢字串（上市用 tse_，上櫃用 otc_）
         ex_ch_list = []
         for sid in stock_ids:
@@ -116,7 +90,7 @@ class TWSEService:
         
         try:
             # ⚠️ 關鍵：verify=False 解決 SSL 問題
-            async with httpx.AsyncClient(timeout=10, verify=False) as client:
+            async with get_http_client().session(timeout=10, verify=False) as client:
                 resp = await client.get(
                     cls.REALTIME_API,
                     params={"ex_ch": ex_ch, "json": "1", "delay": "0"}
@@ -199,11 +173,9 @@ class TWSEService:
             print("📦 使用 TWSE 全市場快取")
             return cached
         
-        await cls._rate_limit()
-        
         try:
             # ⚠️ 關鍵：verify=False 解決 SSL 問題
-            async with httpx.AsyncClient(timeout=30, verify=False) as client:
+            async with get_http_client().session(timeout=30, verify=False) as client:
                 today = datetime.now().strftime("%Y%m%d")
                 resp = await client.get(
                     cls.ALL_STOCKS_API,
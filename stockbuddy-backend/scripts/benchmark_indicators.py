@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+技術指標效能基準測試
+
+比較 TechnicalAnalysis 舊版（逐窗 Python 迴圈）與新版（indicator_engine 向量化）：
+- 驗證 MA / RSI / MACD / 布林通道輸出逐筆相同
+- 量測 1 年、5 年、20 年日 K 序列的計算時間
+
+用法:
+    python scripts/benchmark_indicators.py
+    python scripts/benchmark_indicators.py --repeat 5 --seed 7
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# 將 app 目錄加入路徑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.technical_analysis import TechnicalAnalysis
+
+# 交易日數
+SERIES_LENGTHS = {"1y": 250, "5y": 1250, "20y": 5000}
+
+
+class LegacyIndicators:
+    """舊版實作（保留作為正確性與效能的比較基準）"""
+
+    @staticmethod
+    def calculate_ma(prices: List[float], period: int) -> List[Optional[float]]:
+        """計算移動平均線"""
+        if len(prices) < period:
+            return [None] * len(prices)
+        
+        result = [None] * (period - 1)
+        for i in range(period - 1, len(prices)):
+            avg = sum(prices[i - period + 1:i + 1]) / period
+            result.append(round(avg, 2))
+        return result
+
+    @staticmethod
+    def calculate_rsi(prices: List[float], period: int = 14) -> List[Optional[float]]:
+        """計算 RSI 指標"""
+        if len(prices) < period + 1:
+            return [None] * len(prices)
+
+        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
+        
+        gains = [d if d > 0 else 0 for d in deltas]
+        losses = [-d if d < 0 else 0 for d in deltas]
+
+        result = [None] * period
+        
+        avg_gain = sum(gains[:period]) / period
+        avg_loss = sum(losses[:period]) / period
+
+        for i in range(period, len(deltas)):
+            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+            
+            if avg_loss == 0:
+                rsi = 100
+            else:
+                rs = avg_gain / avg_loss
+                rsi = 100 - (100 / (1 + rs))
+            
+            result.append(round(rsi, 2))
+
+        # 補上第一個 RSI
+        if avg_loss == 0:
+            first_rsi = 100
+        else:
+            rs = (sum(gains[:period]) / period) / (sum(losses[:period]) / period) if sum(losses[:period]) > 0 else 100
+            first_rsi = 100 - (100 / (1 + rs)) if rs != 100 else 100
+        result[period - 1] = round(first_rsi, 2)
+
+        return [None] + result  # 第一個價格沒有變動
+
+    @staticmethod
+    def calculate_macd(prices: List[float], fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, List[Optional[float]]]:
+        """計算 MACD 指標"""
+        if len(prices) < slow:
+            return {
+                "macd": [None] * len(prices),
+                "signal": [None] * len(prices),
+                "histogram": [None] * len(prices),
+            }
+
+        # 計算 EMA
+        def ema(data: List[float], period: int) -> List[float]:
+            multiplier = 2 / (period + 1)
+            result = [data[0]]
+            for i in range(1, len(data)):
+                result.append((data[i] * multiplier) + (result[-1] * (1 - multiplier)))
+            return result
+
+        ema_fast = ema(prices, fast)
+        ema_slow = ema(prices, slow)
+        
+        macd_line = [ema_fast[i] - ema_slow[i] for i in range(len(prices))]
+        signal_line = ema(macd_line, signal)
+        histogram = [macd_line[i] - signal_line[i] for i in range(len(prices))]
+
+        # 前面數據不足的部分設為 None
+        for i in range(slow - 1):
+            macd_line[i] = None
+            signal_line[i] = None
+            histogram[i] = None
+
+        return {
+            "macd": [round(v, 4) if v is not None else None for v in macd_line],
+            "signal": [round(v, 4) if v is not None else None for v in signal_line],
+            "histogram": [round(v, 4) if v is not None else None for v in histogram],
+        }
+
+    @staticmethod
+    def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: float = 2) -> Dict[str, List[Optional[float]]]:
+        """計算布林通道"""
+        if len(prices) < period:
+            return {
+                "upper": [None] * len(prices),
+                "middle": [None] * len(prices),
+                "lower": [None] * len(prices),
+            }
+
+        middle = LegacyIndicators.calculate_ma(prices, period)
+        
+        upper = []
+        lower = []
+        
+        for i in range(len(prices)):
+            if middle[i] is None:
+                upper.append(None)
+                lower.append(None)
+            else:
+                window = prices[i - period + 1:i + 1]
+                std = np.std(window)
+                upper.append(round(middle[i] + std_dev * std, 2))
+                lower.append(round(middle[i] - std_dev * std, 2))
+
+        return {
+            "upper": upper,
+            "middle": middle,
+            "lower": lower,
+        }
+
+
+def generate_prices(n: int, seed: int) -> List[float]:
+    """產生隨機漫步收盤價（四捨五入到 0.01，與台股報價精度相同）"""
+    rng = random.Random(seed)
+    price = 100.0
+    prices = []
+    for _ in range(n):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+        prices.append(round(price, 2))
+    return prices
+
+
+def run_all(prices: List[float], impl) -> Dict[str, object]:
+    return {
+        "ma5": impl.calculate_ma(prices, 5),
+        "ma20": impl.calculate_ma(prices, 20),
+        "ma60": impl.calculate_ma(prices, 60),
+        "rsi": impl.calculate_rsi(prices, 14),
+        "macd": impl.calculate_macd(prices),
+        "bollinger": impl.calculate_bollinger_bands(prices),
+    }
+
+
+def time_it(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="技術指標效能基準測試")
+    parser.add_argument("--repeat", type=int, default=3, help="每項重複次數（取最佳值）")
+    parser.add_argument("--seed", type=int, default=42, help="隨機種子")
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print(f"{'序列':<6}{'筆數':>8}{'舊版 (ms)':>14}{'新版 (ms)':>14}{'加速':>10}{'一致':>8}")
+    print("-" * 64)
+
+    all_equal = True
+    for label, n in SERIES_LENGTHS.items():
+        prices = generate_prices(n, args.seed)
+
+        legacy = run_all(prices, LegacyIndicators)
+        vectorized = run_all(prices, TechnicalAnalysis)
+        equal = legacy == vectorized
+        if not equal:
+            all_equal = False
+            for key in legacy:
+                if legacy[key] != vectorized[key]:
+                    print(f"  ✗ {label} {key} 輸出不一致")
+
+        old_t = time_it(lambda: run_all(prices, LegacyIndicators), args.repeat)
+        new_t = time_it(lambda: run_all(prices, TechnicalAnalysis), args.repeat)
+
+        print(f"{label:<6}{n:>8}{old_t * 1000:>14.2f}{new_t * 1000:>14.2f}"
+              f"{old_t / new_t:>9.1f}x{'✓' if equal else '✗':>8}")
+
+    print("=" * 64)
+    return 0 if all_equal else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
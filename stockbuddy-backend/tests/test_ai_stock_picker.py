@@ -0,0 +1,156 @@
+"""
+AI 選股引擎並行分析測試
+
+測試項目:
+1. 深度分析並行執行且不超過並行上限，結果與序列分析相同順序
+2. 不同 top_n 共用同一份排序結果；並行的冷啟動請求只掃描一次
+3. 無市場資料時回傳錯誤且不快取
+"""
+
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _FakeUpstream:
+    """取代市場資料與深度分析，記錄呼叫次數與最大並行數"""
+
+    def __init__(self, count=50, delay=0.05):
+        self.stocks = [
+            {"stock_id": str(2000 + i), "close": 100.0, "change_percent": 1.0, "volume_ratio": 1.0 + i % 7}
+            for i in range(count)
+        ]
+        self.delay = delay
+        self.scans = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def market_data(self):
+        self.scans += 1
+        return self.stocks
+
+    async def deep_analyze(self, stock):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if stock["stock_id"] == "2003":
+                raise RuntimeError("FinMind 逾時")
+            return {"stock_id": stock["stock_id"], "ai_score": int(stock["stock_id"]) % 13}
+        finally:
+            self.active -= 1
+
+    async def market_summary(self):
+        return {"index": 23000, "change": 12, "status": "收盤"}
+
+
+def _patched(upstream):
+    """以替身取代 AIStockPicker 的上游與快取，回傳還原函數"""
+    from app.services.ai_stock_picker import AIStockPicker
+    from app.services.cache_backend import MemoryBackend, SharedCache
+
+    original = {
+        name: AIStockPicker.__dict__[name]
+        for name in ("_cache", "_get_market_data", "_deep_analyze", "_get_market_summary", "_pre_filter")
+    }
+    AIStockPicker._cache = SharedCache("ai_stock_picker_test", backend=MemoryBackend())
+    AIStockPicker._get_market_data = staticmethod(upstream.market_data)
+    AIStockPicker._deep_analyze = staticmethod(upstream.deep_analyze)
+    AIStockPicker._get_market_summary = staticmethod(upstream.market_summary)
+    AIStockPicker._pre_filter = staticmethod(lambda stocks: list(stocks))
+
+    def restore():
+        for name, value in original.items():
+            setattr(AIStockPicker, name, value)
+        AIStockPicker._scan_task = None
+    return restore
+
+
+def test_bounded_concurrency():
+    """測試並行上限與結果順序"""
+    print("\n[1] 測試深度分析並行且不超過上限...")
+    from app.services.ai_stock_picker import AIStockPicker
+
+    upstream = _FakeUpstream(count=40, delay=0.05)
+    restore = _patched(upstream)
+    try:
+        import time
+        started = time.perf_counter()
+        results = asyncio.run(AIStockPicker._analyze_candidates(upstream.stocks, concurrency=8))
+        elapsed = time.perf_counter() - started
+    finally:
+        restore()
+
+    assert upstream.max_active == 8
+    assert [r["stock_id"] for r in results] == [s["stock_id"] for s in upstream.stocks if s["stock_id"] != "2003"]
+    assert elapsed < 40 * 0.05 / 2  # 序列需要 2 秒
+    print(f"    ✓ 40 檔以並行 8 完成，耗時 {elapsed:.2f}s（序列約 2.0s）")
+    return True
+
+
+def test_shared_ranking():
+    """測試不同 top_n 共用排序結果"""
+    print("\n[2] 測試不同 top_n 共用同一次掃描...")
+    from app.services.ai_stock_picker import AIStockPicker
+
+    upstream = _FakeUpstream()
+    restore = _patched(upstream)
+    try:
+        async def run():
+            cold = await asyncio.gather(*[AIStockPicker.get_top_picks(n) for n in (10, 20, 30, 10)])
+            warm = await AIStockPicker.get_top_picks(5)
+            return cold, warm
+
+        cold, warm = asyncio.run(run())
+    finally:
+        restore()
+
+    assert upstream.scans == 1
+    assert [len(r["top_picks"]) for r in cold] == [10, 20, 30, 10] and len(warm["top_picks"]) == 5
+    assert cold[1]["top_picks"][:10] == cold[0]["top_picks"] and warm["top_picks"] == cold[0]["top_picks"][:5]
+    scores = [p["ai_score"] for p in cold[2]["top_picks"]]
+    assert scores == sorted(scores, reverse=True)
+    assert cold[0]["analysis_count"] == 49 and cold[0]["scanned_count"] == 50
+    assert cold[0]["market_summary"]["index"] == 23000
+    print("    ✓ 4 個並行的冷啟動請求與後續請求只掃描 1 次")
+    return True
+
+
+def test_no_market_data():
+    """測試無市場資料"""
+    print("\n[3] 測試無市場資料...")
+    from app.services.ai_stock_picker import AIStockPicker
+
+    upstream = _FakeUpstream(count=0)
+    restore = _patched(upstream)
+    try:
+        async def run():
+            first = await AIStockPicker.get_top_picks(10)
+            second = await AIStockPicker.get_top_picks(10)
+            return first, second
+
+        first, second = asyncio.run(run())
+    finally:
+        restore()
+
+    assert first == {"error": "無法取得市場資料", "top_picks": []} and second == first
+    assert upstream.scans == 2  # 失敗不快取
+    print("    ✓ 回傳錯誤且下次重新掃描")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_bounded_concurrency,
+        test_shared_ranking,
+        test_no_market_data,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\nAI 選股並行分析測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
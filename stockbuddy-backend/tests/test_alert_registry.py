@@ -0,0 +1,220 @@
+"""
+價格警示登錄表測試
+
+測試項目:
+1. 價格階梯比對結果與逐一 evaluate 一致
+2. 漲跌幅警示未指定基準價時以昨收為基準
+3. 取消 / 取代與 JSON 持久化
+4. dispatch 寫入歷史並推送訂閱者
+5. 目標值轉為正數 float，不正確的值拒絕登錄
+6. 決定基準價後即寫入磁碟，重新載入後沿用同一基準價
+"""
+
+import sys
+import os
+import asyncio
+import random
+import tempfile
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _registry(tmp):
+    from app.services.alert_registry import AlertRegistry
+    return AlertRegistry(path=Path(tmp) / "price_alerts.json")
+
+
+def _random_alerts(n, symbols, seed):
+    rng = random.Random(seed)
+    alerts = []
+    for k in range(n):
+        alert_type = rng.choice(["above", "below", "percent_up", "percent_down"])
+        alert = {"id": f"a{k}", "stock_id": rng.choice(symbols), "alert_type": alert_type}
+        if alert_type in ("above", "below"):
+            alert["target_price"] = round(rng.uniform(80, 120), 1)
+        else:
+            alert["target_percent"] = rng.choice([1, 2.5, 5, 10])
+            alert["base_price"] = 100.0
+        alerts.append(alert)
+    return alerts
+
+
+def test_matches_linear_scan():
+    """測試階梯比對與逐一檢查一致"""
+    print("\n[1] 測試價格階梯與逐一 evaluate 一致...")
+    from app.services.price_alert import PriceAlertService
+
+    symbols = [str(2300 + k) for k in range(20)]
+    alerts = _random_alerts(2000, symbols, seed=7)
+    rng = random.Random(8)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = _registry(tmp)
+        for alert in alerts:
+            registry.register(alert, persist=False)
+        active = {a["id"]: a for a in alerts}
+
+        total = 0
+        for _ in range(30):
+            quotes = {
+                s: {"price": round(rng.uniform(85, 115), 1)}
+                for s in rng.sample(symbols, 8)
+            }
+            expected = {
+                alert_id for alert_id, alert in active.items()
+                if alert["stock_id"] in quotes
+                and PriceAlertService.evaluate(alert, quotes[alert["stock_id"]]["price"])[0]
+            }
+            triggered = registry.match(quotes)
+            assert {t["alert_id"] for t in triggered} == expected
+            for alert_id in expected:
+                del active[alert_id]
+            total += len(expected)
+
+        assert len(registry) == len(active)
+        assert registry.get_stats()["candidates"] == total  # 只檢查被穿越的警示
+    print(f"    ✓ 30 批報價觸發 {total} 個，與逐一檢查一致")
+    return True
+
+
+def test_percent_base_from_quote():
+    """測試漲跌幅警示的基準價"""
+    print("\n[2] 測試漲跌幅警示以昨收為基準...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = _registry(tmp)
+        registry.register({"id": "up", "stock_id": "2330", "alert_type": "percent_up", "target_percent": 5}, persist=False)
+        assert registry.list_alerts()[0]["threshold"] is None
+
+        assert registry.match({"2330": {"price": 1010, "yesterday": 1000}}) == []
+        assert registry.list_alerts()[0]["threshold"] == 1050
+
+        triggered = registry.match({"2330": {"price": 1050, "yesterday": 1000}})
+        assert [t["alert_id"] for t in triggered] == ["up"]
+        assert "5.00%" in triggered[0]["message"]
+        assert len(registry) == 0 and registry.symbols() == []
+    print("    ✓ 第一筆報價決定基準價，觸發後移除")
+    return True
+
+
+def test_cancel_and_persist():
+    """測試取消、取代與持久化"""
+    print("\n[3] 測試取消 / 取代與持久化...")
+    from app.services.alert_registry import AlertRegistry
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = _registry(tmp)
+        registry.register({"id": "x", "stock_id": "2317", "alert_type": "below", "target_price": 100})
+        registry.register({"id": "x", "stock_id": "2317", "alert_type": "below", "target_price": 90})
+        registry.register({"id": "y", "stock_id": "2454", "alert_type": "above", "target_price": 1500})
+        assert len(registry) == 2
+        assert registry.match({"2317": {"price": 95}}) == []  # 舊的 100 已被取代
+
+        try:
+            registry.register({"stock_id": "2330", "alert_type": "above"})
+            assert False, "缺少 target_price 應該失敗"
+        except ValueError:
+            pass
+
+        reloaded = AlertRegistry(path=registry.path)
+        assert reloaded.load() == 2
+        assert reloaded.cancel("y") and not reloaded.cancel("y")
+        assert [a["id"] for a in reloaded.list_alerts()] == ["x"]
+        assert [t["alert_id"] for t in reloaded.match({"2317": {"price": 90}})] == ["x"]
+    print("    ✓ 相同 ID 取代，重新載入後狀態一致")
+    return True
+
+
+def test_dispatch():
+    """測試 dispatch 寫入歷史並推送"""
+    print("\n[4] 測試 dispatch 寫入歷史與推送...")
+    from app.services import alert_registry
+
+    recorded = []
+    original = alert_registry._record_history
+    alert_registry._record_history = lambda events: recorded.extend(events)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            registry = _registry(tmp)
+            registry.register({"id": "a", "stock_id": "2330", "alert_type": "above", "target_price": 1000})
+
+            async def run():
+                queue = registry.subscribe()
+                triggered = await registry.dispatch({"2330": {"price": 1001, "name": "台積電"}})
+                event = queue.get_nowait()
+                registry.unsubscribe(queue)
+                return triggered, event
+
+            triggered, event = asyncio.run(run())
+    finally:
+        alert_registry._record_history = original
+
+    assert len(triggered) == 1 and event["alert_id"] == "a"
+    assert recorded[0]["stock_name"] == "台積電" and recorded[0]["trigger_value"] == 1000
+    print("    ✓ 觸發事件寫入歷史並推送訂閱者")
+    return True
+
+
+def test_validate_values():
+    """測試目標值轉換與驗證"""
+    print("\n[5] 測試目標值轉為正數 float...")
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = _registry(tmp)
+        record = registry.register({"id": "s", "stock_id": "2330", "alert_type": "above", "target_price": "1100"})
+        assert record["target_price"] == 1100.0 and record["threshold"] == 1100.0
+
+        invalid = [
+            {"alert_type": "above", "target_price": "abc"},
+            {"alert_type": "below", "target_price": 0},
+            {"alert_type": "below", "target_price": -5},
+            {"alert_type": "percent_up", "target_percent": "nan"},
+            {"alert_type": "percent_down", "target_percent": 3, "base_price": "0"},
+        ]
+        for alert in invalid:
+            try:
+                registry.register({"stock_id": "2330", **alert})
+                assert False, f"應該拒絕: {alert}"
+            except ValueError:
+                pass
+
+        # 字串目標價不會讓之後的比對失敗
+        assert [t["alert_id"] for t in registry.match({"2330": {"price": 1100.5}})] == ["s"]
+    print("    ✓ 字串目標價轉為 float，0 / 負數 / 非數字拒絕登錄")
+    return True
+
+
+def test_persist_resolved_base():
+    """測試基準價決定後寫入磁碟"""
+    print("\n[6] 測試基準價決定後寫入磁碟...")
+    from app.services.alert_registry import AlertRegistry
+
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = _registry(tmp)
+        registry.register({"id": "p", "stock_id": "2330", "alert_type": "percent_down", "target_percent": 5})
+
+        assert asyncio.run(registry.dispatch({"2330": {"price": 990, "yesterday": 1000}})) == []
+
+        reloaded = AlertRegistry(path=registry.path)
+        reloaded.load()
+        assert reloaded.list_alerts()[0]["base_price"] == 1000.0
+        assert reloaded.list_alerts()[0]["threshold"] == 950.0
+    print("    ✓ 重新載入後沿用第一筆報價的昨收")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_matches_linear_scan,
+        test_percent_base_from_quote,
+        test_cancel_and_persist,
+        test_dispatch,
+        test_validate_values,
+        test_persist_resolved_base,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n價格警示登錄表測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
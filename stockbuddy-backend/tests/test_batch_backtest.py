@@ -0,0 +1,184 @@
+"""
+批次回測服務測試
+
+測試項目:
+1. 參數網格展開與驗證
+2. 結果排序
+3. 行程池執行與單檔回測結果一致
+4. 單一組合失敗時，錯誤列帶有股票代號、策略與參數
+"""
+
+import sys
+import os
+import asyncio
+import random
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _history(n, seed):
+    rng = random.Random(seed)
+    price, start, result = 50.0, date(2023, 1, 2), []
+    for i in range(n):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+        result.append({
+            "date": (start + timedelta(days=i)).isoformat(),
+            "close": round(price, 2),
+            "volume": rng.randint(100, 5000),
+        })
+    return result
+
+
+def test_expand_grid():
+    """測試參數網格"""
+    print("\n[1] 測試參數網格...")
+    from app.services.batch_backtest import expand_grid
+
+    combos = expand_grid([
+        {"strategy": "ma_crossover", "params": {"short_period": [5, 10], "long_period": [20, 60]}},
+        {"strategy": "rsi", "params": {"oversold": 25}},
+        {"strategy": "combined"},
+    ])
+    assert len(combos) == 6
+    assert ("rsi", {"oversold": 25}) in combos
+    assert ("combined", {}) in combos
+
+    for bad in ({"strategy": "unknown"}, {"strategy": "rsi", "params": {"short_period": 5}}):
+        try:
+            expand_grid([bad])
+            assert False, "應拋出 ValueError"
+        except ValueError:
+            pass
+    print("    ✓ 網格展開與參數驗證正確")
+    return True
+
+
+def test_rank_results():
+    """測試結果排序"""
+    print("\n[2] 測試結果排序...")
+    from app.services.batch_backtest import rank_results
+
+    rows = [
+        {"sharpe_ratio": 0.5, "max_drawdown_pct": 10},
+        {"error": "無回測資料"},
+        {"sharpe_ratio": 1.2, "max_drawdown_pct": 20},
+    ]
+    assert [r.get("sharpe_ratio") for r in rank_results(rows)] == [1.2, 0.5, None]
+    assert [r.get("max_drawdown_pct") for r in rank_results(rows, "max_drawdown_pct")] == [10, 20, None]
+    print("    ✓ 排序方向正確，失敗組合排最後")
+    return True
+
+
+def test_job_matches_single_backtest():
+    """測試行程池執行"""
+    print("\n[3] 測試行程池執行...")
+    from app.services import batch_backtest
+    from app.services.backtest_engine import backtest_history
+
+    histories = {"2330": _history(200, 1), "2317": _history(200, 2), "9999": _history(10, 3)}
+
+    async def fake_load(stock_id, start_date, end_date):
+        history = histories[stock_id]
+        if len(history) < 20:
+            return None, {"error": "指定日期範圍資料不足"}
+        return history, None
+
+    original = batch_backtest.load_backtest_history
+    batch_backtest.load_backtest_history = fake_load
+    try:
+        async def run():
+            job = batch_backtest.submit_batch_backtest(
+                stock_ids=list(histories),
+                strategies=[{"strategy": "ma_crossover", "params": {"short_period": [5, 10]}}],
+                start_date="2023-01-01",
+                end_date="2024-01-01",
+            )
+            await job._task
+            return job
+
+        job = asyncio.run(run())
+    finally:
+        batch_backtest.load_backtest_history = original
+
+    status = job.to_dict()
+    assert status["status"] == "completed", status
+    assert status["progress"] == {"completed": 4, "total": 4, "percent": 100.0}
+    assert list(status["skipped"]) == ["9999"]
+
+    for row in status["results"]:
+        expected = backtest_history(
+            row["stock_id"], histories[row["stock_id"]], row["strategy"],
+            params=row["params"], verbose=False,
+        )["stats"]
+        assert row["sharpe_ratio"] == expected["sharpe_ratio"]
+        assert row["total_trades"] == expected["total_trades"]
+
+    sharpes = [r["sharpe_ratio"] for r in status["results"]]
+    assert sharpes == sorted(sharpes, reverse=True)
+    print("    ✓ 4 組結果與單檔回測一致")
+    return True
+
+
+def test_failed_combination():
+    """測試失敗組合的錯誤列"""
+    print("\n[4] 測試失敗組合可追溯...")
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import batch_backtest
+
+    histories = {"2330": _history(200, 1), "2317": _history(200, 2)}
+
+    async def fake_load(stock_id, start_date, end_date):
+        return histories[stock_id], None
+
+    run_combination = batch_backtest._run_combination
+
+    def flaky(stock_id, strategy, params, *args):
+        if stock_id == "2317" and params["short_period"] == 10:
+            raise ValueError("均線期間錯誤")
+        return run_combination(stock_id, strategy, params, *args)
+
+    original = (batch_backtest.load_backtest_history, batch_backtest._run_combination,
+                batch_backtest.ProcessPoolExecutor)
+    batch_backtest.load_backtest_history = fake_load
+    batch_backtest._run_combination = flaky
+    batch_backtest.ProcessPoolExecutor = ThreadPoolExecutor  # 同一行程內執行，才能替換 _run_combination
+    try:
+        async def run():
+            job = batch_backtest.submit_batch_backtest(
+                stock_ids=list(histories),
+                strategies=[{"strategy": "ma_crossover", "params": {"short_period": [5, 10]}}],
+                start_date="2023-01-01",
+                end_date="2024-01-01",
+            )
+            await job._task
+            return job
+
+        job = asyncio.run(run())
+    finally:
+        (batch_backtest.load_backtest_history, batch_backtest._run_combination,
+         batch_backtest.ProcessPoolExecutor) = original
+
+    assert job.status == "completed" and job.completed == 4
+    errors = [r for r in job.results if "sharpe_ratio" not in r]
+    assert len(errors) == 1
+    assert errors[0]["stock_id"] == "2317" and errors[0]["strategy"] == "ma_crossover"
+    assert errors[0]["params"]["short_period"] == 10 and errors[0]["error"] == "均線期間錯誤"
+    print("    ✓ 錯誤列帶有股票代號、策略與參數")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_expand_grid,
+        test_rank_results,
+        test_job_matches_single_backtest,
+        test_failed_combination,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n批次回測測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,226 @@
+"""
+共用快取後端測試
+
+測試項目:
+1. SQLite 後端：不同連線（模擬多個 worker）共用寫入、max_age 與命名空間清除
+2. Redis 協定後端：對本機 RESP 替身伺服器讀寫、過期與前綴清除
+3. StockCache 使用共用後端時，另一個 worker 讀得到且採用較新的值；較舊的共用值不覆寫本地
+4. 後端錯誤不影響呼叫端
+"""
+
+import sys
+import os
+import fnmatch
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+    """只支援後端用到的指令的 RESP 伺服器"""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        assert line[:1] == b"*"
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def _bulk(self, data):
+        if data is None:
+            return b"$-1\r\n"
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            cmd = args[0].upper()
+            now = time.time()
+            if cmd == b"GET":
+                value, expires = store.get(args[1], (None, 0))
+                reply = self._bulk(value if expires > now else None)
+            elif cmd == b"SET":
+                ttl = int(args[4]) / 1000 if len(args) > 4 and args[3].upper() == b"PX" else 1e9
+                store[args[1]] = (args[2], now + ttl)
+                reply = b"+OK\r\n"
+            elif cmd == b"DEL":
+                removed = sum(1 for k in args[1:] if store.pop(k, None) is not None)
+                reply = b":%d\r\n" % removed
+            elif cmd == b"SCAN":
+                pattern = args[args.index(b"MATCH") + 1].decode()
+                keys = [k for k in store if fnmatch.fnmatchcase(k.decode(), pattern)]
+                reply = b"*2\r\n" + self._bulk(b"0") + b"*%d\r\n" % len(keys) + b"".join(self._bulk(k) for k in keys)
+            elif cmd in (b"PING", b"SELECT", b"AUTH"):
+                reply = b"+OK\r\n"
+            else:
+                reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+def _start_fake_redis():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _FakeRedisHandler)
+    server.daemon_threads = True
+    server.store = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_sqlite_shared():
+    """測試 SQLite 後端跨連線共用"""
+    print("\n[1] 測試 SQLite 後端多個 worker 共用...")
+    from app.services.cache_backend import SQLiteBackend, SharedCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "shared_cache.db"
+        worker_a = SharedCache("twse_openapi", retention=60, backend=SQLiteBackend(path))
+        worker_b = SharedCache("twse_openapi", retention=60, backend=SQLiteBackend(path))
+        other = SharedCache("finmind", retention=60, backend=SQLiteBackend(path))
+
+        data = {str(2000 + k): {"close": 100.0 + k} for k in range(1000)}
+        worker_a.set("all_stocks", data)
+        other.set("all_stocks", {"x": 1})
+        assert worker_b.get("all_stocks") == data
+        assert worker_b.get("all_stocks", max_age=0) is None  # 呼叫端 TTL 已過
+
+        # 多執行緒同時寫入（各自連線）
+        def write(n):
+            cache = SharedCache("twse_openapi", retention=60, backend=SQLiteBackend(path))
+            for k in range(20):
+                cache.set(f"t{n}:{k}", k)
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert worker_b.get("t3:19") == 19
+
+        worker_a.set("short", 1, ttl=0.05)
+        time.sleep(0.1)
+        assert worker_b.get("short") is None
+
+        worker_b.clear()
+        assert SharedCache("twse_openapi", backend=SQLiteBackend(path)).get("all_stocks") is None
+        assert other.get("all_stocks") == {"x": 1}  # 其他命名空間不受影響
+
+        stats = other.backend.get_stats()
+        assert stats["backend"] == "sqlite" and stats["keys"] == 1 and stats["errors"] == 0
+        for cache in (worker_a, worker_b, other):
+            cache.backend.close()
+    print("    ✓ 不同連線共用同一份快取，清除只影響自己的命名空間")
+    return True
+
+
+def test_redis_protocol():
+    """測試 Redis 協定後端"""
+    print("\n[2] 測試 Redis 協定後端（本機替身伺服器）...")
+    from app.services.cache_backend import RedisBackend, SharedCache
+
+    server = _start_fake_redis()
+    try:
+        url = f"redis://127.0.0.1:{server.server_address[1]}/1"
+        worker_a = SharedCache("twse_bulk:market", retention=60, backend=RedisBackend(url))
+        worker_b = SharedCache("twse_bulk:market", retention=60, backend=RedisBackend(url))
+        history = SharedCache("twse_bulk:history", retention=60, backend=RedisBackend(url))
+
+        worker_a.set("all_stocks_daily", {"2330": {"close": 1000.0, "name": "台積電"}})
+        history.set("history_2330_2", [{"date": "2024-01-02", "close": 593.0}])
+        assert worker_b.get("all_stocks_daily")["2330"]["name"] == "台積電"
+        assert b"stockbuddy:twse_bulk:market:all_stocks_daily" in server.store
+
+        worker_a.set("expiring", 1, ttl=0.05)
+        time.sleep(0.1)
+        assert worker_b.get("expiring") is None
+
+        worker_b.clear()
+        assert RedisBackend(url).get("twse_bulk:market:all_stocks_daily") is None
+        assert history.get("history_2330_2")[0]["close"] == 593.0
+
+        stats = worker_b.backend.get_stats()
+        assert stats["backend"] == "redis" and stats["errors"] == 0 and stats["hits"] >= 1
+    finally:
+        server.shutdown()
+        server.server_close()
+    print("    ✓ GET / SET PX / SCAN+DEL 正常，鍵加上 stockbuddy: 前綴")
+    return True
+
+
+def test_stock_cache_shared():
+    """測試 CacheService 使用共用後端"""
+    print("\n[3] 測試 StockCache 使用共用後端...")
+    from app.services.cache_backend import SQLiteBackend
+    from app.services.cache_service import CacheService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "shared_cache.db"
+        worker_a = CacheService(backend=SQLiteBackend(path))
+        worker_b = CacheService(backend=SQLiteBackend(path))
+
+        worker_a.set_smart("recommendations", {"picks": ["2330"]}, "recommend")
+        assert worker_b.get("recommendations") == {"picks": ["2330"]}
+        assert "recommendations" in worker_b._entries  # 讀取後寫入本地
+
+        # worker_b 本地已過期時，採用 worker_a 較新的值
+        worker_b.set("info:2330", {"price": 1}, ttl=10, grace=60)
+        worker_b._entries["info:2330"].created -= 20
+        time.sleep(0.01)
+        worker_a.set("info:2330", {"price": 2}, ttl=10, grace=60)
+        assert worker_b.peek("info:2330") == ({"price": 2}, "fresh")
+
+        # 本地過期但比共用後端新：沿用本地（寬限期內的舊值），不被較舊的共用值覆寫
+        now = time.time()
+        worker_a._backend.set(worker_a._backend_prefix + "quote:2330", (now - 30, 10, None, 60, {"price": 1}), 60)
+        worker_b._store("quote:2330", {"price": 3}, now - 15, 10, None, 60)
+        assert worker_b.peek("quote:2330") == ({"price": 3}, "stale")
+        assert worker_b._entries["quote:2330"].created == now - 15
+
+        worker_a.delete("info:2330")
+        assert CacheService(backend=SQLiteBackend(path)).get("info:2330") is None
+        worker_b.clear()
+        assert CacheService(backend=SQLiteBackend(path)).get("recommendations") is None
+    print("    ✓ 一個 worker 寫入，其他 worker 直接命中")
+    return True
+
+
+def test_backend_errors():
+    """測試後端錯誤不影響呼叫端"""
+    print("\n[4] 測試後端連線失敗...")
+    from app.services.cache_backend import RedisBackend, SharedCache
+
+    with socketserver.TCPServer(("127.0.0.1", 0), socketserver.BaseRequestHandler) as probe:
+        port = probe.server_address[1]  # 關閉後沒有服務的埠
+
+    cache = SharedCache("chip", backend=RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.2))
+    cache.set("institutional", {"2330": {}})
+    assert SharedCache("chip", backend=cache.backend).get("institutional") is None
+    stats = cache.backend.get_stats()
+    assert stats["errors"] == 2 and "get" in stats["last_error"]
+    print("    ✓ 連線失敗時視為未命中並計入錯誤")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_sqlite_shared,
+        test_redis_protocol,
+        test_stock_cache_shared,
+        test_backend_errors,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n共用快取後端測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
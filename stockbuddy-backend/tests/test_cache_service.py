@@ -0,0 +1,227 @@
+"""
+快取服務測試
+
+測試項目:
+1. 沒有值時並行呼叫只執行一次 loader
+2. 過期但在寬限內立即回傳舊值，背景只更新一次
+3. 超過寬限視為沒有值；載入失敗傳給所有等待者
+4. @cached 裝飾器共用 single-flight
+5. 項目數與記憶體上限的 LRU 淘汰
+6. 主動清除過期項目與命名空間統計
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _counting_loader(calls, value="v", delay=0.05):
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return f"{value}{len(calls)}"
+    return loader
+
+
+def _age(cache, key, seconds):
+    cache._entries[key].created = time.time() - seconds
+
+
+def test_single_flight():
+    """測試並行載入只執行一次"""
+    print("\n[1] 測試沒有值時並行呼叫只載入一次...")
+    from app.services.cache_service import CacheService
+
+    cache = CacheService()
+    calls = []
+
+    async def run():
+        loader = _counting_loader(calls)
+        return await asyncio.gather(*[cache.get_or_load("k", loader, ttl=60) for _ in range(50)])
+
+    results = asyncio.run(run())
+    assert results == ["v1"] * 50 and len(calls) == 1
+    assert cache.get("k") == "v1"
+
+    stats = cache.get_stats()
+    assert stats["misses"] == 50 and stats["coalesced"] == 49 and stats["loads"] == 1
+    assert stats["inflight"] == 0
+    print("    ✓ 50 個並行請求只執行 1 次 loader")
+    return True
+
+
+def test_stale_while_revalidate():
+    """測試寬限內回傳舊值並背景更新"""
+    print("\n[2] 測試過期後回傳舊值並背景更新...")
+    from app.services.cache_service import CacheService
+
+    cache = CacheService()
+    calls = []
+    cache.set("k", "old", ttl=10, grace=60)
+    _age(cache, "k", 20)
+    assert cache.get("k") is None and cache.peek("k") == ("old", "stale")
+
+    async def run():
+        loader = _counting_loader(calls, value="new")
+        first = await asyncio.gather(*[cache.get_or_load("k", loader, ttl=10, grace=60) for _ in range(20)])
+        await asyncio.sleep(0.1)
+        after = await cache.get_or_load("k", loader, ttl=10, grace=60)
+        return first, after
+
+    first, after = asyncio.run(run())
+    assert first == ["old"] * 20
+    assert len(calls) == 1 and after == "new1"
+    assert cache.get_stats()["stale_hits"] == 21  # 含上方的 peek
+    print("    ✓ 20 個請求立即拿到舊值，背景只更新 1 次")
+    return True
+
+
+def test_expired_and_errors():
+    """測試超過寬限與載入失敗"""
+    print("\n[3] 測試超過寬限與載入失敗...")
+    from app.services.cache_service import CacheService, SmartTTL
+
+    cache = CacheService()
+    cache.set("plain", "x", ttl=10)
+    _age(cache, "plain", 11)
+    assert cache.peek("plain") == (None, "miss")  # 固定 TTL 預設不回傳舊值
+    assert "plain" not in cache._entries
+
+    cache.set_smart("smart", "y", "recommend")
+    ttl = SmartTTL.get_ttl("recommend")
+    _age(cache, "smart", ttl + SmartTTL.get_grace("recommend") - 5)
+    assert cache.peek("smart") == ("y", "stale")
+    _age(cache, "smart", ttl + SmartTTL.get_grace("recommend") + 5)
+    assert cache.peek("smart") == (None, "miss")
+
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        raise RuntimeError("upstream down")
+
+    async def run():
+        return await asyncio.gather(
+            *[cache.get_or_load("bad", failing) for _ in range(5)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.get_stats()["load_errors"] == 1 and cache.peek("bad")[1] == "miss"
+    print("    ✓ 超過寬限即刪除，失敗傳給所有等待者且不寫入快取")
+    return True
+
+
+def test_cached_decorator():
+    """測試 @cached 裝飾器"""
+    print("\n[4] 測試 @cached 裝飾器 single-flight...")
+    from app.services.cache_service import StockCache, cached
+
+    calls = []
+
+    @cached(ttl=60, key_prefix="test")
+    async def fetch(stock_id):
+        calls.append(stock_id)
+        await asyncio.sleep(0.02)
+        return {"stock_id": stock_id}
+
+    async def run():
+        return await asyncio.gather(*[fetch(s) for s in ["2330"] * 10 + ["2317"] * 10])
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        StockCache.clear_all()
+
+    assert sorted(calls) == ["2317", "2330"]
+    assert results[0] == {"stock_id": "2330"} and results[-1] == {"stock_id": "2317"}
+    assert fetch.__name__ == "fetch"
+    print("    ✓ 每個參數組合只執行一次")
+    return True
+
+
+def test_lru_budget():
+    """測試容量上限與 LRU 淘汰"""
+    print("\n[5] 測試項目數與記憶體上限...")
+    from app.services.cache_service import CacheService, estimate_size
+
+    cache = CacheService(max_entries=3)
+    for k in range(3):
+        cache.set(f"score:{k}", {"score": k}, ttl=60)
+    assert cache.get("score:0") == {"score": 0}  # 0 變成最近使用
+    cache.set("score:3", {"score": 3}, ttl=60)
+    assert cache.get("score:1") is None and cache.get("score:0") is not None
+    assert len(cache) == 3
+
+    bars = [{"date": f"2024-01-{d:02d}", "close": 100.0 + d} for d in range(1, 29)]
+    size = estimate_size(bars)
+    cache = CacheService(max_bytes=size * 5)
+    for k in range(20):
+        cache.set(f"history:{k}:6", list(bars), ttl=60)
+    stats = cache.get_stats()
+    assert stats["bytes"] <= size * 5 and 3 <= stats["total_keys"] < 5
+    assert stats["namespaces"]["history"]["evictions"] == 20 - stats["total_keys"]
+    assert cache.get("history:19:6") is not None and cache.get("history:0:6") is None
+
+    cache.set("huge", bars * 10, ttl=60)  # 超過總容量不快取
+    assert cache.get("huge") is None and cache.get_stats()["rejected"] == 1
+    print(f"    ✓ 超過上限淘汰最久未使用，記憶體 {stats['bytes']} ≤ {size * 5} bytes")
+    return True
+
+
+def test_sweep_and_namespaces():
+    """測試主動清除與命名空間統計"""
+    print("\n[6] 測試主動清除過期項目與命名空間統計...")
+    from app.services.cache_service import CacheService
+
+    cache = CacheService()
+    for k in range(100):
+        cache.set(f"history:{k}", [k], ttl=10)
+    cache.set("info:2330", {"price": 1}, ttl=10, grace=30)
+    cache.set("recommendations", {"picks": []}, ttl=600)
+    cache.set(":fetch:(2330,):{}", {"x": 1}, ttl=600)
+
+    now = time.time()
+    assert cache.sweep(now + 20) == 100  # 過期但未讀取的項目也會被清除
+    assert "info:2330" in cache._entries  # 仍在寬限內
+    assert cache.sweep(now + 60) == 1
+    assert len(cache) == 2
+
+    cache.set("history:0", [0], ttl=10)
+    cache.set("history:0", [0, 1], ttl=600)  # 取代後舊的到期紀錄不影響新值
+    assert cache.sweep(now + 20) == 0 and cache.get("history:0") == [0, 1]
+    cache.get("history:missing")
+
+    stats = cache.get_stats()
+    history = stats["namespaces"]["history"]
+    assert history["entries"] == 1 and history["expirations"] == 100
+    assert history["hits"] == 1 and history["misses"] == 1
+    assert stats["namespaces"]["info"]["entries"] == 0 and stats["namespaces"]["info"]["expirations"] == 1
+    assert set(stats["namespaces"]) == {"history", "info", "recommendations", "fetch"}
+    assert stats["bytes"] == sum(ns["bytes"] for ns in stats["namespaces"].values())
+    print("    ✓ 未讀取的過期項目被清除，統計依命名空間分開")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_single_flight,
+        test_stale_while_revalidate,
+        test_expired_and_errors,
+        test_cached_decorator,
+        test_lru_budget,
+        test_sweep_and_namespaces,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n快取服務測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
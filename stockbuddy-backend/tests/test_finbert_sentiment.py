@@ -0,0 +1,154 @@
+"""
+FinBERT 批次推論測試（以假的 tokenizer / 模型取代預訓練權重）
+
+測試項目:
+1. 每批只做一次 forward，批內重複文字只推論一次，結果順序與輸入相同
+2. 重複的文字命中快取，不再推論
+3. 並行呼叫只載入一次模型
+"""
+
+import sys
+import os
+import importlib.util
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LABELS = ["negative", "neutral", "positive"]
+
+
+def _expected(text):
+    """假模型的預測：文字長度 mod 3 決定類別"""
+    return LABELS[len(text) % 3]
+
+
+class _StubTokenizer:
+    """每筆文字編碼為 [長度, 0, 0, ...]，padding 到批內最長"""
+
+    def __call__(self, texts, return_tensors=None, truncation=True, max_length=512, padding=True):
+        import torch
+        width = max(len(t) for t in texts)
+        ids = torch.zeros((len(texts), width), dtype=torch.long)
+        ids[:, 0] = torch.tensor([len(t) for t in texts])
+        return {"input_ids": ids}
+
+
+class _StubModel:
+    """記錄每次 forward 的批次大小"""
+
+    class config:
+        id2label = dict(enumerate(LABELS))
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, input_ids):
+        import torch
+        self.calls.append(len(input_ids))
+        logits = torch.nn.functional.one_hot(input_ids[:, 0] % 3, num_classes=3).float() * 5
+
+        class _Output:
+            pass
+
+        output = _Output()
+        output.logits = logits
+        return output
+
+
+def _analyzer(load_delay=0.0):
+    from app.services.finbert_sentiment import FinBERTSentiment
+
+    analyzer = FinBERTSentiment(language="en", device="cpu", quantize=False)
+    analyzer.loads = 0
+
+    def load_weights():
+        time.sleep(load_delay)
+        analyzer.loads += 1
+        analyzer._tokenizer = _StubTokenizer()
+        analyzer._model = _StubModel()
+        analyzer._loaded = True
+
+    analyzer._load_weights = load_weights
+    return analyzer
+
+
+def _available():
+    if importlib.util.find_spec("torch") is None or importlib.util.find_spec("transformers") is None:
+        print("    ⚠️ torch / transformers 未安裝，跳過")
+        return False
+    return True
+
+
+def test_batch_forward_and_order():
+    """測試每批一次 forward 與結果順序"""
+    print("\n[1] 測試每批一次 forward、批內去重與順序...")
+    if not _available():
+        return True
+
+    analyzer = _analyzer()
+    texts = ["台積電營收創新高", "a", "bb", "a", "ccc", "台積電營收創新高", "dddd", "eeeee", "ffffff", "a"]
+    results = analyzer.analyze_batch(texts, batch_size=3)
+
+    unique = len(set(texts))
+    assert analyzer._model.calls == [3, 3, 1] and sum(analyzer._model.calls) == unique
+    assert [r.label for r in results] == [_expected(t) for t in texts]
+    assert results[1] is results[3] is results[9]
+    print(f"    ✓ {len(texts)} 筆（{unique} 筆不重複）只做 {len(analyzer._model.calls)} 次 forward")
+    return True
+
+
+def test_cache_hits():
+    """測試重複文字命中快取"""
+    print("\n[2] 測試重複文字命中快取...")
+    if not _available():
+        return True
+
+    analyzer = _analyzer()
+    first = analyzer.analyze_batch(["上漲", "下跌", "持平"])
+    calls = list(analyzer._model.calls)
+
+    # 空白差異視為相同文字
+    second = analyzer.analyze_batch(["持平", " 上漲 ", "下跌"])
+    single = analyzer.analyze("下跌")
+
+    assert analyzer._model.calls == calls == [3]
+    assert [r.label for r in second] == [first[2].label, first[0].label, first[1].label]
+    assert single is first[1]
+    assert analyzer.get_cache_stats()["hits"] == 4
+    print("    ✓ 重複文字不再推論")
+    return True
+
+
+def test_load_once():
+    """測試並行只載入一次模型"""
+    print("\n[3] 測試並行呼叫只載入一次模型...")
+    if not _available():
+        return True
+
+    analyzer = _analyzer(load_delay=0.05)
+    threads = [threading.Thread(target=analyzer.analyze_batch, args=([f"新聞 {i}"],)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert analyzer.loads == 1
+    assert analyzer.get_cache_stats()["entries"] == 8
+    print("    ✓ 8 個並行請求只載入 1 次模型")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_batch_forward_and_order,
+        test_cache_hits,
+        test_load_once,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\nFinBERT 批次推論測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,195 @@
+"""
+全市場基本面欄位表測試
+
+測試項目:
+1. 區間遮罩（缺資料處理）
+2. 欄位遮罩與逐檔 _apply_filters 結果一致
+3. 篩選排序、股票池與排除
+4. 多數股票沒有快取基本面時，市值以收盤價 × 已發行股數補齊；無市值者不通過市值條件
+"""
+
+import sys
+import os
+import asyncio
+import inspect
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _records(n=300, seed=1):
+    rng = random.Random(seed)
+
+    def maybe(value):
+        return None if rng.random() < 0.15 else value
+
+    records = {}
+    for k in range(n):
+        stock_id = str(1101 + k)
+        records[stock_id] = {
+            "stock_id": stock_id,
+            "name": f"股票{stock_id}",
+            "price": round(rng.uniform(10, 800), 2),
+            "volume": rng.randint(0, 50000),
+            "pe_ratio": maybe(round(rng.uniform(3, 60), 2)),
+            "pb_ratio": maybe(round(rng.uniform(0.3, 8), 2)),
+            "dividend_yield": maybe(round(rng.uniform(0, 9), 2)),
+            "roe": maybe(round(rng.uniform(-5, 35), 2)),
+            "market_cap": maybe(rng.choice([2e9, 3e10, 8e10, 2e12])),
+        }
+    return records
+
+
+def test_range_mask():
+    """測試區間遮罩"""
+    print("\n[1] 測試區間遮罩...")
+    from app.services.fundamentals_table import FundamentalsTable
+
+    table = FundamentalsTable.from_records({
+        "1101": {"pe_ratio": 10},
+        "2330": {"pe_ratio": 25},
+        "2317": {"pe_ratio": None},
+    })
+    assert list(table.stock_ids) == ["1101", "2317", "2330"]
+    assert table.range_mask("pe_ratio", high=15).tolist() == [True, True, False]
+    assert table.range_mask("pe_ratio", high=15, require=True).tolist() == [True, False, False]
+    assert table.row(1)["pe_ratio"] is None
+    print("    ✓ 缺資料時依 require 決定是否排除")
+    return True
+
+
+def test_mask_matches_apply_filters():
+    """測試遮罩與逐檔篩選一致"""
+    print("\n[2] 測試遮罩與 _apply_filters 一致...")
+    from app.services.fundamentals_table import FundamentalsTable
+    from app.services.stock_screener import StockScreener, MarketCapSize
+
+    records = _records()
+    table = FundamentalsTable.from_records(records)
+
+    accepted = set(inspect.signature(StockScreener._apply_filters).parameters)
+    cases = [
+        {k: v for k, v in config.items() if k in accepted}
+        for config in StockScreener.PRESET_FILTERS.values()
+    ]
+    cases += [
+        {"pe_min": 10, "pb_min": 1, "roe_max": 20},
+        {"dividend_yield_max": 2, "market_cap_size": MarketCapSize.MID, "market_cap_max": 600},
+        {},
+    ]
+
+    for filters in cases:
+        mask = StockScreener._table_mask(table, **filters)
+        for i, stock_id in enumerate(table.stock_ids):
+            fundamental = dict(records[stock_id])
+            fundamental["dividend_yield_percent"] = fundamental["dividend_yield"]
+            assert mask[i] == StockScreener._apply_filters(fundamental, **filters), (filters, stock_id)
+    print(f"    ✓ {len(cases)} 組條件 × {len(table)} 檔一致")
+    return True
+
+
+def test_screen_stocks():
+    """測試篩選結果"""
+    print("\n[3] 測試篩選排序與股票池...")
+    from app.services import stock_screener
+    from app.services.fundamentals_table import FundamentalsTable
+    from app.services.stock_screener import StockScreener
+
+    records = _records()
+    table = FundamentalsTable.from_records(records)
+
+    async def fake_table(force=False):
+        return table
+
+    original = stock_screener.get_fundamentals_table
+    stock_screener.get_fundamentals_table = fake_table
+    try:
+        result = asyncio.run(StockScreener.screen_stocks(dividend_yield_min=5, limit=10))
+        pool = ["1300", "1105", "1200"]
+        pooled = asyncio.run(StockScreener.screen_stocks(stock_pool=pool, exclude_stocks=["1200"]))
+    finally:
+        stock_screener.get_fundamentals_table = original
+
+    expected = [s for s, r in records.items() if r["dividend_yield"] is not None and r["dividend_yield"] >= 5]
+    assert result["total_scanned"] == 300
+    assert result["matched_count"] == len(expected)
+    yields = [s["dividend_yield"] for s in result["stocks"]]
+    assert len(yields) == 10 and yields == sorted(yields, reverse=True)
+
+    assert pooled["total_scanned"] == 2
+    assert [s["stock_id"] for s in pooled["stocks"]] == ["1300", "1105"]
+    print(f"    ✓ 殖利率排序正確，符合 {result['matched_count']} 檔")
+    return True
+
+
+def test_market_cap_without_cached_fundamentals():
+    """測試市值由已發行股數補齊"""
+    print("\n[4] 測試無快取基本面時的市值篩選...")
+    from app.services import fundamentals_table
+    from app.services.cache_service import StockCache
+    from app.services.stock_screener import StockScreener, MarketCapSize
+    from app.services.tpex_openapi import TPExOpenAPI
+    from app.services.twse_openapi import TWSEOpenAPI
+
+    twse = {
+        "2330": {"name": "台積電", "price": 1000.0, "volume": 30_000_000},   # 25,930 億
+        "1101": {"name": "台泥", "price": 30.0, "volume": 10_000_000},       # 226 億
+        "1234": {"name": "小型", "price": 20.0, "volume": 1_000_000},        # 4 億
+        "9999": {"name": "無股數", "price": 50.0, "volume": 1_000_000},
+    }
+    shares = {"2330": 2_593_000_000, "1101": 754_000_000, "1234": 20_000_000}
+    otc = {"6488": {"name": "環球晶", "price": 400.0, "volume": 3000}}       # 1,760 億
+
+    async def value(result):
+        return result
+
+    patches = {
+        (TWSEOpenAPI, "get_all_stocks_summary"): lambda: value(twse),
+        (TWSEOpenAPI, "get_issued_shares"): lambda: value(shares),
+        (TPExOpenAPI, "get_otc_stock_summary"): lambda: value(otc),
+        (TPExOpenAPI, "get_otc_pe_ratio"): lambda: value({}),
+        (TPExOpenAPI, "get_otc_issued_shares"): lambda: value({"6488": 440_000_000}),
+    }
+    original = {key: key[0].__dict__[key[1]] for key in patches}
+    for (cls, name), fake in patches.items():
+        setattr(cls, name, staticmethod(fake))
+
+    # 只有 1101 有快取基本面（市值以快取為準）
+    StockCache.set_fundamental("1101", {"market_cap": 2.5e10})
+    try:
+        table = asyncio.run(fundamentals_table.build_fundamentals_table())
+    finally:
+        for (cls, name), method in original.items():
+            setattr(cls, name, method)
+        StockCache.get_instance().delete("fundamental:1101")
+
+    caps = {s: table.row(i)["market_cap"] for i, s in enumerate(table.stock_ids)}
+    assert caps == {"1101": 2.5e10, "1234": 4e8, "2330": 2.593e12, "6488": 1.76e11, "9999": None}
+
+    def matched(**filters):
+        mask = StockScreener._table_mask(table, **filters)
+        return sorted(table.stock_ids[mask])
+
+    assert matched(market_cap_size=MarketCapSize.LARGE) == ["2330", "6488"]
+    assert matched(market_cap_size=MarketCapSize.MID) == ["1101"]
+    assert matched(market_cap_size=MarketCapSize.SMALL) == ["1234"]
+    assert matched(market_cap_max=1000) == ["1101", "1234"]
+    assert "9999" in matched()
+    print("    ✓ 市值由已發行股數補齊，無市值者不通過市值條件")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_range_mask,
+        test_mask_matches_apply_filters,
+        test_screen_stocks,
+        test_market_cap_without_cached_fundamentals,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n全市場欄位表測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
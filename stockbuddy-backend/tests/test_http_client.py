@@ -0,0 +1,191 @@
+"""
+共用上游 HTTP 連線層測試
+
+測試項目:
+1. 相同的並行 GET 只送出一次上游請求
+2. 每個主機的 token bucket 限速
+3. 錯誤統計與錯誤傳遞給所有等待者
+4. session 預設標頭合併與非 GET 不合併
+5. 第一個呼叫者被取消時，其他等待者仍取得回應
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+
+def _client(handler, host_limits=None):
+    from app.services.http_client import UpstreamClient
+    return UpstreamClient(host_limits=host_limits or {}, transport=httpx.MockTransport(handler))
+
+
+def _slow_handler(calls, delay=0.05, status=200):
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json={"path": request.url.path, "n": len(calls)})
+    return handler
+
+
+def test_coalescing():
+    """測試並行 GET 合併"""
+    print("\n[1] 測試相同的並行 GET 只送出一次...")
+    calls = []
+    client = _client(_slow_handler(calls))
+
+    async def run():
+        url = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
+        responses = await asyncio.gather(*[client.get(url) for _ in range(50)])
+        other = await client.get(url, params={"date": "20240301"})
+        await client.aclose()
+        return responses, other
+
+    responses, other = asyncio.run(run())
+    assert len(calls) == 2
+    assert all(r.json() == {"path": "/v1/exchangeReport/STOCK_DAY_ALL", "n": 1} for r in responses)
+    assert other.json()["n"] == 2  # 參數不同不合併
+
+    stats = client.get_stats()["hosts"]["openapi.twse.com.tw"]
+    assert stats["requests"] == 2 and stats["coalesced"] == 49
+    print("    ✓ 50 個並行請求只送出 1 次，參數不同另外送出")
+    return True
+
+
+def test_rate_limit():
+    """測試主機限速"""
+    print("\n[2] 測試每個主機的 token bucket 限速...")
+    calls = []
+    client = _client(_slow_handler(calls, delay=0), host_limits={"slow.example": (20.0, 2)})
+
+    async def run():
+        started = time.monotonic()
+        await asyncio.gather(*[
+            client.get(f"https://slow.example/{k}") for k in range(6)
+        ])
+        slow = time.monotonic() - started
+
+        started = time.monotonic()
+        await asyncio.gather(*[
+            client.get(f"https://fast.example/{k}") for k in range(6)
+        ])
+        fast = time.monotonic() - started
+        return slow, fast
+
+    slow, fast = asyncio.run(run())
+    # 突發 2 個，其餘 4 個每 50ms 一個
+    assert slow >= 0.18, slow
+    assert fast < 0.1, fast
+    assert len(calls) == 12
+    stats = client.get_stats()["hosts"]
+    assert stats["slow.example"]["rate_limit"] == {"per_second": 20.0, "burst": 2}
+    assert stats["slow.example"]["rate_limited_seconds"] > 0
+    print(f"    ✓ 限速主機 {slow:.2f}s，其他主機 {fast:.2f}s")
+    return True
+
+
+def test_errors():
+    """測試錯誤統計與傳遞"""
+    print("\n[3] 測試錯誤統計與錯誤傳遞...")
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        await asyncio.sleep(0.02)
+        if request.url.path == "/boom":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(503)
+
+    client = _client(handler)
+
+    async def run():
+        results = await asyncio.gather(
+            *[client.get("https://err.example/boom") for _ in range(5)],
+            return_exceptions=True,
+        )
+        unavailable = await client.get("https://err.example/busy")
+        return results, unavailable
+
+    results, unavailable = asyncio.run(run())
+    assert len(results) == 5 and all(isinstance(r, httpx.ConnectError) for r in results)
+    assert unavailable.status_code == 503
+
+    stats = client.get_stats()
+    host = stats["hosts"]["err.example"]
+    assert host["requests"] == 2 and host["errors"] == 2 and host["coalesced"] == 4
+    assert host["last_error"] == "HTTP 503"
+    assert stats["inflight"] == 0
+    print("    ✓ 所有等待者收到同一個例外，錯誤計入統計")
+    return True
+
+
+def test_session():
+    """測試 session 預設參數"""
+    print("\n[4] 測試 session 標頭合併與 POST 不合併...")
+    calls = []
+    client = _client(_slow_handler(calls))
+
+    async def run():
+        async with client.session(timeout=5, headers={"User-Agent": "StockBuddy", "Accept": "text/html"}) as session:
+            await session.get("https://h.example/a", headers={"Accept": "application/json"})
+            await asyncio.gather(*[session.post("https://h.example/b", json={"k": 1}) for _ in range(3)])
+
+    asyncio.run(run())
+    assert calls[0].headers["user-agent"] == "StockBuddy"
+    assert calls[0].headers["accept"] == "application/json"
+    assert calls[0].extensions["timeout"]["read"] == 5
+    assert [c.method for c in calls] == ["GET", "POST", "POST", "POST"]
+    print("    ✓ 呼叫端標頭覆蓋預設值，POST 各自送出")
+    return True
+
+
+def test_leader_cancelled():
+    """測試第一個呼叫者被取消"""
+    print("\n[5] 測試第一個呼叫者取消不影響其他等待者...")
+    calls = []
+    client = _client(_slow_handler(calls))
+    url = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
+
+    async def run():
+        leader = asyncio.ensure_future(client.get(url))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(client.get(url)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        responses = await asyncio.gather(*followers)
+        try:
+            await leader
+        except asyncio.CancelledError:
+            cancelled = True
+        else:
+            cancelled = False
+        inflight = client.get_stats()["inflight"]
+        await client.aclose()
+        return responses, cancelled, inflight
+
+    responses, cancelled, inflight = asyncio.run(run())
+    assert cancelled and len(calls) == 1 and inflight == 0
+    assert all(r.json()["n"] == 1 for r in responses)
+    print("    ✓ 第一個呼叫者取消，3 個等待者仍取得同一個回應")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_coalescing,
+        test_rate_limit,
+        test_errors,
+        test_session,
+        test_leader_cancelled,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n上游 HTTP 連線層測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,118 @@
+"""
+向量化技術指標測試
+
+測試項目:
+1. 移動平均與逐窗加總結果相同（含 .5 進位邊界）
+2. 布林通道與 np.std 逐窗計算相同
+3. MACD / RSI 與遞迴定義相同
+4. 與舊版實作完整比對（scripts/benchmark_indicators.py）
+"""
+
+import sys
+import os
+import random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _prices(n, seed=1):
+    rng = random.Random(seed)
+    price, result = 100.0, []
+    for _ in range(n):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+        result.append(round(price, 2))
+    return result
+
+
+def test_ma_matches_window_sum():
+    """測試移動平均"""
+    print("\n[1] 測試移動平均...")
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    prices = _prices(300)
+    for period in (5, 20, 60):
+        expected = [None] * (period - 1) + [
+            round(sum(prices[i - period + 1:i + 1]) / period, 2)
+            for i in range(period - 1, len(prices))
+        ]
+        assert TechnicalAnalysis.calculate_ma(prices, period) == expected
+
+    # 2.125 剛好落在進位邊界
+    assert TechnicalAnalysis.calculate_ma([2.0, 2.25], 2) == [None, 2.12]
+    print("    ✓ 與逐窗加總一致")
+    return True
+
+
+def test_bollinger_matches_np_std():
+    """測試布林通道"""
+    print("\n[2] 測試布林通道...")
+    import numpy as np
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    prices = _prices(200, seed=2)
+    bands = TechnicalAnalysis.calculate_bollinger_bands(prices)
+    for i in range(19, len(prices)):
+        std = np.std(prices[i - 19:i + 1])
+        assert bands["upper"][i] == round(bands["middle"][i] + 2 * std, 2)
+        assert bands["lower"][i] == round(bands["middle"][i] - 2 * std, 2)
+    print("    ✓ 與 np.std 一致")
+    return True
+
+
+def test_macd_and_rsi_recursions():
+    """測試 MACD / RSI"""
+    print("\n[3] 測試 MACD / RSI...")
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    prices = _prices(120, seed=3)
+
+    def ema(data, period):
+        k = 2 / (period + 1)
+        out = [data[0]]
+        for x in data[1:]:
+            out.append((x * k) + (out[-1] * (1 - k)))
+        return out
+
+    dif = [f - s for f, s in zip(ema(prices, 12), ema(prices, 26))]
+    macd = TechnicalAnalysis.calculate_macd(prices)
+    assert macd["macd"][:25] == [None] * 25
+    assert macd["macd"][25:] == [round(v, 4) for v in dif[25:]]
+    assert macd["signal"][-1] == round(ema(dif, 9)[-1], 4)
+
+    rsi = TechnicalAnalysis.calculate_rsi(prices)
+    assert len(rsi) == len(prices)
+    assert rsi[:14] == [None] * 14
+    assert all(0 <= v <= 100 for v in rsi[14:])
+    assert TechnicalAnalysis.calculate_rsi([1.0 + i for i in range(30)])[-1] == 100
+    print("    ✓ 遞迴結果一致")
+    return True
+
+
+def test_legacy_equivalence():
+    """測試與舊版實作完整比對"""
+    print("\n[4] 與舊版實作比對...")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+    from benchmark_indicators import LegacyIndicators, generate_prices, run_all
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    for seed in range(5):
+        prices = generate_prices(1250, seed)
+        assert run_all(prices, LegacyIndicators) == run_all(prices, TechnicalAnalysis)
+    print("    ✓ 5 年序列輸出完全相同")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_ma_matches_window_sum,
+        test_bollinger_matches_np_std,
+        test_macd_and_rsi_recursions,
+        test_legacy_equivalence,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n技術指標測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,231 @@
+"""
+推論微批次器測試
+
+測試項目:
+1. 時間窗內的並行請求合併為一批；超過上限時分批
+2. 批次失敗傳給該批所有等待者
+3. predict_many 一次 predict_proba（含從股票數據萃取特徵的請求），結果與逐筆預測一致
+4. predict_async 經由微批次器合併 ML 與規則引擎請求
+5. 經由 /predict 路由的並行請求只呼叫一次 predict_proba，歷史K線特徵（多日漲跌、均線斜率）送達模型
+"""
+
+import sys
+import os
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+FEATURES = ["rsi_14", "macd_hist", "volume_ratio", "price_vs_ma20"]
+
+
+class _CountingModel:
+    """記錄 predict_proba 呼叫次數與每次列數"""
+
+    def __init__(self, model):
+        self.model = model
+        self.calls = []
+
+    def predict_proba(self, X):
+        self.calls.append(len(X))
+        return self.model.predict_proba(X)
+
+
+def _trained_predictor(feature_names=FEATURES):
+    import numpy as np
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    from app.services.ml_predictor import MLPredictor
+
+    rng = np.random.default_rng(7)
+    X = rng.normal(size=(200, len(feature_names))) * [15, 1, 0.5, 5] + [50, 0, 1, 0]
+    y = (X[:, 1] + X[:, 3] / 5 + rng.normal(0, 0.5, 200) > 0).astype(int)
+    scaler = StandardScaler().fit(X)
+
+    predictor = MLPredictor()
+    predictor._model = _CountingModel(LogisticRegression().fit(scaler.transform(X), y))
+    predictor._scaler = scaler
+    predictor._meta = {"version": "test_v1", "feature_names": list(feature_names)}
+    predictor._model_loaded = True
+    return predictor, X
+
+
+def test_batching_window():
+    """測試時間窗合併與分批"""
+    print("\n[1] 測試並行請求合併為一批...")
+    from app.services.inference_batcher import MicroBatcher
+
+    sizes = []
+
+    def handler(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, window_ms=5, max_batch=64)
+
+    async def run():
+        first = await asyncio.gather(*[batcher.submit(i) for i in range(50)])
+        second = await asyncio.gather(*[batcher.submit(i) for i in range(150)])
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == [i * 2 for i in range(50)] and second == [i * 2 for i in range(150)]
+    assert sizes == [50, 64, 64, 22]
+
+    stats = batcher.get_stats()
+    assert stats["requests"] == 200 and stats["batches"] == 4 and stats["largest_batch"] == 64
+    print(f"    ✓ 200 個請求只呼叫 handler {len(sizes)} 次")
+    return True
+
+
+def test_batch_errors():
+    """測試批次失敗"""
+    print("\n[2] 測試批次失敗傳給所有等待者...")
+    from app.services.inference_batcher import MicroBatcher
+
+    def handler(items):
+        raise ValueError("模型檔損毀")
+
+    batcher = MicroBatcher(handler, window_ms=2)
+
+    async def run():
+        return await asyncio.gather(*[batcher.submit(i) for i in range(10)], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert batcher.get_stats()["errors"] == 1
+    print("    ✓ 10 個等待者都收到錯誤")
+    return True
+
+
+def test_predict_many():
+    """測試 predict_many 與逐筆預測一致"""
+    print("\n[3] 測試 predict_many 一次 predict_proba...")
+    predictor, X = _trained_predictor()
+
+    requests = [
+        (f"{2000 + i}", dict(zip(FEATURES, map(float, X[i]))), None, None)
+        for i in range(40)
+    ]
+    requests[5][1]["macd_hist"] = None  # 缺失特徵
+    requests.append(("9999", None, {"rsi_14": 25, "close": 100, "ma20": 90}, None))  # 從股票數據萃取特徵
+    requests.append(("8888", None, None, None))  # 無數據：規則引擎
+
+    batch = predictor.predict_many(requests)
+    assert predictor._model.calls == [41]
+
+    single = [predictor.predict(stock_id, features=f, stock_data=d, history=h) for stock_id, f, d, h in requests]
+    for a, b in zip(batch, single):
+        assert (a.stock_id, a.prediction, a.probability, a.features_used, a.model_version) == \
+               (b.stock_id, b.prediction, b.probability, b.features_used, b.model_version)
+    assert batch[5].features_used == len(FEATURES) - 1
+    assert batch[-2].model_version == "test_v1"
+    assert batch[-1].model_version == "rule_based_v1"
+    print("    ✓ 41 檔只呼叫 1 次 predict_proba，結果與逐筆預測相同")
+    return True
+
+
+def test_predict_async():
+    """測試 predict_async"""
+    print("\n[4] 測試 predict_async 經由微批次器...")
+    from app.services import inference_batcher, ml_predictor
+
+    predictor, X = _trained_predictor()
+    original = (ml_predictor._predictor, inference_batcher._prediction_batcher)
+    try:
+        ml_predictor._predictor = predictor
+        inference_batcher._prediction_batcher = None
+
+        async def run():
+            ml = [
+                inference_batcher.predict_async(f"{2000 + i}", features=dict(zip(FEATURES, map(float, X[i]))))
+                for i in range(30)
+            ]
+            rules = [inference_batcher.predict_async("2330")]
+            return await asyncio.gather(*ml, *rules)
+
+        results = asyncio.run(run())
+        stats = inference_batcher.get_prediction_batcher().get_stats()
+    finally:
+        ml_predictor._predictor, inference_batcher._prediction_batcher = original
+
+    assert [r.stock_id for r in results[:30]] == [f"{2000 + i}" for i in range(30)]
+    assert all(r.model_version == "test_v1" for r in results[:30])
+    assert results[-1].model_version == "rule_based_v1"
+    assert predictor._model.calls == [30] and stats["batches"] == 1
+    print("    ✓ 31 個並行請求合併為 1 批，ML 部分只呼叫 1 次模型")
+    return True
+
+
+def test_predict_route():
+    """測試 /predict 路由批次呼叫模型"""
+    print("\n[5] 測試並行 /predict 請求只呼叫一次模型...")
+    from app.routers import ml_routes
+    from app.services import inference_batcher, ml_predictor, twse_bulk
+
+    predictor, _ = _trained_predictor(["price_change_5d", "rsi_14", "ma5_slope", "price_change_20d"])
+    stock_ids = [str(2000 + i) for i in range(12)]
+
+    seen = {}
+    ml_predictions = predictor._ml_predictions
+
+    def record(items, timestamp):
+        seen.update(items)
+        return ml_predictions(items, timestamp)
+    predictor._ml_predictions = record
+
+    class _FakeBulk:
+        async def get_stocks_history_yf_batch(self, ids, months=2):
+            return {
+                sid: [
+                    {"date": f"2026-09-{d + 1:02d}", "open": 100.0, "high": 101.0, "low": 99.0,
+                     "close": 100.0 + (k + 1) * ((-1) ** d) * (d % 5), "volume": 1000 + d}
+                    for d in range(30)
+                ]
+                for k, sid in enumerate(ids)
+            }
+
+    original = (ml_predictor._predictor, inference_batcher._prediction_batcher, twse_bulk.get_bulk_service)
+    try:
+        ml_predictor._predictor = predictor
+        inference_batcher._prediction_batcher = None
+        twse_bulk.get_bulk_service = _FakeBulk
+
+        async def run():
+            return await asyncio.gather(*[ml_routes.ml_predict_stock(sid) for sid in stock_ids])
+
+        results = asyncio.run(run())
+    finally:
+        ml_predictor._predictor, inference_batcher._prediction_batcher, twse_bulk.get_bulk_service = original
+
+    assert all(r["success"] and r["model_version"] == "test_v1" for r in results)
+    assert [r["stock_id"] for r in results] == stock_ids
+    assert predictor._model.calls == [len(stock_ids)]
+
+    # 歷史K線特徵與訓練相同地計算（不是補 0）
+    closes = [100.0 + ((-1) ** d) * (d % 5) for d in range(30)]  # 每個請求各自下載一檔（k = 0）
+    features = seen["2001"]
+    assert abs(features["price_change_5d"] - (closes[-1] / closes[-5] - 1) * 100) < 1e-9
+    assert abs(features["price_change_20d"] - (closes[-1] / closes[-20] - 1) * 100) < 1e-9
+    ma5_prev = sum(closes[-9:-4]) / 5
+    assert abs(features["ma5_slope"] - (sum(closes[-5:]) / 5 - ma5_prev) / ma5_prev * 100) < 1e-9
+    assert all(f["price_change_5d"] != 0 for f in seen.values())
+    print(f"    ✓ {len(stock_ids)} 個並行路由請求只呼叫 1 次 predict_proba，歷史K線特徵有值")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_batching_window,
+        test_batch_errors,
+        test_predict_many,
+        test_predict_async,
+        test_predict_route,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n推論微批次器測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,242 @@
+"""
+本地 OHLCV 資料庫測試
+
+測試項目:
+1. 追加寫入只保留新 K 線，與最後一筆同日者覆寫
+2. memmap 讀取與期間切片
+3. 中斷後殘留位元組截斷
+4. DataFrame 讀取（與 yfinance 欄位相容）
+5. 收盤資料齊全前的當日 K 線不寫入
+6. 盤中 K 線改變不觸發重建；舊 K 線改變時以一次下載重建
+7. 收盤資料定案前檢查過的股票，定案後立即重新下載；盤中尚未取得當日 K 線時下載
+8. 盤中讀取附加當日 K 線，定案後以檔案資料為準
+"""
+
+import sys
+import os
+import json
+import importlib.util
+import tempfile
+from datetime import date, datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _bars(dates, base=100.0):
+    return [
+        {"date": d, "open": base + i, "high": base + i + 1, "low": base + i - 1,
+         "close": base + i, "volume": 1000 + i}
+        for i, d in enumerate(dates)
+    ]
+
+
+def test_append_only_new_bars():
+    """測試追加寫入"""
+    print("\n[1] 測試追加寫入...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    assert store.append("2330", _bars(["2025-01-02", "2025-01-03"]), symbol="2330.TW") == 2
+    # 重疊的 01-03 不會重複寫入，以新值覆寫最後一筆
+    assert store.append("2330", _bars(["2025-01-03", "2025-01-06"], base=200.0)) == 2
+    # 早於最後一筆的 K 線不寫入
+    assert store.append("2330", _bars(["2025-01-02"], base=900.0)) == 0
+
+    history = store.read_history("2330")
+    assert [h["date"] for h in history] == ["2025-01-02", "2025-01-03", "2025-01-06"]
+    assert [h["close"] for h in history] == [100.0, 200.0, 201.0]
+    assert store.read_meta("2330")["symbol"] == "2330.TW"
+    print("    ✓ 只追加新 K 線，最後一筆覆寫")
+    return True
+
+
+def test_read_months_slice():
+    """測試期間切片"""
+    print("\n[2] 測試期間切片...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    store.rewrite("2317", _bars(["2024-01-02", "2024-06-03", "2024-12-02", "2025-01-02"]), coverage_months=24)
+
+    assert len(store.read_history("2317")) == 4
+    assert [h["date"] for h in store.read_history("2317", months=2)] == ["2024-12-02", "2025-01-02"]
+    print("    ✓ 依月數切片正確")
+    return True
+
+
+def test_truncate_partial_append():
+    """測試中斷殘留資料截斷"""
+    print("\n[3] 測試中斷殘留截斷...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    store.append("2454", _bars(["2025-01-02"]))
+
+    # 模擬追加到一半中斷：欄位檔多出資料但 meta 未更新
+    with open(store._symbol_dir("2454") / "close.bin", "ab") as f:
+        f.write(b"\x00" * 8)
+
+    store.append("2454", _bars(["2025-01-03"], base=300.0))
+    closes = list(store.read_columns("2454")["close"])
+    assert closes == [100.0, 300.0]
+    print("    ✓ 殘留位元組已截斷")
+    return True
+
+
+def test_read_frame():
+    """測試 DataFrame 讀取"""
+    print("\n[4] 測試 DataFrame 讀取...")
+    if importlib.util.find_spec("pandas") is None:
+        print("    ⚠️ pandas 未安裝，跳過")
+        return True
+
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    store.append("^TWII", _bars(["2025-01-02", "2025-01-03"]))
+
+    df = store.read_frame("^TWII")
+    assert list(df.columns) == ["Open", "High", "Low", "Close", "Volume"]
+    assert str(df.index.tz) == "Asia/Taipei"
+    assert df["Close"].iloc[-1] == 101.0
+    print("    ✓ 欄位與時區相容 yfinance")
+    return True
+
+
+def test_skip_unfinished_bar():
+    """測試盤中 K 線不寫入"""
+    print("\n[5] 測試盤中 K 線不寫入...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    today = date.today()
+    dates = [(today - timedelta(days=1)).isoformat(), today.isoformat()]
+
+    intraday = datetime.combine(today, datetime.min.time()).replace(hour=10)
+    assert [b["date"] for b in OHLCVStore._final_bars(_bars(dates), now=intraday)] == dates[:1]
+
+    after_close = intraday.replace(hour=15)
+    assert [b["date"] for b in OHLCVStore._final_bars(_bars(dates), now=after_close)] == dates
+    print("    ✓ 收盤資料齊全後才寫入當日 K 線")
+    return True
+
+
+def test_refresh_rebuild_batched():
+    """測試增量更新與批量重建"""
+    print("\n[6] 測試增量更新與批量重建...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    old = ["2025-01-02", "2025-01-03", "2025-01-06"]
+    for sid in ("2330", "2317", "2454"):
+        store.rewrite(sid, _bars(old), symbol=f"{sid}.TW", coverage_months=24)
+    store.needs_refresh = lambda stock_id, months: True
+
+    calls = []
+    fresh = ["2025-01-03", "2025-01-06", "2025-01-07"]
+
+    def fake_download(stock_ids, start, known_symbols=None):
+        calls.append((sorted(stock_ids), start))
+        result = {}
+        for sid in stock_ids:
+            if len(calls) == 1:
+                bars = _bars(fresh, base=101.0)
+                if sid == "2317":
+                    bars[-2]["close"] = 150.0    # 最後一筆（舊版盤中 K 線）改變
+                if sid == "2454":
+                    bars[0]["close"] = 50.0      # 已定案的舊 K 線改變（除權息還原）
+            else:
+                bars = _bars(old + ["2025-01-07"], base=50.0)
+            result[sid] = (f"{sid}.TW", bars)
+        return result
+
+    store._download = fake_download
+    written = store.refresh_many_sync(["2330", "2317", "2454"])
+
+    # 一次增量下載（從倒數第二筆起），一次重建下載（只有 2454）
+    assert len(calls) == 2
+    assert calls[0] == (["2317", "2330", "2454"], date(2025, 1, 3))
+    assert calls[1][0] == ["2454"]
+
+    assert written == {"2330": 2, "2317": 2, "2454": 4}
+    assert [h["close"] for h in store.read_history("2317")] == [100.0, 101.0, 150.0, 103.0]
+    assert [h["close"] for h in store.read_history("2454")] == [50.0, 51.0, 52.0, 53.0]
+    print("    ✓ 只有舊 K 線改變時才重建，且重建為一次下載")
+    return True
+
+
+def test_refresh_after_final_time():
+    """測試收盤定案後重新下載"""
+    print("\n[7] 測試收盤定案後與盤中的更新時機...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    store.rewrite("2330", _bars(["2026-10-09", "2026-10-12"]), symbol="2330.TW", coverage_months=24)
+    tuesday = datetime(2026, 10, 13)
+
+    def checked(at):
+        meta = store.read_meta("2330")
+        meta["checked_at"] = at.timestamp()
+        with open(store._symbol_dir("2330") / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    # 盤中檢查過，收盤後雖在盤後 TTL 內仍要補上當日 K 線
+    checked(tuesday.replace(hour=11))
+    assert store.needs_refresh("2330", 24, now=tuesday.replace(hour=15))
+    # 定案後已檢查過（上游尚無當日資料）：回到 TTL
+    checked(tuesday.replace(hour=14, minute=45))
+    assert not store.needs_refresh("2330", 24, now=tuesday.replace(hour=15))
+
+    # 盤中：尚未取得今日 K 線時下載一次，之後回到 TTL
+    checked(tuesday.replace(hour=10, minute=50))
+    assert store.needs_refresh("2330", 24, now=tuesday.replace(hour=11))
+    store._live["2330"] = {"checked": tuesday.date().isoformat(), "bar": None}
+    assert not store.needs_refresh("2330", 24, now=tuesday.replace(hour=11))
+    print("    ✓ 定案後立即更新，盤中取得當日 K 線後依 TTL")
+    return True
+
+
+def test_live_bar_overlay():
+    """測試盤中附加當日 K 線"""
+    print("\n[8] 測試盤中讀取附加當日 K 線...")
+    from app.services.ohlcv_store import OHLCVStore
+
+    store = OHLCVStore(tempfile.mkdtemp())
+    today = date.today()
+    dates = [(today - timedelta(days=2)).isoformat(), (today - timedelta(days=1)).isoformat(), today.isoformat()]
+    bars = _bars(dates)
+    store.rewrite("2330", bars[:2], symbol="2330.TW", coverage_months=24)
+
+    intraday = datetime.combine(today, datetime.min.time()).replace(hour=10)
+    store._remember_live("2330", bars, now=intraday)
+
+    assert [h["date"] for h in store.read_history("2330")] == dates[:2]
+    live = store.read_history("2330", live=True)
+    assert [h["date"] for h in live] == dates and live[-1]["close"] == 102.0
+    if importlib.util.find_spec("pandas") is not None:
+        assert store.read_frame("2330", live=True)["Close"].iloc[-1] == 102.0
+
+    # 當日 K 線定案寫入後，不再附加記憶體中的盤中 K 線
+    store.append("2330", [dict(bars[2], close=105.0)])
+    assert [h["close"] for h in store.read_history("2330", live=True)] == [100.0, 101.0, 105.0]
+    print("    ✓ 盤中附加當日 K 線，定案後以檔案資料為準")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_append_only_new_bars,
+        test_read_months_slice,
+        test_truncate_partial_append,
+        test_read_frame,
+        test_skip_unfinished_bar,
+        test_refresh_rebuild_batched,
+        test_refresh_after_final_time,
+        test_live_bar_overlay,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\nOHLCV 資料庫測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
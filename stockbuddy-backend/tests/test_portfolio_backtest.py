@@ -0,0 +1,181 @@
+"""
+投資組合回測測試
+
+測試項目:
+1. 價格矩陣日期對齊（停牌、晚上市）
+2. 調倉持有評分前 N 名
+3. 無交易成本時淨值守恆
+4. 技術評分資料不足時為 NaN
+5. API 日期格式錯誤或開始晚於結束時回傳 400
+"""
+
+import sys
+import os
+import random
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _history(n, seed, skip=()):
+    rng = random.Random(seed)
+    price, start, result = rng.uniform(20, 500), date(2023, 1, 2), []
+    for i in range(n):
+        price = max(11.0, price * (1 + rng.gauss(0, 0.02)))
+        if i in skip:
+            continue
+        result.append({
+            "date": (start + timedelta(days=i)).isoformat(),
+            "close": round(price, 2),
+            "volume": rng.randint(100000, 3000000),
+        })
+    return result
+
+
+def test_matrix_alignment():
+    """測試價格矩陣對齊"""
+    print("\n[1] 測試價格矩陣對齊...")
+    import numpy as np
+    from app.services.portfolio_backtest import PriceMatrix
+
+    matrix = PriceMatrix.from_histories({
+        "A": _history(10, 1, skip={3, 4}),
+        "B": _history(10, 2)[2:],
+    })
+    assert matrix.close.shape == (10, 2)
+    assert matrix.dates[0] == "2023-01-02"
+    assert np.isnan(matrix.close[3, 0]) and np.isnan(matrix.close[0, 1])
+
+    filled = matrix.filled_close()
+    assert filled[3, 0] == filled[2, 0] == matrix.close[2, 0]
+    assert np.isnan(filled[0, 1])
+    print("    ✓ 停牌日向前填補，上市前維持 NaN")
+    return True
+
+
+def test_rebalance_top_n():
+    """測試調倉持有前 N 名"""
+    print("\n[2] 測試調倉...")
+    import numpy as np
+    from app.services.portfolio_backtest import PriceMatrix, PortfolioBacktester
+
+    histories = {f"{1000 + k}": _history(40, k) for k in range(6)}
+    matrix = PriceMatrix.from_histories(histories)
+    # 固定評分：1005 > 1004 > 1003 ...
+    scores = np.tile(np.arange(6, dtype=float), (40, 1))
+
+    result = PortfolioBacktester(top_n=2, rebalance_days=10).run(matrix, scores, start_index=5)
+    assert {h["stock_id"] for h in result["holdings"]} == {"1004", "1005"}
+    assert result["stats"]["rebalances"] == 4
+    assert result["stats"]["total_fees"] > 0
+    assert len(result["daily_values"]) == 35
+
+    final_value = result["cash"] + sum(h["value"] for h in result["holdings"])
+    assert abs(final_value - result["daily_values"][-1]["value"]) < 0.01 * len(result["holdings"])
+    print("    ✓ 持有評分最高的 2 檔，淨值一致")
+    return True
+
+
+def test_value_conserved_without_costs():
+    """測試無成本時淨值守恆"""
+    print("\n[3] 測試無成本淨值守恆...")
+    import numpy as np
+    from app.services import portfolio_backtest
+    from app.services.portfolio_backtest import PriceMatrix, PortfolioBacktester
+
+    history = _history(60, 7)
+    matrix = PriceMatrix.from_histories({"2330": history})
+    scores = np.ones(matrix.close.shape)
+
+    fee_rate, tax_rate = portfolio_backtest.FEE_RATE, portfolio_backtest.TAX_RATE
+    portfolio_backtest.FEE_RATE = portfolio_backtest.TAX_RATE = 0.0
+    try:
+        backtester = PortfolioBacktester(
+            top_n=1, rebalance_days=1, lot_size=1, drift_tolerance=0, enable_slippage=False
+        )
+        result = backtester.run(matrix, scores)
+    finally:
+        portfolio_backtest.FEE_RATE, portfolio_backtest.TAX_RATE = fee_rate, tax_rate
+
+    # 每日以收盤價調倉，淨值只隨持股的價格變動而改變
+    closes = [h["close"] for h in history]
+    values = [d["value"] for d in result["daily_values"]]
+    assert values[0] == 1000000
+    for t in range(1, len(values)):
+        shares = int(values[t - 1] // closes[t - 1])
+        assert abs(values[t] - (values[t - 1] + shares * (closes[t] - closes[t - 1]))) < 1e-6
+    assert result["stats"]["total_fees"] == 0 and result["stats"]["total_tax"] == 0
+    print("    ✓ 調倉不改變淨值")
+    return True
+
+
+def test_technical_scores_warmup():
+    """測試技術評分暖機期"""
+    print("\n[4] 測試技術評分...")
+    import numpy as np
+    from app.services.portfolio_backtest import PriceMatrix, technical_scores
+
+    matrix = PriceMatrix.from_histories({"2330": _history(100, 3)})
+    scores = technical_scores(matrix)
+    assert np.isnan(scores[:59]).all()
+    assert ((scores[60:] >= 0) & (scores[60:] <= 100)).all()
+    print("    ✓ MA60 暖機前為 NaN，之後介於 0~100")
+    return True
+
+
+def test_api_date_validation():
+    """測試 API 日期驗證"""
+    print("\n[5] 測試 API 日期驗證...")
+    import asyncio
+    from fastapi import HTTPException
+    from app.routers import stocks
+    from app.services import portfolio_backtest
+
+    calls = []
+
+    async def fake_run(**kwargs):
+        calls.append(kwargs)
+        return {"ok": True}
+
+    def request(start_date, end_date):
+        return stocks.run_portfolio_backtest_api(
+            stock_ids="2330,2317", preset="top50", start_date=start_date, end_date=end_date,
+            months=12, top_n=10, rebalance_days=5, scorer="technical", min_score=None,
+            initial_capital=1000000,
+        )
+
+    original = portfolio_backtest.run_portfolio_backtest
+    portfolio_backtest.run_portfolio_backtest = fake_run
+    try:
+        for start_date, end_date in [("2024-13-01", None), ("2024-01-01", "2024/06/30"), ("2024-06-30", "2024-01-01")]:
+            try:
+                asyncio.run(request(start_date, end_date))
+            except HTTPException as e:
+                assert e.status_code == 400
+            else:
+                raise AssertionError((start_date, end_date))
+        assert asyncio.run(request("2024-01-01", "2024-06-30")) == {"ok": True}
+    finally:
+        portfolio_backtest.run_portfolio_backtest = original
+
+    assert len(calls) == 1
+    assert (calls[0]["start_date"], calls[0]["end_date"]) == ("2024-01-01", "2024-06-30")
+    print("    ✓ 日期格式錯誤與起訖顛倒回傳 400")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_matrix_alignment,
+        test_rebalance_top_n,
+        test_value_conserved_without_costs,
+        test_technical_scores_warmup,
+        test_api_date_validation,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n投資組合回測測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
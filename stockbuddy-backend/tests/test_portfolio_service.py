@@ -0,0 +1,208 @@
+"""
+投資組合批次估值測試
+
+測試項目:
+1. value_holdings 欄向量計算與逐筆公式一致；無價格的持股為 None
+2. get_prices 以全市場摘要取價，缺少的股票以一次批量下載補齊
+3. get_holdings / get_summary 不再逐檔呼叫 get_current_price
+4. 盤中以批量即時報價取價，無成交的股票改用摘要 / 批量下載
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+HOLDINGS = [
+    {"id": "a", "stock_id": "2330", "stock_name": "台積電", "buy_price": 580.0, "quantity": 1000},
+    {"id": "b", "stock_id": "2317", "stock_name": "鴻海", "buy_price": 110.5, "quantity": 2000},
+    {"id": "c", "stock_id": "6488", "stock_name": "環球晶", "buy_price": 500.0, "quantity": 100},
+    {"id": "d", "stock_id": "9999", "stock_name": "下市", "buy_price": 20.0, "quantity": 1000},
+    {"id": "e", "stock_id": "2330", "stock_name": "台積電", "buy_price": 620.0, "quantity": 500},
+]
+
+SUMMARY = {
+    "2330": {"stock_id": "2330", "price": 600.0},
+    "2317": {"stock_id": "2317", "price": "105.50"},
+    "9999": {"stock_id": "9999", "price": None},
+}
+
+REALTIME = {
+    "2330": {"price": 612.0, "yesterday": 600.0},
+    "2317": {"price": None, "yesterday": 105.5},   # 盤中尚未成交
+}
+
+HISTORIES = {"6488": [{"date": "2026-10-15", "close": 480.0}, {"date": "2026-10-16", "close": 455.0}]}
+
+
+class _FakeUpstream:
+    """取代即時報價、全市場摘要與批量歷史下載，記錄呼叫"""
+
+    def __init__(self):
+        self.realtime_calls = []
+        self.summary_calls = 0
+        self.batch_calls = []
+
+    async def get_realtime_quotes(self, stock_ids):
+        self.realtime_calls.append(list(stock_ids))
+        return {sid: REALTIME[sid] for sid in stock_ids if sid in REALTIME}
+
+    async def get_all_stocks_summary(self):
+        self.summary_calls += 1
+        return SUMMARY
+
+    async def get_stocks_history_yf_batch(self, stock_ids, months=2):
+        self.batch_calls.append(list(stock_ids))
+        return {sid: HISTORIES[sid] for sid in stock_ids if sid in HISTORIES}
+
+
+def _patched(upstream, trading=False):
+    from app.services import portfolio_service, twse_bulk
+    from app.services.portfolio_service import PortfolioService
+    from app.services.twse_openapi import TWSEOpenAPI
+
+    original = (
+        TWSEOpenAPI.__dict__["get_realtime_quotes"],
+        TWSEOpenAPI.__dict__["get_all_stocks_summary"],
+        twse_bulk.get_bulk_service,
+        portfolio_service.is_trading_hours,
+        PortfolioService.__dict__["get_current_price"],
+    )
+    TWSEOpenAPI.get_realtime_quotes = staticmethod(upstream.get_realtime_quotes)
+    TWSEOpenAPI.get_all_stocks_summary = staticmethod(upstream.get_all_stocks_summary)
+    twse_bulk.get_bulk_service = lambda: upstream
+    portfolio_service.is_trading_hours = lambda: trading
+
+    def per_stock(stock_id):
+        raise AssertionError("不應逐檔查價")
+    PortfolioService.get_current_price = staticmethod(per_stock)
+
+    def restore():
+        (TWSEOpenAPI.get_realtime_quotes, TWSEOpenAPI.get_all_stocks_summary, twse_bulk.get_bulk_service,
+         portfolio_service.is_trading_hours, PortfolioService.get_current_price) = original
+    return restore
+
+
+def test_value_holdings():
+    """測試欄向量估值"""
+    print("\n[1] 測試欄向量估值與逐筆公式一致...")
+    from app.services.portfolio_service import PortfolioService
+
+    prices = {"2330": 600.0, "2317": 105.5, "6488": 455.0, "9999": None}
+    valued = PortfolioService.value_holdings(HOLDINGS, prices)
+
+    for holding, row in zip(HOLDINGS, valued):
+        current = prices[holding["stock_id"]]
+        cost = holding["buy_price"] * holding["quantity"]
+        assert row["cost"] == cost and row["current_price"] == current
+        if current:
+            assert row["market_value"] == current * holding["quantity"]
+            assert abs(row["profit"] - (current * holding["quantity"] - cost)) < 1e-9
+            assert abs(row["profit_percent"] - (current - holding["buy_price"]) / holding["buy_price"] * 100) < 1e-9
+        else:
+            assert row["market_value"] is None and row["profit"] is None and row["profit_percent"] is None
+        assert row["id"] == holding["id"]
+
+    assert PortfolioService.value_holdings([], prices) == []
+    print("    ✓ 5 筆持股一次計算，無價格者為 None")
+    return True
+
+
+def test_get_prices():
+    """測試批次取價"""
+    print("\n[2] 測試全市場摘要取價與批量補齊...")
+    from app.services.portfolio_service import PortfolioService
+
+    upstream = _FakeUpstream()
+    restore = _patched(upstream)
+    try:
+        prices = asyncio.run(PortfolioService.get_prices([h["stock_id"] for h in HOLDINGS]))
+    finally:
+        restore()
+
+    assert prices == {"2330": 600.0, "2317": 105.5, "6488": 455.0, "9999": None}
+    assert upstream.realtime_calls == []
+    assert upstream.summary_calls == 1
+    assert upstream.batch_calls == [["6488", "9999"]]
+    print("    ✓ 1 次全市場摘要 + 1 次批量下載取得 4 檔價格")
+    return True
+
+
+def test_holdings_and_summary():
+    """測試 get_holdings / get_summary"""
+    print("\n[3] 測試持股與總覽不逐檔查價...")
+    import json
+    from app.services.portfolio_service import PortfolioService
+
+    upstream = _FakeUpstream()
+    restore = _patched(upstream)
+    original_file = PortfolioService.PORTFOLIO_FILE
+    with tempfile.TemporaryDirectory() as root:
+        PortfolioService.PORTFOLIO_FILE = os.path.join(root, "portfolio.json")
+        with open(PortfolioService.PORTFOLIO_FILE, "w", encoding="utf-8") as f:
+            json.dump({"holdings": HOLDINGS, "transactions": []}, f)
+        try:
+            async def run():
+                holdings = await PortfolioService.get_holdings()
+                summary = await PortfolioService.get_summary(holdings)
+                return holdings, summary
+
+            holdings, summary = asyncio.run(run())
+        finally:
+            PortfolioService.PORTFOLIO_FILE = original_file
+            restore()
+
+    assert [h["current_price"] for h in holdings] == [600.0, 105.5, 455.0, None, 600.0]
+    assert upstream.summary_calls == 1 and len(upstream.batch_calls) == 1
+
+    total_cost = sum(h["buy_price"] * h["quantity"] for h in HOLDINGS)
+    total_market_value = 600.0 * 1500 + 105.5 * 2000 + 455.0 * 100
+    assert summary["total_cost"] == round(total_cost, 2)
+    assert summary["total_market_value"] == round(total_market_value, 2)
+    assert summary["total_profit"] == round(total_market_value - total_cost, 2)
+    assert summary["profitable_count"] == 1 and summary["loss_count"] == 3
+    assert summary["holdings_count"] == 5
+    print("    ✓ 5 筆持股 1 次取價，總覽沿用已估值結果")
+    return True
+
+
+def test_realtime_prices_in_trading_hours():
+    """測試盤中即時報價"""
+    print("\n[4] 測試盤中以批量即時報價取價...")
+    from app.services.portfolio_service import PortfolioService
+
+    stock_ids = [h["stock_id"] for h in HOLDINGS] + [str(1101 + i) for i in range(8)]
+    upstream = _FakeUpstream()
+    restore = _patched(upstream, trading=True)
+    try:
+        prices = asyncio.run(PortfolioService.get_prices(stock_ids))
+    finally:
+        restore()
+
+    unique = list(dict.fromkeys(stock_ids))
+    assert upstream.realtime_calls == [unique[:10], unique[10:]]
+    # 2330 用即時成交價；2317 尚未成交，改用摘要
+    assert prices["2330"] == 612.0 and prices["2317"] == 105.5 and prices["6488"] == 455.0
+    assert upstream.summary_calls == 1
+    assert upstream.batch_calls == [[sid for sid in unique if sid not in ("2330", "2317")]]
+    print(f"    ✓ {len(unique)} 檔分 {len(upstream.realtime_calls)} 批取即時報價，其餘由摘要 / 批量下載補齊")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_value_holdings,
+        test_get_prices,
+        test_holdings_and_summary,
+        test_realtime_prices_in_trading_hours,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n投資組合批次估值測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,184 @@
+"""
+背景預先計算快照測試
+
+測試項目:
+1. 發布版本遞增，其他 worker 的存放區讀到新版本
+2. 並行 run 只執行一次；計算失敗保留舊快照
+3. 盤中 / 盤後重建時機
+4. /recommend 只讀快照，過期時回傳舊版並背景重建
+"""
+
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def test_publish_versions():
+    """測試版本化發布"""
+    print("\n[1] 測試發布版本遞增與跨 worker 讀取...")
+    import numpy as np
+    from app.services.precompute import PrecomputeStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        worker_a = PrecomputeStore(root=tmp)
+        worker_b = PrecomputeStore(root=tmp)
+        assert worker_b.latest("recommend") is None
+
+        first = worker_a.publish("recommend", {"recommendations": [{"stock_id": "2330", "score": np.float32(81.5)}]})
+        assert first["version"] == 1
+        assert worker_b.latest("recommend")["result"]["recommendations"][0]["score"] == 81.5
+
+        second = worker_b.publish("recommend", {"recommendations": []}, seconds=12.5)
+        assert second["version"] == 2 and second["seconds"] == 12.5
+        assert worker_a.latest("recommend")["version"] == 2
+        assert [p for p in os.listdir(tmp)] == ["recommend.json"]  # 沒有殘留暫存檔
+
+        worker_a.invalidate("recommend")
+        assert worker_a.latest("recommend") is None and worker_b.latest("recommend") is None
+    print("    ✓ v1 → v2，其他 worker 立即看到新版本")
+    return True
+
+
+def test_single_flight_and_failure():
+    """測試並行執行與失敗"""
+    print("\n[2] 測試並行 run 只執行一次，失敗保留舊快照...")
+    from app.services.precompute import PrecomputeStore
+
+    calls = []
+    fail = {"on": False}
+
+    async def builder():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        if fail["on"]:
+            raise RuntimeError("TWSE 無回應")
+        return {"run": len(calls)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = PrecomputeStore(root=tmp)
+        store.register("recommend", builder)
+
+        async def run():
+            snapshots = await asyncio.gather(*[store.run("recommend") for _ in range(10)])
+            fail["on"] = True
+            assert store.run_in_background("recommend")
+            assert not store.run_in_background("recommend")  # 執行中不重複啟動
+            await asyncio.sleep(0.1)
+            return snapshots
+
+        snapshots = asyncio.run(run())
+        assert len(calls) == 2
+        assert all(s["version"] == 1 and s["result"] == {"run": 1} for s in snapshots)
+        assert store.latest("recommend")["result"] == {"run": 1}
+
+        stats = store.get_stats()["recommend"]
+        assert stats["runs"] == 2 and stats["failures"] == 1 and "TWSE" in stats["last_error"]
+    print("    ✓ 10 個並行請求只計算 1 次，失敗時仍提供 v1")
+    return True
+
+
+def test_due():
+    """測試重建時機"""
+    print("\n[3] 測試盤中 / 盤後重建時機...")
+    from app.services import precompute
+    from app.services.precompute import PrecomputeStore
+
+    async def builder():
+        return {"ok": True}
+
+    original = precompute.is_trading_hours
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PrecomputeStore(root=tmp)
+            store.register("recommend", builder)
+            assert store.due("recommend")  # 沒有快照
+            built_at = datetime.fromisoformat(store.publish("recommend", {"ok": True})["built_at"])
+
+            precompute.is_trading_hours = lambda: True
+            assert not store.due("recommend", now=built_at + timedelta(minutes=5))
+            assert store.due("recommend", now=built_at + timedelta(minutes=11))
+
+            precompute.is_trading_hours = lambda: False
+            monday = datetime(2024, 3, 4)
+            store._snapshots["recommend"]["built_at"] = (monday + timedelta(hours=13)).isoformat()
+            store._mtimes["recommend"] = os.stat(os.path.join(tmp, "recommend.json")).st_mtime_ns
+            assert not store.due("recommend", now=monday + timedelta(hours=14))          # 資料尚未齊全
+            assert store.due("recommend", now=monday + timedelta(hours=15))              # 收盤後第一次
+            assert not store.due("recommend", now=monday + timedelta(days=5, hours=15))  # 週六
+            store._snapshots["recommend"]["built_at"] = (monday + timedelta(hours=15)).isoformat()
+            assert not store.due("recommend", now=monday + timedelta(hours=20))          # 今天已重建
+    finally:
+        precompute.is_trading_hours = original
+    print("    ✓ 盤中每 10 分鐘，盤後每個交易日一次")
+    return True
+
+
+def test_recommend_endpoint():
+    """測試 /recommend 只讀快照"""
+    print("\n[4] 測試 /recommend 只讀快照...")
+    from app.routers import stocks
+    from app.services import precompute
+    from app.services.precompute import PrecomputeStore
+
+    calls = []
+
+    async def builder():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"recommendations": [{"stock_id": "2330"}], "run": len(calls)}
+
+    original = precompute._store
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            precompute._store = PrecomputeStore(root=tmp)
+            precompute.register_precompute("recommend", builder)
+
+            async def run():
+                cold = await asyncio.gather(*[stocks.get_recommendations() for _ in range(5)])
+                warm = await stocks.get_recommendations()
+
+                # 快照過期：立即回傳舊版，背景重建
+                snapshot = precompute._store._snapshots["recommend"]
+                snapshot["built_at"] = (datetime.now() - timedelta(days=1)).isoformat()
+                stale = await stocks.get_recommendations()
+                await asyncio.sleep(0.1)
+                fresh = await stocks.get_recommendations()
+
+                # 讀到快照後被其他 worker 清除：仍以已讀到的快照判斷年齡並回傳
+                store = precompute._store
+                reads = iter([store.latest("recommend")])
+                store.latest = lambda name: next(reads, None)
+                raced = await stocks.get_recommendations()
+                del store.latest
+                return cold, warm, stale, fresh, raced
+
+            cold, warm, stale, fresh, raced = asyncio.run(run())
+    finally:
+        precompute._store = original
+
+    assert all(r["snapshot_version"] == 1 and r["run"] == 1 for r in cold)
+    assert warm["snapshot_version"] == 1 and len(calls) == 2
+    assert stale["run"] == 1 and fresh["run"] == 2 and fresh["snapshot_version"] == 2
+    assert raced["snapshot_version"] == 2 and len(calls) == 2
+    print("    ✓ 冷啟動只計算一次，過期時先回舊版再背景重建")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_publish_versions,
+        test_single_flight_and_failure,
+        test_due,
+        test_recommend_endpoint,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n預先計算快照測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,150 @@
+"""
+增量技術指標測試
+
+測試項目:
+1. 逐日推入 K 線與完整重算結果相同
+2. 盤中 tick 取代最新 K 線
+3. 舊日期報價忽略
+4. 即時報價轉換為日 K
+5. 換日時以已定案 K 線重新初始化，不再追蹤的股票移除
+"""
+
+import sys
+import os
+import asyncio
+import random
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _bars(n, seed=1):
+    rng = random.Random(seed)
+    price, start, result = 100.0, date(2024, 1, 1), []
+    for i in range(n):
+        price = max(1.0, price * (1 + rng.gauss(0, 0.02)))
+        close = round(price, 2)
+        result.append({
+            "date": (start + timedelta(days=i)).isoformat(),
+            "open": close, "high": round(close * 1.01, 2), "low": round(close * 0.99, 2),
+            "close": close, "volume": rng.randint(1000, 9000),
+        })
+    return result
+
+
+def test_matches_full_analysis():
+    """測試與完整重算一致"""
+    print("\n[1] 測試逐日更新...")
+    from app.services.streaming_indicators import StreamingIndicators
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    bars = _bars(160)
+    stream = StreamingIndicators("2330", bars[:40])
+    for i in range(40, len(bars)):
+        assert stream.update(bars[i]) == TechnicalAnalysis.full_analysis(bars[:i + 1])
+    print("    ✓ 120 天逐日更新結果一致")
+    return True
+
+
+def test_tick_replaces_open_bar():
+    """測試盤中 tick"""
+    print("\n[2] 測試盤中 tick...")
+    from app.services.streaming_indicators import StreamingIndicators
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    bars = _bars(100, seed=2)
+    stream = StreamingIndicators("2317", bars)
+    for close in (bars[-1]["close"] * 1.02, bars[-1]["close"] * 0.97):
+        tick = dict(bars[-1], close=round(close, 2), high=round(close * 1.01, 2))
+        assert stream.update(tick) == TechnicalAnalysis.full_analysis(bars[:-1] + [tick])
+    assert stream.bar_count == 100
+    print("    ✓ 同日報價取代最新 K 線")
+    return True
+
+
+def test_ignore_stale_bar():
+    """測試舊日期報價"""
+    print("\n[3] 測試舊日期報價...")
+    from app.services.streaming_indicators import StreamingIndicators
+
+    bars = _bars(80, seed=3)
+    stream = StreamingIndicators("2454", bars)
+    before = stream.analysis()
+    assert stream.update(dict(bars[10], close=999.0)) == before
+    assert stream.last_bar == bars[-1]
+    print("    ✓ 舊日期報價不影響狀態")
+    return True
+
+
+def test_quote_to_bar():
+    """測試即時報價轉換"""
+    print("\n[4] 測試即時報價轉換...")
+    from app.services.streaming_indicators import quote_to_bar
+
+    bar = quote_to_bar({"price": 1080.0, "open": 1075.0, "high": None, "low": 1070.0, "volume": 12}, "2025-01-10")
+    assert bar == {"date": "2025-01-10", "open": 1075.0, "high": 1080.0, "low": 1070.0,
+                   "close": 1080.0, "volume": 12000}
+    assert quote_to_bar({"price": None}) is None
+    print("    ✓ 成交量由張轉為股")
+    return True
+
+
+def test_registry_reseed_and_evict():
+    """測試註冊表換日重新初始化與移除"""
+    print("\n[5] 測試換日重新初始化與移除不再追蹤的股票...")
+    from app.services import streaming_indicators
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    bars = _bars(120)
+    day1, day2 = bars[-2]["date"], bars[-1]["date"]
+    final = {"2330": bars[:-1], "2317": bars[:-1]}   # 資料庫定案到 day1
+    loads = []
+
+    def final_history(stock_id, months):
+        loads.append(stock_id)
+        return list(final[stock_id])
+
+    original = (streaming_indicators._streams.copy(), streaming_indicators._final_history)
+    streaming_indicators._streams.clear()
+    streaming_indicators._final_history = final_history
+    try:
+        async def run():
+            stream = await streaming_indicators.ensure_stream("2330", session_date=day1)
+            # 盤中最後一筆即時報價（收盤集合競價前）
+            stream.update(dict(bars[-2], close=bars[-2]["close"] * 0.97))
+            assert await streaming_indicators.ensure_stream("2330", session_date=day1) is stream
+            await streaming_indicators.ensure_stream("2317", session_date=day1)
+
+            # 換日：以資料庫的定案 K 線重新初始化，而不是併入前一日的即時報價
+            reseeded = await streaming_indicators.ensure_stream("2330", session_date=day2)
+            return stream, reseeded, reseeded.update(bars[-1])
+
+        stream, reseeded, analysis = asyncio.run(run())
+        assert reseeded is not stream and loads == ["2330", "2317", "2330"]
+        assert analysis == TechnicalAnalysis.full_analysis(bars)
+
+        assert streaming_indicators.retain_streams(["2330"]) == 1
+        assert list(streaming_indicators._streams) == ["2330"]
+    finally:
+        streaming_indicators._streams.clear()
+        streaming_indicators._streams.update(original[0])
+        streaming_indicators._final_history = original[1]
+    print("    ✓ 換日採用定案 K 線，未追蹤股票的狀態已移除")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_matches_full_analysis,
+        test_tick_replaces_open_bar,
+        test_ignore_stale_bar,
+        test_quote_to_bar,
+        test_registry_reseed_and_evict,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n增量指標測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,201 @@
+"""
+盤後技術指標快照測試
+
+測試項目:
+1. 快照欄位與 full_analysis 一致，資料不足的股票略過
+2. .npz 存檔與載入
+3. 技術面遮罩與逐檔 _apply_filters 結果一致
+4. 盤後排程時機（當日 K 線未齊全時有限次重試）
+5. 盤後重建強制更新 K 線，最後一根不是當日的股票略過
+"""
+
+import sys
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _history(n, seed):
+    rng = random.Random(seed)
+    close = 50.0
+    bars = []
+    for k in range(n):
+        close = round(close * (1 + rng.gauss(0, 0.02)), 2)
+        bars.append({
+            "date": f"2024-{1 + k // 28:02d}-{1 + k % 28:02d}",
+            "open": close,
+            "high": round(close * 1.01, 2),
+            "low": round(close * 0.99, 2),
+            "close": close,
+            "volume": rng.randint(1, 5000) * 1000,
+        })
+    return bars
+
+
+class FakeStore:
+    """只提供快照需要的 OHLCVStore 介面"""
+
+    def __init__(self, histories):
+        self.histories = histories
+        self.refreshed = []
+        self.forced = []
+
+    def refresh_many_sync(self, stock_ids, months, force=False):
+        self.refreshed.extend(stock_ids)
+        self.forced.append(force)
+        return {}
+
+    def read_history(self, stock_id, months=None):
+        return self.histories.get(stock_id, [])
+
+
+def _snapshot(n=40):
+    from app.services.technical_snapshot import build_technical_snapshot
+
+    histories = {str(2000 + k): _history(90 + k, k) for k in range(n)}
+    histories["9999"] = _history(10, 99)  # 資料不足
+    return build_technical_snapshot(list(histories), store=FakeStore(histories)), histories
+
+
+def test_matches_full_analysis():
+    """測試快照與 full_analysis 一致"""
+    print("\n[1] 測試快照欄位與 full_analysis 一致...")
+    from app.services.technical_analysis import TechnicalAnalysis
+
+    snapshot, histories = _snapshot()
+    assert len(snapshot) == 40 and snapshot.get("9999") is None
+
+    for stock_id in ("2000", "2017", "2039"):
+        analysis = TechnicalAnalysis.full_analysis(histories[stock_id])
+        row = snapshot.get(stock_id)
+        assert row["technical_score"] == analysis["overall_score"]
+        assert abs(row["rsi"] - analysis["rsi"]["value"]) < 1e-3
+        assert abs(row["ma20"] - analysis["ma"]["ma20"]) <= 1e-5 * analysis["ma"]["ma20"]
+        assert row["ma_trend_label"] == analysis["trend"]["trend"]
+        assert row["bar_date"] == histories[stock_id][-1]["date"]
+    print(f"    ✓ {len(snapshot)} 檔，資料不足者略過")
+    return True
+
+
+def test_save_load():
+    """測試存檔與載入"""
+    print("\n[2] 測試 .npz 存檔與載入...")
+    import numpy as np
+    from app.services.technical_snapshot import TechnicalSnapshot
+
+    snapshot, _ = _snapshot(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "technical_snapshot.npz")
+        snapshot.save(path)
+        loaded = TechnicalSnapshot.load(path)
+
+    assert list(loaded.stock_ids) == list(snapshot.stock_ids)
+    assert np.array_equal(loaded.values, snapshot.values, equal_nan=True)
+    assert loaded.built_at == snapshot.built_at
+    assert loaded.get("2003") == snapshot.get("2003")
+    assert TechnicalSnapshot.load(os.path.join(tmp, "missing.npz")) is None
+    print("    ✓ 載入後內容相同")
+    return True
+
+
+def test_mask_matches_apply_filters():
+    """測試技術面遮罩與逐檔篩選一致"""
+    print("\n[3] 測試技術面遮罩與 _apply_filters 一致...")
+    from app.services.fundamentals_table import FundamentalsTable
+    from app.services.stock_screener import StockScreener
+
+    snapshot, histories = _snapshot()
+    records = {s: {"stock_id": s, "pe_ratio": 12} for s in histories}
+    table = FundamentalsTable.from_records(records)
+    assert table.merge_technical(snapshot) == 40
+
+    cases = [
+        {"rsi_min": 40, "rsi_max": 60},
+        {"technical_score_min": 55},
+        {"ma_trend": "bullish"},
+        {"ma_trend": "bearish", "pe_max": 15},
+        {"ma_trend": "neutral", "rsi_max": 70},
+    ]
+    for filters in cases:
+        mask = StockScreener._table_mask(table, **filters)
+        for i, stock_id in enumerate(table.stock_ids):
+            expected = StockScreener._apply_filters(
+                records[stock_id], technical=snapshot.get(stock_id), **filters
+            )
+            assert mask[i] == expected, (filters, stock_id)
+    assert not mask[table.index["9999"]]  # 無快照資料不通過
+    print(f"    ✓ {len(cases)} 組條件 × {len(table)} 檔一致")
+    return True
+
+
+def test_snapshot_due():
+    """測試盤後排程時機"""
+    print("\n[4] 測試盤後排程時機...")
+    from app.services import technical_snapshot
+    from app.services.technical_snapshot import TechnicalSnapshot, snapshot_due
+
+    original = technical_snapshot._snapshot, dict(technical_snapshot._attempts)
+    try:
+        technical_snapshot._snapshot = TechnicalSnapshot.empty()
+        technical_snapshot._attempts.clear()
+        assert not snapshot_due(datetime(2024, 3, 4, 13, 0))   # 週一盤中
+        assert snapshot_due(datetime(2024, 3, 4, 15, 0))       # 週一盤後
+        assert not snapshot_due(datetime(2024, 3, 9, 15, 0))   # 週六
+
+        # 當日 K 線未齊全（未發布）：間隔重試，達上限後當天不再重試
+        first = datetime(2024, 3, 4, 14, 35)
+        technical_snapshot._attempts.update({"date": "2024-03-04", "count": 1, "last": first})
+        assert not snapshot_due(first + timedelta(minutes=10))
+        assert snapshot_due(first + timedelta(minutes=31))
+        technical_snapshot._attempts["count"] = technical_snapshot.SNAPSHOT_MAX_ATTEMPTS
+        assert not snapshot_due(datetime(2024, 3, 4, 20, 0))
+        assert snapshot_due(datetime(2024, 3, 5, 14, 40))      # 隔日重新計數
+
+        technical_snapshot._snapshot.built_at = datetime(2024, 3, 4, 15, 0)
+        assert not snapshot_due(datetime(2024, 3, 4, 18, 0))   # 今日已重建
+        assert snapshot_due(datetime(2024, 3, 5, 14, 40))      # 隔日盤後
+    finally:
+        technical_snapshot._snapshot = original[0]
+        technical_snapshot._attempts.clear()
+        technical_snapshot._attempts.update(original[1])
+    print("    ✓ 交易日收盤後每日一次")
+    return True
+
+
+def test_session_date():
+    """測試盤後重建只採用當日 K 線"""
+    print("\n[5] 測試強制更新與當日 K 線檢查...")
+    from app.services.technical_snapshot import build_technical_snapshot
+
+    histories = {str(2000 + k): _history(90, k) for k in range(4)}
+    session_date = histories["2000"][-1]["date"]
+    histories["2003"] = histories["2003"][:-1]  # 尚未取得當日 K 線
+
+    store = FakeStore(histories)
+    snapshot = build_technical_snapshot(list(histories), store=store, session_date=session_date)
+
+    assert store.forced == [True]
+    assert list(snapshot.stock_ids) == ["2000", "2001", "2002"]
+    assert snapshot.as_of == session_date and snapshot.get("2003") is None
+    print("    ✓ 盤後強制更新，舊 K 線不冒充當日指標")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_matches_full_analysis,
+        test_save_load,
+        test_mask_matches_apply_filters,
+        test_snapshot_due,
+        test_session_date,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n技術指標快照測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,147 @@
+"""
+背景訓練工作測試
+
+測試項目:
+1. 訓練在子行程執行，同時只執行一個，事件迴圈不被阻塞
+2. 取消排隊中與執行中的工作；子行程異常結束
+3. 訓練 API wait=False 立即回傳 job_id，可查詢進度
+"""
+
+import sys
+import os
+import asyncio
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _fake_train(progress, steps=4, delay=0.1, success=True):
+    """模擬訓練：回報進度後回傳結果"""
+    for step in range(steps):
+        time.sleep(delay)  # 阻塞式計算
+        progress((step + 1) / steps, f"步驟 {step + 1}/{steps}")
+    if not success:
+        return {"success": False, "error": "有效樣本不足"}
+    return {"success": True, "version": "v_test", "pid": os.getpid()}
+
+
+def _crash_train(progress):
+    progress(0.1, "載入")
+    os._exit(3)
+
+
+def _runner():
+    from app.services.training_jobs import TrainingJobRunner
+    return TrainingJobRunner(tasks={
+        "fake": _fake_train,
+        "crash": _crash_train,
+    })
+
+
+def test_runs_in_child_process():
+    """測試子行程執行與排隊"""
+    print("\n[1] 測試訓練在子行程執行且一次只執行一個...")
+    runner = _runner()
+
+    async def run():
+        ticks = 0
+        first = runner.submit("fake", {"steps": 5, "delay": 0.1})
+        second = runner.submit("fake", {"steps": 2, "delay": 0.05, "success": False})
+        assert first.status == "queued" and second.status == "queued"
+
+        await asyncio.sleep(0.05)
+        assert first.status == "running" and second.status == "queued"
+
+        progress_seen = set()
+        while not second.done:
+            ticks += 1
+            progress_seen.add(first.progress)
+            await asyncio.sleep(0.01)
+        return first, second, ticks, progress_seen
+
+    first, second, ticks, progress_seen = asyncio.run(run())
+    assert first.status == "done" and first.progress == 100.0
+    assert first.result["pid"] != os.getpid()
+    assert second.status == "failed" and second.error == "有效樣本不足"
+    assert second.started_at >= first.finished_at
+    assert len(progress_seen) >= 3   # 執行中可看到進度變化
+    assert ticks > 30                # 訓練期間事件迴圈持續運作
+    assert runner.get_stats() == {"running": None, "queued": 0, "jobs": {"done": 1, "failed": 1}}
+    print(f"    ✓ 子行程訓練期間事件迴圈執行 {ticks} 次，第二個工作在第一個完成後才開始")
+    return True
+
+
+def test_cancel_and_crash():
+    """測試取消與異常結束"""
+    print("\n[2] 測試取消與子行程異常結束...")
+    runner = _runner()
+
+    async def run():
+        running = runner.submit("fake", {"steps": 100, "delay": 0.1})
+        queued = runner.submit("fake", {})
+        crash = runner.submit("crash", {})
+
+        assert runner.cancel(queued.id)
+        while running.status != "running" or running.progress == 0:
+            await asyncio.sleep(0.02)
+        started = time.perf_counter()
+        assert runner.cancel(running.id)
+        await runner.wait(running.id)
+        cancel_seconds = time.perf_counter() - started
+
+        await runner.wait(crash.id)
+        assert not runner.cancel(crash.id)  # 已結束
+        return running, queued, crash, cancel_seconds
+
+    running, queued, crash, cancel_seconds = asyncio.run(run())
+    assert queued.status == "cancelled" and queued.started_at is None
+    assert running.status == "cancelled" and running.progress < 100 and cancel_seconds < 5
+    assert crash.status == "failed" and "exit code 3" in crash.error
+    print("    ✓ 排隊中直接移除，執行中終止行程，異常結束標記為失敗")
+    return True
+
+
+def test_training_api():
+    """測試訓練 API"""
+    print("\n[3] 測試訓練 API wait=False 與進度查詢...")
+    from app.routers import ml_routes
+    from app.services import training_jobs
+
+    original = training_jobs._runner
+    try:
+        training_jobs._runner = _runner()
+
+        async def run():
+            submitted = await ml_routes._run_training_job("fake", {"steps": 3, "delay": 0.05}, wait=False)
+            status = await ml_routes.get_training_job(submitted["job_id"])
+            waited = await ml_routes._run_training_job("fake", {"steps": 1, "delay": 0.01}, wait=True)
+            listing = await ml_routes.list_training_jobs()
+            missing = await ml_routes.get_training_job("nope")
+            return submitted, status, waited, listing, missing
+
+        submitted, status, waited, listing, missing = asyncio.run(run())
+    finally:
+        training_jobs._runner = original
+
+    assert submitted["success"] and submitted["status"] == "queued"
+    assert status["status"] in ("queued", "running")
+    assert waited["success"] and waited["version"] == "v_test" and "job_id" in waited
+    assert [j["status"] for j in listing["items"]] == ["done", "done"]
+    assert not missing["success"]
+    print("    ✓ 立即回傳 job_id；wait=True 回傳與原本相同的訓練結果")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_runs_in_child_process,
+        test_cancel_and_crash,
+        test_training_api,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n背景訓練工作測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,115 @@
+"""
+訓練資料管線測試
+
+測試項目:
+1. 行程池結果與主行程序列計算一致（依股票清單順序）
+2. 資料不足 / 下載失敗的股票略過
+3. 各階段耗時
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame(n, seed):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    close = np.round(50 * np.cumprod(1 + rng.normal(0, 0.02, n)), 1)
+    index = pd.bdate_range("2023-01-02", periods=n).tz_localize("Asia/Taipei")
+    return pd.DataFrame({
+        "Open": close,
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1, 5000, n).astype(float) * 1000,
+    }, index=index)
+
+
+HISTORIES = {"2330": 150, "2317": 120, "2454": 40, "1301": 130}
+
+
+def _run(max_workers):
+    from app.services import training_pipeline
+    from app.services.historical_data_enricher import get_enricher
+
+    def fake_download(stock_id, period, predict_days):
+        if stock_id == "9999":
+            raise ConnectionError("timeout")
+        hist = _frame(HISTORIES[stock_id], int(stock_id))
+        if len(hist) < training_pipeline.WARMUP_ROWS + predict_days:
+            return None, 0.0
+        return (hist, get_enricher()._get_default_fundamental()), 0.01
+
+    enricher = get_enricher()
+    original_download = training_pipeline._download
+    training_pipeline._download = fake_download
+    enricher.get_market_data = lambda period: None
+    try:
+        return training_pipeline.prepare_training_data(
+            list(HISTORIES) + ["9999"], predict_days=5, max_workers=max_workers
+        )
+    finally:
+        training_pipeline._download = original_download
+        del enricher.get_market_data
+
+
+def test_pool_matches_serial():
+    """測試行程池與序列計算一致"""
+    print("\n[1] 測試行程池與序列計算一致...")
+    import numpy as np
+
+    serial = _run(1)
+    pooled = _run(2)
+    assert serial.X.shape == (85 + 55 + 65, 55)
+    assert np.array_equal(serial.X, pooled.X)
+    assert np.array_equal(serial.y, pooled.y)
+    assert list(pooled.stock_samples) == ["2330", "2317", "1301"]
+    assert serial.quality_stats == pooled.quality_stats
+
+    # 每筆樣本的股票代碼與日期（供樣本庫去重）
+    assert pooled.sample_stock_ids == ["2330"] * 85 + ["2317"] * 55 + ["1301"] * 65
+    assert pooled.sample_dates == serial.sample_dates and len(set(pooled.sample_dates[:85])) == 85
+    assert np.array_equal(pooled.sample_returns > 0, pooled.y == 1)
+    assert len(pooled.sample_quality) == pooled.sample_count
+    print(f"    ✓ {pooled.sample_count} 樣本一致")
+    return True
+
+
+def test_skipped_stocks():
+    """測試略過的股票"""
+    print("\n[2] 測試略過股票...")
+    data = _run(1)
+    assert data.processed_stocks == 3
+    assert data.skipped_stocks == 2  # 2454 資料不足、9999 下載失敗
+    print("    ✓ 資料不足與下載失敗皆略過")
+    return True
+
+
+def test_timings():
+    """測試各階段耗時"""
+    print("\n[3] 測試各階段耗時...")
+    data = _run(1)
+    for key in ("market", "download", "download_wall", "features", "concat", "prepare"):
+        assert data.timings[key] >= 0, key
+    assert data.timings["download"] == 0.03  # 3 檔 × 0.01 秒
+    print(f"    ✓ {data.timings}")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_pool_matches_serial,
+        test_skipped_stocks,
+        test_timings,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n訓練資料管線測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
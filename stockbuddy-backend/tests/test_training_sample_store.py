@@ -0,0 +1,207 @@
+"""
+欄式訓練樣本庫測試
+
+測試項目:
+1. 批次新增：已存在與批次內重複的樣本跳過，回傳新增/跳過數
+2. 載入：與寫入內容一致；單一完整分片零複製；不同特徵順序依名稱對齊
+3. 隨機抽樣、來源與品質篩選、統計；MLTrainingManager 預設使用樣本庫
+4. 資料表後端批次寫入：唯一索引去重、回傳新增/跳過數；舊資料庫補建索引
+"""
+
+import sys
+import os
+import tempfile
+from datetime import date, timedelta
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+FEATURES = ["rsi_14", "macd_hist", "volume_ratio", "price_vs_ma20"]
+
+
+def _batch(n, stock_id="2330", start=date(2024, 1, 2), seed=0):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURES))).astype(np.float32)
+    y = rng.integers(0, 2, n)
+    dates = [start + timedelta(days=i) for i in range(n)]
+    return X, y, [stock_id] * n, dates
+
+
+def test_append_dedupe():
+    """測試新增與去重"""
+    print("\n[1] 測試批次新增與去重...")
+    import numpy as np
+    from app.services.training_sample_store import TrainingSampleStore
+
+    with tempfile.TemporaryDirectory() as root:
+        store = TrainingSampleStore(root)
+        X, y, stock_ids, dates = _batch(100)
+
+        first = store.append(X, y, stock_ids, dates, "historical", FEATURES)
+        assert first["saved"] == 100 and first["skipped"] == 0
+
+        # 與前一批重疊 50 筆，另含 10 筆批次內重複
+        X2, y2, ids2, dates2 = _batch(100, start=date(2024, 2, 21), seed=1)
+        X2 = np.vstack([X2, X2[-10:]])
+        y2 = np.concatenate([y2, y2[-10:]])
+        second = store.append(X2, y2, ids2 + ids2[-10:], dates2 + dates2[-10:], "historical", FEATURES)
+        assert second == {"saved": 50, "skipped": 60, "total": 110, "shard": second["shard"]}
+
+        # 不同來源視為不同樣本；全部重複時不建立分片
+        other = store.append(X, y, stock_ids, [str(d) for d in dates], "performance", FEATURES)
+        again = store.append(X, y, stock_ids, dates, "historical", FEATURES)
+        assert other["saved"] == 100
+        assert again == {"saved": 0, "skipped": 100, "total": 100, "shard": None}
+        assert store.count() == 250
+        store.close()
+    print("    ✓ 已存在與批次內重複的樣本跳過")
+    return True
+
+
+def test_load():
+    """測試載入"""
+    print("\n[2] 測試載入、零複製與特徵對齊...")
+    import numpy as np
+    from app.services.training_sample_store import TrainingSampleStore
+
+    with tempfile.TemporaryDirectory() as root:
+        store = TrainingSampleStore(root)
+        X, y, stock_ids, dates = _batch(80)
+        store.append(X, y, stock_ids, dates, "historical", FEATURES)
+
+        loaded_X, loaded_y, names = store.load()
+        assert isinstance(loaded_X, np.memmap)  # 單一完整分片直接映射
+        assert names == FEATURES
+        assert np.array_equal(loaded_X, X) and np.array_equal(loaded_y, y)
+
+        # 第二批特徵順序不同且含缺失值
+        X2, y2, ids2, dates2 = _batch(20, stock_id="2317", seed=2)
+        X2[0, 1] = np.nan
+        reordered = FEATURES[::-1]
+        store.append(X2[:, ::-1], y2, ids2, dates2, "historical", reordered)
+
+        # 以最新分片的特徵順序為準
+        all_X, all_y, names = store.load()
+        assert all_X.shape == (100, len(FEATURES)) and names == reordered
+        assert np.array_equal(all_X[:80], X[:, ::-1])
+        assert np.array_equal(all_X[81:], X2[1:, ::-1]) and all_X[80, 2] == 0.0
+        assert np.array_equal(all_y, np.concatenate([y, y2]))
+
+        empty_X, empty_y, empty_names = store.load(sources=["performance"])
+        assert len(empty_X) == 0 and len(empty_y) == 0 and empty_names == []
+        store.close()
+    print("    ✓ 內容一致，缺失值補 0，特徵依名稱對齊")
+    return True
+
+
+def test_sample_and_stats():
+    """測試抽樣、篩選與統計"""
+    print("\n[3] 測試抽樣、篩選與統計...")
+    import numpy as np
+    from app.services import training_sample_store
+    from app.services.ml_training_manager import MLTrainingManager
+
+    with tempfile.TemporaryDirectory() as root:
+        store = training_sample_store.TrainingSampleStore(root)
+        original = training_sample_store._store
+        training_sample_store._store = store
+        try:
+            manager = MLTrainingManager()
+            manager._migrated = True
+            X, y, stock_ids, dates = _batch(200)
+            quality = [0.9] * 100 + [0.5] * 100
+            saved = manager.save_training_samples(X, y, FEATURES, {
+                "stock_ids": stock_ids, "dates": dates, "source": "historical",
+                "returns": list(range(200)), "quality_scores": quality,
+            })
+            assert saved == {"success": True, "saved": 200, "skipped": 0, "total": 200}
+
+            high_X, _, _ = manager.load_training_samples(min_quality=0.8)
+            assert np.array_equal(high_X, X[:100])
+
+            replay_X, replay_y = manager.sample_for_replay(30)
+            assert len(replay_X) == 30 and len(replay_y) == 30
+            rows = {tuple(row) for row in X[:100].tolist()}
+            assert all(tuple(row) in rows for row in replay_X.tolist())
+            a, _ = store.sample(30, seed=1)
+            b, _ = store.sample(30, seed=1)
+            assert np.array_equal(a, b)
+
+            stats = manager.get_training_stats()
+            assert stats["total_samples"] == 200
+            assert stats["by_quality"]["high"] == 100
+            assert stats["storage"] == {"backend": "columnar", "shards": 1}
+        finally:
+            training_sample_store._store = original
+            store.close()
+    print("    ✓ 隨機抽樣只取符合品質的樣本，統計與原本格式相同")
+    return True
+
+
+def test_database_bulk_insert():
+    """測試 training_samples 資料表批次寫入"""
+    print("\n[4] 測試資料表後端批次寫入與唯一索引...")
+    import numpy as np
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+    from app.services.ml_training_manager import MLTrainingManager
+
+    with tempfile.TemporaryDirectory() as root:
+        engine = create_engine(f"sqlite:///{os.path.join(root, 'test.db')}")
+        database.Base.metadata.create_all(bind=engine)
+        original = (database.engine, database.SessionLocal)
+        database.engine, database.SessionLocal = engine, sessionmaker(bind=engine)
+        try:
+            manager = MLTrainingManager(sample_backend="database")
+            X, y, stock_ids, dates = _batch(300)
+            X[0, 1] = np.nan
+            first = manager.save_training_samples(X, y, FEATURES, {"stock_ids": stock_ids, "dates": dates})
+            assert first == {"success": True, "saved": 300, "skipped": 0, "total": 300}
+
+            # 與既有樣本重疊 100 筆、批次內重複 20 筆（日期可為字串）
+            X2, y2, ids2, dates2 = _batch(120, start=date(2024, 1, 2) + timedelta(days=200), seed=3)
+            second = manager.save_training_samples(
+                np.vstack([X2, X2[:20]]), np.concatenate([y2, y2[:20]]), FEATURES,
+                {"stock_ids": ids2 + ids2[:20], "dates": [str(d) for d in dates2 + dates2[:20]]},
+            )
+            assert second == {"success": True, "saved": 20, "skipped": 120, "total": 140}
+
+            loaded_X, loaded_y, names = manager.load_training_samples()
+            assert len(loaded_y) == 320 and names == FEATURES
+            assert loaded_X[0, 1] == 0.0 and np.allclose(loaded_X[0, [0, 2, 3]], X[0, [0, 2, 3]])
+
+            # 舊資料庫：沒有唯一索引且含重複樣本
+            with engine.begin() as conn:
+                conn.execute(text("DROP INDEX uq_training_samples_key"))
+                conn.execute(text(
+                    "INSERT INTO training_samples (stock_id, sample_date, features, feature_count, label, "
+                    "source, quality_score) SELECT stock_id, sample_date, features, feature_count, label, "
+                    "source, quality_score FROM training_samples WHERE id <= 5"
+                ))
+            database.ensure_training_sample_index(engine)
+            with engine.connect() as conn:
+                assert conn.execute(text("SELECT COUNT(*) FROM training_samples")).scalar() == 320
+        finally:
+            database.engine, database.SessionLocal = original
+            engine.dispose()
+    print("    ✓ 重複樣本由唯一索引略過，舊資料庫去重後補建索引")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_append_dedupe,
+        test_load,
+        test_sample_and_stats,
+        test_database_bulk_insert,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\n訓練樣本庫測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,123 @@
+"""
+yfinance 多檔下載拆分測試（以假的 yf.download 取代網路請求）
+
+測試項目:
+1. 多檔下載（MultiIndex 欄位）拆成各股票的歷史資料
+2. 單檔下載回傳單層欄位時仍可解析（較舊的 yfinance）
+3. 成交量 NaN 轉為 0，收盤價 NaN 的 K 線略過
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def _frame(closes, volumes=None):
+    import pandas as pd
+
+    index = pd.date_range("2026-10-12", periods=len(closes), freq="D")
+    volumes = volumes or [1000.0] * len(closes)
+    return pd.DataFrame(
+        {"Open": closes, "High": closes, "Low": closes, "Close": closes, "Volume": volumes},
+        index=index,
+    )[FIELDS]
+
+
+def _download(fake, *requests):
+    """
+    以 fake 取代 yf.download，依序執行 _download_symbols_sync
+
+    Returns:
+        (各請求的結果, yf.download 收到的代號)
+    """
+    import yfinance as yf
+    from app.services.twse_bulk import TWSEBulkService
+
+    calls = []
+
+    def download(symbols, **kwargs):
+        calls.append(list(symbols))
+        return fake(symbols)
+
+    original = yf.download
+    yf.download = download
+    try:
+        results = [
+            TWSEBulkService._download_symbols_sync(stock_ids, suffix, "2026-10-01")
+            for stock_ids, suffix in requests
+        ]
+    finally:
+        yf.download = original
+    return results, calls
+
+
+def test_multi_symbol():
+    """測試多檔下載拆分"""
+    print("\n[1] 測試多檔下載拆分...")
+    import pandas as pd
+
+    def fake(symbols):
+        return pd.concat({s: _frame([100.0 + k, 101.0 + k]) for k, s in enumerate(symbols)}, axis=1)
+
+    (result,), calls = _download(fake, (["2330", "2317"], ".TW"))
+
+    assert calls == [["2330.TW", "2317.TW"]]
+    assert [h["close"] for h in result["2317"]] == [101.0, 102.0]
+    assert result["2330"][0] == {
+        "date": "2026-10-12", "open": 100.0, "high": 100.0, "low": 100.0, "close": 100.0, "volume": 1000,
+    }
+    print("    ✓ MultiIndex 欄位依代號拆分")
+    return True
+
+
+def test_single_symbol_flat_columns():
+    """測試單檔單層欄位"""
+    print("\n[2] 測試單檔下載回傳單層欄位...")
+
+    (single, multi), _ = _download(
+        lambda symbols: _frame([50.0, 51.0, 52.0]),
+        (["6488"], ".TWO"),
+        (["2330", "2317"], ".TW"),
+    )
+
+    assert [h["close"] for h in single["6488"]] == [50.0, 51.0, 52.0]
+    # 多檔請求卻回傳單層欄位時無法判斷歸屬，不回傳資料
+    assert multi == {}
+    print("    ✓ 單層欄位視為唯一一檔的資料")
+    return True
+
+
+def test_nan_values():
+    """測試 NaN 處理"""
+    print("\n[3] 測試成交量 / 收盤價 NaN...")
+    nan = float("nan")
+
+    (result,), _ = _download(
+        lambda symbols: _frame([10.0, nan, 12.0], volumes=[500.0, 600.0, nan]),
+        (["1101"], ".TW"),
+    )
+
+    assert [(h["date"], h["close"], h["volume"]) for h in result["1101"]] == [
+        ("2026-10-12", 10.0, 500),
+        ("2026-10-14", 12.0, 0),
+    ]
+    print("    ✓ 成交量 NaN 轉為 0，收盤價 NaN 的 K 線略過")
+    return True
+
+
+def run_all_tests():
+    tests = [
+        test_multi_symbol,
+        test_single_symbol_flat_columns,
+        test_nan_values,
+    ]
+    passed = sum(1 for t in tests if t())
+    print(f"\nyfinance 多檔下載拆分測試結果: {passed}/{len(tests)} 通過")
+    return passed == len(tests)
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    sys.exit(0 if success else 1)